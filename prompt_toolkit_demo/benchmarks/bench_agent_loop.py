@@ -0,0 +1,247 @@
+"""
+Agent Loop Benchmark Suite
+==========================
+
+Drives the stages of an agent turn over synthetic workspaces of different
+sizes: the workspace snapshot (EnvironmentProxy), stream parsing
+(LLMProxy.process_response) of scripted multi-turn, tool-using responses
+at different chunk sizes, and the tools themselves (run() entry points via
+the tool registry). Every stage reports wall time, CPU time and peak
+traced memory; the report is JSON, and a previous report can be given as
+baseline to see (and gate on) regressions.
+
+Peak memory is measured in a second run of each stage under tracemalloc,
+so the timings are not distorted by tracing (``--no-memory`` skips it).
+
+Run command (from prompt_toolkit_demo):
+    python -m benchmarks.bench_agent_loop --files 1000,20000 --chunk-sizes 1,64,4096 \\
+        --output agent_loop.json
+    python -m benchmarks.bench_agent_loop --files 1000,20000 --baseline agent_loop.json \\
+        --max-regression 20
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Optional
+
+from src.examples.ai_chat_modular.environment.environment_proxy import EnvironmentProxy
+from src.examples.ai_chat_modular.headless_view import HeadlessView
+from src.examples.ai_chat_modular.llm.llm_proxy import LLMProxy
+from src.examples.ai_chat_modular.tools.tool_registry import run_tool
+
+# 模拟多轮使用工具的回复：先浏览和搜索，再读文件，最后完成任务
+SCRIPTED_TURNS = [
+    """I'll start by looking at the package layout and searching for the loaders.
+<list_files>
+<args>
+<path>pkg</path>
+<recursive>true</recursive>
+</args>
+</list_files>
+<search_files>
+<args>
+<path>pkg</path>
+<regex>def load_\\w+</regex>
+<file_pattern>*.py</file_pattern>
+</args>
+</search_files>
+""",
+    """The loaders are spread over many modules. Let me read the first two.
+<read_file>
+<args>
+  <file><path>pkg/d0/m0/file_0.py</path></file>
+  <file><path>pkg/d1/m0/file_1.py</path></file>
+</args>
+</read_file>
+""",
+    """Both modules follow the same pattern.
+<attempt_completion>
+<result>
+Every module defines a load_* function that opens the given path and
+returns its content; there is no shared configuration loader.
+</result>
+</attempt_completion>
+""",
+]
+
+DEFAULT_FILES = "1000,10000,200000"
+DEFAULT_CHUNK_SIZES = "1,16,256,4096"
+
+
+def create_workspace(root: str, file_count: int, lines_per_file: int = 4):
+    """
+    Create ``file_count`` small Python files under root/pkg/d<i>/m<j>/.
+
+    A marker file records the size, so an existing workspace of the same
+    size is reused (``--workspace-dir``).
+    """
+    marker = os.path.join(root, ".bench-files")
+    if os.path.exists(marker):
+        with open(marker, encoding="utf-8") as f:
+            if f.read().strip() == str(file_count):
+                return
+        shutil.rmtree(root)
+    for i in range(file_count):
+        directory = os.path.join(root, "pkg", f"d{i % 20}", f"m{(i // 20) % 50}")
+        if i < 1000:
+            os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file_{i}.py"), "w", encoding="utf-8") as f:
+            for j in range(lines_per_file // 2):
+                f.write(f"def load_{i}_{j}(path):\n    return open(path).read()\n")
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write(str(file_count))
+
+
+def iter_chunks(text: str, size: int) -> Iterator[str]:
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+def measure(fn: Callable[[], object], memory: bool, repeat: int = 1) -> Dict[str, float]:
+    """Run ``fn`` and return its best wall/CPU time of ``repeat`` runs (and peak traced memory)."""
+    walls, cpus = [], []
+    for _ in range(repeat):
+        gc.collect()
+        started_wall = time.perf_counter()
+        started_cpu = time.process_time()
+        fn()
+        walls.append(time.perf_counter() - started_wall)
+        cpus.append(time.process_time() - started_cpu)
+    result = {
+        "wall_ms": round(min(walls) * 1000, 3),
+        "cpu_ms": round(min(cpus) * 1000, 3),
+    }
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            result["peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def parse_turns(chunk_size: int) -> List[Dict]:
+    """Stream every scripted turn through process_response; return the parsed tools."""
+    view = HeadlessView()
+    proxy = LLMProxy(view, None)
+    history: List[Dict[str, str]] = []
+    for response in SCRIPTED_TURNS:
+        history = proxy.process_response(iter_chunks(response, chunk_size), history)['conversation_history']
+    return view.pending_tools
+
+
+def bench_workspace(root: str, file_count: int, chunk_sizes: List[int], memory: bool,
+                    repeat: int = 1) -> List[Dict]:
+    """Measure all stages on one workspace."""
+    results = []
+
+    def add(stage: str, fn: Callable[[], object], chunk_size: Optional[int] = None):
+        entry = {"files": file_count, "stage": stage, "chunk_size": chunk_size}
+        entry.update(measure(fn, memory, repeat))
+        results.append(entry)
+        peak = f"{entry['peak_kb']:>12.0f} KB" if "peak_kb" in entry else ""
+        print(f"  {stage:<24}{'' if chunk_size is None else chunk_size:>6}"
+              f"{entry['wall_ms']:>12.1f} ms{peak}", file=sys.stderr)
+
+    old_cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        add("env.snapshot", lambda: EnvironmentProxy().get_current_working_directory())
+    finally:
+        os.chdir(old_cwd)
+
+    for chunk_size in chunk_sizes:
+        add("parse", lambda: parse_turns(chunk_size), chunk_size)
+
+    for tool in parse_turns(4096):
+        name, xml = tool['__name'], tool['__xml']
+        add(f"tool.{name}", lambda: run_tool(name, xml, basePath=root))
+    return results
+
+
+def compare(results: List[Dict], baseline: List[Dict]) -> List[Dict]:
+    """Wall-time change of every stage present in both reports, in percent."""
+    previous = {(r["files"], r["stage"], r["chunk_size"]): r for r in baseline}
+    changes = []
+    for entry in results:
+        before = previous.get((entry["files"], entry["stage"], entry["chunk_size"]))
+        if before and before["wall_ms"] > 0:
+            changes.append({
+                "files": entry["files"], "stage": entry["stage"], "chunk_size": entry["chunk_size"],
+                "baseline_wall_ms": before["wall_ms"], "wall_ms": entry["wall_ms"],
+                "change_pct": round((entry["wall_ms"] - before["wall_ms"]) / before["wall_ms"] * 100, 1),
+            })
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", default=DEFAULT_FILES, help="comma-separated workspace sizes")
+    parser.add_argument("--chunk-sizes", default=DEFAULT_CHUNK_SIZES, help="comma-separated stream chunk sizes")
+    parser.add_argument("--workspace-dir", help="keep (and reuse) workspaces here instead of a temp dir")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage (the best one is reported)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="write the JSON report to this file (default: stdout)")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--max-regression", type=float,
+                        help="exit with status 1 if any stage is this many percent slower than the baseline")
+    opts = parser.parse_args()
+
+    file_counts = [int(n) for n in opts.files.split(",")]
+    chunk_sizes = [int(n) for n in opts.chunk_sizes.split(",")]
+    base_dir = opts.workspace_dir or tempfile.mkdtemp(prefix="too-agent-loop-")
+    results = []
+    try:
+        for file_count in file_counts:
+            root = os.path.join(base_dir, f"ws-{file_count}")
+            print(f"workspace with {file_count} files", file=sys.stderr)
+            create_workspace(root, file_count)
+            results.extend(bench_workspace(root, file_count, chunk_sizes, not opts.no_memory, opts.repeat))
+    finally:
+        if not opts.workspace_dir:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "files": file_counts,
+            "chunk_sizes": chunk_sizes,
+            "repeat": opts.repeat,
+        },
+        "results": results,
+    }
+    regressions = []
+    if opts.baseline:
+        with open(opts.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(results, json.load(f)["results"])
+        if opts.max_regression is not None:
+            regressions = [c for c in report["comparison"] if c["change_pct"] > opts.max_regression]
+
+    text = json.dumps(report, indent=2)
+    if opts.output:
+        with open(opts.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    for change in regressions:
+        print(f"REGRESSION {change['stage']} files={change['files']} chunk={change['chunk_size']}: "
+              f"{change['baseline_wall_ms']:.1f} -> {change['wall_ms']:.1f} ms "
+              f"(+{change['change_pct']}%)", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
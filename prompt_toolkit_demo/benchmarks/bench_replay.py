@@ -0,0 +1,128 @@
+"""
+Cassette Replay Benchmark
+=========================
+
+Runs the full TooTask loop (request build, stream parsing, tools, rendering,
+session log) against a recorded cassette, approving every tool, and reports
+wall time, CPU time and the per-stage telemetry. Record a cassette with
+``python -m src.examples.ai_chat_modular.main --record agent.jsonl`` or
+generate a synthetic one with ``--synthesize``.
+
+Run command (from prompt_toolkit_demo):
+    python -m benchmarks.bench_replay --synthesize /tmp/agent.jsonl
+    python -m benchmarks.bench_replay /tmp/agent.jsonl --speed 0
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from src.examples.ai_chat_modular.headless_view import HeadlessView
+from src.examples.ai_chat_modular.llm.cassette import Cassette
+from src.examples.ai_chat_modular.too_task import TooTask
+from src.examples.ai_chat_modular.utils.telemetry import telemetry
+
+from benchmarks.bench_speculative_tools import SCRIPTED_RESPONSE, create_workspace
+
+TASK_PATTERN = re.compile(r"<task>(.*?)</task>", re.DOTALL)
+SYNTHETIC_TASK = "Find the configuration loader and explain it."
+COMPLETION_RESPONSE = """I have what I need.
+<attempt_completion>
+<result>
+The loader functions live in pkg/mod_0 and pkg/mod_1; each one opens the
+given path and returns its content.
+</result>
+</attempt_completion>
+"""
+
+
+def synthesize(path: str, turns: int = 3, chunk_size: int = 8, chunk_delay: float = 0.002):
+    """Write a cassette of ``turns`` tool-using responses plus a completion."""
+    responses = [SCRIPTED_RESPONSE] * turns + [COMPLETION_RESPONSE]
+    if os.path.exists(path):
+        os.remove(path)
+    cassette = Cassette(path, "record")
+    for i, response in enumerate(responses):
+        events = []
+        for j in range(0, len(response), chunk_size):
+            chunk = {"choices": [{"delta": {"content": response[j:j + chunk_size]}}]}
+            events.append("data: " + json.dumps(chunk))
+        events.append("data: [DONE]")
+
+        def _paced(lines):
+            for line in lines:
+                time.sleep(chunk_delay)
+                yield line
+
+        request = [{"role": "user", "content": f"<task>{SYNTHETIC_TASK}</task>" if i == 0 else f"turn {i}"}]
+        for _ in cassette.record(request, "synthetic", _paced(events)):
+            pass
+
+
+def run_replay(cassette_path: str, speed: float, task: str = None) -> dict:
+    """Replay a cassette through TooTask and return the measurements."""
+    cassette = Cassette(cassette_path, "replay", speed=speed)
+    if task is None:
+        first = cassette._interactions[0].get("last_message", "") if len(cassette) else ""
+        match = TASK_PATTERN.search(first)
+        task = match.group(1) if match else SYNTHETIC_TASK
+
+    app = TooTask()
+    app.llm_provider.config['CONTEXT_WINDOW_TOKENS'] = '1000000'
+    app.llm_provider._cassette = cassette
+    view = HeadlessView([task] + ["$approve"] * len(cassette))
+    app.view_interface = view
+    app.llm_proxy.view = view
+    app.tool_task.view = view
+    telemetry.reset()
+
+    started_wall = time.perf_counter()
+    started_cpu = time.process_time()
+    app.run()
+    report = {
+        "interactions": len(cassette),
+        "hash_hits": cassette.hits,
+        "fallbacks": cassette.fallbacks,
+        "speed": speed,
+        "wall_ms": round((time.perf_counter() - started_wall) * 1000, 1),
+        "cpu_ms": round((time.process_time() - started_cpu) * 1000, 1),
+    }
+    report["stages"] = {name: round(stats["total"], 2) for name, stats in telemetry.summary().items()
+                        if name.endswith("_ms")}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("cassette", nargs="?", help="cassette to replay")
+    parser.add_argument("--synthesize", metavar="PATH", help="write a synthetic cassette and replay it")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="1 = recorded timing, 0 = as fast as possible")
+    parser.add_argument("--files", type=int, default=2000, help="synthetic workspace size")
+    parser.add_argument("--task", help="first user input (default: taken from the cassette)")
+    opts = parser.parse_args()
+    if not opts.cassette and not opts.synthesize:
+        parser.error("give a cassette or --synthesize PATH")
+
+    cassette_path = os.path.abspath(opts.synthesize or opts.cassette)
+    if opts.synthesize:
+        synthesize(cassette_path)
+
+    workspace = tempfile.mkdtemp(prefix="too-replay-")
+    old_cwd = os.getcwd()
+    try:
+        create_workspace(workspace, opts.files)
+        os.chdir(workspace)
+        report = run_replay(cassette_path, opts.speed, opts.task)
+    finally:
+        os.chdir(old_cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Agent Service Benchmark
+=======================
+
+Runs many sessions concurrently through the headless agent service
+(service.py) against the stub OpenAI-compatible server: every client
+creates a session on its own workspace, subscribes to its event stream,
+sends the task and approves tools until the model attempts completion.
+
+Reports throughput (turns and sessions per second), per-turn latency from
+the request to the first streamed delta and to ``turn_end``, and the memory
+the service retains per finished session. Memory is measured in a second
+pass under tracemalloc, so the timings are not distorted by tracing
+(``--no-memory`` skips it).
+
+Run command (from prompt_toolkit_demo):
+    python -m benchmarks.bench_service --sessions 64 --concurrency 16 \\
+        --tokens-per-second 300 --latency 0.05
+"""
+
+import argparse
+import gc
+import json
+import os
+import resource
+import shutil
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+from benchmarks.load_generator import RequestLog, summarise
+from src.examples.ai_chat_modular.llm.stub_server import StubConfig, StubServer
+from src.examples.ai_chat_modular.service import AgentService
+
+TASK = "Inspect the workspace and summarise the README."
+
+
+def create_workspaces(root: str, count: int, files: int) -> List[str]:
+    """Create ``count`` workspaces with a README and ``files`` small files each."""
+    workspaces = []
+    for i in range(count):
+        workspace = os.path.join(root, f"ws-{i}")
+        os.makedirs(os.path.join(workspace, "src"))
+        with open(os.path.join(workspace, "README.md"), "w", encoding="utf-8") as f:
+            f.write(f"# Project {i}\n\nA small project used by the service benchmark.\n" * 10)
+        for j in range(files):
+            with open(os.path.join(workspace, "src", f"module_{j}.py"), "w", encoding="utf-8") as f:
+                f.write(f"def handler_{j}():\n    return {j}\n")
+        workspaces.append(workspace)
+    return workspaces
+
+
+def post(url: str, payload=None) -> Dict:
+    request = urllib.request.Request(url, data=json.dumps(payload or {}).encode(), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.load(response)
+
+
+def iter_events(stream) -> Iterator[Tuple[str, Dict]]:
+    """Parse (event, data) pairs from an SSE response."""
+    fields = {}
+    for raw in stream:
+        line = raw.decode("utf-8").rstrip("\n")
+        if line.startswith(":"):
+            continue
+        if line:
+            name, value = line.split(": ", 1)
+            fields[name] = value
+        elif fields:
+            yield fields.get("event", "message"), json.loads(fields.get("data") or "{}")
+            fields = {}
+
+
+def run_client(base_url: str, workspace: str, log: RequestLog, max_turns: int = 10) -> int:
+    """Drive one session to attempt_completion; return its number of turns."""
+    session = post(base_url + "/sessions", {"workspace_root": workspace})
+    base = f"{base_url}/sessions/{session['id']}"
+    turns = 0
+    with urllib.request.urlopen(base + "/events", timeout=60) as stream:
+        events = iter_events(stream)
+        action, payload = "/messages", {"content": TASK}
+        while turns < max_turns:
+            started = time.perf_counter()
+            post(base + action, payload)
+            first = None
+            chars = 0
+            for event, data in events:
+                if event == "delta":
+                    first = first or time.perf_counter()
+                    chars += len(data["text"])
+                elif event == "turn_end":
+                    break
+            ended = time.perf_counter()
+            log.add({"ttft_ms": ((first or ended) - started) * 1000, "total_ms": (ended - started) * 1000,
+                     "chars": chars, "error": event == "error"})
+            turns += 1
+            if data.get("completed") or not data.get("pending_tools"):
+                break
+            action, payload = "/approve", None
+    return turns
+
+
+def run_pass(config: StubConfig, workspaces: List[str], concurrency: int, memory: bool) -> Dict:
+    """Run every workspace's session once through a fresh service."""
+    log = RequestLog()
+    with StubServer(config) as stub:
+        if memory:
+            gc.collect()
+            tracemalloc.start()
+        try:
+            with AgentService({"API_BASE_URL": stub.base_url, "API_KEY": "stub", "API_MODEL": "stub"},
+                              port=0) as service:
+                baseline = tracemalloc.get_traced_memory()[0] if memory else 0
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    turns = list(pool.map(lambda ws: run_client(service.base_url, ws, log), workspaces))
+                wall = time.perf_counter() - started
+                result = {"wall_s": wall, "turns": turns, "log": log.requests}
+                if memory:
+                    # 会话仍保留在服务中：计算每个会话占用的内存
+                    gc.collect()
+                    current, peak = tracemalloc.get_traced_memory()
+                    result["retained_kb_per_session"] = round((current - baseline) / len(workspaces) / 1024, 1)
+                    result["peak_kb"] = round(peak / 1024, 1)
+        finally:
+            if memory:
+                tracemalloc.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8, help="clients running at the same time")
+    parser.add_argument("--files", type=int, default=20, help="files per workspace")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--chunk-chars", type=int, default=16)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    opts = parser.parse_args()
+
+    config = StubConfig(latency=opts.latency, tokens_per_second=opts.tokens_per_second,
+                        chunk_chars=opts.chunk_chars, seed=0)
+    root = tempfile.mkdtemp(prefix="too-service-")
+    try:
+        workspaces = create_workspaces(root, opts.sessions, opts.files)
+        timed = run_pass(config, workspaces, opts.concurrency, memory=False)
+        traced = None if opts.no_memory else run_pass(config, workspaces, opts.concurrency, memory=True)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    requests = timed["log"]
+    wall = timed["wall_s"]
+    report = {
+        "sessions": opts.sessions,
+        "concurrency": opts.concurrency,
+        "wall_s": round(wall, 3),
+        "turns": len(requests),
+        "errors": sum(1 for r in requests if r["error"]),
+        "turns_per_s": round(len(requests) / wall, 2) if wall else 0,
+        "sessions_per_s": round(opts.sessions / wall, 2) if wall else 0,
+        "turns_per_session": summarise(timed["turns"]),
+        "ttft_ms": summarise([r["ttft_ms"] for r in requests]),
+        "turn_ms": summarise([r["total_ms"] for r in requests]),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if traced:
+        report["retained_kb_per_session"] = traced["retained_kb_per_session"]
+        report["traced_peak_kb"] = traced["peak_kb"]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Session Resume Benchmark
+========================
+
+Writes a long session (and a few unrelated sessions interleaved in the same
+log) to a temporary session store, then measures how long it takes to
+rebuild the conversation history with SessionStore.load_session and
+replay_session, the path used by `$resume` and `--resume`.
+
+Run command (from prompt_toolkit_demo):
+    python -m benchmarks.bench_session_resume --turns 10000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from src.examples.ai_chat_modular.session.session_store import SessionStore, replay_session
+
+# 恢复一个 10k 轮会话的目标耗时（毫秒）
+TARGET_RESUME_MS = 100
+
+
+def write_sessions(root: str, turns: int, other_sessions: int, message_chars: int) -> str:
+    """Write the benchmark session plus unrelated ones; return the benchmark session id."""
+    stores = [SessionStore(root, session_id=f"other-{i}") for i in range(other_sessions)]
+    target = SessionStore(root, session_id="target")
+    body = "x" * message_chars
+    for turn in range(turns):
+        messages = [
+            {"role": "user", "content": f"<task>step {turn}</task>\n{body}", "timestamp": "2025-01-01 12:00:00"},
+            {"role": "assistant", "content": f"Done {turn}.\n{body}", "timestamp": "2025-01-01 12:00:01"},
+        ]
+        target.append_turn(messages, pending=[])
+        for store in stores:
+            store.append_turn(messages, pending=[])
+    for store in stores + [target]:
+        store.close()
+    return target.session_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=10000)
+    parser.add_argument("--other-sessions", type=int, default=2)
+    parser.add_argument("--message-chars", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    opts = parser.parse_args()
+
+    workspace = tempfile.mkdtemp(prefix="too-bench-")
+    try:
+        root = os.path.join(workspace, ".too")
+        session_id = write_sessions(root, opts.turns, opts.other_sessions, opts.message_chars)
+
+        store = SessionStore(root)
+        samples = []
+        for _ in range(opts.repeat):
+            started = time.perf_counter()
+            history, _ = replay_session(store.load_session(session_id))
+            samples.append((time.perf_counter() - started) * 1000)
+        store.close()
+
+        p50 = statistics.median(samples)
+        print(json.dumps({
+            "turns": opts.turns,
+            "messages": len(history),
+            "log_mb": round(os.path.getsize(os.path.join(root, "sessions.jsonl")) / 2 ** 20, 1),
+            "resume_ms_p50": round(p50, 1),
+            "resume_ms_max": round(max(samples), 1),
+            "target_ms": TARGET_RESUME_MS,
+            "within_target": p50 <= TARGET_RESUME_MS,
+        }, indent=2))
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
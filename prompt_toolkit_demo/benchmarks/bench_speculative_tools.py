@@ -0,0 +1,133 @@
+"""
+Speculative Tool Execution Benchmark
+====================================
+
+Measures approval-to-result latency of read-only tools with and without
+speculative execution. A scripted stub LLM streams a response containing
+search_files, read_file and list_files blocks over a synthetic workspace;
+after the stream ends the "user" waits a moment and approves.
+
+Run command (from prompt_toolkit_demo):
+    python -m benchmarks.bench_speculative_tools --files 3000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Dict, Generator, List
+
+from src.examples.ai_chat_modular.headless_view import HeadlessView
+from src.examples.ai_chat_modular.llm.llm_proxy import LLMProxy
+from src.examples.ai_chat_modular.tools.tool_scheduler import ToolScheduler
+
+
+SCRIPTED_RESPONSE = """I'll look for the configuration loader first.
+<search_files>
+<args>
+<path>pkg</path>
+<regex>def load_\\w+</regex>
+<file_pattern>*.py</file_pattern>
+</args>
+</search_files>
+Then I'll read the modules that define it.
+<read_file>
+<args>
+  <file><path>pkg/mod_0/file_0.py</path></file>
+  <file><path>pkg/mod_1/file_1.py</path></file>
+</args>
+</read_file>
+And list the package layout.
+<list_files>
+<args>
+<path>pkg</path>
+<recursive>true</recursive>
+</args>
+</list_files>
+After these results come back I will decide which file to change, and explain
+the plan in detail so that you can review it before anything is modified.
+"""
+
+
+class ScriptedLLMProvider:
+    """Local stub LLM that streams a fixed response at a fixed chunk rate."""
+
+    def __init__(self, response: str, chunk_size: int = 8, chunk_delay: float = 0.002):
+        self.config: Dict[str, str] = {}
+        self.response = response
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+
+    def get_response_stream(self, messages: List[Dict[str, str]],
+                            task_class: str = 'chat') -> Generator[str, None, None]:
+        for i in range(0, len(self.response), self.chunk_size):
+            time.sleep(self.chunk_delay)
+            yield self.response[i:i + self.chunk_size]
+
+
+def create_workspace(root: str, file_count: int):
+    """Create a synthetic Python package with ``file_count`` files."""
+    for i in range(file_count):
+        module_dir = os.path.join(root, "pkg", f"mod_{i % 50}")
+        os.makedirs(module_dir, exist_ok=True)
+        with open(os.path.join(module_dir, f"file_{i}.py"), "w", encoding="utf-8") as f:
+            for j in range(40):
+                f.write(f"def load_{i}_{j}(path):\n    return open(path).read()\n\n")
+
+
+def run_session(provider: ScriptedLLMProvider, speculative: bool, think_time: float) -> float:
+    """Stream one scripted response, wait, approve, and return approval-to-result latency."""
+    view = HeadlessView()
+    proxy = LLMProxy(view, provider)
+    proxy.set_speculative(speculative)
+    try:
+        stream = provider.get_response_stream([])
+        proxy.process_response(stream, [])
+        time.sleep(think_time)
+
+        approved = view.pending_tools.copy()
+        view.pending_tools.clear()
+        started = time.perf_counter()
+        ToolScheduler().run(approved)
+        return time.perf_counter() - started
+    finally:
+        proxy.set_speculative(False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--think-time", type=float, default=0.3,
+                        help="seconds between end of stream and $approve")
+    parser.add_argument("--chunk-delay", type=float, default=0.002)
+    opts = parser.parse_args()
+
+    workspace = tempfile.mkdtemp(prefix="too-bench-")
+    old_cwd = os.getcwd()
+    try:
+        create_workspace(workspace, opts.files)
+        os.chdir(workspace)
+        provider = ScriptedLLMProvider(
+            SCRIPTED_RESPONSE, chunk_delay=opts.chunk_delay)
+
+        report = {"files": opts.files, "think_time": opts.think_time}
+        for speculative in (False, True):
+            latencies = [run_session(provider, speculative, opts.think_time)
+                         for _ in range(opts.repeat)]
+            key = "speculative" if speculative else "baseline"
+            report[key] = {
+                "approve_to_result_ms_p50": round(statistics.median(latencies) * 1000, 2),
+                "approve_to_result_ms_max": round(max(latencies) * 1000, 2),
+            }
+        print(json.dumps(report, indent=2))
+    finally:
+        os.chdir(old_cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
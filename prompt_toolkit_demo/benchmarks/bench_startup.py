@@ -0,0 +1,133 @@
+"""
+Startup Benchmark
+=================
+
+Measures how long ``python -m src.examples.ai_chat_modular.main`` takes to
+get to its first prompt: interpreter start, importing the app, and
+constructing TooTask. Each sample runs in a fresh interpreter. With
+``--importtime`` the slowest modules reported by ``python -X importtime``
+are listed as well.
+
+Most of the startup time is the interpreter and prompt_toolkit itself, which
+vary a lot between machines, so the target applies to the app's own share:
+the time to first prompt minus that of an interpreter that only imports the
+prompt_toolkit modules the app uses (measured alternately with it).
+
+Run command (from prompt_toolkit_demo):
+    python -m benchmarks.bench_startup --repeat 10 --importtime
+    python -m benchmarks.bench_startup --check   # exit 1 if the app's share is over target
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+# 目标：应用自身（不含解释器与 prompt_toolkit 的导入）到出现第一个输入提示的时间（毫秒）
+TARGET_APP_OVERHEAD_MS = 100
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只导入并构造 TooTask，不进入交互循环
+FIRST_PROMPT_SNIPPET = (
+    "import time;"
+    "from src.examples.ai_chat_modular.main import TooTask;"
+    "TooTask();"
+    "print(time.perf_counter())"
+)
+
+# 基准：只导入界面用到的 prompt_toolkit 模块
+BASELINE_SNIPPET = (
+    "import prompt_toolkit.shortcuts, prompt_toolkit.history, prompt_toolkit.completion"
+)
+
+
+def measure_first_prompt(snippet: str = FIRST_PROMPT_SNIPPET) -> float:
+    """
+    Run one fresh interpreter and return time to first prompt in ms.
+
+    The interpreter runs in an empty temporary directory, so nothing TooTask
+    writes relative to the working directory ends up in the caller's tree.
+    """
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    with tempfile.TemporaryDirectory() as cwd:
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", snippet], cwd=cwd, env=env,
+                       check=True, capture_output=True, text=True)
+        return (time.perf_counter() - started) * 1000
+
+
+def measure_importtime(module: str = "src.examples.ai_chat_modular.main") -> List[Dict]:
+    """
+    Import ``module`` under ``-X importtime`` and parse the report.
+
+    Returns:
+        One dict per module with self_us, cumulative_us and depth
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=PROJECT_ROOT, check=True, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true",
+                        help="also list the slowest imports")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--target-ms", type=float, default=TARGET_APP_OVERHEAD_MS,
+                        help="target for the app's share of the time to first prompt")
+    parser.add_argument("--check", action="store_true",
+                        help="exit with status 1 when the app's share exceeds the target")
+    opts = parser.parse_args()
+
+    # 预热一次，避免首次运行时的 .pyc 编译影响结果
+    measure_first_prompt()
+    measure_first_prompt(BASELINE_SNIPPET)
+    samples, baseline = [], []
+    # 交替测量，使机器负载的波动同样影响两者
+    for _ in range(opts.repeat):
+        baseline.append(measure_first_prompt(BASELINE_SNIPPET))
+        samples.append(measure_first_prompt())
+    p50 = statistics.median(samples)
+    overhead = p50 - statistics.median(baseline)
+
+    report = {
+        "first_prompt_ms_p50": round(p50, 1),
+        "first_prompt_ms_min": round(min(samples), 1),
+        "first_prompt_ms_max": round(max(samples), 1),
+        "baseline_ms_p50": round(statistics.median(baseline), 1),
+        "app_overhead_ms": round(overhead, 1),
+        "target_ms": opts.target_ms,
+        "within_target": overhead <= opts.target_ms,
+    }
+    if opts.importtime:
+        rows = measure_importtime()
+        total = next((r for r in rows if r["module"] == "src.examples.ai_chat_modular.main"), None)
+        report["import_main_ms"] = round(total["cumulative_us"] / 1000, 1) if total else None
+        slowest = sorted(rows, key=lambda r: r["self_us"], reverse=True)[:opts.top]
+        report["slowest_imports_self_ms"] = {r["module"]: round(r["self_us"] / 1000, 2) for r in slowest}
+
+    print(json.dumps(report, indent=2))
+    if opts.check and not report["within_target"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
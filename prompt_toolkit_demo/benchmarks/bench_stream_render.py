@@ -0,0 +1,90 @@
+"""
+Stream Rendering Benchmark
+==========================
+
+Compares the CPU cost of rendering a streamed response the old way (one
+flushed ``print`` per plain delta, one ``HTML(...)`` parse and
+``print_formatted_text`` per attempt_completion delta) with the
+frame-coalescing StreamRenderer. Output goes to a VT100 output on
+/dev/null so escape-sequence generation and write syscalls are included.
+
+Run command (from prompt_toolkit_demo):
+    python -m benchmarks.bench_stream_render --tokens-per-second 400
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import time
+
+from prompt_toolkit import print_formatted_text
+from prompt_toolkit.data_structures import Size
+from prompt_toolkit.formatted_text import HTML
+from prompt_toolkit.output.vt100 import Vt100_Output
+
+from src.examples.ai_chat_modular.stream_renderer import StreamRenderer
+
+PLAIN_TEXT = "Let me look at the configuration loader and explain what it does.\n" * 40
+COMPLETION_TEXT = "The loader now validates paths before opening them and caches results.\n" * 20
+
+
+def iter_deltas(text: str, chars: int):
+    for i in range(0, len(text), chars):
+        yield text[i:i + chars]
+
+
+def render_legacy(output: Vt100_Output, devnull, chars: int, delay: float):
+    """The previous ViewInterface behaviour."""
+    with contextlib.redirect_stdout(devnull):
+        for delta in iter_deltas(PLAIN_TEXT, chars):
+            print(delta, end='', flush=True)
+            time.sleep(delay)
+        for delta in iter_deltas(COMPLETION_TEXT, chars):
+            if delta.strip():
+                # 旧实现直接拼接 HTML，这里转义后再拼接以免解析失败
+                safe = delta.replace("&", "&amp;").replace("<", "&lt;")
+                print_formatted_text(HTML(f'<ansigreen>{safe}</ansigreen>'), end='', flush=True,
+                                     output=output)
+            time.sleep(delay)
+
+
+def render_coalesced(output: Vt100_Output, chars: int, delay: float, max_fps: float) -> dict:
+    renderer = StreamRenderer(max_fps=max_fps, output=output)
+    for delta in iter_deltas(PLAIN_TEXT, chars):
+        renderer.feed(delta)
+        time.sleep(delay)
+    for delta in iter_deltas(COMPLETION_TEXT, chars):
+        renderer.feed(delta, 'fg:ansigreen')
+        time.sleep(delay)
+    return renderer.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tokens-per-second", type=float, default=400)
+    parser.add_argument("--chars-per-token", type=int, default=4)
+    parser.add_argument("--max-fps", type=float, default=30)
+    opts = parser.parse_args()
+    delay = 1.0 / opts.tokens_per_second
+
+    with open(os.devnull, "w") as devnull:
+        output = Vt100_Output(devnull, lambda: Size(rows=40, columns=120), term="xterm")
+        report = {"deltas": len(PLAIN_TEXT + COMPLETION_TEXT) // opts.chars_per_token,
+                  "tokens_per_second": opts.tokens_per_second}
+
+        started = time.process_time()
+        render_legacy(output, devnull, opts.chars_per_token, delay)
+        report["legacy_cpu_ms"] = round((time.process_time() - started) * 1000, 1)
+
+        started = time.process_time()
+        stats = render_coalesced(output, opts.chars_per_token, delay, opts.max_fps)
+        report["coalesced_cpu_ms"] = round((time.process_time() - started) * 1000, 1)
+        report["coalesced_render_cpu_ms"] = round(stats["cpu_ms"], 1)
+        report["coalesced_frames"] = stats["frames"]
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Template Rendering Benchmark
+============================
+
+Compares ``replace_template_vars`` (one ``str.replace`` pass per variable)
+with the precompiled ``Template`` renderer on the real system prompt and
+environment details templates, both with fresh inputs on every call and
+with repeated inputs served from the render cache.
+
+Run command (from prompt_toolkit_demo):
+    python -m benchmarks.bench_templates --number 2000
+"""
+
+import argparse
+import json
+import timeit
+
+from src.examples.ai_chat_modular.environment.prompt_tpl.system_prompt import ss as system_prompt_tpl
+from src.examples.ai_chat_modular.environment.user_message_environment_detail import tpl as env_details_tpl
+from src.examples.ai_chat_modular.utils.tpl_util import Template, replace_template_vars
+
+SYSTEM_PROMPT_VALUES = {
+    "current_time": "2025-01-01 12:00:00",
+    "current_working_directory": "\n".join(f"src/pkg/file_{i}.py" for i in range(200)),
+    "system_info_section": "Operating System: Linux\nDefault Shell: /bin/bash",
+    "current_dir": "/home/user/project",
+}
+
+ENV_DETAILS_VALUES = {
+    "environment_details_files": "\n".join(f"src/pkg/file_{i}.py" for i in range(200)),
+    "current_time": "2025-01-01T12:00:00+00:00",
+    "user_timezone": "UTC, UTC+0",
+}
+
+
+def bench_template(name: str, source: str, values: dict, number: int) -> dict:
+    """Time both renderers on one template and return microseconds per render."""
+    braced = {"{{" + k + "}}": v for k, v in values.items()}
+    uncached = Template(source, cache_size=0)
+    cached = Template(source)
+    counter = iter(range(10 ** 9))
+
+    # 每次变更一个值，模拟时间戳变化，避免命中缓存
+    def fresh_values():
+        return {**values, "current_time": str(next(counter))}
+
+    assert uncached.render(values) == replace_template_vars(source, braced)
+
+    def per_call_us(fn) -> float:
+        return round(min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6, 2)
+
+    return {
+        "template": name,
+        "template_chars": len(source),
+        "replace_template_vars_us": per_call_us(lambda: replace_template_vars(source, braced)),
+        "compiled_render_us": per_call_us(lambda: uncached.render(fresh_values())),
+        "compiled_render_cached_us": per_call_us(lambda: cached.render(values)),
+        "compile_us": per_call_us(lambda: Template(source)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--number", type=int, default=2000)
+    opts = parser.parse_args()
+
+    report = [
+        bench_template("system_prompt", system_prompt_tpl, SYSTEM_PROMPT_VALUES, opts.number),
+        bench_template("environment_details", env_details_tpl, ENV_DETAILS_VALUES, opts.number),
+    ]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Load Generator
+==============
+
+Runs many concurrent TooTask sessions (scripted input: a task followed by
+``$approve`` for every turn) against the stub OpenAI-compatible server,
+and reports request latency (time to first token, total), errors,
+throughput and the server's connection/concurrency counters, e.g. to see
+whether connections are reused and how a concurrency limit behaves.
+
+The stub server runs in this process by default; ``--spawn`` starts it in
+a separate process (so it does not compete for the GIL) and ``--url``
+targets a server that is already running.
+
+Run command (from prompt_toolkit_demo):
+    python -m benchmarks.load_generator --sessions 32 --concurrency 8 --turns 3 \\
+        --tokens-per-second 300 --latency 0.05
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from src.examples.ai_chat_modular.headless_view import HeadlessView
+from src.examples.ai_chat_modular.llm.stub_server import StubConfig, StubServer
+from src.examples.ai_chat_modular.too_task import TooTask
+from src.examples.ai_chat_modular.utils.telemetry import percentile
+
+TASK = "Inspect the workspace and summarise the README."
+ERROR_PREFIX = "[Error calling API"
+
+
+class RequestLog:
+    """Thread-safe list of per-request measurements."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: List[Dict[str, float]] = []
+
+    def add(self, entry: Dict[str, float]):
+        with self._lock:
+            self.requests.append(entry)
+
+
+def timed_stream(stream, log: RequestLog):
+    """Pass chunks through and log time to first token, total time and errors."""
+    started = time.perf_counter()
+    first = None
+    chars = 0
+    error = False
+    try:
+        for chunk in stream:
+            if first is None:
+                first = time.perf_counter()
+            error = error or chunk.startswith(ERROR_PREFIX)
+            chars += len(chunk)
+            yield chunk
+    finally:
+        ended = time.perf_counter()
+        log.add({"ttft_ms": ((first or ended) - started) * 1000, "total_ms": (ended - started) * 1000,
+                 "chars": chars, "error": error})
+
+
+def run_session(base_url: str, turns: int, log: RequestLog) -> int:
+    """Run one scripted TooTask session; return the number of messages it produced."""
+    app = TooTask()
+    app.llm_provider.config.update({'API_BASE_URL': base_url, 'API_KEY': 'stub', 'API_MODEL': 'stub'})
+    original = app.llm_provider.get_response_stream
+    app.llm_provider.get_response_stream = \
+        lambda messages, task_class='chat': timed_stream(original(messages, task_class), log)
+    view = HeadlessView([TASK] + ["$approve"] * turns)
+    app.view_interface = view
+    app.llm_proxy.view = view
+    app.tool_task.view = view
+    app.run()
+    return len(app.conversation_history)
+
+
+def spawn_server(args: List[str]):
+    """Start the stub server in a subprocess; return (process, base URL)."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "src.examples.ai_chat_modular.llm.stub_server", "--port", "0"] + args,
+        stdout=subprocess.PIPE, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    line = process.stdout.readline()
+    return process, line.rsplit(" ", 1)[-1].strip()
+
+
+def fetch_stats(base_url: str) -> Optional[Dict[str, int]]:
+    try:
+        with urllib.request.urlopen(base_url + "/stats", timeout=5) as response:
+            return json.load(response)
+    except Exception:
+        return None
+
+
+def summarise(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    return {"p50": round(percentile(values, 50), 2), "p95": round(percentile(values, 95), 2),
+            "mean": round(statistics.mean(values), 2), "max": round(max(values), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4, help="sessions running at the same time")
+    parser.add_argument("--turns", type=int, default=3, help="approved tool turns per session")
+    parser.add_argument("--url", help="use a running server (API base URL) instead of starting one")
+    parser.add_argument("--spawn", action="store_true", help="run the stub server in a separate process")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--chunk-chars", type=int, default=16)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--disconnect-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=0, help="server-side limit (429 above it)")
+    opts = parser.parse_args()
+
+    server = process = None
+    base_url = opts.url
+    if not base_url:
+        config = StubConfig(latency=opts.latency, tokens_per_second=opts.tokens_per_second,
+                            chunk_chars=opts.chunk_chars, error_rate=opts.error_rate,
+                            disconnect_rate=opts.disconnect_rate, max_concurrency=opts.max_concurrency, seed=0)
+        if opts.spawn:
+            process, base_url = spawn_server([
+                "--latency", str(config.latency), "--tokens-per-second", str(config.tokens_per_second),
+                "--chunk-chars", str(config.chunk_chars), "--error-rate", str(config.error_rate),
+                "--disconnect-rate", str(config.disconnect_rate),
+                "--max-concurrency", str(config.max_concurrency), "--seed", "0"])
+        else:
+            server = StubServer(config).start()
+            base_url = server.base_url
+
+    workspace = tempfile.mkdtemp(prefix="too-load-")
+    old_cwd = os.getcwd()
+    log = RequestLog()
+    try:
+        with open(os.path.join(workspace, "README.md"), "w", encoding="utf-8") as f:
+            f.write("# Demo project\n\nA small project used by the load generator.\n" * 20)
+        os.chdir(workspace)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=opts.concurrency) as pool:
+            message_counts = list(pool.map(lambda _: run_session(base_url, opts.turns, log),
+                                           range(opts.sessions)))
+        wall = time.perf_counter() - started
+        server_stats = fetch_stats(base_url)
+    finally:
+        os.chdir(old_cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+        if server:
+            server.stop()
+        if process:
+            process.terminate()
+            process.wait()
+
+    requests = log.requests
+    ok = [r for r in requests if not r["error"]]
+    report = {
+        "sessions": opts.sessions,
+        "concurrency": opts.concurrency,
+        "wall_s": round(wall, 3),
+        "requests": len(requests),
+        "errors": len(requests) - len(ok),
+        "requests_per_s": round(len(requests) / wall, 2) if wall else 0,
+        "chars_per_s": round(sum(r["chars"] for r in ok) / wall, 1) if wall else 0,
+        "messages_per_session": summarise(message_counts),
+        "ttft_ms": summarise([r["ttft_ms"] for r in ok]),
+        "request_ms": summarise([r["total_ms"] for r in ok]),
+        "server": server_stats,
+    }
+    if server_stats and server_stats.get("connections", 0) > 1:
+        # 不计 /stats 请求自己的连接
+        report["requests_per_connection"] = round(
+            server_stats["requests"] / (server_stats["connections"] - 1), 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Agent Session for AI Chat Application
+=====================================
+
+One conversation with the agent, without a terminal: its own workspace
+root, conversation history and pending-tool queue. Everything the terminal
+view would show (streamed assistant text, system messages, tool progress)
+is reported as events to a callback, so many sessions can be hosted by one
+process (see service.py).
+
+The turn methods block while the model streams and tools run; callers that
+host many sessions run them on worker threads.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from .environment.system_message import get_message_message
+from .headless_view import HeadlessView
+from .llm.llm_provider import LLMProvider
+from .llm.llm_proxy import LLMProxy
+from .session.session_store import new_session_id
+from .too_task import NO_TOOLS_USED_TIPS
+from .tools.tool_scheduler import ToolScheduler
+from .tools.tool_worker_pool import ToolWorkerPool
+from .utils.telemetry import telemetry
+from .utils.time_util import get_current_timestamp
+
+# tool_done 事件中结果预览的最大字符数
+RESULT_PREVIEW_CHARS = 1000
+
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+
+class SessionBusyError(RuntimeError):
+    """Raised when a session is asked to do something it cannot do right now."""
+
+
+class EventView(HeadlessView):
+    """
+    A HeadlessView that also reports what it displays as events.
+    """
+
+    def __init__(self, emit: EventCallback):
+        """
+        Initialize the event view.
+
+        Args:
+            emit: Callback ``(event type, data)``, called on the turn's thread
+        """
+        super().__init__()
+        self.emit = emit
+
+    def display_system_message(self, message: str, msg_type: str = 'info'):
+        self.emit("system", {"type": msg_type, "message": message})
+
+    def display_ai_message_chunk(self, chunk: str):
+        self.emit("delta", {"text": chunk})
+
+    def display_attempt_completion(self, chunk: str):
+        self.emit("completion", {"text": chunk})
+
+    def display_ai_message(self, message: str):
+        self.emit("delta", {"text": message})
+
+
+class AgentSession:
+    """
+    A headless agent conversation bound to one workspace directory.
+    """
+
+    def __init__(self, workspace_root: str, emit: Optional[EventCallback] = None,
+                 config: Optional[Dict[str, str]] = None, session_id: Optional[str] = None,
+                 tool_pool: Optional[ToolWorkerPool] = None):
+        """
+        Initialize the session.
+
+        Args:
+            workspace_root: Directory the tools and environment details use
+            emit: Event callback ``(event type, data)``; events are dropped when None
+            config: Configuration overriding the values loaded from .env
+            session_id: Session id (generated when None)
+            tool_pool: Worker process pool to run the tools in (shared between
+                sessions; tools run on threads of this process when None)
+
+        Raises:
+            NotADirectoryError: If the workspace root is not a directory
+        """
+        self.workspace_root = os.path.abspath(workspace_root)
+        if not os.path.isdir(self.workspace_root):
+            raise NotADirectoryError(self.workspace_root)
+        self.session_id = session_id or new_session_id()
+        self.emit = emit or (lambda event, data: None)
+        self.llm_provider = LLMProvider()
+        self.llm_provider.config.update(config or {})
+        self.view = EventView(self._emit)
+        self.llm_proxy = LLMProxy(self.view, self.llm_provider)
+        self.llm_proxy.workspace_root = self.workspace_root
+        self.llm_proxy.tool_pool = tool_pool
+        self.llm_proxy.set_speculative(
+            self.llm_provider.config.get('SPECULATIVE_TOOLS', 'false').lower() in ['true', '1', 'yes', 'on'])
+        self.conversation_history: List[Dict[str, str]] = []
+        # 回复中没有工具时自动提醒重试的次数上限（终端里会一直重试）
+        self.no_tool_retries = int(self.llm_provider.config.get('SERVICE_NO_TOOL_RETRIES', 2))
+        self.stats = {"turns": 0, "tool_runs": 0, "tool_errors": 0, "retries": 0, "delta_chars": 0}
+        self.created = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def pending_tools(self) -> List[Dict[str, Any]]:
+        """Tools parsed from the last response, waiting for approval."""
+        return self.view.pending_tools
+
+    @property
+    def busy(self) -> bool:
+        """Whether a turn is running."""
+        return self._lock.locked()
+
+    def _emit(self, event: str, data: Dict[str, Any]):
+        if event == "delta":
+            self.stats["delta_chars"] += len(data["text"])
+        self.emit(event, data)
+
+    def describe(self) -> Dict[str, Any]:
+        """A JSON-serialisable summary of the session."""
+        return {
+            "id": self.session_id,
+            "workspace_root": self.workspace_root,
+            "messages": len(self.conversation_history),
+            "pending_tools": self._describe_tools(self.pending_tools),
+            "busy": self.busy,
+            "created": self.created,
+            "stats": dict(self.stats),
+        }
+
+    @staticmethod
+    def _describe_tools(tools: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        return [{"name": tool.get('__name', 'unknown'), "desc": tool.get('desc', '')} for tool in tools]
+
+    def send_message(self, message: str) -> Dict[str, Any]:
+        """
+        Send a user message and run the model turn it starts.
+
+        Args:
+            message: The user's message
+
+        Returns:
+            The ``turn_end`` event data
+
+        Raises:
+            SessionBusyError: If a turn is running or tools wait for approval
+        """
+        with self._turn("message", pending=False):
+            if not self.conversation_history:
+                self.conversation_history.append({
+                    "role": "system",
+                    "content": get_message_message(self.workspace_root),
+                    "timestamp": get_current_timestamp()
+                })
+            task_data = self.llm_proxy.process_user_input(message, self.conversation_history)
+            return self._run_model(task_data)
+
+    def approve(self) -> Dict[str, Any]:
+        """
+        Run the pending tools and send their results to the model.
+
+        Returns:
+            The ``turn_end`` event data
+
+        Raises:
+            SessionBusyError: If a turn is running or no tools are pending
+        """
+        with self._turn("approve", pending=True):
+            approved = self.pending_tools.copy()
+            self.pending_tools.clear()
+            self._run_tools(approved)
+            task_data = self.llm_proxy.process_tools_input(approved, self.conversation_history)
+            return self._run_model(task_data)
+
+    def reject(self) -> Dict[str, Any]:
+        """
+        Drop the pending tools and tell the model they were rejected.
+
+        Returns:
+            The ``turn_end`` event data
+
+        Raises:
+            SessionBusyError: If a turn is running or no tools are pending
+        """
+        with self._turn("reject", pending=True):
+            rejected = self.pending_tools.copy()
+            self.pending_tools.clear()
+            self.llm_proxy.discard_pending_tools(rejected)
+            self.conversation_history.append({
+                "role": "user",
+                "content": "[The user rejected the pending tool(s): " + ", ".join(
+                    tool.get('__name', 'unknown') for tool in rejected) + "]",
+                "timestamp": get_current_timestamp()
+            })
+            return self._turn_end(0.0)
+
+    def close(self):
+        """Release the session's background resources."""
+        self.llm_proxy.set_speculative(False)
+
+    @contextmanager
+    def _turn(self, action: str, pending: bool):
+        # 同一会话同时只运行一轮，拿不到锁时直接报错而不是排队
+        if not self._lock.acquire(blocking=False):
+            raise SessionBusyError("a turn is already running")
+        try:
+            if pending and not self.pending_tools:
+                raise SessionBusyError("no tools are waiting for approval")
+            if not pending and self.pending_tools:
+                raise SessionBusyError("tools are waiting for approval or rejection")
+            self._turn_started = time.perf_counter()
+            self.emit("turn_start", {"action": action})
+            yield
+        except SessionBusyError:
+            raise
+        except Exception as e:
+            self.emit("error", {"message": str(e)})
+            raise
+        finally:
+            self._lock.release()
+
+    def _run_tools(self, tools: List[Dict[str, Any]]):
+        def _on_progress(event: str, index: int, tool: Dict[str, Any], payload: Any, elapsed: float):
+            data = {"index": index, "name": tool.get('__name', 'unknown')}
+            if event == 'start':
+                data["desc"] = tool.get('desc', '')
+                self._emit("tool_start", data)
+            elif event == 'done':
+                self.stats["tool_runs"] += 1
+                # 事件里只带结果的开头，完整结果在发给模型的消息中
+                result = str(payload)
+                data.update(elapsed_ms=round(elapsed * 1000, 3), result=result[:RESULT_PREVIEW_CHARS],
+                            result_chars=len(result))
+                self._emit("tool_done", data)
+            elif event == 'error':
+                self.stats["tool_errors"] += 1
+                data.update(elapsed_ms=round(elapsed * 1000, 3), error=str(payload))
+                self._emit("tool_error", data)
+
+        scheduler = ToolScheduler(
+            max_workers=int(self.llm_provider.config.get('TOOL_MAX_WORKERS', 4)),
+            on_progress=_on_progress)
+        scheduler.run(tools)
+
+    def _run_model(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
+        started = self._turn_started
+        retries = 0
+        while True:
+            execution_result = self.llm_proxy.execute_task(task_data)
+            processing_result = self.llm_proxy.process_response(
+                execution_result['response_stream'], execution_result['conversation_history'])
+            self.conversation_history = processing_result['conversation_history']
+            self.stats["turns"] += 1
+            if self.pending_tools or retries >= self.no_tool_retries:
+                break
+            # 回复中没有工具：与终端一样提醒模型使用工具，但次数有限
+            retries += 1
+            self.stats["retries"] += 1
+            telemetry.incr("llm.no_tool_retries")
+            self._emit("system", {"type": "error",
+                                  "message": "No tools were used in the previous response. AI will retry to think."})
+            task_data = self.llm_proxy.process_tips_input(NO_TOOLS_USED_TIPS, self.conversation_history)
+        return self._turn_end(time.perf_counter() - started)
+
+    def _turn_end(self, elapsed: float) -> Dict[str, Any]:
+        data = {
+            "pending_tools": self._describe_tools(self.pending_tools),
+            "completed": any(tool.get('__name') == 'attempt_completion' for tool in self.pending_tools),
+            "messages": len(self.conversation_history),
+            "elapsed_ms": round(elapsed * 1000, 3),
+        }
+        self.emit("turn_end", data)
+        return data
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.agent_session
+"""
+if __name__ == "__main__":
+    from .llm.stub_server import StubServer
+
+    with StubServer() as server:
+        session = AgentSession(os.getcwd(), emit=lambda event, data: print(event, data),
+                               config={"API_BASE_URL": server.base_url, "API_KEY": "stub", "API_MODEL": "stub"})
+        session.send_message("Inspect the workspace and summarise the README.")
+        while session.pending_tools and not any(
+                tool['__name'] == 'attempt_completion' for tool in session.pending_tools):
+            session.approve()
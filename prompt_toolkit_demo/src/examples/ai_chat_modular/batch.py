@@ -0,0 +1,414 @@
+"""
+Batch Task Runner
+=================
+
+Runs a JSONL file of tasks through the headless agent loop (AgentSession)
+without a UI, for bulk jobs. Each task runs in its own worker process on a
+private copy of its workspace, tools are approved automatically according
+to a policy, and every task has a timeout after which its process is
+killed.
+
+Task file, one JSON object per line::
+
+    {"id": "fix-1", "task": "Fix the typo in README.md", "workspace": "/src/project",
+     "approve": "edits", "timeout": 300, "max_turns": 20}
+
+Only ``task`` is required; the other fields default to the command-line
+options. Results are appended to the output JSONL as tasks finish, and
+finished task ids to a progress file, so an interrupted run continues
+where it stopped when started again.
+
+Run command (from prompt_toolkit_demo):
+    python -m src.examples.ai_chat_modular.main batch tasks.jsonl --workers 8 --timeout 600
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from multiprocessing.connection import wait
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+# 自动批准策略：允许自动执行的工具（None 表示全部允许）
+READ_ONLY_TOOLS = {'read_file', 'list_files', 'search_files'}
+APPROVAL_POLICIES = {
+    'all': None,
+    'edits': READ_ONLY_TOOLS | {'write_to_file', 'insert_content', 'search_and_replace'},
+    'read-only': READ_ONLY_TOOLS,
+}
+# 复制工作区时跳过的目录
+COPY_IGNORE = ('.git', '.too', '__pycache__', 'node_modules', '.venv')
+# 超时后等待进程退出的时间（秒），之后强制结束
+KILL_GRACE_SECONDS = 5.0
+
+
+@dataclass
+class BatchOptions:
+    """
+    Defaults for every task of a batch run.
+
+    Attributes:
+        workers: Tasks running at the same time (one process each)
+        timeout: Seconds before a task's process is killed
+        approve: Approval policy: all, edits, read-only, or comma-separated tool names
+        max_turns: Model turns after which a task is stopped
+        workspace: Workspace of tasks that do not name one
+        workspaces_dir: Directory for the workspace copies (temporary when None)
+        keep_workspaces: Keep the workspace copies after the tasks finish
+        config: Configuration overriding the values loaded from .env
+    """
+    workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    timeout: float = 600.0
+    approve: str = 'edits'
+    max_turns: int = 30
+    workspace: str = field(default_factory=os.getcwd)
+    workspaces_dir: Optional[str] = None
+    keep_workspaces: bool = False
+    config: Dict[str, str] = field(default_factory=dict)
+
+
+def allowed_tools(policy: str) -> Optional[Set[str]]:
+    """
+    Resolve an approval policy to the set of tools it approves.
+
+    Args:
+        policy: A policy name or comma-separated tool names
+
+    Returns:
+        The approved tool names, or None if every tool is approved
+    """
+    if policy in APPROVAL_POLICIES:
+        return APPROVAL_POLICIES[policy]
+    return {name.strip() for name in policy.split(",") if name.strip()}
+
+
+def read_tasks(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read the task file; tasks without an id get ``line-<n>``.
+
+    Lines that are not valid tasks, and tasks reusing an earlier task's id,
+    are yielded with an ``error`` field (under the id ``line-<n>``).
+    """
+    seen: Dict[str, int] = {}
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                task = json.loads(line)
+                if not isinstance(task, dict) or not isinstance(task.get("task"), str):
+                    raise ValueError("expected an object with a \"task\" string")
+            except ValueError as e:
+                yield {"id": f"line-{number}", "error": f"Invalid task: {e}"}
+                continue
+            task["id"] = str(task.get("id") or f"line-{number}")
+            if task["id"] in seen:
+                # id 同时用于进度文件和工作区目录，重复会互相覆盖
+                yield {"id": f"line-{number}",
+                       "error": f"Duplicate task id {task['id']!r} (first used on line {seen[task['id']]})"}
+                continue
+            seen[task["id"]] = number
+            yield task
+
+
+def load_progress(path: str) -> Dict[str, str]:
+    """Map of task id to status of the tasks a previous run finished."""
+    finished = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 上次运行中断时可能留下半行
+                    continue
+                finished[record["id"]] = record["status"]
+    return finished
+
+
+def snapshot_files(root: str) -> Dict[str, Tuple[int, int]]:
+    """(size, mtime_ns) of every file below root, by relative path."""
+    files = {}
+    for directory, dirs, names in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in COPY_IGNORE]
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files[os.path.relpath(path, root)] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+def run_task(task: Dict[str, Any], workspace: str, options: BatchOptions) -> Dict[str, Any]:
+    """
+    Run one task to completion in ``workspace`` (in the calling process).
+
+    Args:
+        task: The task (``task`` plus optional ``approve`` and ``max_turns``)
+        workspace: The task's workspace copy
+        options: Defaults for the fields the task does not set
+
+    Returns:
+        The result record (without id and timing)
+    """
+    from .agent_session import AgentSession
+
+    allowed = allowed_tools(task.get("approve") or options.approve)
+    max_turns = int(task.get("max_turns") or options.max_turns)
+    session = AgentSession(workspace, config=options.config)
+    before = snapshot_files(workspace)
+    result: Dict[str, Any] = {"status": "max_turns"}
+    try:
+        session.send_message(task["task"])
+        while session.stats["turns"] < max_turns:
+            pending = session.pending_tools
+            if not pending:
+                result["status"] = "no_tool"
+                break
+            completion = next((tool for tool in pending if tool.get('__name') == 'attempt_completion'), None)
+            if completion is not None:
+                result.update(status="completed", result=str(completion["__callback"]()).strip())
+                break
+            blocked = [tool['__name'] for tool in pending if allowed is not None and tool['__name'] not in allowed]
+            if blocked:
+                result.update(status="needs_approval", blocked_tools=blocked)
+                break
+            session.approve()
+    finally:
+        session.close()
+    after = snapshot_files(workspace)
+    result["changed_files"] = sorted(path for path in set(before) | set(after) if before.get(path) != after.get(path))
+    result["turns"] = session.stats["turns"]
+    result["tool_runs"] = session.stats["tool_runs"]
+    return result
+
+
+def _task_process(conn, task: Dict[str, Any], source: str, workspace: str, options: BatchOptions):
+    """Worker process: copy the workspace, run the task and send back its result."""
+    if hasattr(os, "setsid"):
+        # 自成进程组：超时后连同 execute_command 启动的子进程一起结束
+        os.setsid()
+    try:
+        shutil.copytree(source, workspace, ignore=shutil.ignore_patterns(*COPY_IGNORE), symlinks=True)
+        result = run_task(task, workspace, options)
+    except BaseException as e:
+        result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+    conn.send(result)
+    conn.close()
+
+
+class BatchRunner:
+    """
+    Runs tasks in worker processes and records their results as they finish.
+    """
+
+    def __init__(self, output_path: str, options: Optional[BatchOptions] = None,
+                 progress_path: Optional[str] = None, retry_failed: bool = False, log=None):
+        """
+        Initialize the runner.
+
+        Args:
+            output_path: JSONL file the results are appended to
+            options: Defaults for the tasks
+            progress_path: Progress file (``<output>.progress`` by default)
+            retry_failed: Run tasks again that a previous run did not complete
+            log: Stream for progress lines (stderr by default, False for none)
+        """
+        self.output_path = output_path
+        self.options = options or BatchOptions()
+        self.progress_path = progress_path or output_path + ".progress"
+        self.retry_failed = retry_failed
+        self.log = sys.stderr if log is None else log
+        # fork 时子进程直接继承已导入的模块，启动更快
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("fork" if "fork" in methods else None)
+
+    def _pending(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        finished = load_progress(self.progress_path)
+        return [task for task in tasks if task["id"] not in finished
+                or (self.retry_failed and finished[task["id"]] != "completed")]
+
+    def run(self, tasks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Run the tasks that no previous run finished.
+
+        Args:
+            tasks: Tasks as returned by read_tasks
+
+        Returns:
+            Summary: counts per status, skipped tasks and wall time
+        """
+        pending = self._pending(tasks)
+        summary: Dict[str, Any] = {"tasks": len(tasks), "skipped": len(tasks) - len(pending), "statuses": {}}
+        workspaces_dir = self.options.workspaces_dir or tempfile.mkdtemp(prefix="too-batch-")
+        os.makedirs(workspaces_dir, exist_ok=True)
+        started = time.perf_counter()
+        running: Dict[Any, Tuple[Dict[str, Any], Any, str, float, float]] = {}
+        queue = list(reversed(pending))
+        done = 0
+        try:
+            with open(self.output_path, "a", encoding="utf-8") as output, \
+                    open(self.progress_path, "a", encoding="utf-8") as progress:
+
+                def _finish(task: Dict[str, Any], result: Dict[str, Any], task_started: float, workspace: str):
+                    nonlocal done
+                    done += 1
+                    result = dict({"id": task["id"]}, **result, elapsed_s=round(time.perf_counter() - task_started, 3))
+                    if self.options.keep_workspaces:
+                        result["workspace"] = workspace
+                    else:
+                        shutil.rmtree(workspace, ignore_errors=True)
+                    # 先写结果再写进度：中途崩溃最多重复一个结果，不会丢失
+                    output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    output.flush()
+                    progress.write(json.dumps({"id": task["id"], "status": result["status"]}) + "\n")
+                    progress.flush()
+                    os.fsync(progress.fileno())
+                    statuses = summary["statuses"]
+                    statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+                    if self.log:
+                        print(f"[{done}/{len(pending)}] {task['id']}: {result['status']} "
+                              f"({result.get('turns', 0)} turns, {result['elapsed_s']:.1f}s)", file=self.log)
+
+                while queue or running:
+                    while queue and len(running) < max(1, self.options.workers):
+                        task = queue.pop()
+                        workspace = os.path.join(workspaces_dir, _workspace_name(task["id"]))
+                        if "error" in task:
+                            _finish(task, {"status": "error", "error": task["error"]}, time.perf_counter(), workspace)
+                            continue
+                        shutil.rmtree(workspace, ignore_errors=True)
+                        receiver, sender = self._context.Pipe(duplex=False)
+                        source = os.path.abspath(task.get("workspace") or self.options.workspace)
+                        process = self._context.Process(
+                            target=_task_process, args=(sender, task, source, workspace, self.options), daemon=True)
+                        process.start()
+                        sender.close()
+                        timeout = float(task.get("timeout") or self.options.timeout)
+                        running[receiver] = (task, process, workspace, time.perf_counter(), timeout)
+                    if not running:
+                        continue
+
+                    now = time.perf_counter()
+                    next_deadline = min(entry[3] + entry[4] for entry in running.values())
+                    ready = wait(list(running), timeout=max(0.0, next_deadline - now))
+                    for receiver in ready:
+                        task, process, workspace, task_started, _ = running.pop(receiver)
+                        try:
+                            result = receiver.recv()
+                        except EOFError:
+                            process.join()
+                            result = {"status": "crashed", "error": f"worker exited with code {process.exitcode}"}
+                        receiver.close()
+                        process.join()
+                        _finish(task, result, task_started, workspace)
+
+                    now = time.perf_counter()
+                    for receiver, (task, process, workspace, task_started, timeout) in list(running.items()):
+                        if now - task_started >= timeout:
+                            del running[receiver]
+                            _stop(process)
+                            receiver.close()
+                            _finish(task, {"status": "timeout", "error": f"no result after {timeout:.0f}s"},
+                                    task_started, workspace)
+        finally:
+            # 中断时结束仍在运行的任务，它们会在下次运行时重新执行
+            for receiver, (task, process, workspace, _, _) in running.items():
+                _stop(process)
+                receiver.close()
+                if not self.options.keep_workspaces:
+                    shutil.rmtree(workspace, ignore_errors=True)
+            if not self.options.workspaces_dir:
+                shutil.rmtree(workspaces_dir, ignore_errors=True)
+
+        summary["wall_s"] = round(time.perf_counter() - started, 3)
+        return summary
+
+
+def _signal_group(process, sig: int):
+    """Send a signal to a worker's process group, or to the worker alone if it has none yet."""
+    try:
+        os.killpg(process.pid, sig)
+    except (AttributeError, ProcessLookupError):
+        if not process.is_alive():
+            return
+        if sig == signal.SIGTERM:
+            process.terminate()
+        else:
+            process.kill()
+
+
+def _stop(process):
+    """Stop a worker together with the processes it started."""
+    _signal_group(process, signal.SIGTERM)
+    process.join(KILL_GRACE_SECONDS)
+    # worker 已退出时，它启动的子进程可能仍在运行
+    _signal_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+    process.join()
+
+
+def _workspace_name(task_id: str) -> str:
+    """Directory name of a task's workspace copy, unique per task id."""
+    name = "".join(c if c.isalnum() or c in "-_." else "_" for c in task_id)[:100] or "task"
+    if name != task_id or name in (".", ".."):
+        # a/b、a_b、a b 会得到相同的名称：加上 id 的哈希区分
+        name += "-" + hashlib.sha1(task_id.encode("utf-8")).hexdigest()[:8]
+    return name
+
+
+def run(argv=None):
+    """Run a batch from the command line."""
+    import argparse
+
+    defaults = BatchOptions()
+    parser = argparse.ArgumentParser(prog="main batch", description="Run a JSONL file of agent tasks")
+    parser.add_argument("tasks", help="JSONL task file")
+    parser.add_argument("--output", help="results JSONL (default: <tasks>.results.jsonl)")
+    parser.add_argument("--progress", help="progress file (default: <output>.progress)")
+    parser.add_argument("--workers", type=int, default=defaults.workers, help="tasks running at the same time")
+    parser.add_argument("--timeout", type=float, default=defaults.timeout, help="seconds per task")
+    parser.add_argument("--approve", default=defaults.approve,
+                        help="all, edits, read-only, or comma-separated tool names (default: edits)")
+    parser.add_argument("--max-turns", type=int, default=defaults.max_turns)
+    parser.add_argument("--workspace", default=defaults.workspace,
+                        help="workspace of tasks that do not name one (default: current directory)")
+    parser.add_argument("--workspaces-dir", help="directory for the workspace copies")
+    parser.add_argument("--keep-workspaces", action="store_true", help="keep the copies for inspection")
+    parser.add_argument("--retry-failed", action="store_true", help="run tasks again that did not complete")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="configuration override, e.g. --set API_MODEL=gpt-4o")
+    args = parser.parse_args(argv)
+
+    config = {}
+    for item in args.set:
+        key, sep, value = item.partition("=")
+        if not sep:
+            parser.error(f"--set expects KEY=VALUE, got {item!r}")
+        config[key] = value
+    options = BatchOptions(workers=args.workers, timeout=args.timeout, approve=args.approve,
+                           max_turns=args.max_turns, workspace=args.workspace,
+                           workspaces_dir=args.workspaces_dir, keep_workspaces=args.keep_workspaces,
+                           config=config)
+    output = args.output or os.path.splitext(args.tasks)[0] + ".results.jsonl"
+    runner = BatchRunner(output, options, progress_path=args.progress, retry_failed=args.retry_failed)
+    try:
+        summary = runner.run(list(read_tasks(args.tasks)))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to continue.", file=sys.stderr)
+        sys.exit(130)
+    print(json.dumps(dict(summary, output=output), indent=2))
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.batch tasks.jsonl [--workers N] [--timeout S]
+"""
+if __name__ == "__main__":
+    run()
@@ -1,9 +1,19 @@
 import os
 
+from ..utils.telemetry import telemetry
+
 
 class EnvironmentProxy:
+    def __init__(self, root: str = None):
+        """
+        Args:
+            root: Workspace directory to describe (the process working
+                directory when None)
+        """
+        self.root = root
+
     def get_current_dir(self):
-        current_dir = os.getcwd()
+        current_dir = self.root or os.getcwd()
         return current_dir
 
     def get_current_time(self):
@@ -12,8 +22,10 @@ class EnvironmentProxy:
         return current_time
 
     def get_current_working_directory(self):
-        current_path = os.getcwd()
-        return f"# Current Workspace Directory ({current_path}) Files\n" + self.__get_current_working_directory(current_path)
+        current_path = self.get_current_dir()
+        with telemetry.timer("env.snapshot_ms"):
+            files = self.__get_current_working_directory(current_path)
+        return f"# Current Workspace Directory ({current_path}) Files\n" + files
 
     def __get_current_working_directory(self, pwd: str = None) -> str:
         """
@@ -30,7 +42,8 @@ class EnvironmentProxy:
             # 定义黑名单，包含需要跳过的目录和文件
             blacklist = {
                 '.git', '__pycache__', '.vscode', 'node_modules', '.idea',
-                '.DS_Store', 'Thumbs.db',  'site-packages', '__MACOSX', '.venv', 'target'
+                '.DS_Store', 'Thumbs.db',  'site-packages', '__MACOSX', '.venv', 'target',
+                '.too'
             }
 
             # 递归遍历所有文件和目录
@@ -1,19 +1,25 @@
-from .prompt_tpl.system_prompt import ss as system_prompt_tpl
 from .system_info import get_system_info_section
 from .environment_proxy import EnvironmentProxy
 from ..utils.time_util import get_current_timestamp
-from ..utils.tpl_util import replace_template_vars
+from ..utils.tpl_util import compile_template
 
 
-def get_message_message():
+def get_message_message(root: str = None):
     """
     生成系统提示信息，替换模板中的变量
-    
+
+    Args:
+        root: 工作区目录，为 None 时使用进程的当前目录
+
     Returns:
         str: 替换变量后的系统提示信息
     """
+    # 模板很大，只在第一次生成系统提示时导入并编译，不占用启动时间
+    from .prompt_tpl.system_prompt import ss as system_prompt_tpl
+    template = compile_template(system_prompt_tpl)
+
     # 获取环境信息
-    env_proxy = EnvironmentProxy()
+    env_proxy = EnvironmentProxy(root)
     current_dir = env_proxy.get_current_dir()
     current_time = get_current_timestamp()
     current_working_directory = env_proxy.get_current_working_directory()
@@ -23,13 +29,13 @@ def get_message_message():
     
     # 替换模板中的变量
     vars_map = {
-        "{{current_time}}": current_time,
-        "{{current_working_directory}}": current_working_directory,
-        "{{system_info_section}}": system_info_section,
-        "{{current_dir}}": current_dir
+        "current_time": current_time,
+        "current_working_directory": current_working_directory,
+        "system_info_section": system_info_section,
+        "current_dir": current_dir
     }
     
-    system_prompt = replace_template_vars(system_prompt_tpl, vars_map)
+    system_prompt = template.render(vars_map)
     
     return system_prompt
 
@@ -1,4 +1,5 @@
 from .environment_proxy import EnvironmentProxy
+from ..utils.tpl_util import compile_template
 
 
 tpl = """
@@ -26,6 +27,8 @@ $0.00
 </environment_details>
 """
 
+compiled_tpl = compile_template(tpl)
+
 
 def get_environment_details(envir_proxy: EnvironmentProxy, with_workspace: bool = True) -> str:
     environment_details_files = ''
@@ -50,19 +53,13 @@ def get_environment_details(envir_proxy: EnvironmentProxy, with_workspace: bool
     # 构建完整的时区信息
     user_timezone_info = f"{tz_name}, {offset_str}"
 
-    system_prompt = tpl
     vars_map = {
-        "{{environment_details_files}}": environment_details_files,
-        "{{current_time}}": current_time,
-        "{{user_timezone}}": user_timezone_info,
+        "environment_details_files": environment_details_files,
+        "current_time": current_time,
+        "user_timezone": user_timezone_info,
     }
 
-    # 使用简单字符串替换而不是正则表达式替换所有可能的变量占位符
-    for var_placeholder, replacement_value in vars_map.items():
-        system_prompt = system_prompt.replace(
-            var_placeholder, replacement_value)
-
-    return system_prompt
+    return compiled_tpl.render(vars_map)
 
 
 """
@@ -0,0 +1,446 @@
+"""
+Full-Screen View for AI Chat Application
+========================================
+
+A ViewInterface backed by a full-screen prompt_toolkit Application:
+
+    +------------------------------------------+
+    | transcript (scrollable, virtualized)     |
+    +------------------------------------------+
+    | pending tools (only while tools wait)    |
+    +------------------------------------------+
+    | status bar                               |
+    | You: input pane (stays live)             |
+    +------------------------------------------+
+
+The TooTask loop runs in a worker thread and talks to the view through
+the usual ViewInterface methods; ``get_user_input`` blocks on a queue that
+the input pane feeds, so the user can keep typing while a response is
+streaming. The transcript is stored as a list of lines and the transcript
+control only wraps and returns the lines that fit on screen, so redraw and
+scrolling cost O(screen height) regardless of the transcript length.
+"""
+
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+from prompt_toolkit.application import Application
+from prompt_toolkit.filters import Condition
+from prompt_toolkit.formatted_text import StyleAndTextTuples
+from prompt_toolkit.key_binding import KeyBindings
+from prompt_toolkit.layout import Layout
+from prompt_toolkit.layout.containers import ConditionalContainer, HSplit, Window
+from prompt_toolkit.layout.controls import FormattedTextControl, UIContent, UIControl
+from prompt_toolkit.layout.dimension import Dimension
+from prompt_toolkit.mouse_events import MouseEventType
+from prompt_toolkit.styles import Style
+from prompt_toolkit.utils import get_cwidth
+from prompt_toolkit.widgets import Frame, TextArea
+
+from .stream_renderer import StreamRenderer
+from .views import COMMAND_HELP, ViewInterface
+
+Fragment = Tuple[str, str]
+
+
+class TranscriptBuffer:
+    """
+    Append-only transcript stored as a list of lines of fragments.
+
+    Appending only touches the last line, and any line can be fetched by
+    index, so the size of the transcript never affects rendering cost.
+    """
+
+    def __init__(self):
+        self._lines: List[List[Fragment]] = [[]]
+        self._lock = threading.Lock()
+
+    def append(self, text: str, style: str = ''):
+        """Append text, starting new lines at each '\\n'."""
+        self.extend([(style, text)])
+
+    def extend(self, fragments: List[Fragment]):
+        """Append a list of (style, text) fragments."""
+        with self._lock:
+            for style, text in fragments:
+                parts = text.split('\n')
+                if parts[0]:
+                    self._lines[-1].append((style, parts[0]))
+                for part in parts[1:]:
+                    self._lines.append([(style, part)] if part else [])
+
+    def ensure_newline(self):
+        """Start a new line unless the last line is empty."""
+        with self._lock:
+            if self._lines[-1]:
+                self._lines.append([])
+
+    def line_count(self) -> int:
+        return len(self._lines)
+
+    def get_line(self, index: int) -> List[Fragment]:
+        # 返回副本：渲染线程读取时，工作线程可能仍在追加最后一行
+        with self._lock:
+            return list(self._lines[index])
+
+
+def wrap_fragments(fragments: List[Fragment], width: int) -> List[List[Fragment]]:
+    """
+    Soft-wrap one line of fragments into rows of at most ``width`` cells.
+
+    Args:
+        fragments: (style, text) fragments of a single line
+        width: Available columns
+
+    Returns:
+        The rows; an empty line yields one empty row
+    """
+    rows: List[List[Fragment]] = [[]]
+    used = 0
+    for style, text in fragments:
+        start = 0
+        for i, char in enumerate(text):
+            w = get_cwidth(char)
+            if used + w > width and used > 0:
+                if i > start:
+                    rows[-1].append((style, text[start:i]))
+                rows.append([])
+                used = 0
+                start = i
+            used += w
+        if start < len(text):
+            rows[-1].append((style, text[start:]))
+    return rows
+
+
+class TranscriptControl(UIControl):
+    """
+    Renders the bottom (or scrolled-to) window of a TranscriptBuffer.
+
+    ``scroll_offset`` counts transcript lines hidden below the screen; 0
+    means the view follows new output.
+    """
+
+    def __init__(self, transcript: TranscriptBuffer):
+        self.transcript = transcript
+        self.scroll_offset = 0
+        self.last_height = 24
+
+    def is_focusable(self) -> bool:
+        return False
+
+    def scroll(self, lines: int):
+        """Scroll up (positive) or down (negative) by transcript lines."""
+        max_offset = max(0, self.transcript.line_count() - 1)
+        self.scroll_offset = min(max_offset, max(0, self.scroll_offset + lines))
+
+    def create_content(self, width: int, height: int) -> UIContent:
+        self.last_height = height
+        rows: List[StyleAndTextTuples] = []
+        index = self.transcript.line_count() - 1 - self.scroll_offset
+        # 从底部向上只取能显示在屏幕上的行
+        while index >= 0 and len(rows) < height:
+            rows[:0] = wrap_fragments(self.transcript.get_line(index), max(1, width))
+            index -= 1
+        rows = rows[-height:] if height else []
+
+        return UIContent(get_line=lambda i: rows[i], line_count=len(rows), show_cursor=False)
+
+    def mouse_handler(self, mouse_event):
+        if mouse_event.event_type == MouseEventType.SCROLL_UP:
+            self.scroll(3)
+            return None
+        if mouse_event.event_type == MouseEventType.SCROLL_DOWN:
+            self.scroll(-3)
+            return None
+        return NotImplemented
+
+
+class FullScreenView(ViewInterface):
+    """
+    Full-screen chat interface; see the module docstring for the layout.
+    """
+
+    # 终止输入队列的哨兵：get_user_input 收到后抛出 EOFError
+    _EOF = object()
+
+    def __init__(self, max_fps: float = 30.0):
+        super().__init__(max_fps=max_fps)
+        self.style = Style.from_dict({
+            'ai': '#0088ff bold',
+            'user': '#00ff00 bold',
+            'completion': 'ansigreen',
+            'info': '',
+            'error': '#ff0000 bold',
+            'context': '#00aaaa',
+            'status': 'reverse',
+            'pending-tools-frame': '#ffff00',
+        })
+        self.transcript = TranscriptBuffer()
+        self.transcript_control = TranscriptControl(self.transcript)
+        self._inputs: "queue.Queue" = queue.Queue()
+        self._waiting_for_input = False
+        self._context = ""
+        self._last_render: Dict[str, float] = {}
+        # 流式输出仍经过帧合并，只是目标变为对话记录而不是终端
+        self.renderer = StreamRenderer(write=self._write_fragments, max_fps=max_fps)
+        self.app = self._create_application()
+
+    # ------------------------------------------------------------------
+    # Layout
+    # ------------------------------------------------------------------
+
+    def _create_application(self) -> Application:
+        self.input_area = TextArea(
+            height=Dimension(min=1, max=8),
+            prompt=[('class:user', 'You: ')],
+            multiline=True,
+            wrap_lines=True,
+            completer=self.completer,
+        )
+
+        transcript_window = Window(self.transcript_control, wrap_lines=False)
+        pending_window = ConditionalContainer(
+            Frame(Window(FormattedTextControl(self._get_pending_tools_fragments),
+                         height=Dimension(max=10)),
+                  title="Pending tools ($approve / $reject)", style='class:pending-tools-frame'),
+            filter=Condition(lambda: bool(self.pending_tools)),
+        )
+        status_bar = Window(FormattedTextControl(self._get_status_fragments), height=1,
+                            style='class:status')
+
+        root = HSplit([transcript_window, pending_window, status_bar, self.input_area])
+        return Application(
+            layout=Layout(root, focused_element=self.input_area),
+            key_bindings=self._create_app_key_bindings(),
+            style=self.style,
+            full_screen=True,
+            mouse_support=True,
+            # 限制重绘频率，流式输出时多次 invalidate 会被合并
+            min_redraw_interval=self.renderer.frame_interval,
+        )
+
+    def _create_app_key_bindings(self) -> KeyBindings:
+        bindings = KeyBindings()
+
+        @bindings.add('enter')
+        def _(event):
+            """Submit the input."""
+            text = self.input_area.text
+            if text.strip():
+                self.input_area.buffer.append_to_history()
+            self.input_area.text = ""
+            self._inputs.put(text)
+
+        @bindings.add('escape', 'enter')
+        def _(event):
+            """Insert a newline."""
+            self.input_area.buffer.insert_text('\n')
+
+        @bindings.add('pageup')
+        def _(event):
+            self.transcript_control.scroll(max(1, self.transcript_control.last_height - 1))
+
+        @bindings.add('pagedown')
+        def _(event):
+            self.transcript_control.scroll(-max(1, self.transcript_control.last_height - 1))
+
+        @bindings.add('c-end')
+        def _(event):
+            """Jump back to the newest output."""
+            self.transcript_control.scroll_offset = 0
+
+        @bindings.add('c-c')
+        def _(event):
+            """Clear the current input or exit."""
+            if self.input_area.text:
+                self.input_area.text = ""
+            else:
+                self._request_exit()
+
+        @bindings.add('c-d')
+        def _(event):
+            """Exit the chat."""
+            self._request_exit()
+
+        return bindings
+
+    def _get_pending_tools_fragments(self) -> StyleAndTextTuples:
+        fragments: StyleAndTextTuples = []
+        for i, tool in enumerate(list(self.pending_tools)):
+            fragments.append(('', f" {i + 1}. {tool.get('desc', 'Unknown tool')}\n"))
+        return fragments
+
+    def _get_status_fragments(self) -> StyleAndTextTuples:
+        state = "Waiting for input" if self._waiting_for_input else "Working..."
+        parts = [state, self._context]
+        if self._last_render:
+            parts.append(f"last response: {self._last_render['frames']} frames, "
+                         f"{self._last_render['cpu_ms']:.1f} ms render CPU")
+        if self.transcript_control.scroll_offset:
+            parts.append(f"scrolled {self.transcript_control.scroll_offset} lines (Ctrl+End: bottom)")
+        return [('class:status', " " + " | ".join(p for p in parts if p))]
+
+    # ------------------------------------------------------------------
+    # Running
+    # ------------------------------------------------------------------
+
+    def run_application(self, target: Callable[[], Any]):
+        """
+        Run ``target`` (the TooTask loop) in a worker thread while the
+        Application owns the terminal; returns when either side exits.
+
+        Args:
+            target: Function running the chat loop
+        """
+        def _worker():
+            try:
+                target()
+            except Exception as e:
+                self.display_system_message(f"Chat loop failed: {e}", 'error')
+            finally:
+                if self.app.is_running:
+                    self.app.loop.call_soon_threadsafe(self.app.exit)
+
+        # history_file 由 TooTask 在创建视图之后设置
+        history = self._get_history()
+        if history is not None:
+            self.input_area.buffer.history = history
+
+        worker = threading.Thread(target=_worker, name="too-task", daemon=True)
+        self.app.pre_run_callables.append(worker.start)
+        self.app.run()
+        # 界面已关闭：让仍在等待输入的工作线程退出
+        self._inputs.put(self._EOF)
+        worker.join(timeout=2)
+
+    def _request_exit(self):
+        self._inputs.put(self._EOF)
+
+    def _invalidate(self):
+        if self.app.is_running:
+            self.app.invalidate()
+
+    def _write_fragments(self, fragments: List[Fragment]):
+        self.transcript.extend(fragments)
+        self._invalidate()
+
+    def _append_line(self, text: str, style: str = ''):
+        self.renderer.flush()
+        self.transcript.ensure_newline()
+        self.transcript.append(text + '\n', style)
+        self._invalidate()
+
+    # ------------------------------------------------------------------
+    # ViewInterface
+    # ------------------------------------------------------------------
+
+    def display_system_message(self, message: str, msg_type: str = 'info'):
+        self._append_line(message, f'class:{msg_type}')
+
+    def display_conversation_context(self, messages: List[Dict[str, str]]):
+        # 上下文信息显示在状态栏，待批准工具显示在独立面板中
+        user_count = sum(1 for m in messages if m["role"] == "user")
+        ai_count = sum(1 for m in messages if m["role"] == "assistant")
+        self._context = f"{user_count} user / {ai_count} AI messages"
+        self._invalidate()
+
+    def display_ai_header(self):
+        self.renderer.flush()
+        self.transcript.ensure_newline()
+        self.transcript.append("AI: ", 'class:ai')
+        self._invalidate()
+
+    def display_attempt_completion(self, chunk: str):
+        self.renderer.feed(chunk, 'class:completion')
+
+    def display_user_message(self, message: str):
+        self.renderer.flush()
+        self.transcript.ensure_newline()
+        self.transcript.extend([('class:user', "You: "), ('', message + '\n')])
+        self._invalidate()
+
+    def display_ai_message(self, message: str):
+        self.renderer.flush()
+        self.transcript.ensure_newline()
+        self.transcript.extend([('class:ai', "AI: "), ('', message + '\n')])
+        self._invalidate()
+
+    def finish_ai_message(self) -> Dict[str, float]:
+        self._last_render = super().finish_ai_message()
+        return self._last_render
+
+    def get_user_input(self, default_input: str = "") -> str:
+        """
+        Wait for the next submitted input.
+
+        Inputs submitted while the AI was still responding are returned
+        first, in order.
+
+        Raises:
+            EOFError: When the user exits with Ctrl+C or Ctrl+D
+        """
+        self.renderer.flush()
+        if default_input and self._inputs.empty() and self.app.is_running:
+            def _prefill():
+                if not self.input_area.text:
+                    self.input_area.text = default_input
+                    self.input_area.buffer.cursor_position = len(default_input)
+            self.app.loop.call_soon_threadsafe(_prefill)
+
+        self._waiting_for_input = True
+        self._invalidate()
+        try:
+            text = self._inputs.get()
+        finally:
+            self._waiting_for_input = False
+            self._invalidate()
+        if text is self._EOF:
+            raise EOFError()
+        text = text.strip()
+        self.display_user_message(text)
+        return text
+
+    def show_instructions(self):
+        self._append_line("AI Chat Interface (full screen)", 'class:ai')
+        self._append_line("[Enter] send, [Esc] then [Enter] newline, [PageUp]/[PageDown] or mouse wheel "
+                          "scroll, [Ctrl+End] follow output, [Ctrl+D] exit.", 'class:context')
+        for usage, description in COMMAND_HELP:
+            self._append_line(f"  {usage.ljust(11)} - {description}", 'class:context')
+
+    def show_goodbye_message(self):
+        self._append_line("Goodbye!", 'class:ai')
+
+    def show_interrupt_message(self):
+        self._append_line("Chat interrupted. Goodbye!", 'class:error')
+
+    def wait_for_enter(self):
+        pass
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.fullscreen_view
+"""
+if __name__ == "__main__":
+    import time
+
+    view = FullScreenView()
+
+    def _echo_loop():
+        view.show_instructions()
+        for i in range(100000):
+            view.transcript.append(f"history line {i}\n", 'class:context')
+        while True:
+            try:
+                text = view.get_user_input()
+            except EOFError:
+                return
+            view.display_ai_header()
+            for word in f"You said: {text}. Scroll up to see 100k earlier lines.".split(" "):
+                view.display_ai_message_chunk(word + " ")
+                time.sleep(0.05)
+            view.display_newline()
+            view.finish_ai_message()
+
+    view.run_application(_echo_loop)
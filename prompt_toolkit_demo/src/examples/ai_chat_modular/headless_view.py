@@ -0,0 +1,77 @@
+"""
+Headless View for AI Chat Application
+=====================================
+
+A ViewInterface that never touches the terminal. Everything that would be
+displayed is collected in memory, and user input is taken from a script.
+Used by benchmarks and non-interactive runs.
+"""
+
+from typing import Dict, List, Optional
+
+from .views import ViewInterface
+
+
+class HeadlessView(ViewInterface):
+    """
+    Collects AI output and system messages instead of printing them.
+    """
+
+    def __init__(self, inputs: Optional[List[str]] = None):
+        """
+        Initialize the headless view.
+
+        Args:
+            inputs: Scripted user inputs returned by get_user_input, in order
+        """
+        super().__init__()
+        self.inputs = list(inputs or [])
+        self.ai_output: List[str] = []
+        self.system_messages: List[Dict[str, str]] = []
+
+    def display_system_message(self, message: str, msg_type: str = 'info'):
+        self.system_messages.append({"type": msg_type, "message": message})
+
+    def display_conversation_context(self, messages: List[Dict[str, str]]):
+        pass
+
+    def display_ai_header(self):
+        pass
+
+    def display_attempt_completion(self, chunk: str):
+        self.ai_output.append(chunk)
+
+    def display_ai_message_chunk(self, chunk: str):
+        self.ai_output.append(chunk)
+
+    def display_newline(self):
+        pass
+
+    def display_user_message(self, message: str):
+        pass
+
+    def display_ai_message(self, message: str):
+        self.ai_output.append(message)
+
+    def get_user_input(self, default_input: str = "") -> str:
+        """
+        Return the next scripted input.
+
+        Raises:
+            EOFError: When the script is exhausted, like Ctrl+D in the terminal
+        """
+        if not self.inputs:
+            raise EOFError()
+        return self.inputs.pop(0).strip()
+
+    def show_instructions(self):
+        pass
+
+    def show_goodbye_message(self):
+        pass
+
+    def show_interrupt_message(self):
+        pass
+
+    def wait_for_enter(self):
+        pass
@@ -0,0 +1,241 @@
+"""
+LLM Cassettes
+=============
+
+Records the raw SSE lines of chat-completion streams to a JSONL file and
+plays them back later, so the whole agent loop (parser, tools, rendering)
+can be benchmarked and regression-tested offline on real transcripts.
+
+Each line of a cassette is one interaction::
+
+    {"hash": "...", "model": "...", "last_message": "...",
+     "events": [[seconds since request start, "data: {...}"], ...]}
+
+Requests are matched by a hash of the normalised request: only role and
+content of each message count, and ``<environment_details>`` blocks (which
+contain the current time and the workspace listing) are blanked out. When
+no unplayed interaction has the hash (the conversation diverged), the next
+unplayed interaction in recording order is served instead.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+ENVIRONMENT_DETAILS_PATTERN = re.compile(r"<environment_details>.*?</environment_details>", re.DOTALL)
+# 记录的最后一条消息只保留开头，便于查看，不参与匹配
+LAST_MESSAGE_CHARS = 2000
+
+
+def _has_content(line: str) -> bool:
+    """Whether an SSE line carries response content."""
+    if not line.startswith("data: ") or line == "data: [DONE]":
+        return False
+    try:
+        choices = json.loads(line[6:]).get("choices") or []
+    except (ValueError, AttributeError):
+        return False
+    return any((choice.get("delta") or {}).get("content") for choice in choices)
+
+
+class CassetteMiss(EOFError):
+    """
+    Raised when a replay cassette has no interaction left to serve.
+
+    It is an EOFError so the chat loop ends like it does at the end of input.
+    """
+
+
+def request_hash(messages: List[Dict[str, str]], model: str = "") -> str:
+    """
+    Hash of a chat request that ignores volatile details.
+
+    Args:
+        messages: Chat messages (extra keys such as timestamp are ignored)
+        model: Model name
+
+    Returns:
+        Hex digest identifying the request
+    """
+    normalised = [
+        [message.get("role", ""),
+         ENVIRONMENT_DETAILS_PATTERN.sub("<environment_details/>", message.get("content") or "").strip()]
+        for message in messages
+    ]
+    payload = json.dumps([model, normalised], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    A file of recorded LLM streams, opened for recording or for replay.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", speed: float = 0.0):
+        """
+        Open a cassette.
+
+        Args:
+            path: Cassette file (JSONL); resolved to an absolute path now
+            mode: "record" to append new interactions, "replay" to serve them
+            speed: Replay speed: 1.0 keeps the recorded inter-chunk timing,
+                2.0 plays twice as fast, 0 plays as fast as possible
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = os.path.abspath(path)
+        self.mode = mode
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._interactions: List[Dict[str, object]] = []
+        self._played: List[bool] = []
+        self._by_hash: Dict[str, List[int]] = {}
+        self.hits = 0
+        self.fallbacks = 0
+        if mode == "replay":
+            self._load()
+        else:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> Optional['Cassette']:
+        """Create the cassette configured by LLM_CASSETTE / LLM_CASSETTE_MODE / LLM_REPLAY_SPEED."""
+        path = config.get('LLM_CASSETTE')
+        if not path:
+            return None
+        return cls(path, config.get('LLM_CASSETTE_MODE') or 'replay',
+                   float(config.get('LLM_REPLAY_SPEED') or 0))
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self._add(json.loads(line))
+
+    def _add(self, interaction: Dict[str, object]):
+        self._by_hash.setdefault(interaction["hash"], []).append(len(self._interactions))
+        self._interactions.append(interaction)
+        self._played.append(False)
+
+    def __len__(self) -> int:
+        return len(self._interactions)
+
+    @property
+    def remaining(self) -> int:
+        """Number of interactions not replayed yet."""
+        with self._lock:
+            return self._played.count(False)
+
+    def record(self, messages: List[Dict[str, str]], model: str, lines: Iterable[str],
+               served_model: Optional[str] = None, keep_failed: bool = True) -> Iterator[str]:
+        """
+        Pass SSE lines through while recording them with their arrival times.
+
+        The interaction is appended to the file when the stream ends (also
+        when it is abandoned or fails part-way).
+
+        Args:
+            messages: The request messages
+            model: The request model (part of the hash replay looks up)
+            lines: Decoded SSE lines of the response
+            served_model: Model that actually answered (e.g. a router
+                endpoint's model), stored instead of ``model``
+            keep_failed: Whether to record a stream that failed before any
+                content arrived; False when the caller fails over to another
+                attempt, which is recorded instead
+
+        Yields:
+            The same lines
+        """
+        started = time.perf_counter()
+        events = []
+        completed = False
+        try:
+            for line in lines:
+                events.append([round(time.perf_counter() - started, 6), line])
+                yield line
+            completed = True
+        finally:
+            if completed or keep_failed or any(_has_content(line) for _, line in events):
+                self._write(messages, model, served_model or model, events)
+
+    def _write(self, messages: List[Dict[str, str]], model: str, served_model: str,
+               events: List[List[object]]):
+        last = (messages[-1].get("content") or "") if messages else ""
+        interaction = {"hash": request_hash(messages, model), "model": served_model,
+                       "last_message": last[:LAST_MESSAGE_CHARS], "events": events}
+        data = json.dumps(interaction, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._add(interaction)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+
+    def _take(self, messages: List[Dict[str, str]], model: str) -> Dict[str, object]:
+        key = request_hash(messages, model)
+        with self._lock:
+            for index in self._by_hash.get(key, []):
+                if not self._played[index]:
+                    self.hits += 1
+                    break
+            else:
+                # 对话已偏离录制内容：按录制顺序取下一条
+                try:
+                    index = self._played.index(False)
+                except ValueError:
+                    raise CassetteMiss(f"cassette {self.path} has no interactions left") from None
+                self.fallbacks += 1
+            self._played[index] = True
+            return self._interactions[index]
+
+    def replay(self, messages: List[Dict[str, str]], model: str) -> Iterator[str]:
+        """
+        Serve the recorded SSE lines for a request.
+
+        Args:
+            messages: The request messages
+            model: The request model
+
+        Yields:
+            Recorded SSE lines, paced according to ``speed``
+
+        Raises:
+            CassetteMiss: No unplayed interaction is left
+        """
+        interaction = self._take(messages, model)
+        started = time.perf_counter()
+        for offset, line in interaction["events"]:
+            if self.speed > 0:
+                delay = started + offset / self.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield line
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.llm.cassette
+"""
+if __name__ == "__main__":
+    import tempfile
+
+    def _sse(text: str, size: int = 8):
+        for i in range(0, len(text), size):
+            time.sleep(0.01)
+            yield "data: " + json.dumps({"choices": [{"delta": {"content": text[i:i + size]}}]})
+        yield "data: [DONE]"
+
+    path = os.path.join(tempfile.mkdtemp(), "demo.jsonl")
+    request = [{"role": "user", "content": "<task>hi</task>\n<environment_details>t=1</environment_details>"}]
+    recorder = Cassette(path, "record")
+    recorded = list(recorder.record(request, "demo", _sse("Hello from the recording!")))
+
+    changed = [{"role": "user", "content": "<task>hi</task>\n<environment_details>t=2</environment_details>"}]
+    for speed in (1.0, 0):
+        player = Cassette(path, "replay", speed=speed)
+        started = time.perf_counter()
+        replayed = list(player.replay(changed, "demo"))
+        print(f"speed={speed}: {len(replayed)} lines in {(time.perf_counter() - started) * 1000:.1f} ms, "
+              f"hits={player.hits}, identical={replayed == recorded}")
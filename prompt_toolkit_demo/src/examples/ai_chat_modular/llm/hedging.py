@@ -0,0 +1,141 @@
+"""
+Hedged Requests
+===============
+
+Cuts the tail of time-to-first-token: when a streaming request has not
+produced its first token after a delay, a duplicate is sent (to the
+router's next endpoint, or to the same endpoint) and whichever answers
+first is streamed; the other request is cancelled.
+
+The delay follows the observed TTFT distribution of the endpoint: the
+configured percentile (p95 by default) of a rolling window, so only about
+one request in twenty is duplicated. Until enough samples exist a fixed
+initial delay is used.
+
+A losing request that is already streaming is aborted at once. One that
+has not produced a token yet is kept until its first token (then
+aborted), so its TTFT is still measured: that keeps the window unbiased
+and gives the time a hedge actually saved (``llm.hedge.saved_ms``).
+"""
+
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from ..utils.telemetry import percentile, telemetry
+
+# 滚动窗口大小，以及开始按百分位计算延迟所需的最少样本数
+DEFAULT_WINDOW = 200
+DEFAULT_MIN_SAMPLES = 10
+
+
+class HedgePolicy:
+    """
+    Decides when to hedge, from rolling TTFT samples per endpoint.
+    """
+
+    def __init__(self, pct: float = 95.0, initial_delay: float = 2.0, min_delay: float = 0.05,
+                 min_samples: int = DEFAULT_MIN_SAMPLES, window: int = DEFAULT_WINDOW):
+        """
+        Create a policy.
+
+        Args:
+            pct: TTFT percentile after which a request is hedged
+            initial_delay: Delay in seconds while there are too few samples
+            min_delay: Lower bound of the delay in seconds
+            min_samples: Samples needed before the percentile is used
+            window: Number of recent TTFT samples kept per endpoint
+        """
+        self.pct = pct
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "sent": 0, "wins": 0}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> Optional['HedgePolicy']:
+        """Create a policy from LLM_HEDGE / LLM_HEDGE_PERCENTILE / LLM_HEDGE_DELAY_MS, or None when disabled."""
+        if config.get('LLM_HEDGE', 'false').lower() not in ['true', '1', 'yes', 'on']:
+            return None
+        return cls(pct=float(config.get('LLM_HEDGE_PERCENTILE') or 95),
+                   initial_delay=float(config.get('LLM_HEDGE_DELAY_MS') or 2000) / 1000)
+
+    def delay(self, key: str) -> float:
+        """Seconds to wait for the first token before hedging a request to ``key``."""
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, percentile(samples, self.pct) / 1000)
+
+    def record_ttft(self, key: str, ttft_ms: float):
+        """Add an observed time to first token of an endpoint."""
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(ttft_ms)
+
+    def count(self, name: str):
+        """Count a request, a sent hedge or a hedge win (also in telemetry as llm.hedge.<name>)."""
+        with self._lock:
+            self.stats[name] += 1
+        telemetry.incr("llm.hedge." + name)
+
+    def hedge_rate(self) -> float:
+        """Fraction of requests that were hedged."""
+        with self._lock:
+            return self.stats["sent"] / self.stats["requests"] if self.stats["requests"] else 0.0
+
+
+class Attempt:
+    """
+    One of the (at most two) requests of a hedged stream.
+    """
+
+    def __init__(self, endpoint, started: float, hedge: bool = False):
+        self.endpoint = endpoint
+        self.key = endpoint.name if endpoint is not None else "default"
+        self.started = started
+        self.hedge = hedge
+        self.response = None
+        self.ttft_ms: Optional[float] = None
+        self.first_at: Optional[float] = None
+        self.finished = False
+        # cancelled：不再输出；winner 不为 None 时等到首个 token 记录 TTFT 后再中止
+        self.cancelled = False
+        self.winner: Optional['Attempt'] = None
+        self._lock = threading.Lock()
+
+    def set_response(self, response) -> bool:
+        """Attach the open response; False if the attempt was cancelled meanwhile."""
+        with self._lock:
+            self.response = response
+            return not self.cancelled
+
+    def first_token(self, now: float) -> bool:
+        """Record the arrival of the first token; False if the attempt should stop."""
+        with self._lock:
+            self.first_at = now
+            self.ttft_ms = (now - self.started) * 1000
+            return not (self.cancelled or self.winner is not None)
+
+    def cancel(self, winner: Optional['Attempt'] = None):
+        """
+        Stop the attempt.
+
+        Args:
+            winner: The attempt that won; when given, an attempt without a
+                first token yet is kept until it has one, to measure it
+        """
+        with self._lock:
+            if winner is not None and self.ttft_ms is None and not self.cancelled:
+                self.winner = winner
+                return
+            self.cancelled = True
+            response = self.response
+        if response is not None:
+            response.abort()
@@ -3,15 +3,16 @@ LLM Provider for AI Chat Application
 ====================================
 
 This module handles interactions with AI language models,
-including both real API calls and simulated responses.
+including both real API calls and simulated responses (scripted
+scenarios, see scenario.py).
 """
 
-import random
-import time
 import os
 import json
-from typing import List, Dict, Generator
-import urllib.request
+import time
+from typing import Iterable, List, Dict, Generator, Optional, Tuple
+
+from ..utils.telemetry import telemetry
 
 
 class LLMProvider:
@@ -23,6 +24,52 @@ class LLMProvider:
     def __init__(self):
         """Initialize the LLM provider and load configuration."""
         self.config = self._load_env_config()
+        if self.config.get('SIM_SCENARIO') and os.path.exists(self.config['SIM_SCENARIO']):
+            # 场景文件同样解析为绝对路径（内置场景按名称查找）
+            self.config['SIM_SCENARIO'] = os.path.abspath(self.config['SIM_SCENARIO'])
+        if self.config.get('LLM_CASSETTE'):
+            # 启动时解析为绝对路径，$cd 不会影响它
+            self.config['LLM_CASSETTE'] = os.path.abspath(self.config['LLM_CASSETTE'])
+        # 最近一次请求 API 返回的 usage（prompt_tokens 等），没有返回时为 None
+        self.last_usage = None
+        # get_responses 每个请求各自的 usage（与 message_lists 顺序一致）
+        self.last_usages: List[Optional[Dict[str, int]]] = []
+        self._cassette = None
+        self._simulation = None
+        self._router = None
+        self._hedging = None
+
+    @property
+    def cassette(self):
+        """The record/replay cassette configured by LLM_CASSETTE, if any."""
+        if self._cassette is None and self.config.get('LLM_CASSETTE'):
+            from .cassette import Cassette
+            self._cassette = Cassette.from_config(self.config)
+        return self._cassette
+
+    @property
+    def simulation(self):
+        """The scripted simulation used without an API key (SIM_SCENARIO etc.)."""
+        if self._simulation is None:
+            from .scenario import ScriptedSimulation
+            self._simulation = ScriptedSimulation.from_config(self.config)
+        return self._simulation
+
+    @property
+    def router(self):
+        """The endpoint router configured by LLM_ENDPOINTS, if any."""
+        if self._router is None and self.config.get('LLM_ENDPOINTS'):
+            from .router import ModelRouter
+            self._router = ModelRouter.from_config(self.config)
+        return self._router
+
+    @property
+    def hedging(self):
+        """The hedging policy enabled by LLM_HEDGE, if any."""
+        if self._hedging is None:
+            from .hedging import HedgePolicy
+            self._hedging = HedgePolicy.from_config(self.config)
+        return self._hedging
 
     def _load_env_config(self) -> Dict[str, str]:
         """Load configuration from .env file."""
@@ -41,142 +88,422 @@ class LLMProvider:
 
         return config
 
-    def get_response_stream(self, messages: List[Dict[str, str]]) -> Generator[str, None, None]:
+    def get_response_stream(self, messages: List[Dict[str, str]],
+                            task_class: str = 'chat') -> Generator[str, None, None]:
         """
         Get a streaming response from the AI model.
 
         Args:
             messages: List of message dictionaries with role and content
+            task_class: Kind of request (chat, tool_result, nudge), used by the
+                endpoint router
 
         Yields:
             Chunks of the AI response
         """
-        api_base_url = self.config.get(
-            'API_BASE_URL', 'https://api.openai.com/v1')
-        api_key = self.config.get('API_KEY', '')
         model = self.config.get('API_MODEL', 'gpt-3.5-turbo')
-        # print(f"api_key: {api_key}")
+        self.last_usage = None
 
-        # If no API key is configured, use simulated response
-        if not api_key or api_key == 'your-api-key-here':
-            yield from self._simulate_ai_response_streaming(messages[-1]['content'])
+        # 回放录制的流：不需要 API key，解析路径与真实请求相同
+        cassette = self.cassette
+        if cassette is not None and cassette.mode == 'replay':
+            try:
+                yield from self._iter_sse_content(cassette.replay(messages, model))
+            except ConnectionError as e:
+                yield f"[Error calling API: {str(e)}]\\n"
             return
 
-        url = f"{api_base_url}/chat/completions"
-
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
-        }
+        # 未配置 API key，或显式指定了场景时，使用脚本模拟的回复
+        if not self._api_enabled():
+            yield from self._simulate_ai_response_streaming(messages)
+            return
 
         data = {
             'model': model,
             'messages': messages,
             'stream': True
         }
+        if self.config.get('STREAM_USAGE', 'false').lower() in ['true', '1', 'yes', 'on']:
+            # 让 API 在最后一个 chunk 中返回 usage，用于校准本地 token 估计
+            data['stream_options'] = {'include_usage': True}
+
+        # 对冲请求（录制 cassette 时不用，避免录下重复的请求）
+        if cassette is None and self.hedging is not None:
+            yield from self._hedged_stream(messages, data, task_class)
+            return
+
+        router = self.router
+        if router is None:
+            try:
+                with self._post(data) as response:
+                    yield from self._iter_sse_content(self._sse_lines(response, messages, model))
+            except Exception as e:
+                yield f"[Error calling API: {str(e)}]\\n"
+            return
+
+        # 按任务类型和观测到的延迟选择端点；首个 token 之前出错或超时则换下一个
+        error = None
+        for endpoint in router.candidates(task_class):
+            data['model'] = endpoint.model
+            started = time.perf_counter()
+            first = True
+            try:
+                with self._post(data, endpoint, timeout=router.first_token_timeout) as response:
+                    for chunk in self._iter_sse_content(self._sse_lines(response, messages, model, endpoint)):
+                        if first:
+                            first = False
+                            ttft_ms = (time.perf_counter() - started) * 1000
+                            router.record_success(endpoint, ttft_ms)
+                            telemetry.record(f"llm.endpoint.{endpoint.name}.ttft_ms", ttft_ms)
+                            response.set_timeout(None)
+                        yield chunk
+                if first:
+                    router.record_success(endpoint)
+                return
+            except Exception as e:
+                router.record_error(endpoint)
+                telemetry.incr(f"llm.endpoint.{endpoint.name}.errors")
+                if not first:
+                    # 已输出部分内容，不能再换端点
+                    yield f"[Error calling API: {str(e)}]\\n"
+                    return
+                error = f"{endpoint.name}: {e}"
+                telemetry.incr("llm.failovers")
+        yield f"[Error calling API: {error}]\\n"
 
-        json_data = json.dumps(data).encode('utf-8')
+    def _hedged_stream(self, messages: List[Dict[str, str]], data: Dict[str, object],
+                       task_class: str) -> Generator[str, None, None]:
+        """
+        Stream a response, sending a duplicate request when the first token is late.
+
+        The duplicate goes to the router's next endpoint (or the same
+        endpoint); whichever produces content first is streamed and the
+        other is cancelled (see hedging.py).
+
+        Yields:
+            Chunks of the winning response
+        """
+        import queue
+        import threading
+        from .hedging import Attempt
 
-        req = urllib.request.Request(
-            url, data=json_data, headers=headers, method='POST')
+        policy = self.hedging
+        router = self.router
+        remaining = router.candidates(task_class) if router else [None]
+        # 首 token 超时也限制了为测量而保留的落后请求
+        if router is not None:
+            timeout = router.first_token_timeout
+        else:
+            timeout = float(self.config.get('LLM_FIRST_TOKEN_TIMEOUT') or 30) or None
+        events = queue.Queue()
+        attempts = []
+
+        def _run(attempt: Attempt):
+            endpoint = attempt.endpoint
+            body = dict(data, model=endpoint.model) if endpoint is not None else data
+            try:
+                with self._post(body, endpoint, timeout=timeout) as response:
+                    if not attempt.set_response(response):
+                        return
+                    lines = (line.decode('utf-8').strip() for line in response)
+                    for chunk in self._iter_sse_content(lines):
+                        if attempt.first_at is None:
+                            keep = attempt.first_token(time.perf_counter())
+                            response.set_timeout(None)
+                            policy.record_ttft(attempt.key, attempt.ttft_ms)
+                            telemetry.record(f"llm.endpoint.{attempt.key}.ttft_ms", attempt.ttft_ms)
+                            if router is not None:
+                                router.record_success(endpoint, attempt.ttft_ms)
+                            if not keep:
+                                winner = attempt.winner
+                                if winner is not None and winner.first_at is not None:
+                                    # 被对冲请求抢先的原请求：记录对冲节省的时间
+                                    telemetry.record("llm.hedge.saved_ms",
+                                                     (attempt.first_at - winner.first_at) * 1000)
+                                return
+                        if attempt.cancelled:
+                            return
+                        events.put((attempt, 'chunk', chunk))
+                events.put((attempt, 'done', None))
+            except Exception as e:
+                if not attempt.cancelled:
+                    if router is not None:
+                        router.record_error(endpoint)
+                    events.put((attempt, 'error', e))
+
+        def _start(endpoint, hedge: bool = False) -> Attempt:
+            attempt = Attempt(endpoint, time.perf_counter(), hedge)
+            attempts.append(attempt)
+            threading.Thread(target=_run, args=(attempt,), name="llm-hedge", daemon=True).start()
+            return attempt
 
+        policy.count("requests")
+        primary = _start(remaining.pop(0))
+        delay = policy.delay(primary.key)
+        telemetry.record("llm.hedge.delay_ms", delay * 1000)
+        hedged = False
+        winner = None
         try:
-            response = urllib.request.urlopen(req)
-            for line in response:
-                line = line.decode('utf-8').strip()
-                if line.startswith('data: ') and line != 'data: [DONE]':
-                    data_str = line[6:]  # Remove 'data: ' prefix
-                    try:
-                        chunk_data = json.loads(data_str)
-                        if 'choices' in chunk_data and len(chunk_data['choices']) > 0:
-                            delta = chunk_data['choices'][0].get('delta', {})
-                            if 'content' in delta:
-                                yield delta['content']
-                    except json.JSONDecodeError:
+            while True:
+                wait = None
+                if winner is None and not hedged:
+                    wait = max(0.0, primary.started + delay - time.perf_counter())
+                try:
+                    attempt, kind, payload = events.get(timeout=wait)
+                except queue.Empty:
+                    # 首个 token 迟到：对冲到下一个端点，没有则重复发往同一端点
+                    hedged = True
+                    policy.count("sent")
+                    _start(remaining.pop(0) if remaining else primary.endpoint, hedge=True)
+                    continue
+                if winner is not None and attempt is not winner:
+                    continue
+                if kind == 'error':
+                    attempt.finished = True
+                    error = f"{attempt.key}: {payload}" if router is not None else str(payload)
+                    if winner is not None:
+                        yield f"[Error calling API: {error}]\\n"
+                        return
+                    if any(not a.finished for a in attempts):
                         continue
-        except Exception as e:
-            yield f"[Error calling API: {str(e)}]\\n"
+                    if not remaining:
+                        yield f"[Error calling API: {error}]\\n"
+                        return
+                    # 所有请求都失败：换下一个端点，重新计时
+                    telemetry.incr("llm.failovers")
+                    primary = _start(remaining.pop(0))
+                    delay, hedged = policy.delay(primary.key), False
+                    continue
+                if winner is None:
+                    winner = attempt
+                    if winner.hedge:
+                        policy.count("wins")
+                    for other in attempts:
+                        if other is not winner:
+                            other.cancel(winner if winner.hedge and not other.hedge else None)
+                if kind == 'done':
+                    return
+                yield payload
+        except BaseException:
+            # 调用方中途放弃（或出错）：停止所有请求
+            for attempt in attempts:
+                attempt.cancel()
+            raise
+
+    def _sse_lines(self, response, messages: List[Dict[str, str]], model: str,
+                   endpoint=None) -> Iterable[str]:
+        """
+        Decoded SSE lines of a response (recorded when a cassette is recording).
 
-    def _simulate_ai_response_streaming(self, user_input: str) -> Generator[str, None, None]:
+        With a router endpoint the endpoint's model is recorded, and an
+        attempt that fails before any content is not recorded: the router
+        fails over and records the attempt that answers.
         """
-        Simulate a streaming AI response based on user input.
-        In a real application, this would be replaced by actual API streaming.
+        lines = (line.decode('utf-8').strip() for line in response)
+        cassette = self.cassette
+        if cassette is not None:
+            # 录制模式：原始 SSE 行连同到达时间写入 cassette
+            if endpoint is not None:
+                lines = cassette.record(messages, model, lines, served_model=endpoint.model, keep_failed=False)
+            else:
+                lines = cassette.record(messages, model, lines)
+        return lines
+
+    def _api_enabled(self) -> bool:
+        """Whether requests go to the API (an API key is set and no scenario is forced)."""
+        api_key = self.config.get('API_KEY', '')
+        return bool(api_key) and api_key != 'your-api-key-here' and not self.config.get('SIM_SCENARIO')
+
+    def _post(self, data: Dict[str, object], endpoint=None, timeout: Optional[float] = None):
+        """
+        POST a chat completion request on the shared connection pool.
 
         Args:
-            user_input: The user's input message
+            data: Request body
+            endpoint: Router endpoint to use (API_BASE_URL/API_KEY when None)
+            timeout: Socket timeout in seconds (None = no timeout)
 
-        Yields:
-            Chunks of a simulated AI response
-        """
-        # Simple response simulation based on keywords
-        user_input = user_input.lower()
-
-        if 'hello' in user_input or 'hi' in user_input:
-            responses = [
-                "Hello there! How can I assist you today?",
-                "Hi! What can I help you with?",
-                "Greetings! How may I be of service?"
-            ]
-        elif 'how are you' in user_input:
-            responses = [
-                "I'm just a program, but I'm functioning perfectly! How can I help you?",
-                "I'm doing well, thank you for asking! What would you like to discuss?",
-            ]
-        elif 'bye' in user_input or 'goodbye' in user_input:
-            responses = [
-                "Goodbye! Feel free to come back if you have more questions.",
-                "See you later! Have a great day!",
-                "Farewell! It was nice chatting with you."
-            ]
-        elif 'help' in user_input:
-            responses = [
-                "I can help you with various topics. Try asking me questions about technology, science, or general knowledge!",
-                "I'm here to assist with any questions you might have. What would you like to know?",
-            ]
-        elif 'name' in user_input:
-            responses = [
-                "I'm an AI assistant created with prompt_toolkit. You can call me whatever you like!",
-                "I'm your friendly AI assistant. What would you prefer to call me?",
-            ]
-        elif '?' in user_input:
-            responses = [
-                "That's an interesting question. Based on my knowledge, I'd say that's a complex topic worth exploring further.",
-                "I understand your curiosity. While I don't have all the answers, I can tell you that it depends on several factors.",
-                "Great question! From what I know, there are multiple perspectives on that topic.",
-            ]
+        Returns:
+            The PooledResponse (a context manager)
+
+        Raises:
+            OSError: If the request fails or the API answers with an error status
+        """
+        if endpoint is not None:
+            api_base_url, api_key = endpoint.base_url, endpoint.api_key
         else:
-            responses = [
-                "I understand. Could you tell me more about that?",
-                "That's fascinating! Is there anything specific you'd like to know?",
-                "Thanks for sharing. How does that make you feel?",
-                "I see. What else would you like to discuss?",
-                "Interesting perspective. Can you elaborate on that?",
-            ]
+            api_base_url = self.config.get(
+                'API_BASE_URL', 'https://api.openai.com/v1')
+            api_key = self.config.get('API_KEY', '')
+        url = f"{api_base_url}/chat/completions"
 
-        response = random.choice(responses)
+        headers = {
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        }
+
+        with telemetry.timer("llm.request_build_ms"):
+            json_data = json.dumps(data).encode('utf-8')
+        telemetry.record("llm.request_bytes", len(json_data))
+
+        # 延迟导入：http.client 会拖慢启动，且模拟模式下用不到
+        from .http_pool import http_pool
+        with telemetry.timer("llm.connect_ms"):
+            return http_pool.request('POST', url, json_data, headers, timeout=timeout)
+
+    def _complete(self, messages: List[Dict[str, str]],
+                  task_class: str = 'chat') -> Tuple[str, Optional[Dict[str, int]]]:
+        """
+        Get a complete response with a non-streaming (``stream: false``) request.
+
+        Returns:
+            (content, usage); errors are returned as "[Error calling API: ...]" content
+        """
+        data = {
+            'model': self.config.get('API_MODEL', 'gpt-3.5-turbo'),
+            'messages': messages,
+            'stream': False
+        }
+        router = self.router
+        # 不经路由时只有一个“端点”（API_BASE_URL）；整个回复一次返回，因此不设首 token 超时
+        error = None
+        for endpoint in (router.candidates(task_class) if router else [None]):
+            if endpoint is not None:
+                data['model'] = endpoint.model
+            try:
+                with self._post(data, endpoint) as response:
+                    body = json.loads(response.read())
+                content = body['choices'][0]['message'].get('content') or ""
+            except Exception as e:
+                if endpoint is None:
+                    return f"[Error calling API: {str(e)}]\\n", None
+                router.record_error(endpoint)
+                telemetry.incr("llm.failovers")
+                error = f"{endpoint.name}: {e}"
+                continue
+            if endpoint is not None:
+                router.record_success(endpoint)
+            return content, body.get('usage')
+        return f"[Error calling API: {error}]\\n", None
+
+    def _iter_sse_content(self, lines: Iterable[str]) -> Generator[str, None, None]:
+        """
+        Extract content deltas (and usage) from SSE lines.
 
-        # mark this is simulated response
-        response = f"[Simulated Response] {response}"
+        Args:
+            lines: Decoded, stripped SSE lines
 
-        # Simulate streaming by yielding parts of the response
-        words = response.split(' ')
-        for i, word in enumerate(words):
-            # Simulate varying delays between words
-            if i > 0:
-                time.sleep(random.uniform(0.05, 0.2))
-            yield word + (' ' if i < len(words) - 1 else '')
+        Yields:
+            Content deltas
 
-    def get_response(self, messages: List[Dict[str, str]]) -> str:
+        Raises:
+            ConnectionError: The stream ended without [DONE] or a finish_reason
+                (the connection was dropped half-way)
+        """
+        finished = False
+        for line in lines:
+            if line == 'data: [DONE]':
+                finished = True
+            elif line.startswith('data: '):
+                data_str = line[6:]  # Remove 'data: ' prefix
+                try:
+                    chunk_data = json.loads(data_str)
+                    if chunk_data.get('usage'):
+                        self.last_usage = chunk_data['usage']
+                    if 'choices' in chunk_data and len(chunk_data['choices']) > 0:
+                        choice = chunk_data['choices'][0]
+                        delta = choice.get('delta', {})
+                        if 'content' in delta:
+                            yield delta['content']
+                        if choice.get('finish_reason'):
+                            finished = True
+                except json.JSONDecodeError:
+                    continue
+        if not finished:
+            # urllib 读到提前关闭的 chunked 响应时不会报错，这里补上检查
+            raise ConnectionError("response stream ended before it was complete")
+
+    def _simulate_ai_response_streaming(self, messages: List[Dict[str, str]]) -> Generator[str, None, None]:
+        """
+        Simulate a streaming AI response from the configured scenario.
+
+        Args:
+            messages: List of message dictionaries with role and content
+
+        Yields:
+            Chunks of the scripted response
+        """
+        yield from self.simulation.stream(messages)
+
+    def get_response(self, messages: List[Dict[str, str]], stream: bool = True,
+                     task_class: str = 'chat') -> str:
         """
         Get a complete response from the AI model.
 
         Args:
             messages: List of message dictionaries with role and content
+            stream: False sends a ``stream: false`` request and reads the whole
+                reply from one JSON body (replay, recording and simulation
+                always stream)
+            task_class: Kind of request, used by the endpoint router
 
         Returns:
             Complete AI response as a string
         """
-        response = ""
-        for chunk in self.get_response_stream(messages):
-            response += chunk
-        return response
+        if not stream and self.cassette is None and self._api_enabled():
+            response, self.last_usage = self._complete(messages, task_class)
+            return response
+        return "".join(self.get_response_stream(messages, task_class))
+
+    def get_responses(self, message_lists: List[List[Dict[str, str]]], max_concurrency: int = None,
+                      stream: bool = False, task_class: str = 'chat') -> List[str]:
+        """
+        Get complete responses for several conversations at once.
+
+        The requests run in parallel on the shared connection pool, so the
+        total latency is close to that of the slowest request (for example
+        to summarise several parts of a long history, or to sample several
+        candidate replies).
+
+        Args:
+            message_lists: One list of messages per request
+            max_concurrency: Requests in flight at the same time
+                (LLM_MAX_CONCURRENCY, 4 by default)
+            stream: Stream each response instead of using ``stream: false``
+            task_class: Kind of request, used by the endpoint router
+
+        Returns:
+            The responses in the order of ``message_lists``; failed requests
+            give "[Error calling API: ...]" text. Afterwards ``last_usages``
+            holds the usage of each request (None when streaming or not
+            reported) and ``last_usage`` their sum. While the requests run,
+            ``last_usage`` is undefined: the streaming workers share it.
+        """
+        if max_concurrency is None:
+            max_concurrency = int(self.config.get('LLM_MAX_CONCURRENCY') or 4)
+        fast = not stream and self.cassette is None and self._api_enabled()
+
+        def _one(messages: List[Dict[str, str]]) -> Tuple[str, Optional[Dict[str, int]]]:
+            if fast:
+                return self._complete(messages, task_class)
+            return "".join(self.get_response_stream(messages, task_class)), None
+
+        if len(message_lists) <= 1 or max_concurrency <= 1:
+            results = [_one(messages) for messages in message_lists]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            workers = min(max_concurrency, len(message_lists))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm") as executor:
+                results = list(executor.map(_one, message_lists))
+
+        self.last_usages = [usage for _, usage in results]
+        usages = [usage for usage in self.last_usages if usage]
+        self.last_usage = None
+        if usages:
+            # 汇总各请求的 token 数
+            self.last_usage = {}
+            for usage in usages:
+                for key, value in usage.items():
+                    if isinstance(value, int):
+                        self.last_usage[key] = self.last_usage.get(key, 0) + value
+        return [response for response, _ in results]
@@ -1,30 +1,58 @@
 
-from datetime import datetime
 from typing import Any, Dict, List, TYPE_CHECKING, Tuple
 
 from ..environment.user_message_environment_detail import get_environment_details
 from ..environment.environment_proxy import EnvironmentProxy
 
-from ..utils.tpl_util import replace_template_vars
+from ..utils.tpl_util import compile_template
 from ..utils.time_util import get_current_timestamp
 
+import os
 import re
-import xml.etree.ElementTree as ET
-from typing import Any, Dict, List
+import time
 
-from ..tools.execute_command.run import run as run_execute_command
-from ..tools.insert_content.run import run as run_insert_content
-from ..tools.list_files.run import run as run_list_files
-from ..tools.read_file.run import run as run_read_file
-from ..tools.search_and_replace.run import run as run_search_and_replace
-from ..tools.search_files.run import run as run_search_files
-from ..tools.write_to_file.run import run as run_write_to_file
+from ..tools.tool_registry import TOOL_NAMES, run_tool
+from ..tools.speculative_executor import SpeculativeExecutor
+from ..tools.tool_result import CHARS_PER_TOKEN, ToolResult, render_tool_results
+from ..utils.telemetry import telemetry
+from ..utils.token_counter import TokenBudget, token_counter
 
 
 if TYPE_CHECKING:
+    # xml.etree 仅在第一次解析工具块时导入，避免拖慢启动
+    import xml.etree.ElementTree as ET
     from ..views import ViewInterface
 
 
+# 用户消息模板在导入时编译一次（末尾空白与原模板保持一致）
+TIPS_MESSAGE_TPL = compile_template("{{tips}}\n{{env_details}}\n        ")
+USER_TASK_MESSAGE_TPL = compile_template("<task>{{user_task}}</task>\n{{env_details}}\n        ")
+
+
+def _instrument_stream(response_stream):
+    """
+    Pass chunks through while recording time to first token, stream
+    duration, chunk/char counts and the approximate tokens per second.
+    """
+    started = time.perf_counter()
+    first_token = None
+    chars = 0
+    try:
+        for chunk in response_stream:
+            if first_token is None:
+                first_token = time.perf_counter()
+                telemetry.record("llm.ttft_ms", (first_token - started) * 1000)
+            chars += len(chunk)
+            telemetry.incr("llm.chunks")
+            yield chunk
+    finally:
+        ended = time.perf_counter()
+        telemetry.record("llm.stream_ms", (ended - started) * 1000)
+        telemetry.incr("llm.chars", chars)
+        if first_token is not None and ended > first_token:
+            telemetry.record("llm.tokens_per_s", chars / CHARS_PER_TOKEN / (ended - first_token))
+
+
 def _get_potential_closing_tag_prefixes(tag_name: str) -> List[str]:
     """
     获取可能的结束标签前缀列表
@@ -86,6 +114,79 @@ class LLMProxy:
         self.view = view_interface
         self.llm = llm_provider
         self.tools = {}  # Dictionary to hold available tools
+        self.speculator = None  # 投机执行器，仅在启用投机执行时创建
+        self._prompt_estimate = 0  # 最近一次请求的 prompt token 估计值，用于校准
+        # 工具与环境信息使用的工作区目录；为 None 时使用进程的当前目录（$cd 可切换）
+        self.workspace_root = None
+        # 可选的工具工作进程池；为 None 时工具在本进程的线程中运行
+        self.tool_pool = None
+        # write_to_file 的内容在流式接收时写入临时文件（STREAM_WRITES=false 关闭）
+        config = getattr(llm_provider, 'config', None) or {}
+        self.stream_writes = config.get('STREAM_WRITES', 'true').lower() in ['true', '1', 'yes', 'on']
+        self.write_streamer = None  # 当前回复的 WriteStreamer，仅在处理回复期间存在
+
+    def set_speculative(self, enabled: bool):
+        """
+        Enable or disable speculative execution of read-only tools.
+
+        When enabled, read_file, list_files and search_files start running in
+        the background as soon as their block is parsed, before approval.
+
+        Args:
+            enabled: Whether speculative execution should be active
+        """
+        if enabled and self.speculator is None:
+            self.speculator = SpeculativeExecutor()
+        elif not enabled and self.speculator is not None:
+            # 恢复待批准工具的原始回调，再关闭后台线程
+            self.speculator.discard(self.view.pending_tools)
+            self.speculator.shutdown()
+            self.speculator = None
+
+    def discard_pending_tools(self, tools: List[Dict[str, Any]]):
+        """
+        Drop declined tools, throwing away any speculative results.
+
+        Args:
+            tools: The tools the user declined
+        """
+        if self.speculator is not None:
+            self.speculator.discard(tools)
+        # 删除被拒绝写入的暂存文件
+        for tool in tools:
+            staged = tool.pop("__staged", None)
+            if staged is not None:
+                staged.discard()
+
+    def _queue_pending_tool(self, execution_result: Dict[str, Any]):
+        """Queue a parsed tool for approval, speculatively starting it if allowed."""
+        if self.speculator is not None and self.speculator.can_speculate(
+                execution_result, self.view.pending_tools):
+            self.speculator.submit(execution_result)
+        self.view.pending_tools.append(execution_result)
+
+    def restore_pending_tools(self, tool_xmls: List[str]) -> List[Dict[str, Any]]:
+        """
+        Re-parse saved tool blocks and queue them for approval again.
+
+        Blocks that can no longer run, such as a large streamed write whose
+        staged file was removed at exit, are reported and skipped.
+
+        Args:
+            tool_xmls: The ``__xml`` of each pending tool, in order
+
+        Returns:
+            The restored pending tools
+        """
+        restored = []
+        for tool_xml in tool_xmls:
+            execution_result = self._parse_and_execute_tool(tool_xml)
+            if isinstance(execution_result, dict) and "__callback" in execution_result:
+                self._queue_pending_tool(execution_result)
+                restored.append(execution_result)
+            elif isinstance(execution_result, str):
+                self.view.display_system_message(f"Pending tool not restored: {execution_result}", 'error')
+        return restored
 
     def process_tools_input(self, tool_results: List[Dict], conversation_history: List[Dict[str, str]]) -> Dict[str, Any]:
         """
@@ -100,29 +201,37 @@ class LLMProxy:
         """
         # Extract tool execution results
         tool_execution_results = []
-        for tool in tool_results:
-            if "__execution_result" in tool:
-                tool_execution_results.append({
-                    "name": tool.get("__name", "unknown"),
-                    "result": tool["__execution_result"]
-                })
+        config = getattr(self.llm, 'config', {})
+        payload_cap = int(config.get('TOOL_RESULT_MAX_CHARS', 0))
+        # 所有结果共享剩余的 prompt 预算
+        executed = [tool for tool in tool_results if "__execution_result" in tool]
+        budget_cap = TokenBudget.from_config(config).max_result_chars(
+            conversation_history, len(executed))
+        result_cap = min(payload_cap, budget_cap) if payload_cap else budget_cap
+        for tool in executed:
+            execution_result = tool["__execution_result"]
+            # 超过单个结果上限时，优先截断最大的字段
+            if isinstance(execution_result, ToolResult) and execution_result.size() > result_cap:
+                execution_result.truncate(result_cap)
+                telemetry.incr("tool.results_truncated")
+            tool_execution_results.append(
+                (tool.get("__name", "unknown"), execution_result))
 
         # Get environment details
-        env_proxy = EnvironmentProxy()
+        env_proxy = EnvironmentProxy(self.workspace_root)
         environment_details = get_environment_details(
             env_proxy, with_workspace=False)
 
-        # Create tool results message
-        tool_results_content = "<tool_execution_results>\n"
-        for result in tool_execution_results:
-            tool_results_content += f"<tool name='{result['name']}'>\n{result['result']}\n</tool>\n"
-        tool_results_content += "</tool_execution_results>"
+        # Create tool results message (serialised once)
+        tool_results_content = render_tool_results(
+            tool_execution_results, fmt=config.get('TOOL_RESULT_FORMAT', 'xml'))
 
         # Combine tool results with environment information
         combined_content = f"{tool_results_content}\n{environment_details}"
 
         # Add to conversation history
         result = {
+            'task_class': 'tool_result',
             'conversation_history': conversation_history.copy()
         }
 
@@ -154,16 +263,14 @@ class LLMProxy:
             'tool_name': None,
             'tool_args': None,
             'user_message': tips,
+            'task_class': 'nudge',
             'conversation_history': conversation_history.copy()
         }
 
         # Build user task entry
-        env_proxy = EnvironmentProxy()
+        env_proxy = EnvironmentProxy(self.workspace_root)
         details = get_environment_details(env_proxy)
-        user_message_tpl = """{{tips}}\n{{env_details}}
-        """
-        tips = replace_template_vars(
-            user_message_tpl, {"{{tips}}": tips, "{{env_details}}": details})
+        tips = TIPS_MESSAGE_TPL.render(tips=tips, env_details=details)
 
         # Add user message to conversation history
         result['conversation_history'].append({
@@ -194,16 +301,14 @@ class LLMProxy:
             'tool_name': None,
             'tool_args': None,
             'user_message': user_input,
+            'task_class': 'chat',
             'conversation_history': conversation_history.copy()
         }
 
         # Build user task entry
-        env_proxy = EnvironmentProxy()
+        env_proxy = EnvironmentProxy(self.workspace_root)
         details = get_environment_details(env_proxy)
-        user_message_tpl = """<task>{{user_task}}</task>\n{{env_details}}
-        """
-        user_input = replace_template_vars(
-            user_message_tpl, {"{{user_task}}": user_input, "{{env_details}}": details})
+        user_input = USER_TASK_MESSAGE_TPL.render(user_task=user_input, env_details=details)
 
         # Add user message to conversation history
         result['conversation_history'].append({
@@ -228,8 +333,19 @@ class LLMProxy:
         # In a more complex implementation, this would check if tools are needed
         # and execute them before or after getting an LLM response
 
+        # 超出上下文预算时丢弃最早的消息（完整历史仍保留在会话中）
+        budget = TokenBudget.from_config(getattr(self.llm, 'config', {}))
+        messages, dropped = budget.trim_history(task_data['conversation_history'])
+        if dropped:
+            telemetry.incr("history.trimmed_messages", dropped)
+            self.view.display_system_message(
+                f"Context budget: {dropped} oldest message(s) not sent", 'context')
+        self._prompt_estimate = token_counter.count_history(messages)
+        telemetry.record("llm.prompt_tokens_est", self._prompt_estimate)
+
+        # 任务类型（chat / tool_result / nudge）供端点路由选择模型
         response_stream = self.llm.get_response_stream(
-            task_data['conversation_history'])
+            messages, task_class=task_data.get('task_class', 'chat'))
 
         result = {
             'response_stream': response_stream,
@@ -249,16 +365,35 @@ class LLMProxy:
         Partial tags (e.g. "<to", "<execu") are never output until they are confirmed
         to be non-tool text or completed into a full tag + matching closing tag.
         """
+        if self.stream_writes:
+            from .write_stream import WriteStreamer
+            self.write_streamer = WriteStreamer(self.workspace_root)
+        try:
+            with telemetry.cpu_timer("proxy.process_cpu_ms"):
+                result = self._process_response(_instrument_stream(response_stream), conversation_history)
+        finally:
+            # 未交给工具的暂存内容（未结束的写入块等）在回复结束后删除
+            if self.write_streamer is not None:
+                self.write_streamer.close()
+                self.write_streamer = None
+
+        # API 返回了 usage 时，用实际的 prompt token 数校准估计值
+        usage = getattr(self.llm, 'last_usage', None)
+        if usage and usage.get('prompt_tokens') and self._prompt_estimate:
+            telemetry.record("llm.prompt_tokens", usage['prompt_tokens'])
+            token_counter.calibrate(self._prompt_estimate, usage['prompt_tokens'])
+        return result
+
+    def _process_response(self, response_stream, conversation_history: List[Dict[str, str]]) -> Dict[str, Any]:
         tools_situations = []
         full_response = ""
+        # 工具块之外的文本，用于在结束后查找标签名拼错的工具块
+        plain_text = []
         self.view.display_ai_header()
 
         # buffer holds data not yet safely displayed/consumed
         buffer = ""
-        tool_tags = [
-            'execute_command', 'insert_content', 'list_files', 'read_file',
-            'search_and_replace', 'search_files', 'write_to_file', 'attempt_completion'
-        ]
+        tool_tags = TOOL_NAMES
         max_tool_tag_len = max(len(t) for t in tool_tags)
 
         # helper: process current buffer and extract displayable texts and tool blocks
@@ -377,10 +512,16 @@ class LLMProxy:
             return buf, outputs
 
         # Process stream
+        streamer = self.write_streamer
         for chunk in response_stream:
             buffer += chunk
+            # 正在接收的 write_to_file 内容直接写入暂存文件，不留在缓冲区中
+            if streamer is not None:
+                buffer = streamer.consume(buffer)
             # drain buffer as much as possible
             buffer, outputs = _drain_buffer(buffer)
+            if streamer is not None:
+                buffer = streamer.consume(buffer)
 
             # 检查是否有<attempt_completion>标签内容正在构建
             # 使用游标方式判断chunk是否在<attempt_completion><result>标签内容中
@@ -449,16 +590,19 @@ class LLMProxy:
                     if val:
                         self.view.display_ai_message_chunk(val)
                         full_response += val
+                        plain_text.append(val)
                 elif typ == "tool":
+                    plain_text.append("\n")
                     # try to parse & execute tool block
                     try:
-                        full_response += val
+                        # 对话历史中记录写入的内容（大文件只记录摘要）
+                        execution_params = streamer.expand(val) if streamer is not None else val
+                        full_response += execution_params
                         execution_result = self._parse_and_execute_tool(val)
 
-                        execution_params = val
                         # If execution_result is a dict with __callback, queue for approval
                         if isinstance(execution_result, dict) and "__callback" in execution_result:
-                            self.view.pending_tools.append(execution_result)
+                            self._queue_pending_tool(execution_result)
                             tools_situations.append({
                                 "execution_params": execution_params,
                                 "execution_result": execution_result,
@@ -476,45 +620,60 @@ class LLMProxy:
                         self.view.display_ai_message_chunk(val)
                         full_response += val
 
+        def _run_tool_block(tool_xml: str):
+            """Execute a tool block found after the stream and record it like the streamed ones."""
+            execution_result = self._parse_and_execute_tool(tool_xml)
+            if isinstance(execution_result, dict) and "__callback" in execution_result:
+                self._queue_pending_tool(execution_result)
+                tools_situations.append({
+                    "execution_params": execution_result.get("__xml", tool_xml),
+                    "execution_result": execution_result,
+                })
+            else:
+                tools_situations.append({
+                    "execution_params": tool_xml,
+                    "execution_result": execution_result,
+                })
+                self.view.display_ai_message_chunk(
+                    f"【工具执行结果】{execution_result}")
+
         # After stream ends, whatever remains in buffer is either safe text or partial things that never completed.
         # We'll attempt to safely display them following same rules.
         if buffer:
+            import xml.etree.ElementTree as ET
+            from .tool_repair import repair_tool_xml
+
             # If buffer still contains a leftover that looks like a partial tool tag, we should avoid exposing raw tag fragments.
             # We'll reuse the same logic: if buffer begins with a possible tool tag prefix, try to see if it's actual xml parseable.
             trimmed = buffer
             # try parse as XML - if parses as known tool, treat as tool block (best-effort)
             try:
                 parsed = ET.fromstring(trimmed)
-                # if parsed tag is one of tool_tags and structure is fine, call parse/execution
-                if parsed.tag in tool_tags:
-                    execution_result = self._parse_and_execute_tool(trimmed)
-                    if isinstance(execution_result, dict) and "__callback" in execution_result:
-                        self.view.pending_tools.append(execution_result)
-                        tools_situations.append({
-                            "execution_params": trimmed,
-                            "execution_result": execution_result,
-                        })
-                    else:
-                        tools_situations.append({
-                            "execution_params": trimmed,
-                            "execution_result": execution_result,
-                        })
-                        self.view.display_ai_message_chunk(
-                            f"【工具执行结果】{execution_result}")
-                    full_response += trimmed
-                else:
-                    # not a recognized tool tag, display as text
-                    self.view.display_ai_message_chunk(trimmed)
-                    full_response += trimmed
             except ET.ParseError:
+                parsed = None
+                # 以工具标签开头但未结束（回复被截断）：尝试补全后执行
+                if re.match(rf"<({'|'.join(tool_tags)})\b", trimmed):
+                    try:
+                        repaired = repair_tool_xml(trimmed)
+                        parsed, trimmed = repaired.root, repaired.xml
+                    except ET.ParseError:
+                        parsed = None
+            if parsed is not None and parsed.tag in tool_tags:
+                # if parsed tag is one of tool_tags and structure is fine, call parse/execution
+                history_text = streamer.expand(trimmed) if streamer is not None else trimmed
+                _run_tool_block(trimmed)
+                full_response += history_text
+            elif parsed is not None:
+                # not a recognized tool tag, display as text
+                self.view.display_ai_message_chunk(trimmed)
+                full_response += trimmed
+                plain_text.append(trimmed)
+            else:
                 # Could not parse: display but hide suspicious partial tag tails.
                 # For maximum safety, if buffer contains a '<' that could be prefix of tool tag, strip it or escape it.
                 safe_to_display = trimmed
                 # find any '<' followed by a prefix of a tool tag—escape them
 
-                def _escape_possible_tool_prefix(m):
-                    inner = m.group(0)  # e.g. "<to"
-                    return inner.replace("<", "&lt;")
                 # Use regex to find '<' followed by letters and check if letters prefix any tool_tags
                 safe_to_display = re.sub(
                     r"<([a-zA-Z]{1," + str(max_tool_tag_len) + r"})",
@@ -525,6 +684,13 @@ class LLMProxy:
                 self.view.display_ai_message_chunk(safe_to_display)
                 full_response += safe_to_display
 
+        # 标签名拼错的工具块（如 <read_files>）被当作文本显示：按最接近的工具执行，历史中记录修正后的调用
+        if "<" in "".join(plain_text):
+            from .tool_repair import find_misnamed_tools
+            for original, repaired in find_misnamed_tools("".join(plain_text)):
+                _run_tool_block(repaired.xml)
+                full_response = full_response.replace(original, repaired.xml, 1)
+
         self.view.display_newline()
 
         # Add AI response to conversation history
@@ -552,44 +718,66 @@ class LLMProxy:
         Returns:
             执行结果字符串
         """
+        import xml.etree.ElementTree as ET
+        from .tool_repair import repair_tool_xml
+
+        # 修复率 = tool.repaired / tool.calls
+        telemetry.incr("tool.calls")
         try:
-            root = ET.fromstring(tool_xml)
+            # 先在本地修复小的格式错误（截断、未转义字符、拼错的名称），避免再请求一轮
+            repaired = repair_tool_xml(tool_xml)
+            root, tool_xml = repaired.root, repaired.xml
             tool_name = root.tag
 
             # 根据工具类型调用相应的处理函数
             if tool_name == 'execute_command':
-                return self._execute_command_tool(root, tool_name, tool_xml)
+                result = self._execute_command_tool(root, tool_name, tool_xml)
             elif tool_name == 'insert_content':
-                return self._execute_insert_content_tool(root, tool_name, tool_xml)
+                result = self._execute_insert_content_tool(root, tool_name, tool_xml)
             elif tool_name == 'list_files':
-                return self._execute_list_files_tool(root, tool_name, tool_xml)
+                result = self._execute_list_files_tool(root, tool_name, tool_xml)
             elif tool_name == 'read_file':
-                return self._execute_read_file_tool(root, tool_name, tool_xml)
+                result = self._execute_read_file_tool(root, tool_name, tool_xml)
             elif tool_name == 'search_and_replace':
-                return self._execute_search_replace_tool(root, tool_name, tool_xml)
+                result = self._execute_search_replace_tool(root, tool_name, tool_xml)
             elif tool_name == 'search_files':
-                return self._execute_search_files_tool(root, tool_name, tool_xml)
+                result = self._execute_search_files_tool(root, tool_name, tool_xml)
             elif tool_name == 'write_to_file':
-                return self._execute_write_file_tool(root, tool_name, tool_xml)
+                result = self._execute_write_file_tool(root, tool_name, tool_xml)
             elif tool_name == 'attempt_completion':
-                return self._execute_attempt_completion_tool(root, tool_name, tool_xml)
+                result = self._execute_attempt_completion_tool(root, tool_name, tool_xml)
             else:
                 return f"未知工具: {tool_name}"
 
+            # 保留原始 XML，会话日志据此在恢复会话时重建待批准工具
+            if isinstance(result, dict):
+                result.setdefault("__xml", tool_xml)
+            return result
+
         except ET.ParseError as e:
             return f"XML解析错误: {str(e)}"
         except Exception as e:
             return f"工具执行失败: {str(e)}"
 
+    def _run_tool(self, name: str, tool_xml: str) -> Any:
+        """Run a tool against this proxy's workspace root, in the worker pool if there is one."""
+        if self.tool_pool is not None:
+            return self.tool_pool.run(name, tool_xml, basePath=self.workspace_root)
+        return run_tool(name, tool_xml, basePath=self.workspace_root)
+
+    def _workspace_path(self, path: str) -> str:
+        """Resolve a tool path against the workspace root, for conflict and staleness checks."""
+        return os.path.join(self.workspace_root, path) if self.workspace_root else path
+
     # 以下工具执行方法与之前相同，保持不变
-    def _execute_command_tool(self, root: ET.Element, tool_name: str, tool_xml: str) -> Dict[str, Any]:
+    def _execute_command_tool(self, root: "ET.Element", tool_name: str, tool_xml: str) -> Dict[str, Any]:
         """模拟执行命令工具"""
         command_elem = root.find('.//command')
         if command_elem is not None:
             command = command_elem.text or ""
 
             def __run_execute_command():
-                return run_execute_command(tool_xml)
+                return self._run_tool('execute_command', tool_xml)
 
             return {
                 "desc": f"执行命令: {command} [模拟执行完成]",
@@ -598,7 +786,7 @@ class LLMProxy:
             }
         return "命令参数缺失"
 
-    def _execute_insert_content_tool(self, root: ET.Element, tool_name: str, tool_xml: str) -> str:
+    def _execute_insert_content_tool(self, root: "ET.Element", tool_name: str, tool_xml: str) -> str:
         """模拟插入内容工具"""
         path_elem = root.find('.//path')
         line_elem = root.find('.//line')
@@ -610,16 +798,17 @@ class LLMProxy:
             content = content_elem.text or ""
 
             def __run_insert_content():
-                return run_insert_content(tool_xml)
+                return self._run_tool('insert_content', tool_xml)
 
             return {
                 "desc": f"在文件 {path} 第 {line} 行插入内容 [模拟执行完成]",
                 "__name": tool_name,
+                "__paths": [self._workspace_path(path.strip())],
                 "__callback": __run_insert_content,
             }
         return "插入内容参数缺失"
 
-    def _execute_list_files_tool(self, root: ET.Element, tool_name: str, tool_xml: str) -> str:
+    def _execute_list_files_tool(self, root: "ET.Element", tool_name: str, tool_xml: str) -> str:
         """模拟列出文件工具"""
         path_elem = root.find('.//path')
         recursive_elem = root.find('.//recursive')
@@ -628,31 +817,33 @@ class LLMProxy:
         recursive = recursive_elem.text if recursive_elem is not None else "false"
 
         def __run_execute_command():
-            return run_list_files(tool_xml)
+            return self._run_tool('list_files', tool_xml)
 
         return {
             "desc": f"列出目录 {path} 的文件 (递归: {recursive}) [模拟执行完成]",
             "__name": tool_name,
+            "__paths": [self._workspace_path((path or ".").strip())],
             "__callback": __run_execute_command,
         }
 
-    def _execute_read_file_tool(self, root: ET.Element, tool_name: str, tool_xml: str) -> str:
+    def _execute_read_file_tool(self, root: "ET.Element", tool_name: str, tool_xml: str) -> str:
         """模拟读取文件工具"""
         path_elem = root.find('.//path')
         if path_elem is not None:
             path = path_elem.text or ""
 
             def __run_read_file():
-                return run_read_file(tool_xml)
+                return self._run_tool('read_file', tool_xml)
 
             return {
                 "desc": f"读取文件 {path} 的内容 [模拟执行完成]",
                 "__name": tool_name,
+                "__paths": [self._workspace_path(elem.text.strip()) for elem in root.findall('.//path') if elem.text],
                 "__callback": __run_read_file,
             }
         return "文件路径参数缺失"
 
-    def _execute_search_replace_tool(self, root: ET.Element, tool_name: str, tool_xml: str) -> str:
+    def _execute_search_replace_tool(self, root: "ET.Element", tool_name: str, tool_xml: str) -> str:
         """模拟搜索替换工具"""
         path_elem = root.find('.//path')
         search_elem = root.find('.//search')
@@ -664,16 +855,17 @@ class LLMProxy:
             replace = replace_elem.text or ""
 
             def __run_search_and_replace():
-                return run_search_and_replace(tool_xml)
+                return self._run_tool('search_and_replace', tool_xml)
 
             return {
                 "desc": f"在文件 {path} 中搜索 '{search}' 替换为 '{replace}' [模拟执行完成]",
                 "__name": tool_name,
+                "__paths": [self._workspace_path(path.strip())],
                 "__callback": __run_search_and_replace,
             }
         return "搜索替换参数缺失"
 
-    def _execute_search_files_tool(self, root: ET.Element, tool_name: str, tool_xml: str) -> str:
+    def _execute_search_files_tool(self, root: "ET.Element", tool_name: str, tool_xml: str) -> str:
         """模拟搜索文件工具"""
         path_elem = root.find('.//path')
         regex_elem = root.find('.//regex')
@@ -684,15 +876,16 @@ class LLMProxy:
         file_pattern = file_pattern_elem.text if file_pattern_elem is not None else "*"
 
         def __run_search_files():
-            return run_search_files(tool_xml)
+            return self._run_tool('search_files', tool_xml)
 
         return {
             "desc": f"在目录 {path} 中搜索文件模式 {file_pattern}，正则表达式 {regex} [模拟执行完成]",
             "__name": tool_name,
+            "__paths": [self._workspace_path((path or ".").strip())],
             "__callback": __run_search_files,
         }
 
-    def _execute_write_file_tool(self, root: ET.Element, tool_name: str, tool_xml: str) -> str:
+    def _execute_write_file_tool(self, root: "ET.Element", tool_name: str, tool_xml: str) -> str:
         """模拟写入文件工具"""
         path_elem = root.find('.//path')
         content_elem = root.find('.//content')
@@ -703,17 +896,49 @@ class LLMProxy:
             content = content_elem.text or ""
             line_count = line_count_elem.text if line_count_elem is not None else "未知"
 
+            if content.startswith("__staged_write_"):
+                return self._staged_write_tool(root, tool_name, tool_xml)
+
             def __run_write_to_file():
-                return run_write_to_file(tool_xml)
+                return self._run_tool('write_to_file', tool_xml)
 
             return {
                 "desc": f"写入文件 {path}，内容 {line_count} 行 [模拟执行完成]",
                 "__name": tool_name,
+                "__paths": [self._workspace_path(path.strip())],
                 "__callback": __run_write_to_file,
             }
         return "写入文件参数缺失"
 
-    def _execute_attempt_completion_tool(self, root: ET.Element, tool_name: str, tool_xml: str) -> str:
+    def _staged_write_tool(self, root: "ET.Element", tool_name: str, tool_xml: str) -> Dict[str, Any]:
+        """Queue a write whose content was streamed into a staged file; approving it renames the file into place."""
+        streamer = self.write_streamer
+        xml_with_content = streamer.expand(tool_xml) if streamer is not None else tool_xml
+        staged = streamer.take(root.find('.//content').text) if streamer is not None else None
+        if staged is None:
+            # 例如恢复会话时：大文件的内容只写入了暂存文件，进程退出时已删除
+            return "暂存的文件内容已不存在，请重新发送完整的文件内容"
+        line_count_elem = root.find('.//line_count')
+        if line_count_elem is not None and (line_count_elem.text or "").strip().isdigit():
+            staged.line_count = int(line_count_elem.text.strip())
+        path = staged.path
+
+        def __commit_staged_write():
+            from ..tools.write_to_file.run import execute_staged
+            with telemetry.timer("tool.write_to_file_ms"):
+                return execute_staged(staged)
+
+        return {
+            "desc": f"写入文件 {path}，内容 {staged.lines} 行 [模拟执行完成]",
+            "__name": tool_name,
+            "__paths": [self._workspace_path(path.strip())],
+            "__callback": __commit_staged_write,
+            "__staged": staged,
+            # 会话日志中保存 __xml：内容不在内存中的大文件保留标记，恢复时拒绝，而不是写入摘要文本
+            "__xml": xml_with_content if staged.content is not None else tool_xml,
+        }
+
+    def _execute_attempt_completion_tool(self, root: "ET.Element", tool_name: str, tool_xml: str) -> str:
         ac_elem = root.find('.//attempt_completion')
         result_elem = root.find('.//result')
 
@@ -726,6 +951,7 @@ class LLMProxy:
             return {
                 "desc": f"尝试结束任务",
                 "__name": tool_name,
+                "__paths": [],
                 "__callback": __run_attempt_completion_tool,
             }
         return "写入文件参数缺失"
@@ -0,0 +1,229 @@
+"""
+Model Router
+============
+
+Sends each chat request to one of several endpoint/model profiles instead
+of the single API_BASE_URL/API_MODEL, and fails over to the next profile
+when an endpoint errors or is slow to produce its first token.
+
+Profiles are configured in .env::
+
+    LLM_ENDPOINTS=small,main,backup
+    LLM_ENDPOINT_SMALL_URL=http://localhost:8000/v1
+    LLM_ENDPOINT_SMALL_MODEL=qwen2.5-7b
+    LLM_ENDPOINT_SMALL_CLASSES=nudge
+    LLM_ENDPOINT_MAIN_URL=https://api.openai.com/v1
+    LLM_ENDPOINT_MAIN_MODEL=gpt-4o
+    LLM_ENDPOINT_BACKUP_URL=...           (_KEY defaults to API_KEY)
+
+Requests carry a task class: ``chat`` (a user task), ``tool_result`` (the
+turn after tools ran) or ``nudge`` (the reminder after a reply without
+tools). A profile with _CLASSES only serves those classes.
+
+Each endpoint keeps a rolling window of time-to-first-token samples and
+errors. Candidates are tried fastest first (median TTFT, penalised by the
+error rate); endpoints that have not been used yet are tried first, in
+the order they are configured, so every endpoint is measured. An endpoint
+that fails is skipped for a cooldown period unless no other is left.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from ..utils.telemetry import percentile
+
+TASK_CLASSES = ('chat', 'tool_result', 'nudge')
+# 每个端点保留的最近请求数
+DEFAULT_WINDOW = 50
+# 错误率对延迟分数的惩罚系数
+ERROR_PENALTY = 4.0
+
+
+class Endpoint:
+    """
+    An endpoint/model profile and its rolling statistics.
+    """
+
+    def __init__(self, name: str, base_url: str, model: str, api_key: str = "",
+                 classes: Optional[List[str]] = None, window: int = DEFAULT_WINDOW):
+        """
+        Create a profile.
+
+        Args:
+            name: Profile name (used in telemetry and messages)
+            base_url: API base URL (".../v1")
+            model: Model name sent in requests
+            api_key: API key for this endpoint
+            classes: Task classes served (empty = all)
+            window: Number of recent requests kept for the statistics
+        """
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.api_key = api_key
+        self.classes = list(classes or [])
+        self.ttft_ms: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.down_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def serves(self, task_class: str) -> bool:
+        return not self.classes or task_class in self.classes
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def score(self) -> Optional[float]:
+        """Median TTFT penalised by the error rate (None without TTFT samples)."""
+        if not self.ttft_ms:
+            return None
+        return percentile(list(self.ttft_ms), 50) * (1 + ERROR_PENALTY * self.error_rate)
+
+
+class ModelRouter:
+    """
+    Chooses endpoints by task class and observed latency, with failover.
+    """
+
+    def __init__(self, endpoints: List[Endpoint], first_token_timeout: Optional[float] = 30.0,
+                 cooldown: float = 30.0):
+        """
+        Create a router.
+
+        Args:
+            endpoints: Profiles in order of preference
+            first_token_timeout: Seconds without a first token before failing
+                over (None = wait indefinitely)
+            cooldown: Seconds an endpoint is skipped after an error
+
+        Raises:
+            ValueError: If there are no endpoints
+        """
+        if not endpoints:
+            raise ValueError("The router needs at least one endpoint")
+        self.endpoints = endpoints
+        self.first_token_timeout = first_token_timeout
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> Optional['ModelRouter']:
+        """
+        Create a router from LLM_ENDPOINTS and the LLM_ENDPOINT_<NAME>_* keys.
+
+        Returns:
+            The router, or None when LLM_ENDPOINTS is not set
+
+        Raises:
+            ValueError: If a profile has no URL
+        """
+        names = [name.strip() for name in (config.get('LLM_ENDPOINTS') or '').split(',') if name.strip()]
+        if not names:
+            return None
+        endpoints = []
+        for name in names:
+            prefix = f"LLM_ENDPOINT_{name.upper()}_"
+            base_url = config.get(prefix + 'URL')
+            if not base_url:
+                raise ValueError(f"Endpoint {name} needs {prefix}URL")
+            classes = [c.strip() for c in (config.get(prefix + 'CLASSES') or '').split(',') if c.strip()]
+            endpoints.append(Endpoint(
+                name, base_url,
+                config.get(prefix + 'MODEL') or config.get('API_MODEL', 'gpt-3.5-turbo'),
+                config.get(prefix + 'KEY') or config.get('API_KEY', ''),
+                classes))
+        timeout = float(config.get('LLM_FIRST_TOKEN_TIMEOUT') or 30)
+        return cls(endpoints, first_token_timeout=timeout or None,
+                   cooldown=float(config.get('LLM_ENDPOINT_COOLDOWN') or 30))
+
+    def candidates(self, task_class: str = 'chat') -> List[Endpoint]:
+        """
+        Endpoints to try for a request, best first.
+
+        Args:
+            task_class: One of TASK_CLASSES (profiles restricted to other
+                classes are left out, unless none serves this class)
+
+        Returns:
+            Endpoints not used yet (in configured order), then the others
+            by score; endpoints in their cooldown come last
+        """
+        serving = [e for e in self.endpoints if e.serves(task_class)] or list(self.endpoints)
+        now = time.monotonic()
+        with self._lock:
+            def _key(item):
+                index, endpoint = item
+                score = endpoint.score()
+                # 从未使用过的端点优先（每个端点都会被测到），然后按分数；只有错误的排在最后
+                return (endpoint.down_until > now, bool(endpoint.outcomes),
+                        score if score is not None else float('inf'), index)
+            ranked = sorted(enumerate(serving), key=_key)
+        return [endpoint for _, endpoint in ranked]
+
+    def record_success(self, endpoint: Endpoint, ttft_ms: Optional[float] = None):
+        """Record a successful request (with its time to first token, if known)."""
+        with self._lock:
+            endpoint.requests += 1
+            endpoint.outcomes.append(True)
+            if ttft_ms is not None:
+                endpoint.ttft_ms.append(ttft_ms)
+            endpoint.down_until = 0.0
+
+    def record_error(self, endpoint: Endpoint):
+        """Record a failed or too slow request; the endpoint cools down."""
+        with self._lock:
+            endpoint.requests += 1
+            endpoint.errors += 1
+            endpoint.outcomes.append(False)
+            endpoint.down_until = time.monotonic() + self.cooldown
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        """Per-endpoint statistics (requests, errors, error rate, TTFT p50/p95, down)."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                e.name: {
+                    "model": e.model,
+                    "requests": e.requests,
+                    "errors": e.errors,
+                    "error_rate": round(e.error_rate, 3),
+                    "ttft_p50_ms": round(percentile(list(e.ttft_ms), 50), 1),
+                    "ttft_p95_ms": round(percentile(list(e.ttft_ms), 95), 1),
+                    "down": e.down_until > now,
+                }
+                for e in self.endpoints
+            }
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.llm.router
+"""
+if __name__ == "__main__":
+    import json
+
+    from .llm_provider import LLMProvider
+    from .stub_server import StubConfig, StubServer
+
+    servers = {"down": StubServer(StubConfig(error_rate=1.0, error_status=503)),
+               "slow": StubServer(StubConfig(latency=0.3)),
+               "fast": StubServer(StubConfig(latency=0.02))}
+    provider = LLMProvider()
+    provider.config = {"API_KEY": "stub", "LLM_ENDPOINTS": ",".join(servers)}
+    for name, server in servers.items():
+        server.start()
+        provider.config[f"LLM_ENDPOINT_{name.upper()}_URL"] = server.base_url
+    try:
+        for i in range(6):
+            started = time.perf_counter()
+            reply = provider.get_response([{"role": "user", "content": "go"}])
+            print(f"request {i}: {(time.perf_counter() - started) * 1000:.0f} ms {reply[:30]!r}")
+        print(json.dumps(provider.router.stats(), indent=2))
+    finally:
+        for server in servers.values():
+            server.stop()
@@ -0,0 +1,174 @@
+"""
+Scripted Simulation Provider
+============================
+
+Answers chat requests from a scenario file instead of a model, so the
+whole app (stream parsing, tools, approvals, rendering) can be run and
+measured offline and reproducibly.
+
+A scenario is a JSON file with a list of assistant turns; the n-th
+assistant turn of a conversation gets the n-th reply (cycling at the end),
+like the stub server. The built-in scenarios live in ``scenarios/``
+(``explore``: list_files, search_files, read_file, attempt_completion;
+``edit``: read_file, write_to_file, search_files, attempt_completion)::
+
+    {"description": "...", "turns": ["Let me look...\\n<list_files>...", "..."]}
+
+Replies are cut into chunks of random size (seeded per turn, so a seed
+always gives the same boundaries, which often fall inside XML tags) and
+streamed at a configurable token rate, or as fast as possible.
+"""
+
+import json
+import os
+import random
+import time
+from typing import Dict, Generator, List
+
+from ..utils.token_counter import CHARS_PER_TOKEN
+
+SCENARIO_DIR = os.path.join(os.path.dirname(__file__), 'scenarios')
+DEFAULT_SCENARIO = 'explore'
+
+
+class Scenario:
+    """
+    A scripted multi-turn conversation.
+    """
+
+    def __init__(self, turns: List[str], name: str = "scenario", description: str = ""):
+        """
+        Create a scenario.
+
+        Args:
+            turns: Assistant replies, in order
+            name: Name shown in messages
+            description: What the scenario exercises
+
+        Raises:
+            ValueError: If there are no turns
+        """
+        if not turns:
+            raise ValueError(f"Scenario {name} has no turns")
+        self.turns = turns
+        self.name = name
+        self.description = description
+
+    @classmethod
+    def load(cls, name_or_path: str) -> 'Scenario':
+        """
+        Load a built-in scenario by name, or a scenario file by path.
+
+        Raises:
+            FileNotFoundError: If there is no such scenario
+            ValueError: If the file is not a valid scenario
+        """
+        path = name_or_path
+        if not os.path.exists(path):
+            path = os.path.join(SCENARIO_DIR, f"{name_or_path}.json")
+            if not os.path.exists(path):
+                available = ", ".join(sorted(n[:-5] for n in os.listdir(SCENARIO_DIR) if n.endswith(".json")))
+                raise FileNotFoundError(f"Unknown scenario {name_or_path} (built-in: {available})")
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid scenario file {path}: {e}") from None
+        turns = data.get("turns") if isinstance(data, dict) else None
+        if not isinstance(turns, list) or not all(isinstance(t, str) for t in turns):
+            raise ValueError(f"Scenario file {path} needs a \"turns\" list of strings")
+        name = os.path.splitext(os.path.basename(path))[0]
+        return cls(turns, name, data.get("description", ""))
+
+    def turn_index(self, messages: List[Dict[str, str]]) -> int:
+        """Index of the assistant turn answering ``messages`` (not wrapped)."""
+        return sum(1 for m in messages if m.get("role") == "assistant")
+
+    def reply(self, messages: List[Dict[str, str]]) -> str:
+        """The scripted reply for a request."""
+        return self.turns[self.turn_index(messages) % len(self.turns)]
+
+
+class ScriptedSimulation:
+    """
+    Streams scenario replies with seeded chunk boundaries and paced output.
+    """
+
+    def __init__(self, scenario: Scenario, seed: int = 0, tokens_per_second: float = 0.0,
+                 max_chunk_chars: int = 16):
+        """
+        Create a simulation.
+
+        Args:
+            scenario: The scripted conversation
+            seed: Seed for the chunk boundaries
+            tokens_per_second: Streaming rate (0 = as fast as possible)
+            max_chunk_chars: Chunks are 1 to this many characters long
+        """
+        self.scenario = scenario
+        self.seed = seed
+        self.tokens_per_second = tokens_per_second
+        self.max_chunk_chars = max(1, max_chunk_chars)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> 'ScriptedSimulation':
+        """Create a simulation from SIM_SCENARIO / SIM_SEED / SIM_TOKENS_PER_SECOND / SIM_MAX_CHUNK_CHARS."""
+        return cls(Scenario.load(config.get('SIM_SCENARIO') or DEFAULT_SCENARIO),
+                   seed=int(config.get('SIM_SEED') or 0),
+                   tokens_per_second=float(config.get('SIM_TOKENS_PER_SECOND') or 0),
+                   max_chunk_chars=int(config.get('SIM_MAX_CHUNK_CHARS') or 16))
+
+    def chunks(self, text: str, turn: int = 0) -> List[str]:
+        """
+        Cut a reply into chunks of random size.
+
+        The boundaries depend only on the seed, the turn and the text length.
+        """
+        # 以字符串作种子：结果与 PYTHONHASHSEED 无关
+        rng = random.Random(f"{self.seed}:{turn}")
+        chunks = []
+        position = 0
+        while position < len(text):
+            size = rng.randint(1, self.max_chunk_chars)
+            chunks.append(text[position:position + size])
+            position += size
+        return chunks
+
+    def stream(self, messages: List[Dict[str, str]]) -> Generator[str, None, None]:
+        """
+        Stream the scripted reply for a request.
+
+        Args:
+            messages: The request messages
+
+        Yields:
+            Chunks of the reply
+        """
+        turn = self.scenario.turn_index(messages)
+        chunks = self.chunks(self.scenario.reply(messages), turn)
+        if self.tokens_per_second <= 0:
+            yield from chunks
+            return
+        # 按累计字符数计算每个 chunk 的发送时间，sleep 的误差不会累积
+        chars_per_second = self.tokens_per_second * CHARS_PER_TOKEN
+        started = time.perf_counter()
+        sent = 0
+        for chunk in chunks:
+            delay = started + sent / chars_per_second - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            sent += len(chunk)
+            yield chunk
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.llm.scenario
+"""
+if __name__ == "__main__":
+    simulation = ScriptedSimulation(Scenario.load(DEFAULT_SCENARIO), seed=7, tokens_per_second=400)
+    messages = [{"role": "user", "content": "<task>Explore</task>"}]
+    for _ in simulation.scenario.turns:
+        started = time.perf_counter()
+        chunks = list(simulation.stream(messages))
+        print(f"{len(chunks)} chunks in {(time.perf_counter() - started) * 1000:.0f} ms: {chunks[:6]}")
+        messages += [{"role": "assistant", "content": "".join(chunks)}, {"role": "user", "content": "ok"}]
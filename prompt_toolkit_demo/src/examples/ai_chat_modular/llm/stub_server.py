@@ -0,0 +1,329 @@
+"""
+Stub OpenAI-Compatible Server
+=============================
+
+A local ``/v1/chat/completions`` endpoint for exercising LLMProvider
+without network access. Replies are scripted tool-using turns (the n-th
+assistant turn of a conversation gets the n-th reply), streamed as SSE at
+a configurable token rate after a configurable first-token latency.
+Errors can be injected: HTTP errors, streams that disconnect half-way, and
+429 responses above a concurrency limit.
+
+``GET /stats`` returns request, connection and concurrency counters, so
+clients can check connection reuse. Only the standard library is used.
+
+Run command (from prompt_toolkit_demo):
+    python -m src.examples.ai_chat_modular.llm.stub_server --port 8765 --tokens-per-second 200
+Then point the app at it with ``API_BASE_URL=http://127.0.0.1:8765/v1`` and
+any non-empty ``API_KEY``.
+"""
+
+import json
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from ..utils.token_counter import CHARS_PER_TOKEN, TokenCounter
+
+# 默认脚本：浏览目录、读取文件、完成任务，循环使用
+DEFAULT_REPLIES = [
+    """Let me look at the files in the workspace first.
+<list_files>
+<args>
+<path>.</path>
+<recursive>false</recursive>
+</args>
+</list_files>
+""",
+    """I'll read the README to understand the project.
+<read_file>
+<args>
+  <file><path>README.md</path></file>
+</args>
+</read_file>
+""",
+    """I have gathered enough information.
+<attempt_completion>
+<result>
+The workspace was inspected and the README summarised.
+</result>
+</attempt_completion>
+""",
+]
+
+
+@dataclass
+class StubConfig:
+    """
+    Behaviour of the stub server.
+
+    Attributes:
+        latency: Seconds before the first chunk (or the whole non-streamed reply)
+        tokens_per_second: Streaming rate (0 = as fast as possible)
+        chunk_chars: Characters per SSE chunk
+        error_rate: Probability of answering with ``error_status``
+        error_status: HTTP status used for injected errors
+        disconnect_rate: Probability of closing the stream half-way
+        max_concurrency: Requests in flight above which 429 is returned (0 = unlimited)
+        replies: Scripted assistant replies, cycled by conversation turn
+        seed: Random seed for error injection
+    """
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    chunk_chars: int = 16
+    error_rate: float = 0.0
+    error_status: int = 500
+    disconnect_rate: float = 0.0
+    max_concurrency: int = 0
+    replies: List[str] = field(default_factory=lambda: list(DEFAULT_REPLIES))
+    seed: Optional[int] = None
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1：客户端可以复用连接
+    protocol_version = "HTTP/1.1"
+    server: 'StubServer'
+
+    def setup(self):
+        super().setup()
+        # 头部与正文分开写出：关闭 Nagle，避免复用连接时的 40ms 延迟确认等待
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.count("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, object]):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, self.server.snapshot())
+        elif self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        try:
+            request = json.loads(raw or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+
+        server = self.server
+        if not server.enter():
+            server.count("rejected")
+            self._send_json(429, {"error": {"message": "Too many concurrent requests"}})
+            return
+        try:
+            server.count("requests")
+            config = server.config
+            if server.chance(config.error_rate):
+                server.count("errors")
+                self._send_json(config.error_status, {"error": {"message": "Injected error"}})
+                return
+            messages = request.get("messages") or []
+            turn = sum(1 for m in messages if m.get("role") == "assistant")
+            reply = config.replies[turn % len(config.replies)] if config.replies else ""
+            if request.get("stream"):
+                self._stream(request, messages, reply)
+            else:
+                time.sleep(config.latency)
+                self._send_json(200, {
+                    "id": "chatcmpl-stub", "object": "chat.completion", "model": request.get("model", "stub"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": reply}}],
+                    "usage": self._usage(messages, reply),
+                })
+        finally:
+            server.leave()
+
+    def _usage(self, messages: List[Dict[str, str]], reply: str) -> Dict[str, int]:
+        counter = self.server.token_counter
+        prompt = counter.count_history(messages) if messages else 0
+        completion = counter.count(reply)
+        return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+    def _stream(self, request: Dict[str, object], messages: List[Dict[str, str]], reply: str):
+        config = self.server.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # 流式响应用 chunked 编码，连接在响应结束后可以复用
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        chunk_chars = max(1, config.chunk_chars)
+        delay = chunk_chars / (config.tokens_per_second * CHARS_PER_TOKEN) if config.tokens_per_second > 0 else 0
+        disconnect_at = len(reply) // 2 if self.server.chance(config.disconnect_rate) else None
+        model = request.get("model", "stub")
+
+        time.sleep(config.latency)
+        started = time.perf_counter()
+        for index, offset in enumerate(range(0, len(reply), chunk_chars)):
+            if disconnect_at is not None and offset >= disconnect_at:
+                self.server.count("disconnects")
+                self.close_connection = True
+                return
+            if delay:
+                pause = started + index * delay - time.perf_counter()
+                if pause > 0:
+                    time.sleep(pause)
+            self._write_event({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "model": model,
+                               "choices": [{"index": 0, "delta": {"content": reply[offset:offset + chunk_chars]}}]})
+        self._write_event({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "model": model,
+                           "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._write_event({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "model": model,
+                               "choices": [], "usage": self._usage(messages, reply)})
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_event(self, payload: Dict[str, object]):
+        self._write_chunk(("data: " + json.dumps(payload) + "\n\n").encode("utf-8"))
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    The stub server; ``start()`` serves it on a background thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, config: Optional[StubConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Create the server (port 0 picks a free port).
+
+        Args:
+            config: Server behaviour (defaults to StubConfig())
+            host: Interface to bind
+            port: Port to bind
+        """
+        super().__init__((host, port), _StubHandler)
+        self.config = config or StubConfig()
+        self._random = random.Random(self.config.seed)
+        # 与客户端分开计数，避免在同一进程中打乱客户端的增量统计
+        self.token_counter = TokenCounter()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"connections": 0, "requests": 0, "errors": 0,
+                                          "disconnects": 0, "rejected": 0}
+        self._active = 0
+        self._max_active = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to use as API_BASE_URL."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self, name: str):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+
+    def chance(self, probability: float) -> bool:
+        if probability <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < probability
+
+    def enter(self) -> bool:
+        """Admit a request unless the concurrency limit is reached."""
+        with self._lock:
+            if self.config.max_concurrency and self._active >= self.config.max_concurrency:
+                return False
+            self._active += 1
+            self._max_active = max(self._max_active, self._active)
+            return True
+
+    def leave(self):
+        with self._lock:
+            self._active -= 1
+
+    def snapshot(self) -> Dict[str, int]:
+        """Counters plus current and maximum concurrent requests."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["active"] = self._active
+            stats["max_concurrent"] = self._max_active
+        return stats
+
+    def start(self) -> 'StubServer':
+        """Serve on a daemon thread and return self."""
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> 'StubServer':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def run(argv=None):
+    """Run the stub server from the command line."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first chunk")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="0 = as fast as possible")
+    parser.add_argument("--chunk-chars", type=int, default=16)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--disconnect-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=0)
+    parser.add_argument("--replies", help="JSON file with a list of scripted replies")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    config = StubConfig(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                        chunk_chars=args.chunk_chars, error_rate=args.error_rate,
+                        error_status=args.error_status, disconnect_rate=args.disconnect_rate,
+                        max_concurrency=args.max_concurrency, seed=args.seed)
+    if args.replies:
+        with open(args.replies, encoding="utf-8") as f:
+            config.replies = json.load(f)
+
+    server = StubServer(config, args.host, args.port)
+    # 第一行输出供脚本读取实际端口
+    print(f"Stub server listening on {server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.llm.stub_server [--port 8765]
+"""
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import time
+
+import pytest
+
+from .cassette import Cassette, CassetteMiss, request_hash
+from .llm_provider import LLMProvider
+
+
+def _sse(text: str, size: int = 4, delay: float = 0.0):
+    for i in range(0, len(text), size):
+        if delay:
+            time.sleep(delay)
+        yield "data: " + json.dumps({"choices": [{"delta": {"content": text[i:i + size]}}]})
+    yield 'data: {"choices": [], "usage": {"prompt_tokens": 42}}'
+    yield "data: [DONE]"
+
+
+def _request(task: str, now: str):
+    return [{"role": "system", "content": "sys", "timestamp": now},
+            {"role": "user", "content": f"<task>{task}</task>\n<environment_details>{now}</environment_details>",
+             "timestamp": now}]
+
+
+def test_request_hash_ignores_volatile_details():
+    assert request_hash(_request("a", "t1"), "m") == request_hash(_request("a", "t2"), "m")
+    assert request_hash(_request("a", "t1"), "m") != request_hash(_request("b", "t1"), "m")
+    assert request_hash(_request("a", "t1"), "m") != request_hash(_request("a", "t1"), "other")
+
+
+def test_replay_matches_by_hash_then_falls_back_to_order():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "c.jsonl")
+        recorder = Cassette(path, "record")
+        first = list(recorder.record(_request("first", "t1"), "m", _sse("one")))
+        second = list(recorder.record(_request("second", "t1"), "m", _sse("two")))
+
+        player = Cassette(path, "replay")
+        assert len(player) == 2
+        assert list(player.replay(_request("second", "t9"), "m")) == second
+        assert list(player.replay(_request("diverged", "t9"), "m")) == first
+        assert (player.hits, player.fallbacks, player.remaining) == (1, 1, 0)
+        with pytest.raises(CassetteMiss):
+            list(player.replay(_request("first", "t9"), "m"))
+
+
+def test_replay_speed_keeps_timing():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "c.jsonl")
+        list(Cassette(path, "record").record(_request("a", "t"), "m", _sse("x" * 20, delay=0.01)))
+
+        started = time.perf_counter()
+        list(Cassette(path, "replay", speed=1.0).replay(_request("a", "t"), "m"))
+        realtime = time.perf_counter() - started
+        started = time.perf_counter()
+        list(Cassette(path, "replay", speed=0).replay(_request("a", "t"), "m"))
+        fast = time.perf_counter() - started
+        assert realtime >= 0.04
+        assert fast < realtime / 4
+
+
+def test_provider_replays_without_api_key():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "c.jsonl")
+        list(Cassette(path, "record").record(_request("a", "t"), "gpt-test", _sse("Hello <b>there</b>")))
+
+        provider = LLMProvider()
+        provider.config = {"API_KEY": "", "API_MODEL": "gpt-test",
+                           "LLM_CASSETTE": path, "LLM_CASSETTE_MODE": "replay"}
+        assert "".join(provider.get_response_stream(_request("a", "later"))) == "Hello <b>there</b>"
+        assert provider.last_usage == {"prompt_tokens": 42}
+
+
+if __name__ == "__main__":
+    test_request_hash_ignores_volatile_details()
+    test_replay_matches_by_hash_then_falls_back_to_order()
+    test_replay_speed_keeps_timing()
+    test_provider_replays_without_api_key()
+    print("All tests passed! ✓")
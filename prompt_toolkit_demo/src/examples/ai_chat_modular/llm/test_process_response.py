@@ -51,8 +51,10 @@ def create_mock_response_stream(text: str) -> Generator[str, None, None]:
         i += chunk_size
 
 
-def test_process_response():
+def test_process_response(tmp_path, monkeypatch):
     """Test the process_response method with various XML tool calls"""
+    # 工具会在当前目录写文件：在临时目录中运行
+    monkeypatch.chdir(tmp_path)
 
     # Create mock objects
     view_interface = MockViewInterface()
@@ -192,4 +194,10 @@ The file has been created."""
 Run command: python -m src.examples.ai_chat_modular.llm.test_process_response
 """
 if __name__ == "__main__":
-    test_process_response()
+    import tempfile
+    from pathlib import Path
+
+    import pytest
+
+    with tempfile.TemporaryDirectory() as tmp, pytest.MonkeyPatch.context() as monkeypatch:
+        test_process_response(Path(tmp), monkeypatch)
@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+import time
+
+from .llm_provider import LLMProvider
+from .llm_proxy import LLMProxy
+from .router import ModelRouter
+from .stub_server import StubConfig, StubServer
+from ..headless_view import HeadlessView
+
+GO = [{"role": "user", "content": "go"}]
+
+
+def _provider(servers, **extra):
+    config = {"API_KEY": "stub", "API_MODEL": "stub", "LLM_ENDPOINTS": ",".join(servers)}
+    for name, server in servers.items():
+        config[f"LLM_ENDPOINT_{name.upper()}_URL"] = server.base_url
+    config.update(extra)
+    provider = LLMProvider()
+    provider.config = config
+    return provider
+
+
+def test_fails_over_and_prefers_the_fastest_endpoint():
+    with StubServer(StubConfig(error_rate=1.0, error_status=503)) as down, \
+            StubServer(StubConfig(replies=["slow"], latency=0.2)) as slow, \
+            StubServer(StubConfig(replies=["fast"], latency=0.01)) as fast:
+        provider = _provider({"down": down, "slow": slow, "fast": fast})
+        # 第一个端点返回 503：同一个请求换到下一个端点
+        assert provider.get_response(GO) == "slow"
+        # 未使用过的端点先被测量，之后都走最快的端点
+        assert [provider.get_response(GO) for _ in range(4)] == ["fast"] * 4
+        stats = provider.router.stats()
+        assert (stats["down"]["errors"], stats["down"]["down"]) == (1, True)
+        assert stats["slow"]["ttft_p50_ms"] > stats["fast"]["ttft_p50_ms"]
+        assert provider.get_responses([GO, GO]) == ["fast", "fast"]
+
+        # 全部端点都失败时返回错误文本
+        provider = _provider({"down": down})
+        assert provider.get_response(GO).startswith("[Error calling API: down: HTTP Error 503")
+
+
+def test_first_token_timeout_fails_over():
+    with StubServer(StubConfig(replies=["stalled"], latency=2.0)) as stalled, \
+            StubServer(StubConfig(replies=["backup"])) as backup:
+        provider = _provider({"stalled": stalled, "backup": backup}, LLM_FIRST_TOKEN_TIMEOUT="0.2")
+        started = time.perf_counter()
+        assert provider.get_response(GO) == "backup"
+        assert time.perf_counter() - started < 1.5
+        assert provider.router.stats()["stalled"]["errors"] == 1
+
+
+def test_failover_records_only_the_answer():
+    with StubServer(StubConfig(replies=["stalled"], latency=1.0)) as stalled, \
+            StubServer(StubConfig(replies=["backup"])) as backup, tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "c.jsonl")
+        provider = _provider({"stalled": stalled, "backup": backup}, LLM_FIRST_TOKEN_TIMEOUT="0.3",
+                             LLM_ENDPOINT_BACKUP_MODEL="backup-model",
+                             LLM_CASSETTE=path, LLM_CASSETTE_MODE="record")
+        assert provider.get_response(GO) == "backup"
+
+        with open(path) as f:
+            recorded = [json.loads(line) for line in f]
+        assert len(recorded) == 1 and recorded[0]["model"] == "backup-model"
+        replay = _provider({}, LLM_CASSETTE=path, LLM_CASSETTE_MODE="replay")
+        assert replay.get_response(GO) == "backup"
+
+
+def test_routes_by_task_class():
+    with StubServer(StubConfig(replies=["small"])) as small, StubServer(StubConfig(replies=["main"])) as main:
+        provider = _provider({"small": small, "main": main}, LLM_ENDPOINT_SMALL_CLASSES="nudge",
+                             LLM_ENDPOINT_SMALL_MODEL="small-model")
+        router = provider.router
+        assert [e.name for e in router.candidates("nudge")] == ["small", "main"]
+        assert [e.name for e in router.candidates("chat")] == ["main"]
+        assert router.endpoints[0].model == "small-model"
+
+        proxy = LLMProxy(HeadlessView(), provider)
+        nudge = proxy.process_tips_input("Use a tool.", GO)
+        assert "".join(proxy.execute_task(nudge)['response_stream']) == "small"
+        task = proxy.process_user_input("Explore", [])
+        assert "".join(proxy.execute_task(task)['response_stream']) == "main"
+
+    assert ModelRouter.from_config({}) is None
+
+
+if __name__ == "__main__":
+    test_fails_over_and_prefers_the_fastest_endpoint()
+    test_first_token_timeout_fails_over()
+    test_failover_records_only_the_answer()
+    test_routes_by_task_class()
+    print("All tests passed! ✓")
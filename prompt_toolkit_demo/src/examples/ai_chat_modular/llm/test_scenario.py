@@ -0,0 +1,63 @@
+import json
+import time
+
+import pytest
+
+from ..headless_view import HeadlessView
+from .llm_provider import LLMProvider
+from .llm_proxy import LLMProxy
+from .scenario import Scenario, ScriptedSimulation
+
+TASK = [{"role": "user", "content": "<task>Explore</task>"}]
+
+
+def test_chunk_boundaries_are_seeded():
+    simulation = ScriptedSimulation(Scenario.load("explore"), seed=3, max_chunk_chars=8)
+    first = list(simulation.stream(TASK))
+    assert first == list(simulation.stream(TASK))
+    assert "".join(first) == simulation.scenario.turns[0]
+    assert max(map(len, first)) <= 8 and min(map(len, first)) >= 1
+    assert first != list(ScriptedSimulation(simulation.scenario, seed=4, max_chunk_chars=8).stream(TASK))
+
+
+def test_every_built_in_turn_parses_at_any_seed():
+    expected = {"explore": ["list_files", "search_files", "read_file", "attempt_completion"],
+                "edit": ["read_file", "write_to_file", "search_files", "attempt_completion"]}
+    for name, tools in expected.items():
+        for seed in range(5):
+            simulation = ScriptedSimulation(Scenario.load(name), seed=seed)
+            view = HeadlessView()
+            proxy = LLMProxy(view, None)
+            history = list(TASK)
+            for _ in tools:
+                history = proxy.process_response(simulation.stream(history), history)['conversation_history']
+                history.append({"role": "user", "content": "[tool result]"})
+            assert [tool["__name"] for tool in view.pending_tools] == tools
+
+
+def test_token_rate_and_provider_config(tmp_path):
+    path = tmp_path / "hello.json"
+    path.write_text(json.dumps({"turns": ["x" * 200]}), encoding="utf-8")
+    provider = LLMProvider()
+    provider.config = {"API_KEY": "real-key", "SIM_SCENARIO": str(path), "SIM_TOKENS_PER_SECOND": "500"}
+    started = time.perf_counter()
+    # 显式指定场景时即使配置了 API key 也不发请求；200 字符 = 50 token = 0.1 s
+    assert provider.get_response(TASK) == "x" * 200
+    assert 0.08 <= time.perf_counter() - started < 1
+
+    with pytest.raises(FileNotFoundError):
+        Scenario.load("no-such-scenario")
+    path.write_text(json.dumps({"turns": []}), encoding="utf-8")
+    with pytest.raises(ValueError):
+        Scenario.load(str(path))
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_chunk_boundaries_are_seeded()
+    test_every_built_in_turn_parses_at_any_seed()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_token_rate_and_provider_config(Path(tmp))
+    print("All tests passed! ✓")
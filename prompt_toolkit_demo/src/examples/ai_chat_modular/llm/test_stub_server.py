@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from .llm_provider import LLMProvider
+from .stub_server import StubConfig, StubServer
+
+
+def _provider(server: StubServer) -> LLMProvider:
+    provider = LLMProvider()
+    provider.config = {"API_BASE_URL": server.base_url, "API_KEY": "stub", "API_MODEL": "stub",
+                       "STREAM_USAGE": "true"}
+    return provider
+
+
+def test_streams_scripted_replies_by_turn():
+    replies = ["first <read_file><args><file><path>a</path></file></args></read_file>", "second"]
+    with StubServer(StubConfig(replies=replies, chunk_chars=3)) as server:
+        provider = _provider(server)
+        assert "".join(provider.get_response_stream([{"role": "user", "content": "go"}])) == replies[0]
+        assert provider.last_usage["completion_tokens"] > 0
+        history = [{"role": "user", "content": "go"}, {"role": "assistant", "content": replies[0]}]
+        assert "".join(provider.get_response_stream(history)) == "second"
+        # 两个请求复用同一个 keep-alive 连接
+        assert (server.snapshot()["requests"], server.snapshot()["connections"]) == (2, 1)
+
+
+def test_token_rate_and_latency():
+    config = StubConfig(replies=["x" * 80], chunk_chars=8, tokens_per_second=200, latency=0.05)
+    with StubServer(config) as server:
+        started = time.perf_counter()
+        assert "".join(_provider(server).get_response_stream([{"role": "user", "content": "go"}])) == "x" * 80
+        # 80 个字符 = 20 个 token，200 token/s 约 0.1 秒，加上 0.05 秒首 token 延迟
+        assert time.perf_counter() - started >= 0.12
+
+
+def test_error_injection_and_disconnects():
+    with StubServer(StubConfig(error_rate=1.0, error_status=503)) as server:
+        output = "".join(_provider(server).get_response_stream([{"role": "user", "content": "go"}]))
+        assert output.startswith("[Error calling API") and "503" in output
+        assert server.snapshot()["errors"] == 1
+
+    with StubServer(StubConfig(replies=["y" * 100], disconnect_rate=1.0)) as server:
+        output = "".join(_provider(server).get_response_stream([{"role": "user", "content": "go"}]))
+        assert "[Error calling API" in output
+        assert server.snapshot()["disconnects"] == 1
+
+
+def test_concurrency_limit_and_non_streaming():
+    config = StubConfig(replies=["done"], latency=0.2, max_concurrency=1)
+    with StubServer(config) as server:
+        body = json.dumps({"model": "stub", "messages": [{"role": "user", "content": "go"}]}).encode()
+
+        def _post():
+            request = urllib.request.Request(server.base_url + "/chat/completions", data=body,
+                                             headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request) as response:
+                return json.load(response)
+
+        slow = threading.Thread(target=_post)
+        slow.start()
+        time.sleep(0.05)
+        with pytest.raises(urllib.error.HTTPError) as rejected:
+            _post()
+        assert rejected.value.code == 429
+        slow.join()
+        assert _post()["choices"][0]["message"]["content"] == "done"
+        stats = server.snapshot()
+        assert (stats["rejected"], stats["max_concurrent"]) == (1, 1)
+
+
+def test_get_responses_runs_in_parallel_and_keeps_order():
+    replies = [f"reply {i}" for i in range(4)]
+    with StubServer(StubConfig(replies=replies, latency=0.2)) as server:
+        provider = _provider(server)
+        # 第 i 个请求已有 i 条 assistant 消息，因此得到第 i 个回复
+        message_lists = [[{"role": "user", "content": "go"}] + [{"role": "assistant", "content": "x"}] * i
+                         for i in range(4)]
+        for stream in (False, True):
+            started = time.perf_counter()
+            assert provider.get_responses(message_lists, max_concurrency=4, stream=stream) == replies
+            assert time.perf_counter() - started < 0.6
+        assert provider.last_usage is None and provider.last_usages == [None] * 4
+        assert provider.get_responses(message_lists[:2], max_concurrency=2) == replies[:2]
+        first, second = provider.last_usages
+        assert provider.last_usage["completion_tokens"] == first["completion_tokens"] + second["completion_tokens"]
+        assert provider.get_response(message_lists[3], stream=False) == "reply 3"
+        stats = server.snapshot()
+        # 第二批请求复用第一批留下的连接
+        assert (stats["requests"], stats["connections"]) == (11, 4)
+
+    with StubServer(StubConfig(error_rate=1.0, error_status=503)) as server:
+        results = _provider(server).get_responses([[{"role": "user", "content": "go"}]] * 2)
+        assert all(r.startswith("[Error calling API: HTTP Error 503") for r in results)
+
+
+if __name__ == "__main__":
+    test_streams_scripted_replies_by_turn()
+    test_token_rate_and_latency()
+    test_error_injection_and_disconnects()
+    test_concurrency_limit_and_non_streaming()
+    test_get_responses_runs_in_parallel_and_keeps_order()
+    print("All tests passed! ✓")
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from ..headless_view import HeadlessView
+from ..utils.telemetry import telemetry
+from .llm_proxy import LLMProxy
+from .tool_repair import find_misnamed_tools, repair_tool_xml
+
+
+def test_truncated_and_misspelled_blocks_are_repaired():
+    telemetry.reset()
+    repaired = repair_tool_xml("<read_file><args><file><path>a.py</path></file></ar")
+    assert repaired.fixes == ["closed"]
+    assert repaired.xml == "<read_file><args><file><path>a.py</path></file></args></read_file>"
+
+    repaired = repair_tool_xml("<list_file><args><pth>src</pth><recursive>true</recursive></args></list_file>")
+    assert repaired.name == "list_files"
+    assert [el.tag for el in repaired.root.find("args")] == ["path", "recursive"]
+
+    repaired = repair_tool_xml("<read_file><args><file><path>a.py</path><file><path>b.py</path></args>")
+    assert repaired.fixes == ["extracted"]
+    assert [el.text for el in repaired.root.iter("path")] == ["a.py", "b.py"]
+
+    # 格式正确的块原样返回
+    good = "<read_file><args><file><path>a.py</path></file></args></read_file>"
+    assert repair_tool_xml(good).xml == good and not repair_tool_xml(good).fixes
+
+    counters = telemetry.counters()
+    assert counters["tool.repaired"] == 3
+    assert counters["tool.repair.closed"] == 1 and counters["tool.repair.extracted"] == 1
+
+
+def test_unescaped_text_and_unrepairable_blocks():
+    source = "if a < b && c:\n    print('<tag>')\n"
+    repaired = repair_tool_xml(f"<write_to_file><path>x.py</path><content>{source}</content>"
+                               f"<line_count>2</line_count></write_to_file>")
+    assert repaired.root.find("content").text == source
+    # write_to_file 按原文读取 content：修复后的 XML 中不转义
+    assert f"<content>{source}</content>" in repaired.xml
+
+    repaired = repair_tool_xml("<search_files><args><path>.</path><regex>a<b & c</regex></args></search_files>")
+    assert repaired.root.find("args/regex").text == "a<b & c"
+
+    telemetry.reset()
+    for text in ("just text <not a tool", "<unknown_thing><x></unknown_thing",
+                 "<write_to_file><path>x.py</path><content>half a fi"):
+        with pytest.raises(ET.ParseError):
+            repair_tool_xml(text)
+    assert telemetry.counters()["tool.repair_failed"] == 3
+
+    assert find_misnamed_tools("see <path>a</path> and <read_files><args><file><path>a.py</path>"
+                               "</file></args></read_files>")[0][1].name == "read_file"
+
+
+def test_truncated_mutating_tools_are_not_completed():
+    for text in ("<execute_command><command>rm -rf /home/me/proj/build/ca",
+                 "<execute_command>\n<command>rm -rf build/cache</command>\n<cwd>sub",
+                 "<search_and_replace><path>a.py</path><search>foo(x)</search><replace>bar(x",
+                 "<search_and_replace><path>a.py</path><search>foo</search><replace>bar</replace><use_regex>tr",
+                 "<insert_content><path>a.py</path><line>1",
+                 "<write_to_file><pa"):
+        with pytest.raises(ET.ParseError):
+            repair_tool_xml(text)
+    # 参数都已完整，只缺工具结束标签：可以补全
+    repaired = repair_tool_xml("<execute_command><command>ls build</command>")
+    assert repaired.fixes == ["closed"] and repaired.root.find("command").text == "ls build"
+    # 只读工具截断的参数仍然补全
+    assert repair_tool_xml("<search_files><args><path>src</path><regex>def foo").fixes == ["closed"]
+
+
+def test_entities_in_file_content_are_kept():
+    html = "<p>1 &lt; 2<br>&amp; &nbsp;</p>\n"
+    # 需要转义修复的块
+    repaired = repair_tool_xml(f"<write_to_file><path>a.html</path><content>{html}</content></write_to_file>")
+    assert repaired.fixes == ["escaped"] and repaired.root.find("content").text == html
+    assert f"<content>{html}</content>" in repaired.xml
+    # 格式正确、只改了参数名的块
+    repaired = repair_tool_xml("<insert_content><pth>a.py</pth><line>1</line>"
+                               "<content>x &lt; y &amp;&amp; z\n</content></insert_content>")
+    assert "<content>x &lt; y &amp;&amp; z\n</content>" in repaired.xml
+
+    with tempfile.TemporaryDirectory() as workspace:
+        with open(os.path.join(workspace, "a.py"), "w") as f:
+            f.write("pass\n")
+        proxy = LLMProxy(HeadlessView(), None)
+        proxy.workspace_root = workspace
+        proxy.process_response(iter(["<insert_content><path>a.py</path><line>1</line>"
+                                     "<content>x &lt; y <b></content></insert_content>"]), [])
+        proxy.view.pending_tools[0]["__callback"]()
+        assert open(os.path.join(workspace, "a.py")).read() == "x &lt; y <b>\npass\n"
+
+
+def test_process_response_runs_repaired_tools():
+    view = HeadlessView()
+    proxy = LLMProxy(view, None)
+    reply = ("Reading both.\n<read_files><args><file><path>README.md</path></file></args></read_files>\n"
+             "<write_to_file><path>t.py</path><content>x = 1 < 2\n</content><line_count>1</line_count>"
+             "</write_to_file>\n<list_files><args><path>src</path>")
+    result = proxy.process_response(iter([reply[i:i + 7] for i in range(0, len(reply), 7)]), [])
+
+    names = [situation["execution_result"]["__name"] for situation in result["tools_situations"]]
+    assert sorted(names) == ["list_files", "read_file", "write_to_file"]
+    assert "<read_file><args>" in result["response"] and "<read_files>" not in result["response"]
+    assert "<list_files><args><path>src</path></args></list_files>" in result["response"]
+    assert len(view.pending_tools) == 3
+
+
+if __name__ == "__main__":
+    test_truncated_and_misspelled_blocks_are_repaired()
+    test_unescaped_text_and_unrepairable_blocks()
+    test_truncated_mutating_tools_are_not_completed()
+    test_entities_in_file_content_are_kept()
+    test_process_response_runs_repaired_tools()
+    print("All tests passed! ✓")
@@ -0,0 +1,155 @@
+import os
+import stat
+import tempfile
+
+from ..headless_view import HeadlessView
+from ..session.session_store import SessionStore, replay_session
+from ..tools.write_to_file.staged_write import MAX_INLINE_CHARS, NEW_FILE_MODE, StagedWrite, _read_umask
+from .llm_proxy import LLMProxy
+
+
+def _proxy(workspace: str) -> LLMProxy:
+    proxy = LLMProxy(HeadlessView(), None)
+    proxy.workspace_root = workspace
+    return proxy
+
+
+def test_staged_write_is_verified_and_renamed_into_place():
+    with tempfile.TemporaryDirectory() as workspace:
+        target = os.path.join(workspace, "a.txt")
+        with open(target, "w") as f:
+            f.write("old\n")
+        os.chmod(target, 0o640)
+
+        staged = StagedWrite("a.txt", workspace, line_count=2)
+        staged.feed("\nnew")
+        staged.feed(" line\nsecond\n")
+        assert staged.lines == 2 and open(target).read() == "old\n"
+        result = staged.commit()
+        assert result["status"] == "success" and result["operation"] == "modified"
+        assert "+new line" in result["user_edits"]
+        assert open(target).read() == "\nnew line\nsecond\n"
+        assert stat.S_IMODE(os.stat(target).st_mode) == 0o640
+        assert not os.path.exists(staged.temp_path)
+
+        # 新文件得到 umask 决定的默认权限
+        created = StagedWrite("new.txt", workspace)
+        created.feed("x\n")
+        created.commit()
+        assert stat.S_IMODE(os.stat(os.path.join(workspace, "new.txt")).st_mode) == NEW_FILE_MODE
+        if os.path.exists("/proc/self/status"):
+            # 读取 umask 不修改进程的 umask（多线程时会影响其他线程新建的文件）
+            umask = os.umask
+            os.umask = None
+            try:
+                assert 0o666 & ~_read_umask() == NEW_FILE_MODE
+            finally:
+                os.umask = umask
+
+        # 行数少于 line_count：内容被截断，不写入
+        truncated = StagedWrite("b.txt", workspace, line_count=5)
+        truncated.feed("one\ntwo\n")
+        assert "looks truncated" in truncated.commit()["error"]
+        assert not os.path.exists(os.path.join(workspace, "b.txt"))
+        assert not os.path.exists(truncated.temp_path)
+
+
+def test_content_streams_to_the_staged_file():
+    with tempfile.TemporaryDirectory() as workspace:
+        proxy = _proxy(workspace)
+        lines = [f"line {i}\n" for i in range(200)]
+        observed = []
+
+        def _stream():
+            yield "Writing it.\n<write_to_file>\n<path>big.txt</path>\n<content>\n"
+            for line in lines:
+                yield line
+            # 结束标签到达前，内容已在暂存文件中，而不在缓冲区里
+            staged = proxy.write_streamer.active
+            observed.append((staged.lines, staged.chars))
+            yield "</cont"
+            yield "ent>\n<line_count>200</line_count>\n</write_to_file>"
+
+        result = proxy.process_response(_stream(), [])
+        assert observed == [(200, len("".join(lines)) + 1)]
+        tool = proxy.view.pending_tools[0]
+        assert tool["__name"] == "write_to_file" and "200 行" in tool["desc"]
+        # 对话历史中保留完整内容
+        assert "line 199\n</content>" in result["response"] and "__staged_write_" not in result["response"]
+
+        output = tool["__callback"]()
+        assert output.status == "success"
+        assert open(os.path.join(workspace, "big.txt")).read() == "\n" + "".join(lines)
+
+
+def test_rejected_and_large_writes():
+    with tempfile.TemporaryDirectory() as workspace:
+        proxy = _proxy(workspace)
+        reply = "<write_to_file><path>x.txt</path><content>hi\n</content></write_to_file>"
+        proxy.process_response(iter([reply[:40], reply[40:]]), [])
+        tool = proxy.view.pending_tools.pop()
+        temp_path = tool["__staged"].temp_path
+        assert os.path.exists(temp_path)
+        proxy.discard_pending_tools([tool])
+        assert not os.path.exists(temp_path) and not os.path.exists(os.path.join(workspace, "x.txt"))
+
+        # 大文件：历史中只记录摘要，不生成 diff
+        body = "x" * 99 + "\n"
+        count = MAX_INLINE_CHARS // len(body) + 10
+        chunks = ["<write_to_file><path>big.txt</path><content>"] + [body] * count + ["</content></write_to_file>"]
+        result = proxy.process_response(iter(chunks), [])
+        assert f"[{count} lines" in result["response"]
+        output = proxy.view.pending_tools.pop()["__callback"]()
+        assert "diff omitted" in str(output)
+        assert os.path.getsize(os.path.join(workspace, "big.txt")) == len(body) * count
+
+        # 不是直接子元素的 <path>（write_to_file 不接受）：不暂存，与非流式路径一致
+        nested = "<write_to_file><args><file><path>n.txt</path><content>hi\n</content></file></args></write_to_file>"
+        proxy.process_response(iter([nested[:50], nested[50:]]), [])
+        tool = proxy.view.pending_tools.pop()
+        assert "__staged" not in tool
+        tool["__callback"]()
+        assert not os.path.exists(os.path.join(workspace, "n.txt"))
+
+        # 关闭流式写入时走原来的路径
+        proxy.stream_writes = False
+        proxy.process_response(iter([reply[:40], reply[40:]]), [])
+        assert "__staged" not in proxy.view.pending_tools[-1]
+
+
+def test_large_pending_write_is_not_resumed():
+    with tempfile.TemporaryDirectory() as workspace:
+        target = os.path.join(workspace, "big.txt")
+        with open(target, "w") as f:
+            f.write("original\n")
+        proxy = _proxy(workspace)
+        body = "y" * 99 + "\n"
+        count = MAX_INLINE_CHARS // len(body) + 10
+        small = "<write_to_file><path>small.txt</path><content>hi\n</content></write_to_file>"
+        chunks = ["<write_to_file><path>big.txt</path><content>"] + [body] * count + ["</content></write_to_file>\n", small]
+        result = proxy.process_response(iter(chunks), [])
+
+        # 与 TooTask 相同：会话日志记录对话和待批准工具的 __xml
+        store = SessionStore(os.path.join(workspace, ".too"), session_id="s1")
+        store.append_turn(result["conversation_history"],
+                          pending=[tool["__xml"] for tool in proxy.view.pending_tools])
+        store.close()
+        proxy.discard_pending_tools(proxy.view.pending_tools)
+
+        _, pending = replay_session(SessionStore(os.path.join(workspace, ".too"), session_id="s1").load_session())
+        resumed = _proxy(workspace)
+        restored = resumed.restore_pending_tools(pending)
+        # 小文件的内容在日志中，可以恢复；大文件的暂存文件已不存在，提示重新发送
+        assert [tool["__name"] for tool in restored] == ["write_to_file"]
+        assert "重新发送" in resumed.view.system_messages[0]["message"]
+        restored[0]["__callback"]()
+        assert open(os.path.join(workspace, "small.txt")).read() == "hi\n"
+        assert open(target).read() == "original\n"
+
+
+if __name__ == "__main__":
+    test_staged_write_is_verified_and_renamed_into_place()
+    test_content_streams_to_the_staged_file()
+    test_rejected_and_large_writes()
+    test_large_pending_write_is_not_resumed()
+    print("All tests passed! ✓")
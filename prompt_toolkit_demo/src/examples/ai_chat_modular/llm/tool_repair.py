@@ -0,0 +1,340 @@
+"""
+Tool Call Repair
+================
+
+Fixes slightly malformed tool XML locally, so that a reply with a small
+mistake still runs its tool instead of costing a whole extra LLM turn
+(the "no tools were used" reminder with the full history).
+
+Repairs, in order:
+
+- unescaped ``<`` and ``&`` in free-text parameters (content, regex,
+  result, ...) and elsewhere in the block;
+- truncated blocks: a cut-off trailing tag is dropped and the open tags
+  are closed;
+- lenient extraction: when the block still does not parse, the known
+  parameters of the tool are pulled out with patterns and a clean block
+  is rebuilt;
+- misspelled tool names (``<read_files>``) and parameter names
+  (``<pth>``), matched against the tool registry.
+
+Every repair is counted in telemetry (``tool.repaired`` and
+``tool.repair.<kind>`` against ``tool.calls``, plus ``tool.repair_failed``);
+replies that still end in a "no tools used" retry count as
+``llm.no_tool_retries``.
+
+Only read-only tools are completed when a parameter was cut off. For a
+tool that changes something (write_to_file, insert_content,
+search_and_replace, execute_command) a truncated parameter (a partial
+file, a partial replacement, a partial shell command) fails the repair,
+so the model is asked to send the call again.
+"""
+
+import difflib
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from ..tools.tool_registry import TOOL_NAMES, TOOL_SPECS, is_read_only_tool
+from ..utils.telemetry import telemetry
+
+# 自由文本参数：内容原样转义，不当作标签解析
+RAW_PARAMS = ('content', 'result', 'regex', 'search', 'replace', 'command')
+# 工具按原文读取的参数（不反转义）
+VERBATIM_PARAMS = {'write_to_file': 'content', 'insert_content': 'content'}
+# 名称相似度下限（difflib ratio）
+NAME_CUTOFF = 0.75
+
+TAG_PATTERN = re.compile(r"<(/?)([A-Za-z_][\w\-]*)[^<>]*?(/?)>")
+ENTITY_PATTERN = re.compile(r"&(?!(?:amp|lt|gt|quot|apos|#\d+|#x[0-9a-fA-F]+);)")
+BLOCK_PATTERN = re.compile(r"<([A-Za-z_][\w\-]*)>.*?</\1>", re.DOTALL)
+
+
+@dataclass
+class RepairedTool:
+    """A parsed (and possibly repaired) tool call."""
+    root: ET.Element
+    xml: str
+    fixes: List[str] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return self.root.tag
+
+
+def match_name(name: str, candidates) -> Optional[str]:
+    """The closest candidate to a misspelled name, or None."""
+    matches = difflib.get_close_matches(name.lower().replace('-', '_'), list(candidates), n=1, cutoff=NAME_CUTOFF)
+    return matches[0] if matches else None
+
+
+def _root_name(xml: str) -> Optional[str]:
+    m = re.match(r"\s*<([A-Za-z_][\w\-]*)", xml)
+    return m.group(1) if m else None
+
+
+def _known_tags(tool: Optional[str]) -> set:
+    spec = TOOL_SPECS.get(tool)
+    tags = set(TOOL_NAMES) | {'args', 'file'}
+    for other in TOOL_SPECS.values():
+        tags.update(other.params)
+    if tool:
+        tags.add(tool)
+    if spec is None and tool:
+        matched = match_name(tool, TOOL_NAMES)
+        if matched:
+            tags.update(TOOL_SPECS[matched].params)
+    return tags
+
+
+def _escape_text(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _raw_body(xml: str, param: str) -> Optional[str]:
+    """The text of a parameter exactly as written (up to its last closing tag), or None."""
+    start = xml.find(f"<{param}>")
+    end = xml.rfind(f"</{param}>")
+    if start == -1 or end < start + len(param) + 2:
+        return None
+    return xml[start + len(param) + 2:end]
+
+
+def _escape_raw_params(xml: str, tool: str) -> str:
+    """Escape the whole text of free-text parameters (up to their last closing tag)."""
+    verbatim = VERBATIM_PARAMS.get(tool)
+    for param in RAW_PARAMS:
+        open_tag, close_tag = f"<{param}>", f"</{param}>"
+        start = xml.find(open_tag)
+        if start == -1:
+            continue
+        body_start = start + len(open_tag)
+        end = xml.rfind(close_tag)
+        if end < body_start:
+            # 截断的参数：到工具结束标签或文本末尾
+            end = xml.find(f"</{tool}>", body_start)
+            if end == -1:
+                end = len(xml)
+        body = xml[body_start:end]
+        if '<' in body or '&' in body or '>' in body:
+            if param != verbatim:
+                # 已转义的实体保持不变
+                body = body.replace('&lt;', '<').replace('&gt;', '>').replace('&amp;', '&')
+            # 原文读取的参数连同其中的实体一起转义，解析后与原文一致
+            body = _escape_text(body)
+            xml = xml[:body_start] + body + xml[end:]
+    return xml
+
+
+def _escape_stray_markup(xml: str, tool: str) -> str:
+    """Escape '&' outside entities and '<' that does not start a plausible tag."""
+    xml = ENTITY_PATTERN.sub('&amp;', xml)
+    known = _known_tags(tool)
+    # 成对出现的标签也视为标签（可能是拼错的参数名）
+    paired = {name for name in set(re.findall(r"<([A-Za-z_][\w\-]*)>", xml)) if f"</{name}>" in xml}
+
+    def _lt(m):
+        return m.group(0) if m.group(1) in known or m.group(1) in paired else '&lt;' + m.group(0)[1:]
+    return re.sub(r"<(?!/)([A-Za-z_][\w\-]*)?", lambda m: _lt(m) if m.group(1) else '&lt;', xml)
+
+
+def _autoclose(xml: str) -> Tuple[str, List[str]]:
+    """Drop a cut-off trailing tag and close the tags left open (also returned, innermost first)."""
+    xml = re.sub(r"<[^<>]*$", "", xml)
+    stack: List[str] = []
+    for m in TAG_PATTERN.finditer(xml):
+        closing, name, self_closing = m.group(1), m.group(2), m.group(3)
+        if self_closing:
+            continue
+        if not closing:
+            stack.append(name)
+        elif name in stack:
+            while stack and stack.pop() != name:
+                pass
+    closed = list(reversed(stack))
+    return xml + "".join(f"</{name}>" for name in closed), closed
+
+
+def _extract_params(xml: str, tool: str) -> Optional[str]:
+    """Rebuild a clean block from the known parameters found with patterns."""
+    spec = TOOL_SPECS.get(tool)
+    if spec is None:
+        return None
+    values = {}
+    for param in spec.params:
+        if param in ('args', 'file'):
+            continue
+        if not spec.read_only:
+            # 会修改文件或执行命令的工具：参数必须完整（有结束标签），截断的不能补全
+            if VERBATIM_PARAMS.get(tool) == param:
+                found = re.findall(rf"<{param}>(.*)</{param}>", xml, re.DOTALL)
+                complete = bool(found)
+            else:
+                found = re.findall(rf"<{param}>(.*?)</{param}>", xml, re.DOTALL)
+                complete = len(found) == xml.count(f"<{param}>")
+            if f"<{param}>" in xml and not complete:
+                return None
+        else:
+            found = re.findall(rf"<{param}>(.*?)(?:</{param}>|(?=<(?!/?{param}\b)[A-Za-z_/][\w\-]*>)|$)", xml, re.DOTALL)
+        if found:
+            values[param] = found if param == 'path' and 'file' in spec.params else found[:1]
+    if not values:
+        return None
+    parts = []
+    for param, found in values.items():
+        for value in found:
+            element = f"<{param}>{_escape_text(value.strip() if param != 'content' else value)}</{param}>"
+            parts.append(f"<file>{element}</file>" if 'file' in spec.params and param == 'path' else element)
+    body = "".join(parts)
+    if 'args' in spec.params:
+        body = f"<args>{body}</args>"
+    return f"<{tool}>{body}</{tool}>"
+
+
+def _parse(xml: str) -> Optional[ET.Element]:
+    try:
+        return ET.fromstring(xml)
+    except ET.ParseError:
+        return None
+
+
+def _serialise(root: ET.Element, raw: Optional[str] = None) -> str:
+    """
+    Serialise a tool element, keeping verbatim parameters unescaped for the tool's own parser.
+
+    Args:
+        root: The tool element
+        raw: The verbatim parameter as written in the original block; put back
+            unchanged so that entities in file content are not decoded
+    """
+    param = VERBATIM_PARAMS.get(root.tag)
+    elements = list(root.iter(param)) if param else []
+    texts = [element.text or "" for element in elements]
+    if raw is not None and len(elements) == 1:
+        texts = [raw]
+    for index, element in enumerate(elements):
+        element.text = f"\x00{index}\x00"
+    try:
+        xml = ET.tostring(root, encoding='unicode')
+    finally:
+        for element, text in zip(elements, texts):
+            element.text = text
+    for index, text in enumerate(texts):
+        xml = xml.replace(f"\x00{index}\x00", text)
+    return xml
+
+
+def _rename(root: ET.Element, fixes: List[str]):
+    """Rename a misspelled tool element and misspelled parameter elements."""
+    if root.tag not in TOOL_SPECS:
+        matched = match_name(root.tag, TOOL_NAMES)
+        if matched is None:
+            return
+        fixes.append(f"tool <{root.tag}> → <{matched}>")
+        root.tag = matched
+    params = set(TOOL_SPECS[root.tag].params)
+    # 只检查参数所在的层级（工具、args、file 的直接子元素），内容中的标签不改
+    parents = [root] + [el for el in root.iter() if el.tag in ('args', 'file')]
+    for parent in parents:
+        for child in parent:
+            if child.tag not in params:
+                matched = match_name(child.tag, params)
+                if matched:
+                    fixes.append(f"parameter <{child.tag}> → <{matched}>")
+                    child.tag = matched
+
+
+def repair_tool_xml(xml: str) -> RepairedTool:
+    """
+    Parse a tool block, repairing it if needed.
+
+    Args:
+        xml: The tool XML as produced by the model
+
+    Returns:
+        The parsed tool; ``xml`` is the repaired block and ``fixes`` lists
+        what was changed (empty if the block was fine)
+
+    Raises:
+        ET.ParseError: If the block cannot be repaired
+    """
+    fixes: List[str] = []
+    try:
+        root = ET.fromstring(xml)
+    except ET.ParseError as error:
+        tool = _root_name(xml)
+        target = tool if tool in TOOL_SPECS else match_name(tool or "", TOOL_NAMES)
+        if target is None:
+            telemetry.incr("tool.repair_failed")
+            raise
+        root = None
+        escaped = _escape_stray_markup(_escape_raw_params(xml, tool), tool)
+        closed, closed_tags = _autoclose(escaped)
+        if not is_read_only_tool(target) and (set(closed_tags) & set(TOOL_SPECS[target].params)
+                                              or not re.search(r"</[A-Za-z_][\w\-]*>\s*$", xml)):
+            # 被截断的参数（半条命令、半个替换内容）：只补全只读工具；
+            # 会修改的工具只补全在完整参数之后截断的块
+            closed = None
+        for kind, candidate in (("escaped", escaped), ("closed", closed),
+                                ("extracted", _extract_params(xml, target))):
+            if candidate is not None and candidate != xml:
+                root = _parse(candidate)
+                if root is not None:
+                    fixes.append(kind)
+                    break
+        if root is None:
+            telemetry.incr("tool.repair_failed")
+            raise error
+
+    _rename(root, fixes)
+    if not fixes:
+        return RepairedTool(root, xml)
+    telemetry.incr("tool.repaired")
+    for fix in fixes:
+        telemetry.incr("tool.repair." + fix.split(' ')[0])
+    param = VERBATIM_PARAMS.get(root.tag)
+    return RepairedTool(root, _serialise(root, _raw_body(xml, param) if param else None), fixes)
+
+
+def find_misnamed_tools(text: str) -> List[Tuple[str, RepairedTool]]:
+    """
+    Find blocks in plain reply text whose tag is a misspelled tool name.
+
+    Args:
+        text: Reply text outside recognised tool blocks
+
+    Returns:
+        (original block, repaired tool) pairs, in order
+    """
+    found = []
+    for m in BLOCK_PATTERN.finditer(text):
+        if m.group(1) in TOOL_SPECS or match_name(m.group(1), TOOL_NAMES) is None:
+            continue
+        try:
+            repaired = repair_tool_xml(m.group(0))
+        except ET.ParseError:
+            continue
+        if repaired.name in TOOL_SPECS:
+            found.append((m.group(0), repaired))
+    return found
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.llm.tool_repair
+"""
+if __name__ == "__main__":
+    samples = [
+        "<read_file><args><file><path>a.py</path></file></args>",
+        "<write_to_file><path>x.py</path><content>if a < b && c:\n    pass\n</content><line_count>2</line_count></write_to_file>",
+        "<search_files><args><path>.</path><regex>\\w+<T></regex></args></search_files>",
+        "<read_file><args><file><pth>a.py</pth></file></args></read_file>",
+        "<list_file><args><path>src</path></args></list_file>",
+        "<read_file><args><file><path>a.py</path><file><path>b.py</path></args>",
+    ]
+    for sample in samples:
+        try:
+            repaired = repair_tool_xml(sample)
+            print(f"{repaired.fixes}: {repaired.xml}")
+        except ET.ParseError as e:
+            print(f"unrepairable: {e}")
@@ -0,0 +1,153 @@
+"""
+Streaming File Writes
+=====================
+
+Moves the <content> of a write_to_file block out of the stream buffer and
+into a StagedWrite while the reply is still streaming. Without this, a
+large file sits in the buffer until </write_to_file> arrives and is then
+copied into the XML tree, the tool arguments and the diff inputs.
+
+The content is replaced in the buffer by a short marker, so the block
+still parses as usual. The proxy resolves the marker to its staged write
+(committed with an atomic rename on approval, deleted on rejection), and
+to the content itself (when it is small) for the conversation history.
+
+Streaming starts once ``<path>`` and ``<content>`` have arrived as direct
+children of ``<write_to_file>`` (as parse_write_file_xml reads them); any
+other block, e.g. one whose content comes before its path, is handled the
+usual way.
+"""
+
+import itertools
+import re
+from typing import Dict, Optional
+
+from ..tools.write_to_file.staged_write import StagedWrite
+
+CONTENT_OPEN = "<content>"
+CONTENT_CLOSE = "</content>"
+MARKER_PREFIX = "__staged_write_"
+MARKER_PATTERN = re.compile(MARKER_PREFIX + r"\d+__")
+TAG_PATTERN = re.compile(r"<(/?)([A-Za-z_][\w\-]*)[^<>]*?(/?)>")
+
+_ids = itertools.count(1)
+
+
+def _partial_suffix(text: str, tag: str) -> int:
+    """Length of the longest suffix of ``text`` that is a proper prefix of ``tag``."""
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
+def _top_level_fields(head: str) -> Optional[Dict[str, str]]:
+    """
+    Text of the direct children of a block, from its start up to <content>.
+
+    Returns:
+        {tag: text}, or None if <content> would not be a direct child
+    """
+    fields = {}
+    depth = 0
+    text_start = 0
+    for m in TAG_PATTERN.finditer(head):
+        closing, name, self_closing = m.groups()
+        if self_closing:
+            continue
+        if not closing:
+            depth += 1
+            if depth == 2:
+                text_start = m.end()
+        else:
+            if depth == 2:
+                fields.setdefault(name, head[text_start:m.start()])
+            depth -= 1
+    return fields if depth == 1 else None
+
+
+class WriteStreamer:
+    """
+    Stages the content of write_to_file blocks as they stream.
+    """
+
+    def __init__(self, basePath: str = None):
+        """
+        Create a streamer for one reply.
+
+        Args:
+            basePath: Base path to resolve the target paths (defaults to cwd)
+        """
+        self.basePath = basePath
+        self.active: Optional[StagedWrite] = None
+        self._content_start = 0
+        # 已接收完整内容、尚未被工具块取走的暂存写入
+        self.completed: Dict[str, StagedWrite] = {}
+
+    def _start(self, buffer: str) -> bool:
+        if not buffer.startswith("<write_to_file"):
+            return False
+        start = buffer.find(CONTENT_OPEN)
+        if start == -1 or buffer.startswith(MARKER_PREFIX, start + len(CONTENT_OPEN)):
+            return False
+        # 与 parse_write_file_xml 一致：只接受 <write_to_file> 的直接子元素
+        fields = _top_level_fields(buffer[:start])
+        if fields is None or not fields.get("path", "").strip():
+            return False
+        line_count = fields.get("line_count", "").strip()
+        self.active = StagedWrite(fields["path"].strip(), self.basePath,
+                                  int(line_count) if line_count.isdigit() else 0)
+        self._content_start = start + len(CONTENT_OPEN)
+        return True
+
+    def consume(self, buffer: str) -> str:
+        """
+        Move streamed write content from the buffer to the staged file.
+
+        Args:
+            buffer: The stream buffer (a pending tool block starts at its beginning)
+
+        Returns:
+            The buffer without the staged content
+        """
+        if self.active is None and not self._start(buffer):
+            return buffer
+        body = buffer[self._content_start:]
+        end = body.find(CONTENT_CLOSE)
+        if end == -1:
+            # 可能是被拆开的 </content>：留在缓冲区等待下一段
+            keep = _partial_suffix(body, CONTENT_CLOSE)
+            self.active.feed(body[:len(body) - keep])
+            return buffer[:self._content_start] + body[len(body) - keep:]
+        self.active.feed(body[:end])
+        self.active.finish()
+        marker = f"{MARKER_PREFIX}{next(_ids)}__"
+        self.completed[marker] = self.active
+        self.active = None
+        return buffer[:self._content_start] + marker + body[end:]
+
+    def take(self, content: Optional[str]) -> Optional[StagedWrite]:
+        """The staged write for a content marker (removed from the streamer), or None."""
+        if not content or not MARKER_PATTERN.fullmatch(content.strip()):
+            return None
+        return self.completed.pop(content.strip(), None)
+
+    def expand(self, text: str) -> str:
+        """Put the content of staged writes back into a text (a note for large files)."""
+        def _content(m):
+            staged = self.completed.get(m.group(0))
+            if staged is None:
+                return m.group(0)
+            if staged.content is not None:
+                return staged.content
+            return f"[{staged.lines} lines, {staged.chars} characters streamed to {staged.path}]"
+        return MARKER_PATTERN.sub(_content, text)
+
+    def close(self):
+        """Discard what was not handed to a tool (an unfinished block, an unused staged write)."""
+        if self.active is not None:
+            self.active.discard()
+            self.active = None
+        for staged in self.completed.values():
+            staged.discard()
+        self.completed.clear()
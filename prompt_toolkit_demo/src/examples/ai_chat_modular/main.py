@@ -1,15 +1,66 @@
+import argparse
+import os
+import sys
+
 from .too_task import TooTask
 
 
-def run():
+def run(argv=None):
     """Run the modular AI chat example."""
-    print("=== Modular AI Chat Example ===\n")
-    app = TooTask()
-    app.run()
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "batch":
+        # 批处理子命令：无界面地运行 JSONL 任务文件
+        from .batch import run as run_batch
+        run_batch(argv[1:])
+        return
+
+    parser = argparse.ArgumentParser(description="Modular AI Chat Example",
+                                     epilog="Run a JSONL file of tasks without a UI: main batch TASKS.jsonl")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="SESSION",
+                        help="resume a previous session (the latest one if no id is given)")
+    parser.add_argument("--fullscreen", action="store_true",
+                        help="use the full-screen interface with a live input pane")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", metavar="CASSETTE",
+                          help="record the model's responses to a cassette file")
+    cassette.add_argument("--replay", metavar="CASSETTE",
+                          help="answer from a recorded cassette instead of the API")
+    parser.add_argument("--scenario", metavar="NAME|FILE",
+                        help="answer from a scripted scenario (built-in: explore, edit) instead of the API")
+    parser.add_argument("--serve", action="store_true",
+                        help="run the headless multi-session HTTP/SSE service instead of the terminal chat")
+    parser.add_argument("--replay-speed", type=float, default=0, metavar="X",
+                        help="replay timing: 1 = as recorded, 0 = as fast as possible (default)")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        # 服务模式：每个会话有自己的工作区，不使用终端界面
+        from .service import run as run_service
+        run_service([])
+        return
+
+    app = TooTask(resume=args.resume, fullscreen=args.fullscreen)
+    if args.record or args.replay:
+        app.llm_provider.config.update({
+            'LLM_CASSETTE': os.path.abspath(args.record or args.replay),
+            'LLM_CASSETTE_MODE': 'record' if args.record else 'replay',
+            'LLM_REPLAY_SPEED': str(args.replay_speed),
+        })
+    if args.scenario:
+        app.llm_provider.config['SIM_SCENARIO'] = (os.path.abspath(args.scenario)
+                                                   if os.path.exists(args.scenario) else args.scenario)
+    if args.fullscreen:
+        app.view_interface.run_application(app.run)
+    else:
+        print("=== Modular AI Chat Example ===\n")
+        app.run()
 
 
 """
-Run command: python -m src.examples.ai_chat_modular.main
+Run command: python -m src.examples.ai_chat_modular.main [--resume [SESSION]] [--fullscreen]
+             [--record CASSETTE | --replay CASSETTE [--replay-speed X]]
+             [--scenario NAME|FILE] [--serve]
+             python -m src.examples.ai_chat_modular.main batch TASKS.jsonl [--workers N] [--timeout S]
 """
 if __name__ == "__main__":
     run()
@@ -0,0 +1,559 @@
+"""
+Headless Agent Service
+======================
+
+Hosts many agent sessions (see agent_session.py) in one asyncio process
+behind a small HTTP API, and streams each session's events (assistant
+deltas, tool progress, turn ends) to clients as Server-Sent Events. Every
+session has its own workspace root, history and pending-tool queue, so
+nothing depends on the process working directory.
+
+Endpoints (JSON bodies and responses)::
+
+    POST   /sessions                  {"workspace_root": "..."} -> 201 {"id": ...}
+    GET    /sessions                  list of sessions
+    GET    /sessions/<id>             session summary
+    DELETE /sessions/<id>             close the session
+    POST   /sessions/<id>/messages    {"content": "..."} -> 202, starts a turn
+    POST   /sessions/<id>/approve     run the pending tools -> 202, starts a turn
+    POST   /sessions/<id>/reject      drop the pending tools -> 202
+    GET    /sessions/<id>/events      text/event-stream; Last-Event-ID resumes
+    GET    /stats                     service counters and telemetry summary
+
+A session runs one turn at a time (409 otherwise). Turns block on the model
+stream and the tools, so they run on a thread pool; their events are handed
+to the event loop in batches and fanned out to the session's subscribers.
+Only the standard library is used.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from .agent_session import AgentSession
+from .tools.tool_worker_pool import ToolWorkerPool
+from .utils.telemetry import telemetry
+
+# 请求体大小上限
+MAX_BODY_BYTES = 1024 * 1024
+# 事件流空闲时发送心跳注释的间隔（秒），用于发现已断开的客户端
+HEARTBEAT_SECONDS = 15.0
+# 订阅者积压超过这么多事件时断开它（客户端可以用 Last-Event-ID 重连补齐）
+MAX_SUBSCRIBER_BACKLOG = 10000
+
+HTTP_REASONS = {200: "OK", 201: "Created", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+                405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+                500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    """An error answered with the given HTTP status and message."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class _Subscriber:
+    """One open event stream."""
+
+    def __init__(self):
+        self.queue: "asyncio.Queue[Optional[Tuple[int, str, Dict[str, Any]]]]" = asyncio.Queue()
+        self.dropped = False
+
+
+class ServiceSession:
+    """
+    The service-side state of one AgentSession: its event log and subscribers.
+
+    Events are emitted on worker threads; they are collected in an outbox and
+    delivered on the event loop with one wake-up per batch rather than per
+    streamed chunk.
+    """
+
+    def __init__(self, agent: AgentSession, loop: asyncio.AbstractEventLoop, backlog: int):
+        self.agent = agent
+        self.loop = loop
+        self.events: Deque[Tuple[int, str, Dict[str, Any]]] = deque(maxlen=backlog)
+        self.last_event_id = 0
+        self.subscribers: Set[_Subscriber] = set()
+        # 事件循环侧的“会话锁”：接受请求时同步置位，避免两个请求同时启动一轮
+        self.running: Optional[str] = None
+        self.closed = False
+        self._outbox: List[Tuple[str, Dict[str, Any]]] = []
+        self._outbox_lock = threading.Lock()
+        self._flush_scheduled = False
+
+    def emit_threadsafe(self, event: str, data: Dict[str, Any]):
+        """Queue an event from any thread."""
+        with self._outbox_lock:
+            self._outbox.append((event, data))
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self.loop.call_soon_threadsafe(self.flush)
+
+    def flush(self):
+        """Deliver the queued events to the event log and subscribers (event loop only)."""
+        with self._outbox_lock:
+            batch, self._outbox = self._outbox, []
+            self._flush_scheduled = False
+        for event, data in batch:
+            self.last_event_id += 1
+            entry = (self.last_event_id, event, data)
+            self.events.append(entry)
+            for subscriber in list(self.subscribers):
+                if subscriber.queue.qsize() >= MAX_SUBSCRIBER_BACKLOG:
+                    # 消费太慢的客户端：断开，重连时从事件日志补齐
+                    subscriber.dropped = True
+                    self.subscribers.discard(subscriber)
+                    subscriber.queue.put_nowait(None)
+                else:
+                    subscriber.queue.put_nowait(entry)
+
+    def subscribe(self, after: int = 0) -> _Subscriber:
+        """Open an event stream that first replays the logged events after ``after``."""
+        self.flush()
+        subscriber = _Subscriber()
+        for entry in self.events:
+            if entry[0] > after:
+                subscriber.queue.put_nowait(entry)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def close(self):
+        """End all event streams."""
+        self.flush()
+        self.closed = True
+        for subscriber in self.subscribers:
+            subscriber.queue.put_nowait(None)
+        self.subscribers.clear()
+
+
+class AgentService:
+    """
+    The asyncio HTTP/SSE front end hosting the sessions.
+    """
+
+    def __init__(self, config: Optional[Dict[str, str]] = None, host: Optional[str] = None,
+                 port: Optional[int] = None):
+        """
+        Initialize the service.
+
+        Args:
+            config: Configuration for every session, overriding the values loaded
+                from .env; the SERVICE_* keys configure the service itself
+            host: Interface to bind (SERVICE_HOST by default)
+            port: Port to bind, 0 picks a free port (SERVICE_PORT by default)
+        """
+        self.config = dict(config or {})
+        settings = _load_settings(self.config)
+        self.host = host if host is not None else settings.get('SERVICE_HOST', '127.0.0.1')
+        self.port = port if port is not None else int(settings.get('SERVICE_PORT', 8700))
+        workspaces = settings.get('SERVICE_WORKSPACES')
+        # 设置后只允许在该目录下创建会话，相对路径也相对于它解析
+        self.workspaces = os.path.abspath(workspaces) if workspaces else None
+        self.backlog = int(settings.get('SERVICE_EVENT_BACKLOG', 1000))
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(settings.get('SERVICE_MAX_WORKERS', 32)), thread_name_prefix="session-turn")
+        # 可选：所有会话共享一个工具工作进程池
+        self.tool_pool = ToolWorkerPool.from_config(settings)
+        self.sessions: Dict[str, ServiceSession] = {}
+        self.counters = {"requests": 0, "connections": 0, "sessions_created": 0, "turns": 0,
+                         "turn_errors": 0}
+        self.queued_turns = 0
+        self.running_turns = 0
+        self.started = time.time()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._connections: Set["asyncio.Task"] = set()
+        telemetry.enable_export(settings.get('TELEMETRY_EXPORT') or None)
+
+    @property
+    def base_url(self) -> str:
+        """URL of the service once it is listening."""
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> 'AgentService':
+        """Start listening; the actual port is stored in ``port``."""
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        telemetry.begin_turn()
+        return self
+
+    async def serve_forever(self):
+        """Start (if needed) and serve until cancelled."""
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        """Stop listening, end all event streams and close the sessions."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for entry in list(self.sessions.values()):
+            self._close_session(entry)
+        # 关闭仍打开的连接（空闲的 keep-alive 连接和事件流）
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.tool_pool is not None:
+            self.tool_pool.shutdown()
+
+    def start_in_thread(self) -> 'AgentService':
+        """Serve on a daemon thread with its own event loop and return self."""
+        started = threading.Event()
+
+        def _run():
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(self.start())
+            started.set()
+            try:
+                loop.run_forever()
+            finally:
+                loop.run_until_complete(self.close())
+                loop.close()
+
+        self._thread = threading.Thread(target=_run, name="agent-service", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        """Stop a service started with ``start_in_thread``."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+    def __enter__(self) -> 'AgentService':
+        return self.start_in_thread()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # ---- sessions ----
+
+    def create_session(self, workspace_root: str) -> ServiceSession:
+        """
+        Create a session for a workspace directory.
+
+        Raises:
+            HTTPError: 400 if the directory is not allowed or does not exist
+        """
+        if self.workspaces:
+            allowed = os.path.realpath(self.workspaces)
+            root = os.path.realpath(os.path.join(allowed, workspace_root))
+            if os.path.commonpath([root, allowed]) != allowed:
+                raise HTTPError(400, f"workspace_root must be inside {self.workspaces}")
+        elif os.path.isabs(workspace_root):
+            root = workspace_root
+        else:
+            raise HTTPError(400, "workspace_root must be an absolute path")
+        if not os.path.isdir(root):
+            raise HTTPError(400, f"Not a directory: {root}")
+
+        holder: List[ServiceSession] = []
+        agent = AgentSession(root, emit=lambda event, data: holder[0].emit_threadsafe(event, data),
+                             config=self.config, tool_pool=self.tool_pool)
+        entry = ServiceSession(agent, self.loop, self.backlog)
+        holder.append(entry)
+        self.sessions[agent.session_id] = entry
+        self.counters["sessions_created"] += 1
+        return entry
+
+    def _get_session(self, session_id: str) -> ServiceSession:
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            raise HTTPError(404, f"Unknown session {session_id}")
+        return entry
+
+    def _close_session(self, entry: ServiceSession):
+        self.sessions.pop(entry.agent.session_id, None)
+        entry.close()
+        entry.agent.close()
+
+    def start_turn(self, entry: ServiceSession, action: str, call: Callable[[], Any]):
+        """
+        Run a blocking session call on the thread pool.
+
+        Raises:
+            HTTPError: 409 if the session is already running a turn or the
+                action does not fit its pending-tool state
+        """
+        if entry.running:
+            raise HTTPError(409, f"Session is busy ({entry.running})")
+        has_pending = bool(entry.agent.pending_tools)
+        if action == "message" and has_pending:
+            raise HTTPError(409, "Tools are waiting for approval or rejection")
+        if action != "message" and not has_pending:
+            raise HTTPError(409, "No tools are waiting for approval")
+        entry.running = action
+        self.queued_turns += 1
+
+        def _run():
+            # 线程池排队时间计入 queued，开始执行后计入 running
+            self.loop.call_soon_threadsafe(self._turn_started)
+            return call()
+
+        future = self.loop.run_in_executor(self.executor, _run)
+        future.add_done_callback(lambda f: self._turn_finished(entry, f))
+
+    def _turn_started(self):
+        self.queued_turns -= 1
+        self.running_turns += 1
+
+    def _turn_finished(self, entry: ServiceSession, future: "asyncio.Future"):
+        entry.running = None
+        self.running_turns -= 1
+        self.counters["turns"] += 1
+        if future.cancelled() or future.exception() is not None:
+            self.counters["turn_errors"] += 1
+        entry.flush()
+        # 各会话的轮次交错进行，遥测按“两次轮次结束之间”的区间导出
+        telemetry.end_turn()
+        telemetry.begin_turn()
+
+    def stats(self) -> Dict[str, Any]:
+        """Service counters and the telemetry summary."""
+        return {
+            "uptime_s": round(time.time() - self.started, 3),
+            "sessions": len(self.sessions),
+            "queued_turns": self.queued_turns,
+            "running_turns": self.running_turns,
+            "subscribers": sum(len(entry.subscribers) for entry in self.sessions.values()),
+            "counters": dict(self.counters, events=sum(
+                entry.last_event_id for entry in self.sessions.values())),
+            "tool_pool": dict(self.tool_pool.stats) if self.tool_pool is not None else None,
+            "telemetry": telemetry.summary(),
+        }
+
+    # ---- HTTP ----
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.counters["connections"] += 1
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HTTPError as e:
+                    await _write_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                self.counters["requests"] += 1
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    if method == "GET" and path.endswith("/events"):
+                        # 事件流占用整个连接，结束后关闭
+                        await self._stream_events(path, headers, writer)
+                        break
+                    status, payload = self._route(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                await _write_json(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # 客户端断开，或服务关闭时取消了连接
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+
+    def _route(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        parts = [part for part in path.split("/") if part]
+        if parts == ["stats"]:
+            _require(method, "GET")
+            return 200, self.stats()
+        if not parts or parts[0] != "sessions":
+            raise HTTPError(404, f"Unknown path {path}")
+        if len(parts) == 1:
+            if method == "GET":
+                return 200, [entry.agent.describe() for entry in self.sessions.values()]
+            _require(method, "POST")
+            workspace_root = _parse_body(body).get("workspace_root")
+            if not isinstance(workspace_root, str) or not workspace_root:
+                raise HTTPError(400, "workspace_root is required")
+            return 201, self.create_session(workspace_root).agent.describe()
+
+        entry = self._get_session(parts[1])
+        if len(parts) == 2:
+            if method == "DELETE":
+                self._close_session(entry)
+                return 200, {"deleted": entry.agent.session_id}
+            _require(method, "GET")
+            return 200, entry.agent.describe()
+
+        action = parts[2] if len(parts) == 3 else None
+        _require(method, "POST")
+        if action == "messages":
+            content = _parse_body(body).get("content")
+            if not isinstance(content, str) or not content.strip():
+                raise HTTPError(400, "content is required")
+            self.start_turn(entry, "message", lambda: entry.agent.send_message(content))
+        elif action == "approve":
+            self.start_turn(entry, "approve", entry.agent.approve)
+        elif action == "reject":
+            self.start_turn(entry, "reject", entry.agent.reject)
+        else:
+            raise HTTPError(404, f"Unknown path {path}")
+        return 202, {"accepted": action, "last_event_id": entry.last_event_id}
+
+    async def _stream_events(self, path: str, headers: Dict[str, str], writer: asyncio.StreamWriter):
+        parts = [part for part in path.split("/") if part]
+        if len(parts) != 3 or parts[0] != "sessions":
+            raise HTTPError(404, f"Unknown path {path}")
+        entry = self._get_session(parts[1])
+        try:
+            after = int(headers.get("last-event-id") or 0)
+        except ValueError:
+            after = 0
+
+        subscriber = entry.subscribe(after)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                    await writer.drain()
+                    continue
+                if item is None:
+                    break
+                # 一次写出队列中已有的所有事件，减少 drain 次数
+                chunks = [_format_event(item)]
+                while not subscriber.queue.empty():
+                    item = subscriber.queue.get_nowait()
+                    if item is None:
+                        break
+                    chunks.append(_format_event(item))
+                writer.write(b"".join(chunks))
+                await writer.drain()
+                if item is None:
+                    break
+        finally:
+            entry.subscribers.discard(subscriber)
+
+
+def _load_settings(config: Dict[str, str]) -> Dict[str, str]:
+    """The .env configuration with ``config`` applied on top."""
+    from .llm.llm_provider import LLMProvider
+    settings = LLMProvider().config
+    settings.update(config)
+    return settings
+
+
+def _require(method: str, expected: str):
+    if method != expected:
+        raise HTTPError(405, f"Use {expected}")
+
+
+def _parse_body(body: bytes) -> Dict[str, Any]:
+    try:
+        payload = json.loads(body or b"{}")
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise HTTPError(400, "Invalid JSON body")
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "Expected a JSON object")
+    return payload
+
+
+def _format_event(item: Tuple[int, str, Dict[str, Any]]) -> bytes:
+    event_id, event, data = item
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """
+    Read one HTTP request; None when the client closed the connection.
+
+    Raises:
+        HTTPError: 400 for a malformed request, 413 for an oversized body
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Request body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), urlsplit(target).path, headers, body
+
+
+async def _write_json(writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        .encode("latin-1") + body)
+    await writer.drain()
+
+
+def run(argv=None):
+    """Run the service from the command line."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Headless multi-session agent service (HTTP + SSE)")
+    parser.add_argument("--host", help="interface to bind (SERVICE_HOST)")
+    parser.add_argument("--port", type=int, help="port to bind, 0 picks a free port (SERVICE_PORT)")
+    parser.add_argument("--workspaces", help="only allow session workspaces inside this directory")
+    args = parser.parse_args(argv)
+
+    config = {'SERVICE_WORKSPACES': args.workspaces} if args.workspaces else {}
+    service = AgentService(config, host=args.host, port=args.port)
+
+    async def _main():
+        await service.start()
+        # 第一行输出供脚本读取实际端口
+        print(f"Agent service listening on {service.base_url}", flush=True)
+        try:
+            await service.serve_forever()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.service [--port 8700] [--workspaces DIR]
+"""
+if __name__ == "__main__":
+    run()
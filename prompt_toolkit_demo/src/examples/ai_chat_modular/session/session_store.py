@@ -0,0 +1,416 @@
+"""
+Session Store for AI Chat Application
+=====================================
+
+Conversation turns are appended as JSON lines to a single log file by a
+background writer thread, so the chat loop never waits on disk I/O. Each
+session has a sidecar index of fixed-size ``(offset, length)`` entries, so
+record ``n`` of any session is found with one seek into the index and one
+read from the log. Prompt-input history lives in its own small file.
+
+Layout of the store directory (``.too`` by default)::
+
+    sessions.jsonl       append-only log, one JSON record per line
+    <session_id>.idx     little-endian <QI entries: byte offset, byte length
+    prompt_history       prompt_toolkit FileHistory of typed inputs
+"""
+
+import json
+import mmap
+import os
+import queue
+import random
+import struct
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+LOG_FILE_NAME = "sessions.jsonl"
+PROMPT_HISTORY_FILE_NAME = "prompt_history"
+INDEX_SUFFIX = ".idx"
+# 索引项：日志中的字节偏移 (uint64) 与记录长度 (uint32)
+INDEX_ENTRY = struct.Struct("<QI")
+
+
+def new_session_id() -> str:
+    """Create a sortable, practically unique session id."""
+    return time.strftime("%Y%m%d-%H%M%S") + f"-{random.getrandbits(16):04x}"
+
+
+class SessionStore:
+    """
+    Append-only, indexed store of conversation records.
+
+    Writes are queued and performed by a daemon thread in batches; reads go
+    straight to disk via the index. Reading the session being written
+    flushes the queue first, so callers always see their own writes.
+
+    The store directory is only created when the first record is written.
+    If a batch cannot be written (e.g. the disk is full) it is dropped, the
+    writer keeps running, and the next ``append`` raises the error.
+    """
+
+    def __init__(self, root: str = ".too", session_id: Optional[str] = None,
+                 flush_interval: float = 0.2):
+        """
+        Open (or create) a session store.
+
+        Args:
+            root: Store directory; relative paths are resolved once, against
+                the working directory at startup, so `$cd` does not move it
+            session_id: Session to append to (a new one by default)
+            flush_interval: Maximum seconds a queued record waits before it
+                is written
+        """
+        self.root = os.path.abspath(root)
+        self.log_path = os.path.join(self.root, LOG_FILE_NAME)
+        self.prompt_history_path = os.path.join(self.root, PROMPT_HISTORY_FILE_NAME)
+        self.session_id = session_id or new_session_id()
+        self.flush_interval = flush_interval
+
+        self._seq = self._indexed_count(self.session_id)
+        self._seq_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        # 写线程最近一次写入失败的异常，由下一次 append 抛出
+        self._write_error: Optional[OSError] = None
+        self._writer = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+        self._writer.start()
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, record_type: str, **fields: Any) -> int:
+        """
+        Queue a record for the current session.
+
+        Args:
+            record_type: Record kind, e.g. "start", "turn" or "reset"
+            **fields: JSON-serialisable record fields
+
+        Returns:
+            The record's sequence number within the session
+
+        Raises:
+            OSError: If an earlier batch of records could not be written
+        """
+        if self._closed:
+            raise ValueError("SessionStore is closed")
+        error, self._write_error = self._write_error, None
+        if error is not None:
+            raise OSError(f"Session log write failed, records were lost: {error}") from error
+        with self._seq_lock:
+            seq = self._seq
+            self._seq += 1
+        record = {"session": self.session_id, "seq": seq, "type": record_type,
+                  "ts": time.time(), **fields}
+        # 在调用线程里序列化：不可序列化的记录在这里报错，不会拖垮写线程
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        self._queue.put((self.session_id, data))
+        return seq
+
+    @property
+    def next_seq(self) -> int:
+        """Sequence number the next record of the current session will get."""
+        return self._seq
+
+    def append_turn(self, messages: List[Dict[str, Any]], **fields: Any) -> int:
+        """
+        Queue the messages added to the conversation during one turn.
+
+        Args:
+            messages: New conversation history entries, in order
+            **fields: Extra record fields
+
+        Returns:
+            The record's sequence number within the session
+        """
+        return self.append("turn", messages=messages, **fields)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every queued record has been written.
+
+        Returns:
+            True if the queue was drained within ``timeout`` (False if the
+            writer thread has died)
+        """
+        if self._closed and not self._writer.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # 分段等待：写线程意外退出时不会一直阻塞
+        while not done.wait(0.5 if deadline is None else max(0.0, min(0.5, deadline - time.monotonic()))):
+            if not self._writer.is_alive() or (deadline is not None and time.monotonic() >= deadline):
+                return False
+        return True
+
+    def close(self):
+        """Write all queued records and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        # 每批记录用一次 O_APPEND 写入：即使多个 SessionStore（或多个进程）
+        # 共用同一个日志文件，写入后 fd 的位置也能准确给出本批的起始偏移
+        fd = None
+        index_files: Dict[str, Any] = {}
+        try:
+            stop = False
+            while not stop:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+
+                # 批量取出已排队的记录
+                batch = [item]
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                waiters = []
+                records = []
+                for item in batch:
+                    if item is None:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        records.append(item)
+
+                if records:
+                    try:
+                        if fd is None:
+                            # 第一次写入时才创建目录和日志文件
+                            os.makedirs(self.root, exist_ok=True)
+                            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                        self._write_batch(fd, records, index_files)
+                    except OSError as e:
+                        # 丢弃这一批，写线程继续运行，等待者照常被唤醒
+                        self._write_error = e
+
+                for waiter in waiters:
+                    waiter.set()
+        finally:
+            if fd is not None:
+                os.close(fd)
+            for index in index_files.values():
+                index.close()
+
+    def _write_batch(self, fd: int, records: List[Tuple[str, bytes]], index_files: Dict[str, Any]):
+        data = b"".join(record for _, record in records)
+        written = 0
+        while written < len(data):
+            written += os.write(fd, data[written:])
+        offset = os.lseek(fd, 0, os.SEEK_CUR) - len(data)
+
+        # 先写日志再写索引：索引项永远不会指向未写入的数据
+        entries: Dict[str, List[bytes]] = {}
+        for session_id, record in records:
+            entries.setdefault(session_id, []).append(
+                INDEX_ENTRY.pack(offset, len(record)))
+            offset += len(record)
+        for session_id, packed in entries.items():
+            index = index_files.get(session_id)
+            if index is None:
+                index = open(self.index_path(session_id), "ab")
+                index_files[session_id] = index
+            index.write(b"".join(packed))
+            index.flush()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def index_path(self, session_id: str) -> str:
+        """Path of a session's index file."""
+        return os.path.join(self.root, session_id + INDEX_SUFFIX)
+
+    def _sync_for_read(self, session_id: str):
+        if session_id == self.session_id and not self._closed:
+            self.flush()
+
+    def _indexed_count(self, session_id: str) -> int:
+        try:
+            return os.path.getsize(self.index_path(session_id)) // INDEX_ENTRY.size
+        except OSError:
+            return 0
+
+    def record_count(self, session_id: Optional[str] = None) -> int:
+        """
+        Number of records written for a session.
+
+        Args:
+            session_id: Session to inspect (the current session by default)
+        """
+        session_id = session_id or self.session_id
+        self._sync_for_read(session_id)
+        return self._indexed_count(session_id)
+
+    def read_record(self, seq: int, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Read one record by sequence number in O(1).
+
+        Args:
+            seq: Record sequence number; negative values count from the end
+            session_id: Session to read (the current session by default)
+
+        Returns:
+            The decoded record
+
+        Raises:
+            IndexError: If the session has no such record
+        """
+        session_id = session_id or self.session_id
+        count = self.record_count(session_id)
+        if seq < 0:
+            seq += count
+        if not 0 <= seq < count:
+            raise IndexError(f"Session {session_id} has no record {seq}")
+
+        with open(self.index_path(session_id), "rb") as index:
+            index.seek(seq * INDEX_ENTRY.size)
+            offset, length = INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))
+        with open(self.log_path, "rb") as log:
+            log.seek(offset)
+            return json.loads(log.read(length))
+
+    def iter_records(self, session_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over all records of a session in order.
+
+        Args:
+            session_id: Session to read (the current session by default)
+        """
+        session_id = session_id or self.session_id
+        self._sync_for_read(session_id)
+        try:
+            with open(self.index_path(session_id), "rb") as index:
+                entries = index.read()
+        except OSError:
+            return
+        with open(self.log_path, "rb") as log:
+            for offset, length in INDEX_ENTRY.iter_unpack(entries):
+                log.seek(offset)
+                yield json.loads(log.read(length))
+
+    def load_session(self, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Read all records of a session at once.
+
+        The log is memory-mapped and only the byte ranges listed in the
+        session's index are touched; the slices are decoded with a single
+        ``json.loads`` call, which is much faster than one call per record.
+
+        Args:
+            session_id: Session to read (the current session by default)
+
+        Returns:
+            The session's records in order
+        """
+        session_id = session_id or self.session_id
+        self._sync_for_read(session_id)
+        try:
+            with open(self.index_path(session_id), "rb") as index:
+                entries = index.read()
+        except OSError:
+            return []
+        if not entries:
+            return []
+
+        with open(self.log_path, "rb") as log, \
+                mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # 每条记录以换行结尾，去掉换行后拼成一个 JSON 数组
+            slices = [mm[offset:offset + length - 1]
+                      for offset, length in INDEX_ENTRY.iter_unpack(entries)]
+        return json.loads(b"[" + b",".join(slices) + b"]")
+
+    def switch_session(self, session_id: str):
+        """
+        Continue appending to another (e.g. resumed) session.
+
+        Args:
+            session_id: Session that new records are appended to
+        """
+        self.flush()
+        with self._seq_lock:
+            self.session_id = session_id
+            self._seq = self._indexed_count(session_id)
+
+    def latest_session(self, exclude_current: bool = True) -> Optional[str]:
+        """
+        Get the most recently written session id.
+
+        Args:
+            exclude_current: Skip the session currently being written
+
+        Returns:
+            The session id, or None when there is none
+        """
+        self._sync_for_read(self.session_id)
+        sessions = [sid for sid in self.list_sessions()
+                    if not (exclude_current and sid == self.session_id)]
+        # 按索引文件的修改时间排序：被恢复并继续的旧会话也算“最近”
+        return max(sessions, key=lambda sid: os.path.getmtime(self.index_path(sid)), default=None)
+
+    def list_sessions(self) -> List[str]:
+        """
+        List the ids of all sessions in the store, oldest first.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name[:-len(INDEX_SUFFIX)] for name in os.listdir(self.root)
+                      if name.endswith(INDEX_SUFFIX))
+
+
+def replay_session(records: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Rebuild the conversation state from a session's records.
+
+    Args:
+        records: Records as returned by SessionStore.load_session
+
+    Returns:
+        (conversation history, XML of the tools still waiting for approval)
+    """
+    history: List[Dict[str, Any]] = []
+    pending: List[str] = []
+    # 只有最后一次 reset 之后的记录才属于当前对话
+    start = 0
+    for i in range(len(records) - 1, -1, -1):
+        if records[i].get("type") == "reset":
+            start = i + 1
+            break
+    for record in records[start:]:
+        if record.get("type") == "turn":
+            history.extend(record.get("messages", []))
+            pending = record.get("pending", [])
+    return history, pending
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.session.session_store
+"""
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, ".too"))
+        store.append("start", cwd=tmp)
+        for i in range(3):
+            store.append_turn([{"role": "user", "content": f"question {i}"},
+                               {"role": "assistant", "content": f"answer {i}"}])
+        store.flush()
+        print(f"Session: {store.session_id}, records: {store.record_count()}")
+        print(f"Record 2: {store.read_record(2)}")
+        print(f"Last record: {store.read_record(-1)['messages'][0]['content']}")
+        print(f"Sessions: {store.list_sessions()}")
+        store.close()
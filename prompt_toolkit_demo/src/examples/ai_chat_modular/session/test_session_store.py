@@ -0,0 +1,135 @@
+import os
+import tempfile
+import time
+
+from .session_store import INDEX_ENTRY, SessionStore, replay_session
+
+
+def _turn(i: int):
+    return [{"role": "user", "content": f"q{i} ✓"}, {"role": "assistant", "content": f"a{i}"}]
+
+
+def test_records_are_indexed_and_seekable():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, ".too"))
+        for i in range(5):
+            assert store.append_turn(_turn(i)) == i
+
+        assert store.record_count() == 5
+        assert store.read_record(3)["messages"] == _turn(3)
+        assert store.read_record(-1)["seq"] == 4
+        assert [r["seq"] for r in store.iter_records()] == [0, 1, 2, 3, 4]
+        assert os.path.getsize(store.index_path(store.session_id)) == 5 * INDEX_ENTRY.size
+        store.close()
+
+
+def test_sessions_share_one_log_and_resume_numbering():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, ".too")
+        first = SessionStore(root, session_id="s1")
+        second = SessionStore(root, session_id="s2")
+        first.append_turn(_turn(0))
+        second.append("reset")
+        first.append_turn(_turn(1))
+        first.close()
+        second.close()
+
+        reopened = SessionStore(root, session_id="s1")
+        assert reopened.append_turn(_turn(2)) == 2
+        assert [r["messages"][0]["content"] for r in reopened.iter_records()] == ["q0 ✓", "q1 ✓", "q2 ✓"]
+        assert reopened.read_record(0, session_id="s2")["type"] == "reset"
+        assert reopened.list_sessions() == ["s1", "s2"]
+        reopened.close()
+
+
+def test_unserialisable_record_fails_in_caller():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, ".too"))
+        try:
+            store.append("turn", messages=[object()])
+            assert False, "expected TypeError"
+        except TypeError:
+            pass
+        store.append_turn(_turn(0))
+        assert store.flush(timeout=5)
+        store.close()
+
+
+def test_load_session_and_replay_after_reset():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, ".too"), session_id="s1")
+        store.append("start", cwd=tmp)
+        store.append_turn(_turn(0))
+        store.append("reset")
+        store.append_turn(_turn(1), pending=["<read_file><path>a</path></read_file>"])
+        store.append_turn(_turn(2), pending=["<list_files><path>.</path></list_files>"])
+
+        records = store.load_session()
+        assert [r["seq"] for r in records] == [0, 1, 2, 3, 4]
+        assert records == list(store.iter_records())
+
+        history, pending = replay_session(records)
+        assert history == _turn(1) + _turn(2)
+        assert pending == ["<list_files><path>.</path></list_files>"]
+        assert store.load_session("missing") == []
+        store.close()
+
+
+def test_switch_session_continues_numbering():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, ".too"), session_id="old")
+        store.append_turn(_turn(0))
+        store.switch_session("new")
+        store.append_turn(_turn(1))
+        store.switch_session("old")
+        time.sleep(0.05)  # 文件修改时间精度有限
+        assert store.append_turn(_turn(2)) == 1
+        assert store.latest_session(exclude_current=False) == "old"
+        assert store.latest_session() == "new"
+        store.close()
+
+
+def test_directory_is_created_on_first_write():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, ".too")
+        store = SessionStore(root, session_id="s1")
+        assert store.list_sessions() == [] and store.record_count() == 0
+        assert store.flush(timeout=5)
+        assert not os.path.exists(root)
+        store.append_turn(_turn(0))
+        assert store.flush(timeout=5)
+        assert store.list_sessions() == ["s1"]
+        store.close()
+
+
+def test_write_errors_release_waiters_and_are_reported():
+    with tempfile.TemporaryDirectory() as tmp:
+        blocker = os.path.join(tmp, "not-a-dir")
+        open(blocker, "w").close()
+        # 目录无法创建：写线程记录错误但继续运行
+        store = SessionStore(os.path.join(blocker, ".too"))
+        store.append_turn(_turn(0))
+        assert store.flush(timeout=5)
+        try:
+            store.append_turn(_turn(1))
+            assert False, "expected OSError"
+        except OSError:
+            pass
+        assert store._writer.is_alive()
+        store.append_turn(_turn(2))
+        assert store.flush(timeout=5)
+        store.close()
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.session.test_session_store
+"""
+if __name__ == "__main__":
+    test_records_are_indexed_and_seekable()
+    test_sessions_share_one_log_and_resume_numbering()
+    test_unserialisable_record_fails_in_caller()
+    test_load_session_and_replay_after_reset()
+    test_switch_session_continues_numbering()
+    test_directory_is_created_on_first_write()
+    test_write_errors_release_waiters_and_are_reported()
+    print("All tests passed! ✓")
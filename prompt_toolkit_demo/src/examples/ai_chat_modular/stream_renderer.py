@@ -0,0 +1,156 @@
+"""
+Stream Renderer for AI Chat Application
+=======================================
+
+Streaming responses arrive as many tiny deltas. Writing each delta to the
+terminal costs a syscall (and, for styled text, an HTML parse). The
+StreamRenderer collects deltas as FormattedText fragments and writes them
+as one frame: at most ``max_fps`` times per second, immediately when a
+newline arrives, or once the stream has been idle for ``idle_flush``
+seconds. It also measures the CPU time spent rendering each turn.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from prompt_toolkit import print_formatted_text
+from prompt_toolkit.formatted_text import FormattedText
+
+Fragment = Tuple[str, str]
+
+
+class StreamRenderer:
+    """
+    Coalesces streamed text into frames.
+
+    ``feed`` is called from the streaming thread; an idle-flush thread is
+    started on first use so text without a trailing newline still shows up
+    when the stream stalls. All writes happen under one lock.
+    """
+
+    def __init__(self, write: Optional[Callable[[List[Fragment]], None]] = None,
+                 max_fps: float = 30.0, idle_flush: float = 0.05, style=None, output=None):
+        """
+        Initialize the renderer.
+
+        Args:
+            write: Callback receiving the fragments of one frame (defaults to
+                print_formatted_text on ``output``)
+            max_fps: Maximum frames per second while text keeps arriving
+            idle_flush: Seconds without new text after which pending text is
+                written (0 disables the idle-flush thread)
+            style: prompt_toolkit Style for the default writer
+            output: prompt_toolkit Output for the default writer
+        """
+        self.write = write or self._print_fragments
+        self.frame_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.idle_flush = idle_flush
+        self.style = style
+        self.output = output
+
+        self._pending: List[Fragment] = []
+        self._lock = threading.Lock()
+        self._has_pending = threading.Condition(self._lock)
+        self._last_frame = 0.0
+        self._last_feed = 0.0
+        self._idle_thread: Optional[threading.Thread] = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.stats: Dict[str, float] = {"chunks": 0, "chars": 0, "frames": 0, "cpu_ms": 0.0}
+
+    def _print_fragments(self, fragments: List[Fragment]):
+        print_formatted_text(FormattedText(fragments), end='', flush=True,
+                             style=self.style, output=self.output)
+
+    def feed(self, text: str, style: str = ''):
+        """
+        Queue streamed text for the next frame.
+
+        Args:
+            text: The text delta
+            style: prompt_toolkit style string for the text, e.g. 'fg:ansigreen'
+        """
+        if not text:
+            return
+        started_cpu = time.thread_time()
+        now = time.perf_counter()
+        with self._lock:
+            # 相邻同样式的片段合并，减少 FormattedText 片段数量
+            if self._pending and self._pending[-1][0] == style:
+                self._pending[-1] = (style, self._pending[-1][1] + text)
+            else:
+                self._pending.append((style, text))
+            self.stats["chunks"] += 1
+            self.stats["chars"] += len(text)
+            self._last_feed = now
+
+            if '\n' in text or now - self._last_frame >= self.frame_interval:
+                self._flush_locked(now)
+            elif self.idle_flush > 0:
+                self._ensure_idle_thread()
+                self._has_pending.notify()
+            self.stats["cpu_ms"] += (time.thread_time() - started_cpu) * 1000
+
+    def flush(self):
+        """Write any pending text now."""
+        started_cpu = time.thread_time()
+        with self._lock:
+            self._flush_locked(time.perf_counter())
+            self.stats["cpu_ms"] += (time.thread_time() - started_cpu) * 1000
+
+    def finish(self) -> Dict[str, float]:
+        """
+        Flush the turn's remaining text and return its render statistics.
+
+        Returns:
+            Dict with chunks, chars, frames and cpu_ms of the finished turn
+        """
+        self.flush()
+        with self._lock:
+            stats = dict(self.stats)
+            self._reset_stats()
+        return stats
+
+    def _flush_locked(self, now: float):
+        if not self._pending:
+            return
+        fragments, self._pending = self._pending, []
+        self._last_frame = now
+        self.stats["frames"] += 1
+        self.write(fragments)
+
+    def _ensure_idle_thread(self):
+        if self._idle_thread is None:
+            self._idle_thread = threading.Thread(
+                target=self._idle_loop, name="stream-renderer", daemon=True)
+            self._idle_thread.start()
+
+    def _idle_loop(self):
+        with self._lock:
+            while True:
+                while not self._pending:
+                    self._has_pending.wait()
+                # 等到流空闲 idle_flush 秒后再输出剩余内容
+                remaining = self._last_feed + self.idle_flush - time.perf_counter()
+                if remaining > 0:
+                    self._has_pending.wait(remaining)
+                    continue
+                started_cpu = time.thread_time()
+                self._flush_locked(time.perf_counter())
+                self.stats["cpu_ms"] += (time.thread_time() - started_cpu) * 1000
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.stream_renderer
+"""
+if __name__ == "__main__":
+    renderer = StreamRenderer(max_fps=10)
+    text = "Streaming <b>raw</b> & unescaped text, one small delta at a time. " * 3 + "\n"
+    for i in range(0, len(text), 3):
+        renderer.feed(text[i:i + 3])
+        time.sleep(0.005)
+    for word in "Task completed: a < b && c > d\n".split(" "):
+        renderer.feed(word + " ", 'fg:ansigreen')
+    print(renderer.finish())
@@ -0,0 +1,129 @@
+import json
+
+from .batch import BatchOptions, BatchRunner, allowed_tools, load_progress, read_tasks
+from .llm.stub_server import StubConfig, StubServer
+
+WRITE_REPLY = """I'll add the notes file.
+<write_to_file>
+<path>NOTES.md</path>
+<content>
+notes
+</content>
+<line_count>1</line_count>
+</write_to_file>
+"""
+DONE_REPLY = "<attempt_completion>\n<result>\nNotes added.\n</result>\n</attempt_completion>\n"
+
+
+def _setup(tmp_path, tasks):
+    workspace = tmp_path / "project"
+    workspace.mkdir()
+    (workspace / "README.md").write_text("# Project\n", encoding="utf-8")
+    task_file = tmp_path / "tasks.jsonl"
+    task_file.write_text("".join(json.dumps(task) + "\n" for task in tasks) + "not json\n", encoding="utf-8")
+    return workspace, task_file
+
+
+def _options(server, workspace, **kwargs):
+    config = {"API_BASE_URL": server.base_url, "API_KEY": "stub", "API_MODEL": "stub"}
+    return BatchOptions(workers=2, workspace=str(workspace), config=config, **kwargs)
+
+
+def _results(path):
+    return {r["id"]: r for r in map(json.loads, open(path, encoding="utf-8"))}
+
+
+def test_runs_tasks_and_resumes(tmp_path):
+    workspace, task_file = _setup(tmp_path, [{"id": f"t{i}", "task": "Summarise"} for i in range(3)])
+    output = str(tmp_path / "results.jsonl")
+    with StubServer() as server:
+        summary = BatchRunner(output, _options(server, workspace), log=False).run(list(read_tasks(task_file)))
+        assert summary["statuses"] == {"completed": 3, "error": 1}
+        results = _results(output)
+        assert results["t0"]["result"] == "The workspace was inspected and the README summarised."
+        assert results["t0"]["turns"] == 3 and results["t0"]["changed_files"] == []
+        assert results["line-4"]["status"] == "error"
+        assert load_progress(output + ".progress")["t2"] == "completed"
+
+        # 再次运行时跳过已完成的任务
+        summary = BatchRunner(output, _options(server, workspace), log=False).run(list(read_tasks(task_file)))
+        assert (summary["skipped"], summary["statuses"]) == (4, {})
+
+
+def test_approval_policy_and_workspace_copies(tmp_path):
+    workspace, task_file = _setup(tmp_path, [{"id": "notes", "task": "Add notes"}])
+    tasks = list(read_tasks(task_file))[:1]
+    assert allowed_tools("read_file, list_files") == {"read_file", "list_files"}
+    with StubServer(StubConfig(replies=[WRITE_REPLY, DONE_REPLY])) as server:
+        output = str(tmp_path / "read-only.jsonl")
+        BatchRunner(output, _options(server, workspace, approve="read-only"), log=False).run(tasks)
+        result = _results(output)["notes"]
+        assert (result["status"], result["blocked_tools"]) == ("needs_approval", ["write_to_file"])
+
+        output = str(tmp_path / "edits.jsonl")
+        copies = tmp_path / "copies"
+        options = _options(server, workspace, approve="edits", workspaces_dir=str(copies), keep_workspaces=True)
+        BatchRunner(output, options, log=False).run(tasks)
+        result = _results(output)["notes"]
+        assert (result["status"], result["changed_files"]) == ("completed", ["NOTES.md"])
+        assert (copies / "notes" / "NOTES.md").exists()
+        # 原工作区不受影响
+        assert not (workspace / "NOTES.md").exists()
+
+
+def test_timeouts_kill_the_task(tmp_path):
+    workspace, task_file = _setup(tmp_path, [{"id": "slow", "task": "Wait", "timeout": 0.5}])
+    output = str(tmp_path / "results.jsonl")
+    with StubServer(StubConfig(latency=5)) as server:
+        summary = BatchRunner(output, _options(server, workspace), log=False).run(list(read_tasks(task_file))[:1])
+    assert summary["statuses"] == {"timeout": 1} and summary["wall_s"] < 4
+    assert load_progress(output + ".progress") == {"slow": "timeout"}
+
+
+def test_ids_get_their_own_workspaces(tmp_path):
+    tasks = [{"id": task_id, "task": "Summarise"} for task_id in ("a/b", "a_b", "a b", "a_b")]
+    workspace, task_file = _setup(tmp_path, tasks)
+    tasks = list(read_tasks(task_file))
+    assert tasks[3] == {"id": "line-4", "error": "Duplicate task id 'a_b' (first used on line 2)"}
+    output = str(tmp_path / "results.jsonl")
+    copies = tmp_path / "copies"
+    with StubServer() as server:
+        options = _options(server, workspace, workspaces_dir=str(copies), keep_workspaces=True)
+        summary = BatchRunner(output, options, log=False).run(tasks)
+    assert summary["statuses"] == {"completed": 3, "error": 2}
+    results = _results(output)
+    assert len({results[task_id]["workspace"] for task_id in ("a/b", "a_b", "a b")}) == 3
+    assert results["a_b"]["workspace"] == str(copies / "a_b")
+
+
+def _alive(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # 已退出但未被回收的僵尸进程不算
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_timeouts_kill_the_commands_of_the_task(tmp_path):
+    pid_file = tmp_path / "child.pid"
+    reply = f"<execute_command>\n<command>sh -c 'echo $$ > {pid_file}; exec sleep 30'</command>\n</execute_command>\n"
+    workspace, task_file = _setup(tmp_path, [{"id": "cmd", "task": "Run it", "timeout": 2}])
+    output = str(tmp_path / "results.jsonl")
+    with StubServer(StubConfig(replies=[reply])) as server:
+        summary = BatchRunner(output, _options(server, workspace, approve="all"), log=False).run(
+            list(read_tasks(task_file))[:1])
+    assert summary["statuses"] == {"timeout": 1}
+    assert not _alive(int(pid_file.read_text()))
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    for test in (test_runs_tasks_and_resumes, test_approval_policy_and_workspace_copies,
+                 test_timeouts_kill_the_task, test_ids_get_their_own_workspaces,
+                 test_timeouts_kill_the_commands_of_the_task):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("All tests passed! ✓")
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from prompt_toolkit.application import create_app_session
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
+
+from .fullscreen_view import FullScreenView, TranscriptBuffer, TranscriptControl, wrap_fragments
+
+
+def _row_text(row):
+    return "".join(text for _, text in row)
+
+
+def test_transcript_splits_lines_and_keeps_styles():
+    transcript = TranscriptBuffer()
+    transcript.append("AI: ", 'class:ai')
+    transcript.append("one\ntwo")
+    transcript.extend([('class:completion', " <done> & more\n")])
+
+    assert transcript.line_count() == 3
+    assert transcript.get_line(0) == [('class:ai', "AI: "), ('', "one")]
+    assert transcript.get_line(1) == [('', "two"), ('class:completion', " <done> & more")]
+    assert transcript.get_line(2) == []
+
+
+def test_wrap_counts_wide_characters():
+    rows = wrap_fragments([('', "ab"), ('x', "中文字")], 4)
+    assert [_row_text(r) for r in rows] == ["ab中", "文字"]
+    assert rows[0] == [('', "ab"), ('x', "中")]
+    assert wrap_fragments([], 10) == [[]]
+
+
+def test_control_renders_only_visible_window():
+    transcript = TranscriptBuffer()
+    for i in range(100000):
+        transcript.append(f"line {i}\n")
+    control = TranscriptControl(transcript)
+
+    # 统计 get_line 调用次数：只应读取屏幕能容纳的行
+    calls = []
+    original = transcript.get_line
+    transcript.get_line = lambda index: calls.append(index) or original(index)
+
+    content = control.create_content(width=80, height=10)
+    assert content.line_count == 10
+    assert _row_text(content.get_line(8)) == "line 99999"
+    assert len(calls) == 10
+
+    control.scroll(50000)
+    content = control.create_content(width=80, height=10)
+    assert _row_text(content.get_line(9)) == "line 50000"
+    assert len(calls) == 20
+
+    control.scroll(-10 ** 9)
+    assert control.scroll_offset == 0
+
+
+def test_input_queue_drives_worker_loop():
+    inputs = []
+    with create_pipe_input() as pipe, create_app_session(input=pipe, output=DummyOutput()):
+        view = FullScreenView()
+
+        def _loop():
+            while True:
+                try:
+                    inputs.append(view.get_user_input("$approve" if inputs else ""))
+                except EOFError:
+                    return
+                view.display_ai_header()
+                view.display_ai_message_chunk("a < b")
+                view.display_newline()
+                view.finish_ai_message()
+
+        def _type():
+            for keys in ["hello\r", "\r", "\x04"]:
+                time.sleep(0.2)
+                pipe.send_text(keys)
+
+        threading.Thread(target=_type, daemon=True).start()
+        view.run_application(_loop)
+
+    assert inputs == ["hello", "$approve"]
+    texts = [_row_text(view.transcript.get_line(i)) for i in range(view.transcript.line_count())]
+    assert "You: hello" in texts and "AI: a < b" in texts
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.test_fullscreen_view
+"""
+if __name__ == "__main__":
+    test_transcript_splits_lines_and_keeps_styles()
+    test_wrap_counts_wide_characters()
+    test_control_renders_only_visible_window()
+    test_input_queue_drives_worker_loop()
+    print("All tests passed! ✓")
@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from .agent_session import AgentSession, SessionBusyError
+from .environment.environment_proxy import EnvironmentProxy
+from .llm.stub_server import StubConfig, StubServer
+from .service import AgentService
+
+
+def _stub_config(server: StubServer):
+    return {"API_BASE_URL": server.base_url, "API_KEY": "stub", "API_MODEL": "stub"}
+
+
+def _workspace(tmp_path, name: str) -> str:
+    root = tmp_path / name
+    root.mkdir()
+    (root / "README.md").write_text(f"# Project {name}\n", encoding="utf-8")
+    return str(root)
+
+
+def _request(method: str, url: str, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def _read_events(response, until: str):
+    """Read SSE events until one of type ``until``; return [(id, event, data)]."""
+    events = []
+    fields = {}
+    for raw in response:
+        line = raw.decode("utf-8").rstrip("\n")
+        if line.startswith(":"):
+            continue
+        if line:
+            name, value = line.split(": ", 1)
+            fields[name] = value
+            continue
+        events.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+        fields = {}
+        if events[-1][1] == until:
+            return events
+    return events
+
+
+def test_environment_uses_workspace_root(tmp_path):
+    root = _workspace(tmp_path, "a")
+    listing = EnvironmentProxy(root).get_current_working_directory()
+    assert root in listing and "README.md" in listing
+    assert EnvironmentProxy().get_current_dir() == os.getcwd()
+
+
+def test_concurrent_sessions_use_their_own_workspaces(tmp_path):
+    cwd = os.getcwd()
+    with StubServer() as server:
+        results = {}
+
+        def _run(name: str):
+            events = []
+            session = AgentSession(_workspace(tmp_path, name), config=_stub_config(server),
+                                   emit=lambda event, data: events.append((event, data)))
+            session.send_message("Summarise the README")
+            assert session.approve()["pending_tools"][0]["name"] == "read_file"
+            assert session.approve()["completed"]
+            results[name] = events
+
+        threads = [threading.Thread(target=_run, args=(name,)) for name in ("a", "b")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    for name in ("a", "b"):
+        reads = [data["result"] for event, data in results[name]
+                 if event == "tool_done" and data["name"] == "read_file"]
+        assert len(reads) == 1 and f"# Project {name}" in reads[0]
+    assert os.getcwd() == cwd
+
+
+def test_no_tool_retries_are_bounded(tmp_path):
+    with StubServer(StubConfig(replies=["Just talking, no tools."])) as server:
+        config = dict(_stub_config(server), SERVICE_NO_TOOL_RETRIES="2")
+        session = AgentSession(_workspace(tmp_path, "a"), config=config)
+        turn_end = session.send_message("hello")
+        assert turn_end["pending_tools"] == [] and not turn_end["completed"]
+        assert (session.stats["turns"], session.stats["retries"]) == (3, 2)
+        with pytest.raises(SessionBusyError):
+            session.approve()
+
+
+def test_http_sessions_stream_events(tmp_path):
+    with StubServer(StubConfig(chunk_chars=4)) as stub, AgentService(_stub_config(stub), port=0) as service:
+        url = service.base_url
+        assert _request("POST", url + "/sessions", {"workspace_root": "relative"})[0] == 400
+        status, session = _request("POST", url + "/sessions", {"workspace_root": _workspace(tmp_path, "a")})
+        assert status == 201
+        base = f"{url}/sessions/{session['id']}"
+
+        with urllib.request.urlopen(base + "/events", timeout=10) as stream:
+            assert _request("POST", base + "/messages", {"content": "Summarise the README"})[0] == 202
+            events = _read_events(stream, "turn_end")
+        kinds = [event for _, event, _ in events]
+        assert kinds[0] == "turn_start" and "delta" in kinds
+        assert events[-1][2]["pending_tools"][0]["name"] == "list_files"
+        assert "".join(data["text"] for _, event, data in events if event == "delta").startswith("Let me look")
+
+        # 有待批准工具时不能发送新消息
+        assert _request("POST", base + "/messages", {"content": "again"})[0] == 409
+        assert _request("POST", base + "/approve")[0] == 202
+
+        # 用 Last-Event-ID 重连，只收到之后的事件
+        request = urllib.request.Request(base + "/events", headers={"Last-Event-ID": str(events[-1][0])})
+        with urllib.request.urlopen(request, timeout=10) as stream:
+            resumed = _read_events(stream, "turn_end")
+        assert resumed[0][0] == events[-1][0] + 1
+        assert [data["name"] for _, event, data in resumed if event == "tool_done"] == ["list_files"]
+
+        assert _request("GET", base)[1]["stats"]["tool_runs"] == 1
+        stats = _request("GET", url + "/stats")[1]
+        assert (stats["sessions"], stats["counters"]["turns"]) == (1, 2)
+        assert _request("DELETE", base)[0] == 200
+        assert _request("GET", base)[0] == 404
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    for test in (test_environment_uses_workspace_root, test_concurrent_sessions_use_their_own_workspaces,
+                 test_no_tool_retries_are_bounded, test_http_sessions_stream_events):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("All tests passed! ✓")
@@ -0,0 +1,51 @@
+import time
+
+from .stream_renderer import StreamRenderer
+
+
+def _collecting_renderer(**kwargs):
+    frames = []
+    renderer = StreamRenderer(write=frames.append, **kwargs)
+    return renderer, frames
+
+
+def test_deltas_are_coalesced_until_newline():
+    renderer, frames = _collecting_renderer(max_fps=0.001, idle_flush=0)
+    for chunk in ["Hel", "lo ", "<b>&", " world\n", "next"]:
+        renderer.feed(chunk)
+
+    # 第一个增量立即输出，之后的增量合并到换行为止
+    assert frames == [[('', "Hel")], [('', "lo <b>& world\n")]]
+    stats = renderer.finish()
+    assert frames[-1] == [('', "next")]
+    assert (stats["chunks"], stats["chars"], stats["frames"]) == (5, 21, 3)
+    assert renderer.finish()["chunks"] == 0
+
+
+def test_styles_become_separate_fragments():
+    renderer, frames = _collecting_renderer(max_fps=0.001, idle_flush=0)
+    renderer.feed("plain ")
+    renderer.feed("done", 'fg:ansigreen')
+    renderer.feed(" a < b", 'fg:ansigreen')
+    renderer.finish()
+    assert frames == [[('', "plain ")], [('fg:ansigreen', "done a < b")]]
+
+
+def test_idle_text_is_flushed_in_background():
+    renderer, frames = _collecting_renderer(max_fps=0.001, idle_flush=0.02)
+    renderer.feed("first ")
+    renderer.feed("partial line")
+    deadline = time.time() + 2
+    while len(frames) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert frames == [[('', "first ")], [('', "partial line")]]
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.test_stream_renderer
+"""
+if __name__ == "__main__":
+    test_deltas_are_coalesced_until_newline()
+    test_styles_become_separate_fragments()
+    test_idle_text_is_flushed_in_background()
+    print("All tests passed! ✓")
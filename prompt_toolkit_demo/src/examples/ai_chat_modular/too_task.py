@@ -1,3 +1,5 @@
+import os
+import time
 from typing import List, Dict, Optional, Any
 
 from .environment.system_message import get_message_message
@@ -6,6 +8,42 @@ from .views import ViewInterface
 from .llm.llm_provider import LLMProvider
 from .llm.llm_proxy import LLMProxy
 from .tools.tool_task import ToolTask
+from .tools.tool_scheduler import ToolScheduler
+from .session.session_store import SessionStore, replay_session
+from .utils.profiler import turn_profiler
+from .utils.telemetry import telemetry
+
+# 回复中没有使用工具时发送给模型的提醒
+NO_TOOLS_USED_TIPS = """
+[ERROR] You did not use a tool in your previous response! Please retry with a tool use.
+
+# Reminder: Instructions for Tool Use
+
+Tool uses are formatted using XML-style tags. The tool name itself becomes the XML tag name. Each parameter is enclosed within its own set of tags. Here's the structure:
+
+<actual_tool_name>
+<parameter1_name>value1</parameter1_name>
+<parameter2_name>value2</parameter2_name>
+...
+</actual_tool_name>
+
+For example, to use the attempt_completion tool:
+
+<attempt_completion>
+<result>
+I have completed the task...
+</result>
+</attempt_completion>
+
+Always use the actual tool name as the XML tag name for proper parsing and execution.
+
+# Next Steps
+
+If you have completed the user's task, use the attempt_completion tool. 
+If you require additional information from the user, use the ask_followup_question tool. 
+Otherwise, if you have not completed the task and do not need additional information, then proceed with the next step of the task. 
+(This is an automated message, so do not respond to it conversationally.)
+"""
 
 
 class TooTask:
@@ -14,19 +52,55 @@ class TooTask:
     Integrates ViewInterface, LLMProvider, and ToolTask components.
     """
 
-    def __init__(self):
-        """Initialize the modular AI chat application."""
-        self.view_interface = ViewInterface()
+    def __init__(self, resume: Optional[str] = None, fullscreen: bool = False):
+        """
+        Initialize the modular AI chat application.
+
+        Args:
+            resume: Session id to resume on start, or "latest"
+            fullscreen: Use the full-screen Application view; run it with
+                ``view_interface.run_application(task.run)``
+        """
         self.llm_provider = LLMProvider()
+        max_fps = float(self.llm_provider.config.get('RENDER_MAX_FPS', 30))
+        if fullscreen:
+            # 全屏界面只在需要时导入
+            from .fullscreen_view import FullScreenView
+            self.view_interface = FullScreenView(max_fps=max_fps)
+        else:
+            self.view_interface = ViewInterface(max_fps=max_fps)
         self.tool_task = ToolTask(self.view_interface, self.llm_provider)
         self.llm_proxy = LLMProxy(self.view_interface, self.llm_provider)
         self.conversation_history: List[Dict[str, str]] = []
+        # 会话日志目录在启动时解析为绝对路径，$cd 不会影响它
+        self.session_store = SessionStore(
+            self.llm_provider.config.get('SESSION_DIR', '.too'))
+        self.view_interface.history_file = self.session_store.prompt_history_path
+        # 已写入会话日志的对话历史条数
+        self._logged_messages = 0
+        self._resume_on_start = resume
+        # 可选：每轮的性能指标追加写入 JSONL 文件
+        telemetry.enable_export(self.llm_provider.config.get('TELEMETRY_EXPORT') or None)
+        # 可选：每轮写出 cProfile/tracemalloc 剖析报告，也可用 $profile 切换
+        turn_profiler.configure(
+            self.llm_provider.config.get('PROFILE_TURNS', 'false').lower() in ['true', '1', 'yes', 'on'],
+            self.llm_provider.config.get('PROFILE_DIR') or os.path.join(self.session_store.root, 'profiles'))
+        self.llm_proxy.set_speculative(
+            self.llm_provider.config.get('SPECULATIVE_TOOLS', 'false').lower() in ['true', '1', 'yes', 'on'])
+        # 可选：工具在预热的工作进程中运行，耗时的搜索不会卡住界面（只在启用时导入）
+        if int(self.llm_provider.config.get('TOOL_PROCESS_WORKERS') or 0) > 0:
+            from .tools.tool_worker_pool import ToolWorkerPool
+            self.llm_proxy.tool_pool = ToolWorkerPool.from_config(self.llm_provider.config)
 
     def run(self):
         """Run the modular AI chat application."""
         # Display initial instructions
         self.view_interface.show_instructions()
 
+        if self._resume_on_start:
+            self.resume_session(
+                None if self._resume_on_start == 'latest' else self._resume_on_start)
+
         # Main conversation loop
         try:
             while True:
@@ -42,6 +116,7 @@ class TooTask:
                         # 则需要提示
                         self.view_interface.display_system_message(
                             "No tools were used in the previous response. AI will retry to think.\n", 'error')
+                        self._begin_turn()
                         task_data = self.remind_no_tools_used()
                     else:
                         finish_task_executions = []
@@ -61,9 +136,43 @@ class TooTask:
                                 # 如果是批准工具的命令，执行工具
                                 if 'approved_tools' in command_result:
                                     # 如果是 approved_tools, 则在前面的 process_command 方法中添加 approved_tools 到result了
+                                    # 工具执行计入本轮的耗时与剖析
+                                    self._begin_turn()
                                     self._execute_approved_tools(
                                         command_result['approved_tools'])
                                     finish_task_executions = command_result['approved_tools']
+                                elif 'rejected_tools' in command_result:
+                                    # 丢弃被拒绝工具的投机执行结果，并告知 AI 工具被拒绝，
+                                    # 避免下一轮因“没有使用工具”而自动重试
+                                    rejected_tools = command_result['rejected_tools']
+                                    self.llm_proxy.discard_pending_tools(
+                                        rejected_tools)
+                                    self.conversation_history.append({
+                                        "role": "user",
+                                        "content": "[The user rejected the pending tool(s): " + ", ".join(
+                                            tool.get('__name', 'unknown') for tool in rejected_tools) + "]",
+                                        "timestamp": get_current_timestamp()
+                                    })
+                                    self._save_conversation_exchange()
+                                    continue
+                                elif 'speculate' in command_result:
+                                    self.llm_proxy.set_speculative(
+                                        command_result['speculate'])
+                                    continue
+                                elif 'resume' in command_result:
+                                    self.resume_session(command_result['resume'])
+                                    continue
+                                elif 'stats' in command_result:
+                                    for line in telemetry.format_summary():
+                                        self.view_interface.display_system_message(line, 'context')
+                                    continue
+                                elif 'profile' in command_result:
+                                    turn_profiler.configure(command_result['profile'])
+                                    self.view_interface.display_system_message(
+                                        f"Turn profiling {'on' if command_result['profile'] else 'off'}"
+                                        + (f", reports in {turn_profiler.output_dir}" if command_result['profile'] else ""),
+                                        'info')
+                                    continue
                                 else:
                                     continue
 
@@ -75,6 +184,8 @@ class TooTask:
                         # Check for reset command
                         if user_message == '$reset':
                             self.conversation_history = []
+                            self._logged_messages = 0
+                            self.session_store.append("reset")
                             self.view_interface.display_system_message(
                                 "Conversation history cleared.", 'info')
                             continue
@@ -82,6 +193,8 @@ class TooTask:
                         if not user_message:
                             continue
 
+                        if not finish_task_executions:
+                            self._begin_turn()
                         if len(self.conversation_history) == 0:
                             self.conversation_history.append({
                                 "role": "system",
@@ -109,12 +222,20 @@ class TooTask:
                         execution_result['conversation_history']
                     )
 
+                    # 输出剩余的流式内容，并按需显示本轮渲染开销
+                    render_stats = self.view_interface.finish_ai_message()
+                    telemetry.record("render.cpu_ms", render_stats['cpu_ms'])
+                    if self.llm_provider.config.get('SHOW_RENDER_STATS', 'false').lower() in ['true', '1', 'yes', 'on']:
+                        self.view_interface.display_system_message(
+                            f"Rendered {render_stats['chunks']} chunks in {render_stats['frames']} frames, "
+                            f"{render_stats['cpu_ms']:.1f} ms CPU", 'context')
+
                     # 更新对话历史
                     self.conversation_history = processing_result['conversation_history']
 
                     # 保存对话交换
-                    self._save_conversation_exchange(
-                        task_data, processing_result)
+                    self._save_conversation_exchange()
+                    self._end_turn()
 
                     self.view_interface.display_newline()
 
@@ -126,85 +247,110 @@ class TooTask:
                     break
 
         finally:
+            turn_profiler.discard_turn()
+            if self.llm_proxy.tool_pool is not None:
+                self.llm_proxy.tool_pool.shutdown()
+            self.session_store.close()
             self.view_interface.wait_for_enter()
 
-    def remind_no_tools_used(self) -> Dict[str, Any]:
-        tips = """
-[ERROR] You did not use a tool in your previous response! Please retry with a tool use.
-
-# Reminder: Instructions for Tool Use
-
-Tool uses are formatted using XML-style tags. The tool name itself becomes the XML tag name. Each parameter is enclosed within its own set of tags. Here's the structure:
-
-<actual_tool_name>
-<parameter1_name>value1</parameter1_name>
-<parameter2_name>value2</parameter2_name>
-...
-</actual_tool_name>
-
-For example, to use the attempt_completion tool:
+    def _begin_turn(self):
+        """Start timing (and, if enabled, profiling) a turn."""
+        telemetry.begin_turn()
+        turn_profiler.begin_turn()
+
+    def _end_turn(self):
+        """Finish the turn's telemetry and write its profile report if profiling."""
+        turn = telemetry.end_turn()
+        report = turn_profiler.end_turn(turn['metrics'], self.session_store.session_id)
+        if report:
+            dominant = report['dominant_stage']
+            self.view_interface.display_system_message(
+                f"Profile written to {report['summary_path']}"
+                + (f" (dominant stage: {dominant[0]}, {dominant[1]:.0f} ms)" if dominant else ""),
+                'context')
 
-<attempt_completion>
-<result>
-I have completed the task...
-</result>
-</attempt_completion>
-
-Always use the actual tool name as the XML tag name for proper parsing and execution.
-
-# Next Steps
-
-If you have completed the user's task, use the attempt_completion tool. 
-If you require additional information from the user, use the ask_followup_question tool. 
-Otherwise, if you have not completed the task and do not need additional information, then proceed with the next step of the task. 
-(This is an automated message, so do not respond to it conversationally.)
-"""
-        return self.llm_proxy.process_tips_input(tips, self.conversation_history)
+    def remind_no_tools_used(self) -> Dict[str, Any]:
+        # 只有本地修复也无法解析的回复才会走到这里：统计重试率
+        telemetry.incr("llm.no_tool_retries")
+        return self.llm_proxy.process_tips_input(NO_TOOLS_USED_TIPS, self.conversation_history)
 
     def _execute_approved_tools(self, approved_tools: List[Dict[str, Any]]):
         """
         执行用户批准的工具
+
+        只读工具在线程池中并发执行，修改同一路径的工具按原始顺序串行执行。
         """
-        for tool in approved_tools:
-            if "__callback" in tool:
-                try:
-                    result = tool["__callback"]()
-                    """
-                    这里的tool结构如下:
-                    'desc' ='读取文件 README.md 的内容 [模拟执行完成]'
-                    '__name' = 'read_file'
-                    '__callback' = <function LLMProxy._execute_read_file_tool.<locals>.__run_read_file at 0x000002BBE6C18670>
-                    '__execution_result' = '[read
-                    """
-                    tool["__execution_result"] = result
-                    self.view_interface.display_system_message(
-                        f"✅ [{tool['__name']}] Tool execution result: {result[:32]}", 'info')
-                except Exception as e:
-                    self.view_interface.display_system_message(
-                        f"Error executing tool: {str(e)}", 'error')
-
-    def _save_conversation_exchange(self, task_data: Dict, processing_result: Dict):
+        total = len(approved_tools)
+
+        def _on_progress(event: str, index: int, tool: Dict[str, Any], payload: Any, elapsed: float):
+            """显示工具的开始、完成与失败（由调度器的工作线程调用）"""
+            prefix = f"[{index + 1}/{total}] [{tool['__name']}]"
+            if event == 'start':
+                self.view_interface.display_system_message(
+                    f"⏳ {prefix} Running: {tool.get('desc', '')}", 'context')
+            elif event == 'done':
+                self.view_interface.display_system_message(
+                    f"✅ {prefix} Tool execution result ({elapsed:.2f}s): {str(payload)[:32]}", 'info')
+            elif event == 'error':
+                self.view_interface.display_system_message(
+                    f"Error executing tool {prefix}: {str(payload)}", 'error')
+
+        scheduler = ToolScheduler(
+            max_workers=int(self.llm_provider.config.get('TOOL_MAX_WORKERS', 4)),
+            on_progress=_on_progress)
+        scheduler.run(approved_tools)
+
+    def resume_session(self, session_id: Optional[str] = None) -> bool:
         """
-        Save the conversation exchange to a file.
+        Replace the current conversation with a session from the log.
+
+        New turns are appended to the resumed session afterwards.
 
         Args:
-            task_data: Data about the user's task
-            processing_result: Results of processing the AI response
+            session_id: Session to resume (the latest other session by default)
+
+        Returns:
+            True if a session was resumed
+        """
+        started = time.perf_counter()
+        session_id = session_id or self.session_store.latest_session()
+        if not session_id or session_id not in self.session_store.list_sessions():
+            self.view_interface.display_system_message(
+                f"No session to resume: {session_id or 'the session log is empty'}", 'error')
+            return False
+
+        history, pending = replay_session(self.session_store.load_session(session_id))
+
+        # 丢弃当前的待批准工具，再恢复会话中的待批准工具
+        self.llm_proxy.discard_pending_tools(self.view_interface.pending_tools)
+        self.view_interface.pending_tools.clear()
+        self.conversation_history = history
+        self.session_store.switch_session(session_id)
+        self._logged_messages = len(history)
+        restored = self.llm_proxy.restore_pending_tools(pending)
+
+        self.view_interface.display_system_message(
+            f"Resumed session {session_id}: {len(history)} messages, "
+            f"{len(restored)} pending tool(s) ({(time.perf_counter() - started) * 1000:.0f} ms)", 'info')
+        return True
+
+    def _save_conversation_exchange(self):
+        """
+        Append the messages added since the last save to the session log.
+
+        The write itself happens on the session store's writer thread.
         """
+        new_messages = self.conversation_history[self._logged_messages:]
+        if not new_messages:
+            return
         try:
-            with open('.ai_chat_history', 'a', encoding='utf-8') as f:
-                # Last user message
-                user_entry = task_data['conversation_history'][-1]
-                ai_entry = {
-                    "role": "assistant",
-                    "content": processing_result['response'],
-                    "timestamp": get_current_timestamp()
-                }
-
-                f.write(
-                    f"[User] [{user_entry['timestamp']}]: {user_entry['content']}\n")
-                f.write(
-                    f"[AI] [{ai_entry['timestamp']}]: {ai_entry['content']}\n")
-                f.write("\n")  # Empty line between exchanges
+            if self.session_store.next_seq == 0:
+                self.session_store.append(
+                    "start", cwd=os.getcwd(), model=self.llm_provider.config.get('API_MODEL'))
+            # 同时记录待批准工具的原始 XML，恢复会话时重新解析
+            self.session_store.append_turn(new_messages, pending=[
+                tool['__xml'] for tool in self.view_interface.pending_tools if tool.get('__xml')])
+            self._logged_messages = len(self.conversation_history)
         except Exception as e:
-            print(f"Failed to save conversation exchange: {e}")
+            self.view_interface.display_system_message(
+                f"Failed to save conversation exchange: {e}", 'error')
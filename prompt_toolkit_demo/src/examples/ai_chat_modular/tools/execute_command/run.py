@@ -2,20 +2,25 @@ from typing import Dict, Any
 
 import xml.etree.ElementTree as ET
 from .execute_command import ExecuteCommandArgs, execute_command
+from ..tool_result import ToolResult, text_line
 
 
-def run(xml_string: str, basePath: str = None) -> str:
+# 命令输出过长时按字段截断（保留开头和结尾）
+MAX_OUTPUT_CHARS = 50000
+
+
+def run(xml_string: str, basePath: str = None) -> ToolResult:
     parsed_args = parse_execute_command_xml(xml_string)
     return execute(parsed_args, basePath)
 
 
-def execute(args: ExecuteCommandArgs, basePath: str):
+def execute(args: ExecuteCommandArgs, basePath: str) -> ToolResult:
 
     result = execute_command(args, basePath)
 
     # 如果有错误，返回错误信息
     if "error" in result:
-        return f"Error: {result['error']}"
+        return ToolResult.error("execute_command", result['error'])
 
     # 获取执行结果
     command = result.get("command", "")
@@ -25,22 +30,26 @@ def execute(args: ExecuteCommandArgs, basePath: str):
     returncode = result.get("returncode", 0)
     status = result.get("status", "unknown")
 
-    # 构建返回的字符串格式
-    output_lines = [f"[execute_command for '{command}'] Result:"]
-    output_lines.append(
-        f"Command executed in terminal  within working directory '{cwd}'.")
-    output_lines.append(f"Exit code: {returncode}")
-    output_lines.append(f"Status: {status}")
+    # 构建结构化结果
+    nodes = [
+        text_line("cwd", f"Command executed in terminal  within working directory '{cwd}'."),
+        text_line("exit_code", f"Exit code: {returncode}"),
+        text_line("status", f"Status: {status}"),
+    ]
 
     if stdout:
-        output_lines.append("Output:")
-        output_lines.append(stdout.strip())  # Remove trailing newlines
+        nodes.append(text_line("output_label", "Output:"))
+        nodes.append(text_line("stdout", stdout.strip(), max_chars=MAX_OUTPUT_CHARS))  # Remove trailing newlines
 
     if stderr:
-        output_lines.append("Error:")
-        output_lines.append(stderr.strip())  # Remove trailing newlines
-
-    return "\n".join(output_lines)
+        nodes.append(text_line("error_label", "Error:"))
+        nodes.append(text_line("stderr", stderr.strip(), max_chars=MAX_OUTPUT_CHARS))  # Remove trailing newlines
+
+    return ToolResult(
+        tool="execute_command",
+        title=f"[execute_command for '{command}'] Result:",
+        nodes=nodes,
+        status="success" if status == "success" else "error")
 
 
 def parse_execute_command_xml(xml_string: str) -> ExecuteCommandArgs:
@@ -0,0 +1,116 @@
+"""
+File Content Cache for AI Chat Application
+==========================================
+
+Keeps the decoded text of recently read files, and their lines, so that
+repeated read_file and search_files calls over the same tree do not read
+and split every file again. An entry is valid while the file's size and
+modification time are unchanged; the cache is bounded by the total size
+of the cached text and evicts the least recently used files.
+
+Every process has its own cache. In tool worker processes (see
+tool_worker_pool.py) it survives from one tool call to the next.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# 缓存的文本总大小上限，以及单个文件的大小上限（字节）
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_FILE_BYTES = 4 * 1024 * 1024
+
+
+class _Entry:
+    __slots__ = ("mtime_ns", "size", "text", "lines")
+
+    def __init__(self, mtime_ns: int, size: int, text: str):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.text = text
+        self.lines: Optional[List[str]] = None
+
+
+class FileCache:
+    """
+    LRU cache of file text and lines, validated by (mtime, size).
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_file_bytes: int = DEFAULT_MAX_FILE_BYTES):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Total size of the cached files
+            max_file_bytes: Files larger than this are read but not cached
+        """
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, path: str) -> _Entry:
+        # 与工具原来的读取方式相同：utf-8 解码并转换换行符
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = _Entry(st.st_mtime_ns, st.st_size, f.read())
+        if st.st_size <= self.max_file_bytes:
+            with self._lock:
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self._bytes -= previous.size
+                self._entries[key] = entry
+                self._bytes += entry.size
+                while self._bytes > self.max_bytes and self._entries:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= evicted.size
+        return entry
+
+    def read_text(self, path: str) -> str:
+        """
+        Read a text file through the cache.
+
+        Raises:
+            OSError: If the file cannot be read
+            UnicodeDecodeError: If the file is not valid UTF-8
+        """
+        return self._load(path).text
+
+    def read_lines(self, path: str) -> List[str]:
+        """
+        Read a text file split on '\\n' through the cache (do not modify the list).
+
+        Raises:
+            OSError: If the file cannot be read
+            UnicodeDecodeError: If the file is not valid UTF-8
+        """
+        entry = self._load(path)
+        if entry.lines is None:
+            entry.lines = entry.text.split('\n')
+        return entry.lines
+
+    def stats(self) -> Tuple[int, int, int, int]:
+        """(hits, misses, cached files, cached bytes)."""
+        with self._lock:
+            return self.hits, self.misses, len(self._entries), self._bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# 进程内共享的默认实例
+file_cache = FileCache()
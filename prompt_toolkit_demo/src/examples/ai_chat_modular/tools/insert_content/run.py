@@ -2,19 +2,20 @@ from typing import Dict, Any
 import xml.etree.ElementTree as ET
 from xml.etree.ElementTree import XMLParser
 from .insert_content import InsertContentArgs, insert_content
+from ..tool_result import ToolResult, element
 
 
-def run(xml_string: str, basePath: str = None) -> str:
+def run(xml_string: str, basePath: str = None) -> ToolResult:
     exec_args = parse_insert_content_xml(xml_string)
     return execute(exec_args, basePath)
 
 
-def execute(exec_args: InsertContentArgs, basePath: str = None) -> str:
+def execute(exec_args: InsertContentArgs, basePath: str = None) -> ToolResult:
     result = insert_content(exec_args, basePath)
 
     # 如果有错误，返回错误信息
     if "error" in result:
-        return f"Error: {result['error']}"
+        return ToolResult.error("insert_content", result['error'])
 
     # 获取结果列表
     results = result.get("results", [])
@@ -23,27 +24,22 @@ def execute(exec_args: InsertContentArgs, basePath: str = None) -> str:
     operation = result.get("operation", "")
     user_edits = result.get("user_edits", "")
 
-    # 构建返回的字符串格式
-    output_lines = [f"[insert_content for '{path}'] Result:"]
-    output_lines.append("<file_write_result>")
-    output_lines.append(f"<path>{path}</path>")
-    output_lines.append(f"<operation>{operation}</operation>")
-
-    output_lines.append(f"<user_edits>{user_edits}")
-    output_lines.append("</file_write_result>")
-
-    # 添加notice部分
-    output_lines.append("<notice>")
-    output_lines.append(
-        "<i>You do not need to re-read the file, as you have seen all changes</i>")
-    output_lines.append(
-        "<i>Proceed with the task using these changes as the new baseline.</i>")
-    output_lines.append(
-        "<i>If the user's edits have addressed part of the task or changed the requirements, adjust your approach accordingly.</i>")
-    output_lines.append("</notice>")
-    output_lines.append("</file_write_result>")
-
-    return "\n".join(output_lines)
+    return ToolResult(
+        tool="insert_content",
+        title=f"[insert_content for '{path}'] Result:",
+        nodes=[
+            element("file_write_result", children=[
+                element("path", path),
+                element("operation", operation),
+                element("user_edits", user_edits, block=True),
+            ]),
+            # 添加notice部分
+            element("notice", children=[
+                element("i", "You do not need to re-read the file, as you have seen all changes"),
+                element("i", "Proceed with the task using these changes as the new baseline."),
+                element("i", "If the user's edits have addressed part of the task or changed the requirements, adjust your approach accordingly."),
+            ]),
+        ])
 
 
 def parse_insert_content_xml(xml_string: str) -> InsertContentArgs:
@@ -4,10 +4,16 @@ Description: Request to list files and directories within the specified director
 Parameters:
 - path: (required) The path of the directory to list contents for (relative to the current workspace directory C:\Users\phx10\code\cg-manager)
 - recursive: (optional) Whether to list files recursively. Use true for recursive listing, false or omit for top-level only.
+- max_depth: (optional) With recursive, the number of directory levels to list (1 = top level only).
+- max_entries: (optional) Maximum number of entries to return (default: 500). When there are more, the result ends with a next_cursor.
+- cursor: (optional) The next_cursor of a previous result, to list the entries that follow it.
+- format: (optional) "tree" for an indented tree (default for recursive listings, much shorter) or "list" for one path per line.
 Usage:
 <list_files>
 <path>Directory path here</path>
 <recursive>true or false (optional)</recursive>
+<max_depth>Number of levels (optional)</max_depth>
+<cursor>next_cursor of the previous result (optional)</cursor>
 </list_files>
 
 Example: Requesting to list all files in the current directory
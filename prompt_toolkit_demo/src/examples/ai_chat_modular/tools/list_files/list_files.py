@@ -1,20 +1,51 @@
 import os
 
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any, NamedTuple, Optional
 import json
 from dataclasses import dataclass
+from collections import Counter
+from itertools import islice
 
 
 # 定义黑名单
 BLACKLIST = {'.git', '__pycache__', '.DS_Store',
              'node_modules', '.vscode', '.idea'}
 
+# 单次调用最多返回的条目数，更多条目通过 cursor 分页获取
+DEFAULT_MAX_ENTRIES = 500
+FORMATS = ('list', 'tree')
+
+
+class FileEntry(NamedTuple):
+    """One listed entry: path relative to the listed directory ("/"-separated)."""
+    path: str
+    is_dir: bool
+    depth: int
+
 
 @dataclass
 class ListFilesArgs:
     """Arguments for the list files tool."""
     path: str
     recursive: bool = False
+    max_depth: Optional[int] = None
+    max_entries: int = DEFAULT_MAX_ENTRIES
+    cursor: Optional[str] = None
+    format: Optional[str] = None
+
+    @property
+    def depth_limit(self) -> Optional[int]:
+        """Deepest level listed (1 = the directory's own entries, None = unlimited)."""
+        if not self.recursive:
+            return 1
+        return self.max_depth if self.max_depth and self.max_depth > 0 else None
+
+    @property
+    def output_format(self) -> str:
+        """Requested format; recursive listings default to the compact tree."""
+        if self.format in FORMATS:
+            return self.format
+        return 'tree' if self.recursive else 'list'
 
 
 def list_files(args: ListFilesArgs, basePath: str = None) -> Dict[str, Any]:
@@ -35,29 +66,110 @@ def list_files(args: ListFilesArgs, basePath: str = None) -> Dict[str, Any]:
     if "error" in args:
         return args
 
+    parsed = args.get("args", {})
     list_files_args = ListFilesArgs(
-        path=args.get("args", {}).get("path", ""),
-        recursive=args.get("args", {}).get("recursive", False)
+        path=parsed.get("path", ""),
+        recursive=parsed.get("recursive", False),
+        max_depth=parsed.get("max_depth"),
+        max_entries=parsed.get("max_entries") or DEFAULT_MAX_ENTRIES,
+        cursor=parsed.get("cursor"),
+        format=parsed.get("format"),
     )
 
     return _list_files(list_files_args, basePath)
 
 
+def _iter_entries(directory: str, prefix: str, depth: int, max_depth: Optional[int],
+                  after: List[str]) -> Iterator[FileEntry]:
+    """
+    Walk a directory in listing order (names sorted, each directory followed by its contents).
+
+    Entry types come from ``os.scandir`` (no extra stat per entry); symlinked
+    directories are listed but not entered.
+
+    Args:
+        directory: Directory to scan
+        prefix: Relative path of the directory ("" or ending in "/")
+        depth: Depth of the directory's entries (1 for the listed directory)
+        max_depth: Deepest level to list (None = unlimited)
+        after: Cursor path components; entries up to and including the cursor
+            are skipped without scanning the subtrees before it
+    """
+    try:
+        with os.scandir(directory) as it:
+            entries = sorted((entry for entry in it if entry.name not in BLACKLIST),
+                             key=lambda entry: entry.name)
+    except OSError:
+        # 无权限等：跳过该目录
+        return
+    first = after[0] if after else None
+    for entry in entries:
+        if first is not None and entry.name < first:
+            continue
+        # 游标所在路径上的条目已输出过，只继续进入其子目录
+        resuming = entry.name == first
+        path = prefix + entry.name
+        is_dir = entry.is_dir()
+        if not resuming:
+            yield FileEntry(path, is_dir, depth)
+        if is_dir and not entry.is_symlink() and (max_depth is None or depth < max_depth):
+            yield from _iter_entries(entry.path, path + "/", depth + 1, max_depth,
+                                     after[1:] if resuming else [])
+
+
+def render_tree(entries: List[FileEntry]) -> str:
+    """
+    Render entries as an indented tree (names only, directories end in "/").
+
+    Paths are not repeated on every line and chains of directories with a
+    single subdirectory share one line ("src/main/java/"), which makes large
+    recursive listings several times smaller than the path-per-line list.
+    """
+    # 分页后的一页可能从子目录中间开始：补上未显示的父目录
+    rows: List[FileEntry] = []
+    seen = set()
+    for entry in entries:
+        parts = entry.path.split("/")
+        for level in range(1, len(parts)):
+            parent = "/".join(parts[:level])
+            if parent not in seen:
+                seen.add(parent)
+                rows.append(FileEntry(parent, True, level))
+        seen.add(entry.path)
+        rows.append(entry)
+
+    children = Counter(row.path.rpartition("/")[0] for row in rows)
+    lines: List[str] = []
+    line_of: Dict[str, int] = {}
+    indent_of: Dict[str, int] = {"": -1}
+    for row in rows:
+        parent, _, name = row.path.rpartition("/")
+        if row.is_dir and parent and children[parent] == 1 and lines[line_of[parent]].endswith("/"):
+            # 唯一的子目录接在父目录同一行
+            line_of[row.path] = line_of[parent]
+            indent_of[row.path] = indent_of[parent]
+            lines[line_of[parent]] += name + "/"
+            continue
+        indent_of[row.path] = indent_of.get(parent, -1) + 1
+        line_of[row.path] = len(lines)
+        lines.append("  " * indent_of[row.path] + name + ("/" if row.is_dir else ""))
+    return "\n".join(lines)
+
+
 def _list_files(args: ListFilesArgs, basePath: str) -> Dict[str, Any]:
     """
     List files and directories within the specified directory.
 
     Args:
-        args: Structured arguments containing path and recursive flag
+        args: Structured arguments (path, recursive, max_depth, max_entries, cursor, format)
         basePath: Base path to resolve relative file paths
 
     Returns:
-        Dictionary with results of directory listing operations
+        Dictionary with the listed entries (``items``, in listing order) and
+        ``next_cursor`` when more entries are available
     """
     try:
-        # Extract path and recursive flag from args
         path = args.path
-        recursive = args.recursive
 
         if not path:
             return {"error": "No path specified"}
@@ -72,53 +184,20 @@ def _list_files(args: ListFilesArgs, basePath: str) -> Dict[str, Any]:
         if not os.path.isdir(full_path):
             return {"error": f"Path is not a directory: {full_path}"}
 
-        # List files and directories
-        items = []
-        if recursive:
-            for root, dirs, files in os.walk(full_path):
-                # 过滤目录
-                dirs[:] = [d for d in dirs if d not in BLACKLIST]
-
-                rel_root = os.path.relpath(root, full_path)
-                if rel_root == ".":
-                    rel_root = ""
-
-                for dir_name in dirs:
-                    if dir_name in BLACKLIST:
-                        continue
-                    dir_path = os.path.join(
-                        rel_root, dir_name) if rel_root else dir_name
-                    items.append({
-                        "name": dir_name,
-                        "path": dir_path,
-                        "type": "directory"
-                    })
-
-                for file_name in files:
-                    if file_name in BLACKLIST:
-                        continue
-                    file_path = os.path.join(
-                        rel_root, file_name) if rel_root else file_name
-                    items.append({
-                        "name": file_name,
-                        "path": file_path,
-                        "type": "file"
-                    })
-        else:
-            for item in os.listdir(full_path):
-                if item in BLACKLIST:
-                    continue
-                item_path = os.path.join(full_path, item)
-                items.append({
-                    "name": item,
-                    "path": item,
-                    "type": "directory" if os.path.isdir(item_path) else "file"
-                })
+        max_entries = max(1, args.max_entries)
+        after = [part for part in (args.cursor or "").replace("\\", "/").split("/") if part]
+        walker = _iter_entries(full_path, "", 1, args.depth_limit, after)
+        items = list(islice(walker, max_entries))
+        # 多取一个条目判断是否还有下一页
+        has_more = next(walker, None) is not None
+        walker.close()
 
         return {
             "path": path,
-            "recursive": recursive,
-            "items": sorted(items, key=lambda x: (x['path'], x['type'], x['name']))
+            "recursive": args.recursive,
+            "format": args.output_format,
+            "items": items,
+            "next_cursor": items[-1].path if has_more and items else None,
         }
 
     except Exception as e:
@@ -131,13 +210,7 @@ if __name__ == "__main__":
     current_working_directory = Path.cwd()
 
     # Test the function
-    test_args = {
-        "args": {
-            "path": ".",
-            "recursive": False
-        }
-    }
-    result = _list_files(test_args, current_working_directory)
+    result = _list_files(ListFilesArgs(path=".", max_entries=20), current_working_directory)
     print(json.dumps(result, indent=2))
 
     # Test XML parsing
@@ -154,7 +227,7 @@ if __name__ == "__main__":
     parsed_args = parse_list_files_xml(xml_example)
     print("\nParsed XML:")
     print(json.dumps(parsed_args, indent=2))
-    result = _list_files(parsed_args, current_working_directory)
+    result = list_files(parsed_args, current_working_directory)
     print(json.dumps(result, indent=2))
 
     xml_example = """
@@ -1,36 +1,42 @@
 import json
 from typing import Dict, Any
 
-from .list_files import ListFilesArgs, list_files
+from .list_files import ListFilesArgs, list_files, render_tree
+from ..tool_result import ToolResult, element, text_line
 import xml.etree.ElementTree as ET
 
 
-def run(xml_string: str, basePath: str = None) -> str:
+def run(xml_string: str, basePath: str = None) -> ToolResult:
     args = parse_list_files_xml(xml_string)
     return execute(args, basePath)
 
 
-def execute(args: ListFilesArgs, basePath: str = None) -> str:
+def execute(args: ListFilesArgs, basePath: str = None) -> ToolResult:
     result = list_files(args, basePath)
 
     # 如果有错误，返回错误信息
     if "error" in result:
-        return f"Error: {result['error']}"
+        return ToolResult.error("list_files", result['error'])
 
     # 获取路径信息
     path = result.get("path", "")
 
-    # 构建返回的字符串格式
-    output_lines = [f"[list_files for '{path}'] Result:"]
-
-    # 添加文件名列表
+    # 添加文件名列表（递归时默认使用紧凑的树形格式）
     items = result.get("items", [])
-    for item in items:
-        # if item.get("type") == "file":
-        #     output_lines.append(item.get("name", ""))
-        output_lines.append(item.get("path", ""))
+    if result.get("format") == "tree":
+        listing = render_tree(items)
+    else:
+        listing = "\n".join(item.path for item in items)
+
+    nodes = [text_line("files", listing)] if items else []
+    title = f"[list_files for '{path}'] Result:"
+    next_cursor = result.get("next_cursor")
+    if next_cursor:
+        title = (f"[list_files for '{path}'] Result (first {len(items)} entries; "
+                 f"pass next_cursor as the cursor parameter to list more):")
+        nodes.append(element("next_cursor", next_cursor))
 
-    return "\n".join(output_lines)
+    return ToolResult(tool="list_files", title=title, nodes=nodes)
 
 
 def parse_list_files_xml(xml_string: str) -> ListFilesArgs:
@@ -72,10 +78,24 @@ def parse_list_files_xml(xml_string: str) -> ListFilesArgs:
             recursive_text = recursive_element.text.strip().lower()
             recursive = recursive_text in ['true', '1', 'yes', 'on']
 
+        # Parse paging and depth options
+        def _int(name):
+            found = args_element.find(name)
+            if found is None or not (found.text or "").strip():
+                return None
+            return int(found.text.strip())
+
+        cursor_element = args_element.find('cursor')
+        format_element = args_element.find('format')
+
         return {
             "args": {
                 "path": path,
-                "recursive": recursive
+                "recursive": recursive,
+                "max_depth": _int('max_depth'),
+                "max_entries": _int('max_entries'),
+                "cursor": cursor_element.text.strip() if cursor_element is not None and cursor_element.text else None,
+                "format": format_element.text.strip().lower() if format_element is not None and format_element.text else None,
             }
         }
 
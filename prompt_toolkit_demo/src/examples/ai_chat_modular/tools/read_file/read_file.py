@@ -5,6 +5,8 @@ import json
 from dataclasses import dataclass
 from typing import Optional
 
+from ..file_cache import file_cache
+
 
 @dataclass
 class FileInfo:
@@ -66,23 +68,21 @@ def _read_file(args: ReadFileArgs, basePath: str) -> Dict[str, Any]:
             full_path = os.path.join(basePath, path)
 
             try:
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # Add line numbers to content
-                    lines = content.split('\n')
-                    # 计算总行数以确定行号的宽度
-                    total_lines = len(lines)
-                    width = len(str(total_lines))
-                    # 格式化行号，右对齐
-                    numbered_lines = [
-                        f"{i+1:>{width}} | {line}" for i, line in enumerate(lines)]
-                    formatted_content = '\n'.join(numbered_lines)
-
-                    results.append({
-                        "path": path,
-                        "content": formatted_content,
-                        "status": "success"
-                    })
+                # 文件内容与分行结果经缓存读取，未修改的文件不会重复读取
+                lines = file_cache.read_lines(full_path)
+                # 计算总行数以确定行号的宽度
+                total_lines = len(lines)
+                width = len(str(total_lines))
+                # 格式化行号，右对齐
+                numbered_lines = [
+                    f"{i+1:>{width}} | {line}" for i, line in enumerate(lines)]
+                formatted_content = '\n'.join(numbered_lines)
+
+                results.append({
+                    "path": path,
+                    "content": formatted_content,
+                    "status": "success"
+                })
             except FileNotFoundError:
                 results.append({
                     "path": path,
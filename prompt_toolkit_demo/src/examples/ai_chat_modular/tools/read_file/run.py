@@ -2,56 +2,55 @@ from typing import Dict, Any
 
 from .read_file import FileInfo, read_file
 from .read_file import ReadFileArgs
+from ..tool_result import ToolResult, element
 
 import xml.etree.ElementTree as ET
 
 
-def run(xml_string: str, basePath: str = None) -> str:
+def run(xml_string: str, basePath: str = None) -> ToolResult:
     args = parse_xml_args(xml_string)
     return execute(args, basePath)
 
 
-def execute(args: ReadFileArgs, basePath: str = None) -> Dict[str, Any]:
+def execute(args: ReadFileArgs, basePath: str = None) -> ToolResult:
     result = read_file(args, basePath)
 
     # 如果有错误，返回错误信息
     if "error" in result:
-        return f"Error: {result['error']}"
+        return ToolResult.error("read_file", result['error'])
 
     # 获取结果列表
     results = result.get("results", [])
 
-    # 构建返回的字符串格式
-    output_lines = [f"[read_file for {len(results)} files] Result:"]
-    output_lines.append("<files>")
+    # 构建结构化结果
+    files_node = element("files")
 
     # 添加每个文件的内容
     for file_result in results:
+        path = file_result.get("path", "")
         if file_result.get("status") == "success":
-            path = file_result.get("path", "")
             content = file_result.get("content", "")
 
             # 计算行数
-            lines = content.split('\n') if content else []
-            line_count = len(lines)
+            line_count = content.count('\n') + 1 if content else 0
             line_range = f"1-{line_count}" if line_count > 0 else "1-0"
 
-            output_lines.append(f"<file><path>{path}</path>")
-            output_lines.append(f"<content lines=\"{line_range}\">")
-            output_lines.append(content)
-            output_lines.append("</content>")
-            output_lines.append("</file>")
+            files_node.children.append(element("file", children=[
+                element("path", path),
+                element("content", content, attrs={"lines": line_range}, block=True),
+            ]))
         else:
             # 处理错误情况
-            path = file_result.get("path", "")
             error = file_result.get("error", "Unknown error")
-            output_lines.append(f"<file><path>{path}</path>")
-            output_lines.append(f"<error>{error}</error>")
-            output_lines.append("</file>")
-
-    output_lines.append("</files>")
-
-    return "\n".join(output_lines)
+            files_node.children.append(element("file", children=[
+                element("path", path),
+                element("error", error),
+            ]))
+
+    return ToolResult(
+        tool="read_file",
+        title=f"[read_file for {len(results)} files] Result:",
+        nodes=[files_node])
 
 
 def parse_xml_args(xml_string: str) -> ReadFileArgs:
@@ -3,13 +3,14 @@ import os
 
 import xml.etree.ElementTree as ET
 from .search_and_replace import SearchAndReplaceArgs, search_and_replace
+from ..tool_result import ToolResult, element
 
 
-def run(xml_string: str, basePath: str = None) -> str:
+def run(xml_string: str, basePath: str = None) -> ToolResult:
 
     args = parse_search_and_replace_xml(xml_string)
     if "error" in args:
-        return args
+        return ToolResult.error("search_and_replace", args['error'])
 
     # Convert dict args to SearchAndReplaceArgs object
     structured_args = SearchAndReplaceArgs(
@@ -25,42 +26,41 @@ def run(xml_string: str, basePath: str = None) -> str:
     return execute(structured_args, basePath)
 
 
-def execute(args: SearchAndReplaceArgs, basePath: str) -> str:
+def execute(args: SearchAndReplaceArgs, basePath: str) -> ToolResult:
 
     search_and_replace_results = search_and_replace(args, basePath)
 
-    # 构建返回的字符串格式，按照示例格式
+    if search_and_replace_results and "error" in search_and_replace_results:
+        return ToolResult.error("search_and_replace", search_and_replace_results['error'])
+
+    # 构建返回的结构化结果，按照示例格式
     if search_and_replace_results:
         file_result = search_and_replace_results.get("results")[0]  # 只处理第一个文件
         path = file_result.get("path", "")
         operation = file_result.get("operation", "no changes")
         user_edits = file_result.get("user_edits", "no edits applied")
 
-        # 构建输出字符串
-        output_lines = [f"[search_and_replace for '{path}'] Result:"]
-        output_lines.append("<file_write_result>")
-        output_lines.append(f"<path>{path}</path>")
-        output_lines.append(f"<operation>{operation}</operation>")
-
-        # 添加user_edits部分
-        output_lines.append(f"<user_edits>{user_edits}")
-
-        output_lines.append("</user_edits>")
-        output_lines.append("</file_write_result>")
+        nodes = [
+            element("file_write_result", children=[
+                element("path", path),
+                element("operation", operation),
+                element("user_edits", user_edits, block=True),
+            ])
+        ]
 
         # 只有在确实有更改时才添加notice部分
         if operation != "no changes":
-            # 添加notice部分
-            output_lines.append("<notice>")
-            output_lines.append(
-                "<i>You do not need to re-read the file, as you have seen all changes</i>")
-            output_lines.append(
-                "<i>Proceed with the task using these changes as the new baseline.</i>")
-            output_lines.append("</notice>")
-
-        return "\n".join(output_lines)
+            nodes.append(element("notice", children=[
+                element("i", "You do not need to re-read the file, as you have seen all changes"),
+                element("i", "Proceed with the task using these changes as the new baseline."),
+            ]))
+
+        return ToolResult(
+            tool="search_and_replace",
+            title=f"[search_and_replace for '{path}'] Result:",
+            nodes=nodes)
     else:
-        return "[search_and_replace] Result: No files processed"
+        return ToolResult(tool="search_and_replace", title="[search_and_replace] Result: No files processed")
 
 
 def parse_search_and_replace_xml(xml_string: str) -> Dict[str, Any]:
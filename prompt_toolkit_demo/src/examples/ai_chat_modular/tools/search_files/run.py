@@ -4,9 +4,10 @@ from typing import Dict, List, Any
 import json
 
 from .search_files import SearchArgs, search_files
+from ..tool_result import ToolResult, text_line
 
 
-def run(xml_string: str, basePath: str = None) -> str:
+def run(xml_string: str, basePath: str = None) -> ToolResult:
     """
     ## search_files
     Description: Request to perform a regex search across files in a specified directory, providing context-rich results. This tool searches for patterns or specific content across multiple files, displaying each match with encapsulating context.
@@ -61,17 +62,17 @@ def run(xml_string: str, basePath: str = None) -> str:
     return execute(args, basePath)
 
 
-def execute(args: SearchArgs, basePath: str = None) -> str:
+def execute(args: SearchArgs, basePath: str = None) -> ToolResult:
     result = search_files(args, basePath)
 
     # 如果有错误，直接返回错误信息
     if "error" in result:
-        return json.dumps(result, indent=2, ensure_ascii=False)
+        return ToolResult.error("search_files", result['error'])
 
     # 格式化输出结果
     results = result.get("results", [])
     if not results:
-        return "Found 0 results."
+        return ToolResult(tool="search_files", title="Found 0 results.")
 
     # 按文件路径分组结果
     file_groups = {}
@@ -86,19 +87,22 @@ def execute(args: SearchArgs, basePath: str = None) -> str:
             file_groups[path] = []
         file_groups[path].extend(matches)
 
-    output_lines = [f"Found {total_matches} results.\n"]
-
     # 为每个文件输出所有匹配项
+    nodes = []
     for path, matches in file_groups.items():
-        output_lines.append(f"# {path}")
+        output_lines = [f"# {path}"]
         for match in matches:
             # 添加匹配行，确保正确缩进
             for line in match.split('\n'):
                 output_lines.append(f" {line}")
             output_lines.append("----")
         output_lines.append('\n')
+        nodes.append(text_line("file", '\n'.join(output_lines)))
 
-    return '\n'.join(output_lines)
+    return ToolResult(
+        tool="search_files",
+        title=f"Found {total_matches} results.\n",
+        nodes=nodes)
 
 
 def parse_xml_args(xml_string: str) -> SearchArgs:
@@ -6,6 +6,8 @@ import re
 from pathlib import Path
 from dataclasses import dataclass
 
+from ..file_cache import file_cache
+
 
 @dataclass
 class SearchArgs:
@@ -77,12 +79,11 @@ def _search_files(args: SearchArgs, basePath: str) -> Dict[str, Any]:
             for file_path in matched_files:
                 if file_path.is_file():
                     try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
+                        # 文件的分行结果经缓存读取，重复搜索同一目录时不再重新读取
+                        lines = file_cache.read_lines(str(file_path))
 
                         # Find all matches in the file
                         matches = []
-                        lines = content.split('\n')
                         for i, line in enumerate(lines, 1):
                             if pattern.search(line):
                                 # Collect context lines (previous, current, and next line)
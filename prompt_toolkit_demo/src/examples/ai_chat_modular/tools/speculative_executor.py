@@ -0,0 +1,127 @@
+"""
+Speculative Tool Executor for AI Chat Application
+=================================================
+
+This module starts read-only tools in the background as soon as their
+tool block has been parsed, while the response is still streaming and
+before the user approves them. When the user approves, the cached result
+is returned; when the user declines, the result is thrown away.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .tool_scheduler import get_tool_paths, tools_conflict
+
+
+# 只有这些工具可以被投机执行（只读且开销值得提前执行）
+SPECULATABLE_TOOLS = {'read_file', 'list_files', 'search_files'}
+
+
+def _snapshot_paths(paths: List[str]) -> List[Optional[Tuple[int, int]]]:
+    """
+    Record (mtime_ns, size) of each path so stale results can be detected.
+
+    For directories only direct entries change the mtime, so edits deep
+    inside a listed or searched tree are not detected.
+    """
+    snapshot = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            snapshot.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            snapshot.append(None)
+    return snapshot
+
+
+class SpeculativeExecutor:
+    """
+    Runs read-only tools ahead of approval.
+
+    A speculated tool keeps its original callback in ``__original_callback``
+    and gets a new ``__callback`` that returns the cached result, so the
+    normal approval path (ToolScheduler) does not need to know about it.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        """
+        Initialize the speculative executor.
+
+        Args:
+            max_workers: Number of background threads used for speculation
+        """
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="speculative-tool")
+        self.stats = {"started": 0, "hits": 0, "stale": 0, "discarded": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def can_speculate(self, tool: Dict[str, Any], pending_tools: List[Dict[str, Any]]) -> bool:
+        """
+        Check whether a tool may run before approval.
+
+        Args:
+            tool: The newly parsed tool
+            pending_tools: Tools already waiting for approval, in order
+
+        Returns:
+            True if the tool is read-only and no earlier pending tool
+            could change what it reads
+        """
+        if tool.get('__name') not in SPECULATABLE_TOOLS or "__callback" not in tool:
+            return False
+        if get_tool_paths(tool) is None:
+            return False
+        return not any(tools_conflict(prev, tool) for prev in pending_tools)
+
+    def submit(self, tool: Dict[str, Any]):
+        """
+        Start executing a tool in the background.
+
+        Args:
+            tool: Pending tool dictionary; its ``__callback`` is replaced
+        """
+        original_callback = tool["__callback"]
+        paths = get_tool_paths(tool) or []
+        snapshot = _snapshot_paths(paths)
+        future = self.executor.submit(original_callback)
+        self._count("started")
+
+        def __run_speculative():
+            # 批准前文件被修改过则重新执行，避免返回过期结果
+            if _snapshot_paths(paths) != snapshot:
+                future.cancel()
+                self._count("stale")
+                return original_callback()
+            self._count("hits")
+            return future.result()
+
+        tool["__original_callback"] = original_callback
+        tool["__speculative"] = future
+        tool["__callback"] = __run_speculative
+
+    def discard(self, tools: List[Dict[str, Any]]):
+        """
+        Throw away speculative results of declined tools.
+
+        Args:
+            tools: Tools the user declined
+        """
+        for tool in tools:
+            future = tool.pop("__speculative", None)
+            if future is None:
+                continue
+            # 已在运行的任务无法取消，结果会被直接丢弃
+            future.cancel()
+            tool["__callback"] = tool.pop("__original_callback")
+            self._count("discarded")
+
+    def shutdown(self):
+        """Stop the background threads without waiting for running tools."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
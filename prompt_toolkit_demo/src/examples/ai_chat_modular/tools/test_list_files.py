@@ -0,0 +1,74 @@
+import os
+import tempfile
+
+from .list_files.list_files import ListFilesArgs, _list_files, render_tree
+from .list_files.run import run
+
+
+def _make_tree(root: str):
+    for path in ("b.txt", "a/x.py", "a/y.py", "a/deep/z.py", "c/w.py", ".git/HEAD", "node_modules/m.js"):
+        full = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "w") as f:
+            f.write("x")
+
+
+def _paths(result):
+    return [entry.path for entry in result["items"]]
+
+
+def test_listing_order_depth_and_types():
+    with tempfile.TemporaryDirectory() as root:
+        _make_tree(root)
+        flat = _list_files(ListFilesArgs(path="."), root)
+        assert [(e.path, e.is_dir) for e in flat["items"]] == [("a", True), ("b.txt", False), ("c", True)]
+        assert flat["format"] == "list" and flat["next_cursor"] is None
+
+        full = _list_files(ListFilesArgs(path=".", recursive=True), root)
+        assert _paths(full) == ["a", "a/deep", "a/deep/z.py", "a/x.py", "a/y.py", "b.txt", "c", "c/w.py"]
+        shallow = _list_files(ListFilesArgs(path=".", recursive=True, max_depth=2), root)
+        assert "a/deep/z.py" not in _paths(shallow) and "a/deep" in _paths(shallow)
+
+        assert render_tree(full["items"]).splitlines() == [
+            "a/", "  deep/", "    z.py", "  x.py", "  y.py", "b.txt", "c/", "  w.py"]
+        assert "error" in _list_files(ListFilesArgs(path="missing"), root)
+
+
+def test_pages_follow_the_cursor():
+    with tempfile.TemporaryDirectory() as root:
+        _make_tree(root)
+        expected = _paths(_list_files(ListFilesArgs(path=".", recursive=True), root))
+        pages, cursor = [], None
+        while True:
+            page = _list_files(ListFilesArgs(path=".", recursive=True, max_entries=3, cursor=cursor), root)
+            pages.append(_paths(page))
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert [len(p) for p in pages] == [3, 3, 2]
+        assert sum(pages, []) == expected
+
+        # 从子目录中间开始的页在树形输出中补上父目录
+        result = run("<list_files><args><path>.</path><recursive>true</recursive>"
+                     f"<max_entries>2</max_entries><cursor>a/deep</cursor></args></list_files>", root)
+        assert str(result).splitlines()[1:] == ["a/", "  deep/", "    z.py", "  x.py",
+                                                "<next_cursor>a/x.py</next_cursor>"]
+
+
+def test_tree_is_smaller_than_the_path_list():
+    with tempfile.TemporaryDirectory() as root:
+        for i in range(5):
+            for j in range(20):
+                path = os.path.join(root, "src", "examples", "application", f"module_{i}", f"file_{j}.py")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                open(path, "w").close()
+        xml = "<list_files><args><path>.</path><recursive>true</recursive><format>{}</format></args></list_files>"
+        listed, tree = str(run(xml.format("list"), root)), str(run(xml.format("tree"), root))
+        assert len(tree) * 2.5 < len(listed)
+
+
+if __name__ == "__main__":
+    test_listing_order_depth_and_types()
+    test_pages_follow_the_cursor()
+    test_tree_is_smaller_than_the_path_list()
+    print("All tests passed! ✓")
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import threading
+
+from .speculative_executor import SpeculativeExecutor
+from .tool_scheduler import ToolScheduler
+
+
+def _tool(name, paths, callback):
+    return {"__name": name, "__paths": paths, "__callback": callback}
+
+
+def _reader(path, calls):
+    def __run():
+        calls.append(path)
+        with open(path) as f:
+            return f.read()
+    return __run
+
+
+def test_hit_reuses_speculative_result():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "a.txt")
+        with open(path, "w") as f:
+            f.write("v1")
+        calls = []
+        executor = SpeculativeExecutor()
+        tool = _tool('read_file', [path], _reader(path, calls))
+        assert executor.can_speculate(tool, [])
+        executor.submit(tool)
+        tool["__speculative"].result(timeout=5)
+
+        # 批准后直接返回后台已得到的结果，不再读取文件
+        assert ToolScheduler().run([tool]) == ["v1"]
+        assert calls == [path]
+        assert (executor.stats["hits"], executor.stats["stale"]) == (1, 0)
+        executor.shutdown()
+
+
+def test_stale_result_is_rerun_after_workspace_change():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "a.txt")
+        with open(path, "w") as f:
+            f.write("v1")
+        calls = []
+        executor = SpeculativeExecutor()
+        tool = _tool('read_file', [path], _reader(path, calls))
+        executor.submit(tool)
+        assert tool["__speculative"].result(timeout=5) == "v1"
+
+        # 批准前文件被修改（大小也变化，不依赖 mtime 精度）
+        with open(path, "w") as f:
+            f.write("version 2")
+        assert ToolScheduler().run([tool]) == ["version 2"]
+        assert calls == [path, path]
+        assert (executor.stats["hits"], executor.stats["stale"]) == (0, 1)
+        executor.shutdown()
+
+
+def test_result_is_discarded_on_reject():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "a.txt")
+        with open(path, "w") as f:
+            f.write("v1")
+        release = threading.Event()
+        executor = SpeculativeExecutor(max_workers=1)
+        # 占住唯一的后台线程，使被拒绝的工具还在排队
+        executor.executor.submit(release.wait, 5)
+        calls = []
+        original = _reader(path, calls)
+        tool = _tool('read_file', [path], original)
+        executor.submit(tool)
+
+        # $reject：取消排队中的投机执行并恢复原始回调
+        executor.discard([tool])
+        release.set()
+        executor.executor.shutdown(wait=True)
+        assert tool["__callback"] is original
+        assert "__speculative" not in tool and "__original_callback" not in tool
+        assert calls == []
+        assert executor.stats["discarded"] == 1
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.tools.test_speculative_executor
+"""
+if __name__ == "__main__":
+    test_hit_reuses_speculative_result()
+    test_stale_result_is_rerun_after_workspace_change()
+    test_result_is_discarded_on_reject()
+    print("All tests passed! ✓")
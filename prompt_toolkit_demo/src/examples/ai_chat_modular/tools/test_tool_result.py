@@ -0,0 +1,71 @@
+import json
+
+from .tool_result import ToolResult, element, render_tool_results, text_line
+
+
+def _read_result(content: str, max_chars=None) -> ToolResult:
+    return ToolResult(
+        tool="read_file",
+        title="[read_file for 1 files] Result:",
+        nodes=[element("files", children=[
+            element("file", children=[
+                element("path", "a.py"),
+                element("content", content, attrs={"lines": "1-1"},
+                        block=True, max_chars=max_chars),
+            ])
+        ])])
+
+
+def test_xml_envelope_escapes_text():
+    result = _read_result("if a < b && c > d:")
+    xml = render_tool_results([("read_file", result), ("attempt_completion", "<done>")])
+
+    assert "if a &lt; b &amp;&amp; c &gt; d:" in xml
+    assert '<tool name="read_file">' in xml
+    assert "&lt;done&gt;" in xml
+    assert xml.startswith("<tool_execution_results>")
+
+
+def test_json_keeps_raw_text():
+    result = _read_result("if a < b:")
+    data = json.loads(render_tool_results([("read_file", result)], fmt="json"))
+
+    fields = data["tool_execution_results"][0]["fields"]
+    content = fields[0]["children"][0]["children"][1]
+    assert content["text"] == "if a < b:"
+    assert content["attrs"] == {"lines": "1-1"}
+
+
+def test_field_max_chars_and_token_estimate():
+    result = _read_result("x" * 1000, max_chars=100)
+    content = list(result.iter_nodes())[-1]
+
+    assert content.truncated_chars == 900
+    assert "900 characters truncated" in content.text
+    assert 0 < result.token_estimate < 100
+
+
+def test_truncate_shrinks_largest_field_to_fit():
+    result = ToolResult(tool="execute_command", title="[execute_command for 'ls'] Result:", nodes=[
+        text_line("status", "Status: success"),
+        text_line("stdout", "line\n" * 2000),
+    ])
+    before = result.token_estimate
+
+    removed = result.truncate(500)
+
+    assert removed > 0
+    assert result.size() <= 500
+    assert result.token_estimate < before
+    assert "Status: success" in result.to_xml()
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.tools.test_tool_result
+"""
+if __name__ == "__main__":
+    test_xml_envelope_escapes_text()
+    test_json_keeps_raw_text()
+    test_field_max_chars_and_token_estimate()
+    test_truncate_shrinks_largest_field_to_fit()
+    print("All tests passed! ✓")
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from .tool_scheduler import ToolScheduler, tools_conflict
+
+
+def _tool(name, paths, callback):
+    return {"__name": name, "__paths": paths, "__callback": callback}
+
+
+def test_tools_conflict():
+    read_a = _tool('read_file', ['a.txt'], None)
+    read_b = _tool('read_file', ['b.txt'], None)
+    write_a = _tool('write_to_file', ['a.txt'], None)
+    list_dir = _tool('list_files', ['.'], None)
+    command = {"__name": 'execute_command', "__callback": None}
+
+    assert not tools_conflict(read_a, read_b)
+    assert not tools_conflict(read_a, list_dir)
+    assert tools_conflict(read_a, write_a)
+    assert not tools_conflict(read_b, write_a)
+    # 目录与其中文件的写入冲突
+    assert tools_conflict(list_dir, write_a)
+    # 路径未知的命令与所有工具冲突
+    assert tools_conflict(read_b, command)
+
+
+def test_read_only_tools_run_concurrently_and_keep_order():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def _reader(value):
+        def __run():
+            # 三个读取必须同时运行才能通过 barrier
+            barrier.wait()
+            return value
+        return __run
+
+    tools = [_tool('read_file', [f'{i}.txt'], _reader(f"r{i}")) for i in range(3)]
+    results = ToolScheduler(max_workers=3).run(tools)
+
+    assert results == ["r0", "r1", "r2"]
+    assert [t["__execution_result"] for t in tools] == results
+
+
+def test_writes_to_same_path_are_serialised():
+    order = []
+
+    def _step(value, delay):
+        def __run():
+            time.sleep(delay)
+            order.append(value)
+            return value
+        return __run
+
+    tools = [
+        _tool('write_to_file', ['a.txt'], _step("write1", 0.05)),
+        _tool('read_file', ['a.txt'], _step("read", 0.0)),
+        _tool('write_to_file', ['a.txt'], _step("write2", 0.0)),
+    ]
+    events = []
+    results = ToolScheduler(
+        max_workers=3,
+        on_progress=lambda event, index, tool, payload, elapsed: events.append((event, index))
+    ).run(tools)
+
+    assert order == ["write1", "read", "write2"]
+    assert results == ["write1", "read", "write2"]
+    assert events.count(('done', 0)) == 1 and len(events) == 6
+
+
+def test_failed_tool_does_not_block_others():
+    def _boom():
+        raise RuntimeError("boom")
+
+    tools = [
+        _tool('write_to_file', ['a.txt'], _boom),
+        _tool('write_to_file', ['a.txt'], lambda: "ok"),
+    ]
+    results = ToolScheduler().run(tools)
+
+    assert results == [None, "ok"]
+    assert "__execution_result" not in tools[0]
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.tools.test_tool_scheduler
+"""
+if __name__ == "__main__":
+    test_tools_conflict()
+    test_read_only_tools_run_concurrently_and_keep_order()
+    test_writes_to_same_path_are_serialised()
+    test_failed_tool_does_not_block_others()
+    print("All tests passed! ✓")
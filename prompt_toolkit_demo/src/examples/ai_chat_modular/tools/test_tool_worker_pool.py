@@ -0,0 +1,81 @@
+import os
+import time
+
+from .file_cache import FileCache
+from .tool_registry import run_tool
+from .tool_result import ToolResult
+from .tool_worker_pool import ToolWorkerPool
+
+READ_XML = "<read_file><args><file><path>a.txt</path></file></args></read_file>"
+# 灾难性回溯：(a+)+$ 在末尾不匹配的长串上需要指数时间
+SLOW_SEARCH_XML = "<search_files><args><path>.</path><regex>(a+)+$</regex><file_pattern>slow.txt</file_pattern></args></search_files>"
+
+
+def test_file_cache_hits_and_invalidation(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("one\ntwo", encoding="utf-8")
+    cache = FileCache(max_bytes=10)
+    assert cache.read_lines(str(path)) == ["one", "two"]
+    assert cache.read_lines(str(path)) == ["one", "two"]
+    assert cache.stats()[:2] == (1, 1)
+
+    # 大小或修改时间变化后重新读取
+    path.write_text("three", encoding="utf-8")
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+    assert cache.read_text(str(path)) == "three"
+    assert cache.stats()[:2] == (1, 2)
+
+    # 超出总大小时淘汰最久未使用的文件
+    other = tmp_path / "b.txt"
+    other.write_text("123456789", encoding="utf-8")
+    cache.read_text(str(other))
+    assert cache.stats()[2:] == (1, 9)
+
+
+def test_pool_matches_in_process_results(tmp_path):
+    (tmp_path / "a.txt").write_text("hello\nworld", encoding="utf-8")
+    pool = ToolWorkerPool(workers=1, cpu_seconds=5)
+    try:
+        result = pool.run('read_file', READ_XML, str(tmp_path))
+        assert isinstance(result, ToolResult)
+        assert result.to_xml() == run_tool('read_file', READ_XML, str(tmp_path)).to_xml()
+        assert pool.stats["calls"] == 1 and pool.stats["errors"] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_cpu_limit_and_timeout_recovery(tmp_path):
+    (tmp_path / "a.txt").write_text("hello", encoding="utf-8")
+    (tmp_path / "slow.txt").write_text("a" * 40 + "!", encoding="utf-8")
+    pool = ToolWorkerPool(workers=1, cpu_seconds=1, timeout=30)
+    try:
+        result = pool.run('search_files', SLOW_SEARCH_XML, str(tmp_path))
+        assert result.status == "error" and "CPU time limit exceeded" in result.title
+        # 同一个工作进程继续处理后续调用
+        assert pool.run('read_file', READ_XML, str(tmp_path)).status != "error"
+        assert pool.stats["restarts"] == 0
+
+        pool.cpu_seconds, pool.timeout = 0, 0.5
+        result = pool.run('search_files', SLOW_SEARCH_XML, str(tmp_path))
+        assert "timed out" in result.title
+        assert pool.stats["timeouts"] == 1 and pool.stats["restarts"] == 1
+        assert pool.run('read_file', READ_XML, str(tmp_path)).status != "error"
+    finally:
+        pool.shutdown()
+
+
+def test_from_config_is_opt_in():
+    assert ToolWorkerPool.from_config({}) is None
+    assert ToolWorkerPool.from_config({"TOOL_PROCESS_WORKERS": "0"}) is None
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    for test in (test_file_cache_hits_and_invalidation, test_pool_matches_in_process_results,
+                 test_cpu_limit_and_timeout_recovery):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    test_from_config_is_opt_in()
+    print("All tests passed! ✓")
@@ -0,0 +1,107 @@
+"""
+Tool Registry for AI Chat Application
+=====================================
+
+Central list of the tools the model may call. Tool modules are only
+imported the first time a tool is actually executed, which keeps them (and
+their dependencies such as difflib, subprocess and pathlib) off the
+startup path.
+"""
+
+import importlib
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+from ..utils.profiler import turn_profiler
+from ..utils.telemetry import telemetry
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """Static description of a tool."""
+    name: str
+    read_only: bool
+    params: Tuple[str, ...] = ()
+
+
+TOOL_SPECS: Dict[str, ToolSpec] = {
+    spec.name: spec for spec in [
+        ToolSpec('execute_command', read_only=False, params=('command', 'cwd')),
+        ToolSpec('insert_content', read_only=False, params=('path', 'line', 'content')),
+        ToolSpec('list_files', read_only=True,
+                 params=('args', 'path', 'recursive', 'max_depth', 'max_entries', 'cursor', 'format')),
+        ToolSpec('read_file', read_only=True, params=('args', 'file', 'path')),
+        ToolSpec('search_and_replace', read_only=False,
+                 params=('path', 'search', 'replace', 'start_line', 'end_line', 'use_regex', 'ignore_case')),
+        ToolSpec('search_files', read_only=True, params=('args', 'path', 'regex', 'file_pattern')),
+        ToolSpec('write_to_file', read_only=False, params=('path', 'content', 'line_count')),
+        ToolSpec('attempt_completion', read_only=True, params=('result',)),
+    ]
+}
+
+# 工具标签名列表，流式解析时用于识别工具块
+TOOL_NAMES: List[str] = list(TOOL_SPECS)
+
+_runners: Dict[str, Callable[..., Any]] = {}
+_runners_lock = threading.Lock()
+
+
+def is_read_only_tool(name: str) -> bool:
+    """
+    Check whether a tool only reads from the workspace.
+
+    Args:
+        name: Tool name
+
+    Returns:
+        True for read-only tools, False for mutating or unknown tools
+    """
+    spec = TOOL_SPECS.get(name)
+    return spec is not None and spec.read_only
+
+
+def get_tool_runner(name: str) -> Callable[..., Any]:
+    """
+    Resolve the ``run(xml_string, basePath)`` entry point of a tool.
+
+    The tool module is imported on first use and cached afterwards.
+
+    Args:
+        name: Tool name, e.g. "read_file"
+
+    Returns:
+        The tool's run function
+
+    Raises:
+        KeyError: If the tool is not registered
+    """
+    runner = _runners.get(name)
+    if runner is not None:
+        return runner
+    if name not in TOOL_SPECS:
+        raise KeyError(f"Unknown tool: {name}")
+    # 多个线程可能同时首次执行同一工具，加锁避免重复导入
+    with _runners_lock:
+        if name not in _runners:
+            module = importlib.import_module(f"{__package__}.{name}.run")
+            _runners[name] = module.run
+        return _runners[name]
+
+
+def run_tool(name: str, xml_string: str, basePath: str = None) -> Any:
+    """
+    Execute a tool from its XML block.
+
+    Args:
+        name: Tool name
+        xml_string: The tool's XML block as emitted by the model
+        basePath: Base path to resolve relative paths (defaults to cwd)
+
+    Returns:
+        The tool result
+    """
+    runner = get_tool_runner(name)
+    # 工具通常在线程池中运行，开启 $profile 时单独采样后合并到本轮
+    with turn_profiler.profile_thread(), telemetry.timer(f"tool.{name}_ms"):
+        return runner(xml_string, basePath)
@@ -0,0 +1,297 @@
+"""
+Structured Tool Results for AI Chat Application
+===============================================
+
+Every tool builds a ToolResult tree instead of concatenating strings. The
+tree is serialised exactly once, either into the XML envelope sent to the
+model or into JSON, with text escaped properly. Large fields (file content,
+command output) can be truncated per field, and each result carries a
+precomputed token estimate so payload caps do not need to re-parse text.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from ..utils.token_counter import CHARS_PER_TOKEN, token_counter
+
+TRUNCATION_MARKER = "\n[... {count} characters truncated ...]\n"
+
+
+def escape(text: str) -> str:
+    """
+    Escape '&', '<', '>' and '"' for use in XML text and attributes.
+
+    (xml.sax.saxutils.escape would pull urllib.request in at import time.)
+    """
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a piece of text.
+
+    Args:
+        text: The text to estimate
+
+    Returns:
+        Approximate token count
+    """
+    return token_counter.count(text)
+
+
+def truncate_text(text: str, max_chars: int) -> Tuple[str, int]:
+    """
+    Truncate text to at most ``max_chars`` characters, keeping head and tail.
+
+    Args:
+        text: Text to truncate
+        max_chars: Maximum number of characters to keep
+
+    Returns:
+        (truncated text, number of characters removed)
+    """
+    if max_chars is None or len(text) <= max_chars:
+        return text, 0
+    removed = len(text) - max_chars
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    return text[:head] + TRUNCATION_MARKER.format(count=removed) + (text[-tail:] if tail else ""), removed
+
+
+@dataclass
+class ResultNode:
+    """
+    One field of a tool result.
+
+    A node either holds text or child nodes. ``block`` text is placed on its
+    own lines (file content, diffs); ``bare`` nodes are rendered as plain text
+    without surrounding tags in XML but keep their name in JSON.
+    """
+    tag: str
+    text: Optional[str] = None
+    children: List['ResultNode'] = field(default_factory=list)
+    attrs: Dict[str, str] = field(default_factory=dict)
+    block: bool = False
+    bare: bool = False
+    max_chars: Optional[int] = None
+    truncated_chars: int = 0
+
+    def iter_nodes(self):
+        """Yield this node and all descendants."""
+        yield self
+        for child in self.children:
+            yield from child.iter_nodes()
+
+    def truncate(self, max_chars: int):
+        """Truncate this node's text to ``max_chars`` characters."""
+        if self.text is None:
+            return
+        self.text, removed = truncate_text(self.text, max_chars)
+        self.truncated_chars += removed
+
+    def size(self) -> int:
+        """Approximate serialised size in characters."""
+        total = len(self.text) if self.text else 0
+        if not self.bare:
+            total += 2 * len(self.tag) + 6
+            total += sum(len(k) + len(v) + 4 for k, v in self.attrs.items())
+        return total + sum(child.size() for child in self.children)
+
+    def to_xml(self) -> str:
+        """Serialise the node to XML with escaped text and attributes."""
+        text = escape(self.text) if self.text is not None else ""
+        if self.bare:
+            return text
+        attrs = "".join(
+            f' {k}="{escape(str(v))}"' for k, v in self.attrs.items())
+        if self.children:
+            inner = "\n".join(child.to_xml() for child in self.children)
+            return f"<{self.tag}{attrs}>\n{inner}\n</{self.tag}>"
+        if self.block:
+            return f"<{self.tag}{attrs}>\n{text}\n</{self.tag}>"
+        return f"<{self.tag}{attrs}>{text}</{self.tag}>"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the node to a JSON-serialisable dictionary."""
+        data: Dict[str, Any] = {"tag": self.tag}
+        if self.attrs:
+            data["attrs"] = dict(self.attrs)
+        if self.children:
+            data["children"] = [child.to_dict() for child in self.children]
+        else:
+            data["text"] = self.text if self.text is not None else ""
+        if self.truncated_chars:
+            data["truncated_chars"] = self.truncated_chars
+        return data
+
+
+def element(tag: str, text: Optional[str] = None, children: Optional[List[ResultNode]] = None,
+            attrs: Optional[Dict[str, str]] = None, block: bool = False,
+            max_chars: Optional[int] = None) -> ResultNode:
+    """Create an XML-style result node."""
+    return ResultNode(tag=tag, text=text, children=children or [], attrs=attrs or {},
+                      block=block, max_chars=max_chars)
+
+
+def text_line(tag: str, text: str, max_chars: Optional[int] = None) -> ResultNode:
+    """Create a bare text node, rendered without tags in XML."""
+    return ResultNode(tag=tag, text=text, bare=True, max_chars=max_chars)
+
+
+@dataclass
+class ToolResult:
+    """
+    The model-facing result of one tool execution.
+
+    Attributes:
+        tool: Name of the tool that produced the result
+        title: Headline such as "[read_file for 2 files] Result:"
+        nodes: The result fields
+        status: "success" or "error"
+        token_estimate: Approximate number of tokens of the serialised result
+    """
+    tool: str
+    title: str
+    nodes: List[ResultNode] = field(default_factory=list)
+    status: str = "success"
+    token_estimate: int = 0
+
+    def __post_init__(self):
+        # 先按字段上限截断，再计算 token 估计值
+        for node in self.iter_nodes():
+            if node.max_chars is not None:
+                node.truncate(node.max_chars)
+        self._update_estimate()
+
+    @classmethod
+    def error(cls, tool: str, message: str) -> 'ToolResult':
+        """Create an error result."""
+        return cls(tool=tool, title=f"Error: {message}", status="error")
+
+    def iter_nodes(self):
+        """Yield all nodes of the result tree."""
+        for node in self.nodes:
+            yield from node.iter_nodes()
+
+    def size(self) -> int:
+        """Approximate serialised size in characters."""
+        return len(self.title) + 1 + sum(node.size() + 1 for node in self.nodes)
+
+    def _update_estimate(self):
+        # 字段文本用 token 计数器估计（带缓存），标签等结构开销按字符数折算
+        text_tokens = 0
+        text_chars = 0
+        for node in self.iter_nodes():
+            if node.text:
+                text_tokens += token_counter.count(node.text)
+                text_chars += len(node.text)
+        markup_chars = self.size() - text_chars
+        self.token_estimate = text_tokens + (markup_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+    def truncate(self, max_chars: int) -> int:
+        """
+        Shrink the largest text fields until the result fits ``max_chars``.
+
+        Args:
+            max_chars: Target serialised size in characters
+
+        Returns:
+            Number of characters removed
+        """
+        removed = 0
+        overflow = self.size() - max_chars
+        if overflow <= 0:
+            return 0
+        # 从最大的字段开始截断
+        text_nodes = sorted((n for n in self.iter_nodes() if n.text),
+                            key=lambda n: len(n.text), reverse=True)
+        for node in text_nodes:
+            if overflow <= 0:
+                break
+            marker_len = len(TRUNCATION_MARKER.format(count=overflow))
+            if len(node.text) <= marker_len:
+                continue
+            keep = max(0, len(node.text) - overflow - marker_len)
+            before = len(node.text)
+            node.truncate(keep)
+            # 节点大小只随文本长度变化，增量更新，避免每次重新遍历整棵树
+            removed += max(0, before - len(node.text))
+            overflow -= before - len(node.text)
+        self._update_estimate()
+        return removed
+
+    def to_xml(self) -> str:
+        """Serialise the result body (title and fields) to XML text."""
+        parts = [escape(self.title)]
+        parts.extend(node.to_xml() for node in self.nodes)
+        return "\n".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the result to a JSON-serialisable dictionary."""
+        return {
+            "tool": self.tool,
+            "status": self.status,
+            "title": self.title,
+            "fields": [node.to_dict() for node in self.nodes],
+            "token_estimate": self.token_estimate,
+        }
+
+    def to_json(self) -> str:
+        """Serialise the result to JSON."""
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def __str__(self) -> str:
+        return self.to_xml()
+
+
+ToolOutput = Union[ToolResult, str]
+
+
+def render_tool_results(results: Sequence[Tuple[str, ToolOutput]], fmt: str = "xml") -> str:
+    """
+    Serialise tool results into the message sent back to the model.
+
+    Args:
+        results: (tool name, result) pairs; plain string results are allowed
+        fmt: "xml" for the <tool_execution_results> envelope, or "json"
+
+    Returns:
+        The serialised tool results
+    """
+    if fmt == "json":
+        items = []
+        for name, result in results:
+            if isinstance(result, ToolResult):
+                items.append(result.to_dict())
+            else:
+                items.append({"tool": name, "status": "success", "title": "",
+                              "fields": [{"tag": "result", "text": str(result)}]})
+        return json.dumps({"tool_execution_results": items}, ensure_ascii=False)
+
+    parts = ["<tool_execution_results>"]
+    for name, result in results:
+        body = result.to_xml() if isinstance(result, ToolResult) else escape(str(result))
+        parts.append(f'<tool name="{escape(name)}">\n{body}\n</tool>')
+    parts.append("</tool_execution_results>")
+    return "\n".join(parts)
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.tools.tool_result
+"""
+if __name__ == "__main__":
+    demo = ToolResult(
+        tool="read_file",
+        title="[read_file for 1 files] Result:",
+        nodes=[element("files", children=[
+            element("file", children=[
+                element("path", "a<b>.py"),
+                element("content", "1 | if a < b && c:\n2 |     pass",
+                        attrs={"lines": "1-2"}, block=True),
+            ])
+        ])]
+    )
+    print(render_tool_results([("read_file", demo)]))
+    print(render_tool_results([("read_file", demo)], fmt="json"))
+    print(f"Token estimate: {demo.token_estimate}")
@@ -0,0 +1,182 @@
+"""
+Tool Scheduler for AI Chat Application
+======================================
+
+This module schedules approved tool callbacks. Read-only tools run
+concurrently on a thread pool, while tools that mutate the workspace are
+serialised behind every earlier tool that touches the same path.
+"""
+
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, List, Optional
+
+from .tool_registry import is_read_only_tool
+
+
+def is_read_only(tool: Dict[str, Any]) -> bool:
+    """
+    Check whether a pending tool only reads from the workspace.
+
+    Args:
+        tool: Pending tool dictionary (with __name, __callback, ...)
+
+    Returns:
+        True if the tool never modifies files
+    """
+    # 只读工具互相之间没有依赖，可以并发执行
+    return is_read_only_tool(tool.get('__name'))
+
+
+def get_tool_paths(tool: Dict[str, Any]) -> Optional[List[str]]:
+    """
+    Get the normalized workspace paths a pending tool touches.
+
+    Args:
+        tool: Pending tool dictionary
+
+    Returns:
+        List of absolute paths, or None when the paths are unknown
+        (e.g. execute_command may touch anything)
+    """
+    paths = tool.get('__paths')
+    if paths is None:
+        return None
+    return [os.path.normcase(os.path.abspath(p)) for p in paths]
+
+
+def _paths_overlap(a: str, b: str) -> bool:
+    """Two paths overlap when they are equal or one is inside the other."""
+    return a == b or a.startswith(b.rstrip(os.sep) + os.sep) or b.startswith(a.rstrip(os.sep) + os.sep)
+
+
+def tools_conflict(first: Dict[str, Any], second: Dict[str, Any]) -> bool:
+    """
+    Check whether two tools must not run at the same time.
+
+    Args:
+        first: The earlier pending tool
+        second: The later pending tool
+
+    Returns:
+        True if ``second`` has to wait for ``first``
+    """
+    if is_read_only(first) and is_read_only(second):
+        return False
+
+    first_paths = get_tool_paths(first)
+    second_paths = get_tool_paths(second)
+    # 路径未知的修改类工具（如 execute_command）与所有工具冲突
+    if first_paths is None or second_paths is None:
+        return True
+
+    return any(_paths_overlap(a, b) for a in first_paths for b in second_paths)
+
+
+class ToolScheduler:
+    """
+    Runs approved tools concurrently where it is safe to do so.
+
+    Each tool waits for every earlier tool it conflicts with, so writes to
+    the same path keep their original order. Progress events are delivered
+    on the calling thread, and results are returned in the original order.
+    """
+
+    def __init__(self, max_workers: int = 4,
+                 on_progress: Optional[Callable[[str, int, Dict[str, Any], Any, float], None]] = None):
+        """
+        Initialize the tool scheduler.
+
+        Args:
+            max_workers: Maximum number of tools running at the same time
+            on_progress: Callback ``(event, index, tool, payload, elapsed)`` where
+                event is 'start', 'done' or 'error'
+        """
+        self.max_workers = max(1, max_workers)
+        self.on_progress = on_progress
+
+    def run(self, tools: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Execute the callbacks of the given tools.
+
+        Args:
+            tools: Approved pending tools, in the order the model issued them
+
+        Returns:
+            List of results in the original order (None for failed tools).
+            Successful results are also stored in ``tool["__execution_result"]``.
+        """
+        runnable = [i for i, tool in enumerate(tools) if "__callback" in tool]
+        results: List[Any] = [None] * len(tools)
+        if not runnable:
+            return results
+
+        events: "queue.Queue" = queue.Queue()
+        futures: Dict[int, Future] = {}
+
+        def _run_one(index: int, depends_on: List[Future]):
+            # 等待所有冲突的前序工具完成
+            for dep in depends_on:
+                try:
+                    dep.result()
+                except Exception:
+                    pass
+            tool = tools[index]
+            events.put(('start', index, None, 0.0))
+            started = time.perf_counter()
+            try:
+                result = tool["__callback"]()
+            except Exception as e:
+                events.put(('error', index, e, time.perf_counter() - started))
+                raise
+            events.put(('done', index, result, time.perf_counter() - started))
+            return result
+
+        workers = min(self.max_workers, len(runnable))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool") as executor:
+            # 按原始顺序提交：依赖总是先于被依赖者入队，线程池 FIFO 保证不会死锁
+            for index in runnable:
+                depends_on = [futures[prev] for prev in futures
+                              if tools_conflict(tools[prev], tools[index])]
+                futures[index] = executor.submit(_run_one, index, depends_on)
+
+            finished = 0
+            while finished < len(runnable):
+                event, index, payload, elapsed = events.get()
+                if event == 'done':
+                    results[index] = payload
+                    tools[index]["__execution_result"] = payload
+                    finished += 1
+                elif event == 'error':
+                    finished += 1
+                if self.on_progress:
+                    self.on_progress(event, index, tools[index], payload, elapsed)
+
+        return results
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.tools.tool_scheduler
+"""
+if __name__ == "__main__":
+    def _sleepy(name: str, seconds: float):
+        def __run():
+            time.sleep(seconds)
+            return f"{name} finished"
+        return __run
+
+    demo_tools = [
+        {"__name": "read_file", "__paths": ["a.txt"], "__callback": _sleepy("read a", 0.3)},
+        {"__name": "read_file", "__paths": ["b.txt"], "__callback": _sleepy("read b", 0.3)},
+        {"__name": "write_to_file", "__paths": ["a.txt"], "__callback": _sleepy("write a", 0.1)},
+        {"__name": "search_files", "__paths": ["."], "__callback": _sleepy("search", 0.3)},
+    ]
+
+    def _print_progress(event, index, tool, payload, elapsed):
+        print(f"[{event}] #{index + 1} {tool['__name']} {payload or ''} ({elapsed:.2f}s)")
+
+    started = time.perf_counter()
+    print(ToolScheduler(on_progress=_print_progress).run(demo_tools))
+    print(f"Total: {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,246 @@
+"""
+Tool Worker Process Pool for AI Chat Application
+================================================
+
+Runs tool calls in a pool of long-lived worker processes instead of the
+chat process, so a CPU-heavy or pathological search cannot freeze the UI
+(a regex match holds the GIL for its whole duration).
+
+Workers import every tool module when they start and keep their caches
+(see file_cache.py) from one call to the next. A request is the tool name,
+its XML block and the base path; the result (usually a ToolResult) comes
+back pickled over a pipe. Each call runs under a CPU-time limit and each
+worker under an address-space limit (RLIMIT_CPU / RLIMIT_AS, where the
+platform has them). A worker that crashes, is killed by a limit or misses
+the wall-clock timeout is replaced, and the call returns an error result.
+"""
+
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..utils.telemetry import telemetry
+from .tool_result import ToolResult
+
+try:
+    import resource
+except ImportError:  # Windows：没有 rlimit，只保留超时保护
+    resource = None
+
+
+class ToolLimitExceeded(BaseException):
+    """Raised inside a worker when a call exceeds its CPU-time limit."""
+
+    # 继承 BaseException：工具内部的 except Exception 不会吞掉它
+
+
+def _on_cpu_limit(signum, frame):
+    raise ToolLimitExceeded("CPU time limit exceeded")
+
+
+def _worker_main(conn, cpu_seconds: float, memory_mb: int):
+    """Worker process: import the tools, then serve calls until told to stop."""
+    from .tool_registry import TOOL_SPECS, get_tool_runner
+
+    if resource is not None:
+        if memory_mb:
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+        if cpu_seconds:
+            signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    # 预先导入所有工具模块，第一次调用也不需要等待导入
+    runners = {name: get_tool_runner(name) for name in TOOL_SPECS}
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        name, xml_string, base_path = request
+        started = time.process_time()
+        _set_cpu_limit(cpu_seconds)
+        try:
+            reply = ("ok", runners[name](xml_string, base_path))
+        except ToolLimitExceeded as e:
+            reply = ("error", f"{e} ({cpu_seconds:g}s)")
+        except MemoryError:
+            reply = ("error", "Memory limit exceeded")
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        finally:
+            _set_cpu_limit(0)
+        try:
+            conn.send(reply + ((time.process_time() - started) * 1000,))
+        except Exception as e:
+            # 结果无法序列化时返回错误
+            conn.send(("error", f"Unable to send the tool result: {e}", 0.0))
+
+
+def _set_cpu_limit(cpu_seconds: float):
+    """Limit the process CPU time to the time used so far plus ``cpu_seconds`` (0 removes the limit)."""
+    if resource is None or not hasattr(resource, "RLIMIT_CPU"):
+        return
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    if cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    else:
+        soft = hard
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+class _Worker:
+    """A worker process and the parent's end of its pipe."""
+
+    def __init__(self, context, cpu_seconds: float, memory_mb: int):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child, cpu_seconds, memory_mb),
+                                       name="tool-worker", daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+
+
+class ToolWorkerPool:
+    """
+    A fixed number of warm tool worker processes.
+    """
+
+    def __init__(self, workers: int = 2, cpu_seconds: float = 30.0, memory_mb: int = 0,
+                 timeout: float = 120.0):
+        """
+        Start the worker processes.
+
+        Args:
+            workers: Number of worker processes (calls beyond it wait)
+            cpu_seconds: CPU time allowed per call (0 = unlimited)
+            memory_mb: Address-space limit per worker in MiB (0 = unlimited)
+            timeout: Wall-clock seconds per call before the worker is killed
+        """
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.timeout = timeout
+        # spawn：不从可能持有锁的多线程父进程 fork
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers = [self._start_worker() for _ in range(max(1, workers))]
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"calls": 0, "errors": 0, "timeouts": 0, "crashes": 0, "restarts": 0}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> Optional['ToolWorkerPool']:
+        """Create a pool from TOOL_PROCESS_WORKERS etc., or None when it is disabled."""
+        workers = int(config.get('TOOL_PROCESS_WORKERS') or 0)
+        if workers <= 0:
+            return None
+        return cls(workers=workers,
+                   cpu_seconds=float(config.get('TOOL_CPU_SECONDS') or 0),
+                   memory_mb=int(config.get('TOOL_MEMORY_MB') or 0),
+                   timeout=float(config.get('TOOL_TIMEOUT_SECONDS') or 120))
+
+    def _start_worker(self) -> _Worker:
+        return _Worker(self._context, self.cpu_seconds, self.memory_mb)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.kill()
+        replacement = self._start_worker()
+        with self._lock:
+            self._workers[self._workers.index(worker)] = replacement
+            self.stats["restarts"] += 1
+        return replacement
+
+    def run(self, name: str, xml_string: str, basePath: str = None) -> Any:
+        """
+        Execute a tool in a worker process.
+
+        Args:
+            name: Tool name
+            xml_string: The tool's XML block
+            basePath: Base path for relative paths (the caller's cwd by default)
+
+        Returns:
+            The tool result, or an error ToolResult if the call failed, hit a
+            limit, timed out or crashed its worker
+        """
+        if self._closed:
+            raise RuntimeError("tool worker pool is shut down")
+        # 工作进程的当前目录不随 $cd 变化，由调用方传入
+        base_path = basePath or os.getcwd()
+        self._count("calls")
+        worker = self._idle.get()
+        try:
+            with telemetry.timer(f"tool.{name}_ms"):
+                try:
+                    worker.conn.send((name, xml_string, base_path))
+                    if not worker.conn.poll(self.timeout):
+                        self._count("timeouts")
+                        worker = self._replace(worker)
+                        return ToolResult.error(name, f"Tool timed out after {self.timeout:g}s")
+                    status, payload, cpu_ms = worker.conn.recv()
+                except (EOFError, OSError):
+                    # 工作进程崩溃（或被 CPU/内存限制结束）：换一个新的进程
+                    worker.process.join(1)
+                    exitcode = worker.process.exitcode
+                    self._count("crashes")
+                    worker = self._replace(worker)
+                    return ToolResult.error(name, f"Tool worker crashed (exit code {exitcode})")
+            telemetry.record("tool.worker_cpu_ms", cpu_ms)
+            if status == "error":
+                self._count("errors")
+                return ToolResult.error(name, payload)
+            return payload
+        finally:
+            self._idle.put(worker)
+
+    def shutdown(self):
+        """Stop all worker processes."""
+        self._closed = True
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self._workers:
+            worker.process.join(1)
+            worker.kill()
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.tools.tool_worker_pool
+"""
+if __name__ == "__main__":
+    LIST_XML = "<list_files><args><path>.</path><recursive>false</recursive></args></list_files>"
+    pool = ToolWorkerPool(workers=2, cpu_seconds=2)
+    try:
+        started = time.perf_counter()
+        print(pool.run('list_files', LIST_XML))
+        print(f"{(time.perf_counter() - started) * 1000:.1f} ms (first call, includes worker start-up)")
+        started = time.perf_counter()
+        pool.run('list_files', LIST_XML)
+        print(f"{(time.perf_counter() - started) * 1000:.1f} ms (warm)")
+        print(pool.stats)
+    finally:
+        pool.shutdown()
@@ -2,57 +2,60 @@ from typing import Dict, Any
 import os
 
 import xml.etree.ElementTree as ET
+from .staged_write import StagedWrite
 from .write_to_file import WriteToFileArgs, write_to_file
+from ..tool_result import ToolResult, element
 
 
-def run(xml_string: str, basePath: str = None) -> str:
+def run(xml_string: str, basePath: str = None) -> ToolResult:
     args = parse_write_file_xml(xml_string)
     return execute(args, basePath)
 
 
-def execute(args: WriteToFileArgs, basePath: str = None) -> str:
-    result = write_to_file(args, basePath)
+def execute(args: WriteToFileArgs, basePath: str = None) -> ToolResult:
+    return _to_tool_result(write_to_file(args, basePath))
 
+
+def execute_staged(staged: StagedWrite) -> ToolResult:
+    """Commit content that was streamed into a staged file (see llm/write_stream.py)."""
+    return _to_tool_result({"results": [staged.commit()]})
+
+
+def _to_tool_result(result) -> ToolResult:
     # 如果有错误，返回错误信息
     if "error" in result:
-        return f"Error: {result['error']}"
+        return ToolResult.error("write_to_file", result['error'])
 
     # 获取结果列表
     results = result.get("results", [])
 
-    # 构建返回的字符串格式，按照示例格式
+    # 构建返回的结构化结果，按照示例格式
     if results:
         file_result = results[0]  # 只处理第一个文件
         path = file_result.get("path", "")
+        if file_result.get("status") == "error":
+            return ToolResult.error("write_to_file", file_result.get("error", "Unknown error"))
         operation = file_result.get("operation", "modified")
         user_edits = file_result.get("user_edits", "no edits applied")
-        line_count = file_result.get("line_count", 0)
-
-        # 构建输出字符串
-        output_lines = [f"[write_to_file for '{path}'] Result:"]
-        output_lines.append("<file_write_result>")
-        output_lines.append(f"<path>{path}</path>")
-        output_lines.append(f"<operation>{operation}</operation>")
-
-        # 添加user_edits部分，根据实际内容构建
-        # 首先解析XML以获取内容
-        output_lines.append(f"<user_edits>{user_edits.strip()}")
-
-        output_lines.append("</user_edits>")
-        output_lines.append("</file_write_result>")
-        # 添加notice部分
-        output_lines.append("<notice>")
-        output_lines.append(
-            "<i>You do not need to re-read the file, as you have seen all changes</i>")
-        output_lines.append(
-            "<i>Proceed with the task using these changes as the new baseline.</i>")
-        output_lines.append(
-            "<i>If the user's edits have addressed part of the task or changed the requirements, adjust your approach accordingly.</i>")
-        output_lines.append("</notice>")
-
-        return "\n".join(output_lines)
+
+        return ToolResult(
+            tool="write_to_file",
+            title=f"[write_to_file for '{path}'] Result:",
+            nodes=[
+                element("file_write_result", children=[
+                    element("path", path),
+                    element("operation", operation),
+                    element("user_edits", user_edits.strip(), block=True),
+                ]),
+                # 添加notice部分
+                element("notice", children=[
+                    element("i", "You do not need to re-read the file, as you have seen all changes"),
+                    element("i", "Proceed with the task using these changes as the new baseline."),
+                    element("i", "If the user's edits have addressed part of the task or changed the requirements, adjust your approach accordingly."),
+                ]),
+            ])
     else:
-        return "[write_to_file] Result: No files processed"
+        return ToolResult(tool="write_to_file", title="[write_to_file] Result: No files processed")
 
 
 def parse_write_file_xml(xml_string: str) -> WriteToFileArgs:
@@ -136,7 +139,7 @@ if __name__ == "__main__":
 "version": "1.0.0"
 }
 </content>
-<line_count>17</line_count>
+<line_count>15</line_count>
 </write_to_file>
     """
 
@@ -0,0 +1,232 @@
+"""
+Staged File Writes
+==================
+
+write_to_file content is written to a temporary file first; the target is
+replaced with an atomic rename only when the write is committed (approved).
+A reader never sees a half-written file, and memory use does not grow with
+the size of the file: content can be fed in pieces while the model's reply
+is still streaming (see llm/write_stream.py).
+
+Lines are counted as the content arrives. If the tool call declares a
+line_count and the content has fewer lines, the content was almost
+certainly cut off, so the write is refused instead of truncating the file.
+"""
+
+import atexit
+import difflib
+import errno
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional
+
+# 内容不超过该长度时保留在内存中，用于生成 diff 和写入对话历史
+MAX_INLINE_CHARS = 64 * 1024
+STAGING_PREFIX = "too-write-"
+
+_staging_dir: Optional[str] = None
+
+
+def _read_umask() -> int:
+    """The process umask, read without changing it where the system allows."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    # os.umask 只能先设置再恢复，期间其他线程创建的文件会得到错误的权限：只在导入时执行一次
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# 新建文件的默认权限（0666 去掉 umask），与 open() 创建的文件一致
+NEW_FILE_MODE = 0o666 & ~_read_umask()
+
+
+def _default_staging_dir() -> str:
+    """A private temp directory of the process, removed at exit with any writes never approved."""
+    global _staging_dir
+    if _staging_dir is None or not os.path.isdir(_staging_dir):
+        _staging_dir = tempfile.mkdtemp(prefix=STAGING_PREFIX)
+        atexit.register(shutil.rmtree, _staging_dir, True)
+    return _staging_dir
+
+
+def _replace(source: str, target: str):
+    """Atomically replace ``target`` with ``source``, also across file systems."""
+    try:
+        os.replace(source, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # 临时目录与目标不在同一文件系统：先复制到目标目录，再在目录内原子替换
+        fd, copy_path = tempfile.mkstemp(prefix=f".{os.path.basename(target)}.", dir=os.path.dirname(target) or ".")
+        try:
+            with os.fdopen(fd, "wb") as out, open(source, "rb") as src:
+                shutil.copyfileobj(src, out)
+            shutil.copymode(source, copy_path)
+            os.replace(copy_path, target)
+        except BaseException:
+            os.unlink(copy_path)
+            raise
+        os.unlink(source)
+
+
+class StagedWrite:
+    """
+    The content of one write_to_file call, staged in a temporary file.
+    """
+
+    def __init__(self, path: str, basePath: str = None, line_count: int = 0, staging_dir: str = None):
+        """
+        Start staging a write.
+
+        Args:
+            path: Target path as given in the tool call
+            basePath: Base path to resolve the target path (defaults to cwd)
+            line_count: Declared number of lines (0 = not declared)
+            staging_dir: Directory of the temporary file (defaults to a private
+                directory in the system temp dir, removed at exit)
+        """
+        self.path = path
+        self.full_path = os.path.join(basePath or os.getcwd(), path)
+        self.line_count = line_count
+        fd, self.temp_path = tempfile.mkstemp(suffix=".tmp", dir=staging_dir or _default_staging_dir())
+        # newline='' 保持换行符原样
+        self._file = os.fdopen(fd, "w", encoding="utf-8", newline="")
+        self.chars = 0
+        self.newlines = 0
+        self._first = ""
+        self._last = ""
+        self._inline: Optional[List[str]] = []
+        self.closed = False
+
+    def feed(self, text: str):
+        """Append a piece of content."""
+        if not text:
+            return
+        self._file.write(text)
+        if not self._first:
+            self._first = text[0]
+        self._last = text[-1]
+        self.newlines += text.count("\n")
+        self.chars += len(text)
+        if self._inline is not None:
+            if self.chars <= MAX_INLINE_CHARS:
+                self._inline.append(text)
+            else:
+                self._inline = None
+
+    @property
+    def lines(self) -> int:
+        """Lines of content received so far (the line break right after <content> is not counted)."""
+        if not self.chars:
+            return 0
+        count = self.newlines + (0 if self._last == "\n" else 1)
+        return count - 1 if self._first == "\n" else count
+
+    @property
+    def content(self) -> Optional[str]:
+        """The content, if it is small enough to be kept in memory."""
+        return "".join(self._inline) if self._inline is not None else None
+
+    def finish(self):
+        """Close the temporary file (no more content follows)."""
+        if not self._file.closed:
+            self._file.close()
+
+    def verify(self) -> Optional[str]:
+        """An error message if the content has fewer lines than declared, else None."""
+        if self.line_count and self.lines < self.line_count:
+            return (f"The content has {self.lines} lines but line_count is {self.line_count}; "
+                    f"it looks truncated, so {self.path} was not written. Write the complete file again.")
+        return None
+
+    def _diff(self, operation: str) -> str:
+        new_content = self.content
+        old_content = ""
+        if operation == "modified":
+            try:
+                if os.path.getsize(self.full_path) > MAX_INLINE_CHARS * 4:
+                    new_content = None
+                else:
+                    with open(self.full_path, 'r', encoding='utf-8') as f:
+                        old_content = f.read()
+            except Exception:
+                # If we can't read the old file, treat as if it's empty
+                old_content = ""
+        if new_content is None:
+            # 大文件不生成 diff，避免新旧内容同时驻留内存
+            return f"{operation} {self.path}: {self.lines} lines, {self.chars} characters (diff omitted for large files)"
+        diff = difflib.unified_diff(
+            old_content.splitlines(keepends=True),
+            new_content.splitlines(keepends=True),
+            fromfile=f'a/{self.path}',
+            tofile=f'b/{self.path}',
+            lineterm=''
+        )
+        return ''.join(diff)
+
+    def commit(self) -> Dict[str, Any]:
+        """
+        Verify the content and move it into place.
+
+        Returns:
+            The write result: path, status, and line_count / user_edits /
+            operation on success or error on failure
+        """
+        self.finish()
+        if self.closed:
+            return {"path": self.path, "status": "error", "error": "The staged content was already used"}
+        error = self.verify()
+        if error:
+            self.discard()
+            return {"path": self.path, "status": "error", "error": error}
+        try:
+            operation = "modified" if os.path.exists(self.full_path) else "created"
+            content_diff = self._diff(operation)
+            # Create directories if they don't exist
+            os.makedirs(os.path.dirname(self.full_path) or ".", exist_ok=True)
+            # 临时文件权限为 0600：改为原文件或新文件的默认权限
+            mode = os.stat(self.full_path).st_mode & 0o7777 if operation == "modified" else NEW_FILE_MODE
+            os.chmod(self.temp_path, mode)
+            _replace(self.temp_path, self.full_path)
+        except Exception as e:
+            self.discard()
+            return {"path": self.path, "status": "error", "error": str(e)}
+        self.closed = True
+        return {
+            "path": self.path,
+            "status": "success",
+            "line_count": self.line_count,
+            "user_edits": content_diff,
+            "operation": operation,
+        }
+
+    def discard(self):
+        """Throw the staged content away."""
+        self.finish()
+        self.closed = True
+        try:
+            os.unlink(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.tools.write_to_file.staged_write
+"""
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as workspace:
+        staged = StagedWrite("notes/a.txt", workspace, line_count=3)
+        for piece in ["\nfirst", " line\nsec", "ond line\nthird line\n"]:
+            staged.feed(piece)
+            print(f"fed {piece!r}: {staged.lines} lines so far")
+        print(staged.commit())
+        truncated = StagedWrite("b.txt", workspace, line_count=10)
+        truncated.feed("only\ntwo\n")
+        print(truncated.commit())
@@ -1,9 +1,10 @@
 import os
 from typing import Dict, Any, List
 import json
-import difflib
 from dataclasses import dataclass
 
+from .staged_write import StagedWrite
+
 
 @dataclass
 class FileInfo:
@@ -57,61 +58,23 @@ def _write_to_file(args: WriteToFileArgs, basePath: str) -> Dict[str, Any]:
 
         results = []
         for file_info in files:
-            content_diff = ""
-            operation = "created"
             path = file_info.get('path')
-            content = file_info.get('content', '')
-            line_count = file_info.get('line_count', 0)
-
             if not path:
                 continue
 
-            # Resolve path relative to workspace
-            full_path = os.path.join(basePath, path)
-
-            # Read old content if file exists
-            old_content = ""
-            if os.path.exists(full_path):
-                try:
-                    with open(full_path, 'r', encoding='utf-8') as f:
-                        old_content = f.read()
-                        operation = "modified"
-                except Exception:
-                    # If we can't read the old file, treat as if it's empty
-                    old_content = ""
-
-            # Generate diff
-            old_lines = old_content.splitlines(keepends=True)
-            new_lines = content.splitlines(keepends=True)
-            diff = difflib.unified_diff(
-                old_lines,
-                new_lines,
-                fromfile=f'a/{path}',
-                tofile=f'b/{path}',
-                lineterm=''
-            )
-            content_diff = ''.join(diff)
-
-            # Create directories if they don't exist
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
-
+            # 先写入临时文件，校验行数后原子替换目标文件
+            staged = StagedWrite(path, basePath, file_info.get('line_count', 0))
             try:
-                with open(full_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-
-                results.append({
-                    "path": path,
-                    "status": "success",
-                    "line_count": line_count,
-                    "user_edits": content_diff,
-                    "operation": operation,
-                })
+                staged.feed(file_info.get('content', ''))
             except Exception as e:
+                staged.discard()
                 results.append({
                     "path": path,
                     "status": "error",
                     "error": str(e)
                 })
+                continue
+            results.append(staged.commit())
 
         return {"results": results}
 
@@ -0,0 +1,259 @@
+"""
+Turn Profiler
+=============
+
+Profiles whole agent turns with cProfile and tracemalloc. For each turn a
+``.prof`` file (open it with ``python -m pstats`` or snakeviz) and a text
+summary are written. The summary lists the slowest functions, the largest
+allocations, and the stage that dominated the turn according to the
+telemetry timers.
+
+Before Python 3.12, cProfile only sees the thread it was enabled on, so
+code running on worker threads (the tool scheduler, speculative execution)
+wraps itself in ``turn_profiler.profile_thread()``; those profiles are
+merged into the turn's statistics. From 3.12 cProfile is built on
+sys.monitoring, which sees every thread but allows only one active
+profiler, so ``profile_thread()`` does nothing there.
+
+cProfile, pstats and tracemalloc are imported when the first turn is
+profiled, so importing this module costs nothing at startup.
+"""
+
+import io
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 10
+# 3.12 起一个 Profile 就能看到所有线程，且同时只能启用一个
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+def stage_timings(metrics: Dict[str, float]) -> Dict[str, float]:
+    """
+    Split a turn's telemetry metrics into non-overlapping stages (ms).
+
+    Args:
+        metrics: Per-turn metric sums as returned by Telemetry.end_turn
+
+    Returns:
+        {stage name: milliseconds}
+    """
+    ttft = metrics.get("llm.ttft_ms", 0.0)
+    stream = metrics.get("llm.stream_ms", 0.0)
+    process_cpu = metrics.get("proxy.process_cpu_ms", 0.0)
+    render_cpu = metrics.get("render.cpu_ms", 0.0)
+    stages = {
+        "model: time to first token": ttft,
+        "model: streaming": max(0.0, stream - ttft - process_cpu),
+        "parser: process_response": max(0.0, process_cpu - render_cpu),
+        "render": render_cpu,
+        "environment snapshot": metrics.get("env.snapshot_ms", 0.0),
+    }
+    for name, value in metrics.items():
+        if name.startswith("tool.") and name.endswith("_ms"):
+            stages[f"tool: {name[len('tool.'):-len('_ms')]}"] = value
+    return stages
+
+
+def dominant_stage(metrics: Dict[str, float]) -> Optional[Tuple[str, float]]:
+    """
+    Find the stage that took the most time in a turn.
+
+    Returns:
+        (stage name, milliseconds), or None when nothing was measured
+    """
+    stages = {k: v for k, v in stage_timings(metrics).items() if v > 0}
+    if not stages:
+        return None
+    name = max(stages, key=stages.get)
+    return name, stages[name]
+
+
+class TurnProfiler:
+    """
+    Starts and stops cProfile + tracemalloc around agent turns.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.output_dir: Optional[str] = None
+        self._lock = threading.Lock()
+        # cProfile / tracemalloc 在开始分析时才导入：类型注解写成字符串
+        self._profile: Optional["cProfile.Profile"] = None
+        self._owner_thread: Optional[int] = None
+        self._thread_profiles: List["cProfile.Profile"] = []
+        self._started_tracemalloc = False
+        self._snapshot: Optional["tracemalloc.Snapshot"] = None
+        self._turn = 0
+
+    def configure(self, enabled: bool, output_dir: Optional[str] = None):
+        """
+        Enable or disable profiling.
+
+        Args:
+            enabled: Whether the following turns are profiled
+            output_dir: Directory for .prof files and summaries (resolved now)
+        """
+        if output_dir:
+            self.output_dir = os.path.abspath(output_dir)
+        if not enabled:
+            self.discard_turn()
+        self.enabled = enabled
+
+    @property
+    def active(self) -> bool:
+        """Whether a turn is currently being profiled."""
+        return self._profile is not None
+
+    def begin_turn(self):
+        """Start profiling a turn (a turn still running is discarded)."""
+        self.discard_turn()
+        if not self.enabled:
+            return
+        import cProfile
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._snapshot = tracemalloc.take_snapshot()
+        with self._lock:
+            self._thread_profiles = []
+            self._owner_thread = threading.get_ident()
+            self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def discard_turn(self):
+        """Stop profiling without writing anything."""
+        profile = self._stop()
+        if profile is not None:
+            self._stop_tracemalloc()
+
+    @contextmanager
+    def profile_thread(self):
+        """Profile the block on the current (worker) thread if a turn is active."""
+        # 在开启 turn profile 的线程上再启用一个 Profile 会替换掉它的钩子
+        if not PER_THREAD_PROFILES or self._profile is None or threading.get_ident() == self._owner_thread:
+            yield
+            return
+        import cProfile
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 已有其他 profiler 处于启用状态（"Another profiling tool is already active"）
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                if self._profile is not None:
+                    self._thread_profiles.append(profile)
+
+    def end_turn(self, metrics: Dict[str, float], name: str) -> Optional[Dict[str, object]]:
+        """
+        Stop profiling and write the turn's profile and summary.
+
+        Args:
+            metrics: The turn's telemetry metrics
+            name: File name prefix, e.g. the session id
+
+        Returns:
+            {prof_path, summary_path, dominant_stage} or None if not profiling
+        """
+        snapshot_before = self._snapshot
+        allocations = None
+        if snapshot_before is not None:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                allocations = tracemalloc.take_snapshot().compare_to(snapshot_before, "lineno")
+        with self._lock:
+            thread_profiles = self._thread_profiles
+            self._thread_profiles = []
+        profile = self._stop()
+        self._stop_tracemalloc()
+        if profile is None:
+            return None
+
+        import pstats
+        self._turn += 1
+        output_dir = self.output_dir or os.path.abspath("profiles")
+        os.makedirs(output_dir, exist_ok=True)
+        base = os.path.join(output_dir, f"{name}-turn-{self._turn}")
+
+        stats = pstats.Stats(profile)
+        for thread_profile in thread_profiles:
+            stats.add(thread_profile)
+        stats.dump_stats(base + ".prof")
+
+        dominant = dominant_stage(metrics)
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(self._format_summary(stats, allocations, metrics, dominant))
+        return {"prof_path": base + ".prof", "summary_path": base + ".txt", "dominant_stage": dominant}
+
+    def _stop(self) -> Optional["cProfile.Profile"]:
+        with self._lock:
+            profile, self._profile = self._profile, None
+        if profile is not None:
+            profile.disable()
+        return profile
+
+    def _stop_tracemalloc(self):
+        self._snapshot = None
+        if self._started_tracemalloc:
+            import tracemalloc
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    @staticmethod
+    def _format_summary(stats: "pstats.Stats", allocations, metrics: Dict[str, float],
+                        dominant: Optional[Tuple[str, float]]) -> str:
+        out = io.StringIO()
+        if dominant:
+            out.write(f"Dominant stage: {dominant[0]} ({dominant[1]:.1f} ms)\n\n")
+        out.write("Stages (ms):\n")
+        for stage, value in sorted(stage_timings(metrics).items(), key=lambda kv: -kv[1]):
+            out.write(f"  {stage:<32}{value:>10.1f}\n")
+
+        out.write(f"\nTop {TOP_ALLOCATIONS} allocations during the turn:\n")
+        for stat in (allocations or [])[:TOP_ALLOCATIONS]:
+            out.write(f"  {stat}\n")
+
+        out.write(f"\nTop {TOP_FUNCTIONS} functions by cumulative time:\n")
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        return out.getvalue()
+
+
+# 进程内共享的默认实例
+turn_profiler = TurnProfiler()
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.utils.profiler
+"""
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    with tempfile.TemporaryDirectory() as tmp:
+        turn_profiler.configure(True, tmp)
+        turn_profiler.begin_turn()
+        data = [str(i) * 10 for i in range(100000)]
+
+        def _worker():
+            with turn_profiler.profile_thread():
+                time.sleep(0.05)
+
+        worker = threading.Thread(target=_worker)
+        worker.start()
+        worker.join()
+        result = turn_profiler.end_turn({"tool.read_file_ms": 50.0, "proxy.process_cpu_ms": 3.0}, "demo")
+        print(result)
+        with open(result["summary_path"], encoding="utf-8") as f:
+            print(f.read()[:1500])
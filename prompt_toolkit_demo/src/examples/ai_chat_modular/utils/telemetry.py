@@ -0,0 +1,201 @@
+"""
+Telemetry Utilities
+===================
+
+Lightweight, thread-safe timers and counters for the hot paths of a turn
+(request build, time to first token, streaming, parsing, tools, environment
+snapshots). Samples are kept for the whole session so ``$stats`` can show
+p50/p95, and each finished turn can optionally be appended to a JSONL file
+for offline analysis.
+
+Usage::
+
+    from ..utils.telemetry import telemetry
+
+    with telemetry.timer("env.snapshot_ms"):
+        ...
+    telemetry.incr("llm.chunks")
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, List, Optional
+
+# 每个指标最多保留的样本数，避免长会话无限增长
+MAX_SAMPLES = 10000
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of a list of values.
+
+    Args:
+        values: Samples (need not be sorted)
+        pct: Percentile between 0 and 100
+
+    Returns:
+        The percentile, or 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))  # ceil
+    return ordered[int(rank) - 1]
+
+
+class Telemetry:
+    """
+    Collects samples (timings in ms, rates, sizes) and counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counters: Dict[str, float] = {}
+        self._turn_samples: Dict[str, List[float]] = {}
+        self._turn_counters: Dict[str, float] = {}
+        self._turn = 0
+        self._turn_started: Optional[float] = None
+        self._export_path: Optional[str] = None
+
+    def enable_export(self, path: Optional[str]):
+        """
+        Append one JSON line per finished turn to ``path`` (None disables).
+
+        Relative paths are resolved now, so `$cd` does not move the file.
+        """
+        if path:
+            path = os.path.abspath(path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._export_path = path or None
+
+    def record(self, name: str, value: float):
+        """Add one sample to a metric."""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=MAX_SAMPLES)
+            samples.append(value)
+            self._turn_samples.setdefault(name, []).append(value)
+
+    def incr(self, name: str, amount: float = 1):
+        """Increase a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+            self._turn_counters[name] = self._turn_counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, name: str):
+        """Record the wall time of the block in milliseconds (monotonic clock)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000)
+
+    @contextmanager
+    def cpu_timer(self, name: str):
+        """Record the CPU time of the block on the current thread in milliseconds."""
+        started = time.thread_time()
+        try:
+            yield
+        finally:
+            self.record(name, (time.thread_time() - started) * 1000)
+
+    def begin_turn(self):
+        """Start collecting the samples of a new turn."""
+        with self._lock:
+            self._turn += 1
+            self._turn_samples = {}
+            self._turn_counters = {}
+            self._turn_started = time.perf_counter()
+
+    def end_turn(self) -> Dict[str, object]:
+        """
+        Finish the current turn and export it if enabled.
+
+        Returns:
+            The turn's metrics: per-metric sums and the turn counters
+        """
+        if self._turn_started is not None:
+            self.record("turn.total_ms", (time.perf_counter() - self._turn_started) * 1000)
+        with self._lock:
+            self._turn_started = None
+            turn = {
+                "ts": time.time(),
+                "turn": self._turn,
+                "metrics": {name: round(sum(values), 3) for name, values in self._turn_samples.items()},
+                "counters": dict(self._turn_counters),
+            }
+            export_path = self._export_path
+        if export_path:
+            with open(export_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(turn, ensure_ascii=False) + "\n")
+        return turn
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Session-wide statistics per metric.
+
+        Returns:
+            {name: {count, p50, p95, max, total}}
+        """
+        with self._lock:
+            snapshot = {name: list(values) for name, values in self._samples.items()}
+        return {
+            name: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "max": max(values),
+                "total": sum(values),
+            }
+            for name, values in sorted(snapshot.items()) if values
+        }
+
+    def counters(self) -> Dict[str, float]:
+        """Session-wide counters."""
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def format_summary(self) -> List[str]:
+        """Render the session statistics as text lines for display."""
+        summary = self.summary()
+        if not summary and not self._counters:
+            return ["No telemetry recorded yet."]
+        lines = [f"{'metric':<26}{'count':>7}{'p50':>11}{'p95':>11}{'max':>11}"]
+        for name, stats in summary.items():
+            lines.append(f"{name:<26}{stats['count']:>7}{stats['p50']:>11.2f}"
+                         f"{stats['p95']:>11.2f}{stats['max']:>11.2f}")
+        for name, value in self.counters().items():
+            lines.append(f"{name:<26}{value:>7g}")
+        return lines
+
+    def reset(self):
+        """Drop all samples and counters."""
+        with self._lock:
+            self._samples.clear()
+            self._counters.clear()
+            self._turn_samples = {}
+            self._turn_counters = {}
+
+
+# 进程内共享的默认实例
+telemetry = Telemetry()
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.utils.telemetry
+"""
+if __name__ == "__main__":
+    for i in range(20):
+        telemetry.begin_turn()
+        with telemetry.timer("demo.sleep_ms"):
+            time.sleep(0.001 * (i % 5))
+        telemetry.incr("demo.turns")
+        telemetry.end_turn()
+    print("\n".join(telemetry.format_summary()))
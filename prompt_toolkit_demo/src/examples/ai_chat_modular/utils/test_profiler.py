@@ -0,0 +1,94 @@
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from .profiler import PER_THREAD_PROFILES, TurnProfiler, dominant_stage
+
+
+def _busy_tool():
+    time.sleep(0.01)
+
+
+def test_dominant_stage():
+    metrics = {
+        "llm.ttft_ms": 100.0,
+        "llm.stream_ms": 400.0,
+        "proxy.process_cpu_ms": 50.0,
+        "render.cpu_ms": 10.0,
+        "tool.search_files_ms": 900.0,
+    }
+    assert dominant_stage(metrics) == ("tool: search_files", 900.0)
+    metrics["tool.search_files_ms"] = 1.0
+    assert dominant_stage(metrics) == ("model: streaming", 250.0)
+    assert dominant_stage({}) is None
+
+
+def test_turn_report_includes_worker_threads():
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = TurnProfiler()
+        profiler.configure(True, tmp)
+        profiler.begin_turn()
+        assert profiler.active
+
+        errors = []
+
+        def _worker():
+            try:
+                with profiler.profile_thread():
+                    _busy_tool()
+            except Exception as e:
+                errors.append(e)
+
+        worker = threading.Thread(target=_worker)
+        worker.start()
+        worker.join()
+        assert errors == []
+        # 3.12 起 turn profile 本身就能看到工作线程，不再单独启用 Profile
+        assert len(profiler._thread_profiles) == (1 if PER_THREAD_PROFILES else 0)
+        report = profiler.end_turn({"tool.read_file_ms": 10.0}, "s1")
+
+        assert not profiler.active
+        assert not tracemalloc.is_tracing()
+        assert report["dominant_stage"] == ("tool: read_file", 10.0)
+        assert os.path.basename(report["prof_path"]) == "s1-turn-1.prof"
+        functions = {func[2] for func in pstats.Stats(report["prof_path"]).stats}
+        assert "_busy_tool" in functions
+        with open(report["summary_path"], encoding="utf-8") as f:
+            summary = f.read()
+        assert summary.startswith("Dominant stage: tool: read_file")
+        assert "allocations during the turn" in summary
+
+
+def test_disabled_profiler_writes_nothing():
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = TurnProfiler()
+        profiler.configure(False, tmp)
+        profiler.begin_turn()
+        with profiler.profile_thread():
+            pass
+        assert profiler.end_turn({}, "s1") is None
+        assert os.listdir(tmp) == []
+
+
+def test_importing_the_profiler_loads_no_profiling_modules():
+    # 启动路径（工具注册表）不加载 cProfile / tracemalloc，开始分析时才导入
+    package = __package__.rsplit(".", 1)[0]
+    code = (f"import sys, {package}.tools.tool_registry, {package}.utils.profiler; "
+            "print([m for m in ('cProfile', 'pstats', 'tracemalloc') if m in sys.modules])")
+    root = Path(__file__).resolve().parents[len(__package__.split("."))]
+    output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "[]"
+
+
+if __name__ == "__main__":
+    test_dominant_stage()
+    test_turn_report_includes_worker_threads()
+    test_disabled_profiler_writes_nothing()
+    test_importing_the_profiler_loads_no_profiling_modules()
+    print("All tests passed! ✓")
@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+
+from .telemetry import Telemetry, percentile
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile([7.0], 95) == 7.0
+    assert percentile([], 50) == 0.0
+
+
+def test_summary_and_counters():
+    telemetry = Telemetry()
+    for value in (10, 20, 30, 40):
+        telemetry.record("llm.ttft_ms", value)
+    telemetry.incr("llm.chunks", 3)
+    telemetry.incr("llm.chunks")
+
+    stats = telemetry.summary()["llm.ttft_ms"]
+    assert (stats["count"], stats["p50"], stats["p95"], stats["max"]) == (4, 20, 40, 40)
+    assert telemetry.counters() == {"llm.chunks": 4}
+    assert telemetry.format_summary()[0].startswith("metric")
+
+
+def test_turns_are_exported_as_jsonl():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "metrics", "turns.jsonl")
+        telemetry = Telemetry()
+        telemetry.enable_export(path)
+        for turn in range(2):
+            telemetry.begin_turn()
+            with telemetry.timer("tool.read_file_ms"):
+                pass
+            telemetry.record("tool.read_file_ms", 5)
+            telemetry.incr("llm.chars", 100)
+            telemetry.end_turn()
+
+        with open(path, encoding="utf-8") as f:
+            turns = [json.loads(line) for line in f]
+        assert [t["turn"] for t in turns] == [1, 2]
+        assert turns[1]["counters"] == {"llm.chars": 100}
+        assert 5 <= turns[1]["metrics"]["tool.read_file_ms"] < 100
+        assert "turn.total_ms" in turns[0]["metrics"]
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.utils.test_telemetry
+"""
+if __name__ == "__main__":
+    test_percentile_nearest_rank()
+    test_summary_and_counters()
+    test_turns_are_exported_as_jsonl()
+    print("All tests passed! ✓")
@@ -0,0 +1,84 @@
+from .token_counter import MIN_RESULT_CHARS, TokenBudget, TokenCounter, estimate_text_tokens
+
+
+def test_estimates_are_close_to_bpe_counts():
+    # cl100k 的实际 token 数：10、14
+    assert estimate_text_tokens("Hello, world! This is a simple sentence.") == 10
+    assert 12 <= estimate_text_tokens("The year 2024 had 366 days and 8784 hours.") <= 16
+    assert estimate_text_tokens("") == 0
+    code = "def get_current_working_directory(self) -> str:\n    return os.getcwd()\n" * 50
+    assert 3 <= len(code) / estimate_text_tokens(code) <= 5
+
+
+def test_counts_are_cached():
+    counter = TokenCounter()
+    text = "some repeated message content " * 20
+    first = counter.count(text)
+    assert counter.count(text) == first
+    assert (counter.hits, counter.misses) == (1, 1)
+
+
+def test_history_total_is_incremental():
+    counter = TokenCounter()
+    history = [{"role": "system", "content": "You are helpful."},
+               {"role": "user", "content": "Read the README please."}]
+    total = counter.count_history(history)
+    history = history + [{"role": "assistant", "content": "Sure, reading it now."}]
+    misses = counter.misses
+    grown = counter.count_history(history)
+
+    assert grown == total + counter.count_message(history[-1])
+    # 只统计新增的消息（内容与角色各一次）
+    assert counter.misses - misses <= 2
+    assert grown == TokenCounter().count_history(history)
+
+
+def test_calibration_scales_estimates():
+    counter = TokenCounter()
+    text = "calibrate me " * 100
+    before = counter.count(text)
+    for _ in range(20):
+        counter.calibrate(counter.count(text), before * 2)
+    assert 1.9 <= counter.scale <= 2.0
+    assert counter.count(text) > before * 1.9
+
+
+def test_budget_trims_oldest_messages():
+    counter = TokenCounter()
+    history = [{"role": "system", "content": "system prompt"}]
+    for i in range(40):
+        history.append({"role": "user", "content": f"question {i} " * 20})
+        history.append({"role": "assistant", "content": f"answer {i} " * 20})
+    history.append({"role": "user", "content": "final question"})
+
+    budget = TokenBudget(context_window=800, reserve=100, counter=counter)
+    trimmed, dropped = budget.trim_history(history)
+    assert dropped > 0
+    assert trimmed[0] == history[0] and trimmed[-1] == history[-1]
+    assert trimmed[1]["role"] == "user"
+    assert budget.fits(trimmed)
+    assert budget.trim_history(trimmed) == (trimmed, 0)
+    # 结果上限按裁剪后的历史计算，且不低于最小值
+    assert budget.max_result_chars(history) == budget.max_result_chars(trimmed) >= MIN_RESULT_CHARS
+    assert TokenBudget(20000, 100, counter).max_result_chars(history[:1], results=2) > MIN_RESULT_CHARS
+
+
+def test_budget_window_follows_the_model():
+    assert TokenBudget.from_config({"API_MODEL": "gpt-4o-mini"}).context_window == 128000
+    assert TokenBudget.from_config({"API_MODEL": "openai/gpt-4-32k-0613"}).context_window == 32768
+    assert TokenBudget.from_config({"API_MODEL": "gpt-4o", "CONTEXT_WINDOW_TOKENS": "9000"}).context_window == 9000
+    # 未知模型：不裁剪历史，也不限制结果
+    budget = TokenBudget.from_config({"API_MODEL": "local-llm"})
+    history = [{"role": "user", "content": "x " * 100000}, {"role": "user", "content": "y"}]
+    assert budget.trim_history(history) == (history, 0)
+    assert budget.max_result_chars(history) > 10 ** 9
+
+
+if __name__ == "__main__":
+    test_estimates_are_close_to_bpe_counts()
+    test_counts_are_cached()
+    test_history_total_is_incremental()
+    test_calibration_scales_estimates()
+    test_budget_trims_oldest_messages()
+    test_budget_window_follows_the_model()
+    print("All tests passed! ✓")
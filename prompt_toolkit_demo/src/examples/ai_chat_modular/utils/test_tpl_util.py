@@ -0,0 +1,41 @@
+from .tpl_util import Template, compile_template, replace_template_vars
+
+
+def test_render_matches_replace_template_vars():
+    source = "Hi {{name}}, cwd={{cwd}}. {{name}} again; {{unknown}} stays."
+    expected = replace_template_vars(source, {"{{name}}": "Ann", "{{cwd}}": "/tmp"})
+
+    assert Template(source).render({"name": "Ann", "cwd": "/tmp"}) == expected
+    assert Template(source).render(name="Ann", cwd="/tmp") == expected
+
+
+def test_values_are_not_rescanned():
+    template = Template("{{a}}|{{b}}")
+    assert template.render(a="{{b}}", b="x") == "{{b}}|x"
+
+
+def test_render_cache_hits_on_same_inputs():
+    template = Template("{{a}}-{{b}}", cache_size=2)
+    assert template.render(a="1", b="2") == "1-2"
+    assert template.render(a="1", b="2") == "1-2"
+    assert (template.hits, template.misses) == (1, 1)
+
+    template.render(a="3", b="4")
+    template.render(a="5", b="6")
+    template.render(a="1", b="2")
+    assert template.misses == 4
+
+
+def test_compile_template_is_shared():
+    assert compile_template("x {{y}}") is compile_template("x {{y}}")
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.utils.test_tpl_util
+"""
+if __name__ == "__main__":
+    test_render_matches_replace_template_vars()
+    test_values_are_not_rescanned()
+    test_render_cache_hits_on_same_inputs()
+    test_compile_template_is_shared()
+    print("All tests passed! ✓")
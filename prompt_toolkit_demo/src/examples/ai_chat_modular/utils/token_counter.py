@@ -0,0 +1,354 @@
+"""
+Token Counter
+=============
+
+Offline token estimates for prompt budgeting. Text is split the way BPE
+tokenizers pre-tokenize it (words with their leading space, digit groups of
+up to three, punctuation runs, whitespace runs), and each piece is costed
+with rules calibrated against cl100k-style vocabularies: common words are a
+single token, long words and identifiers split every few characters, CJK
+characters cost about one token each. The estimate can be corrected at
+runtime from the ``usage`` the API reports (``calibrate``).
+
+Counts are cached per message content, and the total of a conversation
+history is updated incrementally: only messages appended since the last
+call are counted.
+
+Usage::
+
+    from ..utils.token_counter import token_counter, TokenBudget
+
+    budget = TokenBudget(context_window=16385, reserve=1024)
+    messages, dropped = budget.trim_history(conversation_history)
+"""
+
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# 与 BPE 分词器的预分词规则类似：缩写、带前导空格的单词、最多三位的数字（不含空格）、标点串、空白串
+PIECE_PATTERN = re.compile(
+    r"'(?:s|t|re|ve|m|ll|d)"
+    r"| ?[^\W\d_]+"
+    r"|\d{1,3}"
+    r"| ?(?:[^\s\w]|_)+"
+    r"|\s+(?!\S)|\s+")
+
+# 校准参数：英文单词约 8 个字符以内为 1 个 token，更长的按此长度切分
+WORD_CHARS_PER_TOKEN = 8
+# 标点/符号串大约每 2 个字符 1 个 token
+PUNCT_CHARS_PER_TOKEN = 2
+# 非 ASCII 字母（如中文）大约每个字符 1 个 token
+NON_ASCII_TOKENS_PER_CHAR = 1.0
+# 普通英文文本平均每个 token 约 4 个字符
+CHARS_PER_TOKEN = 4
+# 每条聊天消息的格式开销（role、分隔符），与 OpenAI 的计算方式一致
+MESSAGE_OVERHEAD = 4
+# 工具结果的最小长度：历史已占满预算时仍保留结果开头（更早的消息在下次请求时被裁掉）
+MIN_RESULT_CHARS = 4096
+# 常见模型的上下文窗口（按模型名前缀匹配，最长前缀优先）；未知模型不设预算
+MODEL_CONTEXT_WINDOWS = {
+    'gpt-3.5-turbo': 16385,
+    'gpt-4': 8192,
+    'gpt-4-32k': 32768,
+    'gpt-4-turbo': 128000,
+    'gpt-4o': 128000,
+    'gpt-4.1': 1047576,
+    'gpt-5': 400000,
+    'o1': 200000,
+    'o3': 200000,
+    'o4': 200000,
+    'claude': 200000,
+    'gemini': 1048576,
+    'deepseek': 65536,
+}
+# 回复的起始开销
+REPLY_OVERHEAD = 3
+
+
+def _count_piece(piece: str) -> float:
+    first = piece[0]
+    if first == " " and len(piece) > 1:
+        piece = piece[1:]
+        first = piece[0]
+    if first.isspace():
+        return 1
+    if first.isdigit():
+        return 1
+    if first.isalpha():
+        if piece.isascii():
+            return -(-len(piece) // WORD_CHARS_PER_TOKEN)
+        ascii_chars = sum(1 for ch in piece if ch.isascii())
+        return max(1, -(-ascii_chars // WORD_CHARS_PER_TOKEN)
+                   + (len(piece) - ascii_chars) * NON_ASCII_TOKENS_PER_CHAR)
+    return -(-len(piece) // PUNCT_CHARS_PER_TOKEN)
+
+
+def estimate_text_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text (uncached, uncalibrated).
+
+    Args:
+        text: The text to estimate
+
+    Returns:
+        Approximate token count
+    """
+    if not text:
+        return 0
+    return int(sum(_count_piece(piece) for piece in PIECE_PATTERN.findall(text)) + 0.5)
+
+
+class TokenCounter:
+    """
+    Cached, calibrated token estimates for texts and chat histories.
+    """
+
+    def __init__(self, cache_size: int = 4096):
+        """
+        Initialize the counter.
+
+        Args:
+            cache_size: Number of distinct texts whose counts are kept
+        """
+        self.cache_size = cache_size
+        # 根据 API 返回的 usage 校准的比例系数
+        self.scale = 1.0
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+        # 上一次统计的历史：(消息对象, 内容对象, 累计 token 数)
+        self._history: List[Tuple[Dict[str, str], object, int]] = []
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text: str) -> int:
+        """
+        Estimated tokens of a text, cached by content hash.
+
+        Args:
+            text: The text to count
+
+        Returns:
+            Approximate token count
+        """
+        if not text:
+            return 0
+        # str 的哈希值会缓存在对象上，历史中的同一字符串重复查询几乎没有开销
+        key = (hash(text), len(text))
+        with self._lock:
+            raw = self._cache.get(key)
+            if raw is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+        if raw is None:
+            raw = estimate_text_tokens(text)
+            with self._lock:
+                self.misses += 1
+                self._cache[key] = raw
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return int(raw * self.scale + 0.5)
+
+    def count_message(self, message: Dict[str, str]) -> int:
+        """
+        Estimated tokens of one chat message including its formatting overhead.
+
+        Args:
+            message: Message dict with role and content
+
+        Returns:
+            Approximate token count
+        """
+        return MESSAGE_OVERHEAD + self.count(message.get("role", "")) + self.count(message.get("content") or "")
+
+    def count_history(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Estimated prompt tokens of a chat history.
+
+        Messages shared with the previous call (same objects, same content)
+        are not visited again, so appending to a history costs only the new
+        messages.
+
+        Args:
+            messages: The conversation history
+
+        Returns:
+            Approximate prompt token count
+        """
+        with self._lock:
+            previous = self._history
+        common = 0
+        limit = min(len(previous), len(messages))
+        while common < limit:
+            message, content, _ = previous[common]
+            if messages[common] is not message or message.get("content") is not content:
+                break
+            common += 1
+
+        history = previous[:common]
+        total = history[-1][2] if history else 0
+        for message in messages[common:]:
+            total += self.count_message(message)
+            history.append((message, message.get("content"), total))
+        with self._lock:
+            self._history = history
+        return total + REPLY_OVERHEAD
+
+    def calibrate(self, estimated: int, actual: int, weight: float = 0.3):
+        """
+        Adjust the scale from a reported token count.
+
+        Args:
+            estimated: Tokens estimated for a prompt (with the current scale)
+            actual: Tokens the API reported for the same prompt
+            weight: Weight of the new observation (exponential moving average)
+        """
+        if estimated <= 0 or actual <= 0:
+            return
+        with self._lock:
+            ratio = self.scale * actual / estimated
+            scale = (1 - weight) * self.scale + weight * ratio
+            self.scale = min(2.0, max(0.5, scale))
+            # 系数变化后累计值失效
+            self._history = []
+
+    def chars_for_tokens(self, tokens: int) -> int:
+        """Approximate number of characters of ordinary text that fit ``tokens``."""
+        return max(0, int(tokens * CHARS_PER_TOKEN / self.scale))
+
+
+def model_context_window(model: Optional[str]) -> Optional[int]:
+    """Context window of a known model family (``provider/`` prefixes ignored), or None."""
+    name = (model or "").lower().rsplit("/", 1)[-1]
+    matches = [prefix for prefix in MODEL_CONTEXT_WINDOWS if name.startswith(prefix)]
+    return MODEL_CONTEXT_WINDOWS[max(matches, key=len)] if matches else None
+
+
+class TokenBudget:
+    """
+    Prompt budget of one model: context window minus the tokens reserved
+    for the reply.
+    """
+
+    def __init__(self, context_window: Optional[int] = 16385, reserve: int = 1024,
+                 counter: Optional[TokenCounter] = None):
+        """
+        Initialize the budget.
+
+        Args:
+            context_window: Model context window in tokens (None = no budget:
+                nothing is trimmed or capped)
+            reserve: Tokens kept free for the model's reply
+            counter: TokenCounter to use (the shared one by default)
+        """
+        self.context_window = context_window
+        self.reserve = reserve
+        self.counter = counter or token_counter
+
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> 'TokenBudget':
+        """
+        Create a budget from CONTEXT_WINDOW_TOKENS / RESPONSE_RESERVE_TOKENS.
+
+        Without CONTEXT_WINDOW_TOKENS the window of API_MODEL is used if the
+        model is known (MODEL_CONTEXT_WINDOWS), otherwise there is no budget.
+        """
+        window = config.get('CONTEXT_WINDOW_TOKENS')
+        return cls(int(window) if window else model_context_window(config.get('API_MODEL')),
+                   int(config.get('RESPONSE_RESERVE_TOKENS') or 1024))
+
+    @property
+    def limit(self) -> int:
+        """Maximum prompt tokens."""
+        if self.context_window is None:
+            return sys.maxsize
+        return max(0, self.context_window - self.reserve)
+
+    def remaining(self, messages: List[Dict[str, str]]) -> int:
+        """Tokens still available after ``messages`` (negative when over budget)."""
+        return self.limit - self.counter.count_history(messages)
+
+    def fits(self, messages: List[Dict[str, str]]) -> bool:
+        """Whether ``messages`` fit the prompt budget."""
+        return self.remaining(messages) >= 0
+
+    def max_result_chars(self, messages: List[Dict[str, str]], results: int = 1) -> int:
+        """
+        Character cap per tool result so that ``results`` results still fit.
+
+        The remaining budget is measured on the history as trim_history will
+        send it, so a long session does not starve the results.
+
+        Args:
+            messages: The history the results will be appended to
+            results: Number of results sharing the remaining budget
+
+        Returns:
+            Characters per result (at least MIN_RESULT_CHARS)
+        """
+        if self.context_window is None:
+            return sys.maxsize
+        kept, _ = self.trim_history(messages)
+        remaining = max(0, self.remaining(kept) - MESSAGE_OVERHEAD)
+        return max(MIN_RESULT_CHARS, self.counter.chars_for_tokens(remaining // max(1, results)))
+
+    def trim_history(self, messages: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], int]:
+        """
+        Drop the oldest messages until the history fits.
+
+        The system message (first message with role "system") and the last
+        message are always kept.
+
+        Args:
+            messages: The conversation history
+
+        Returns:
+            (messages to send, number of messages dropped)
+        """
+        total = self.counter.count_history(messages)
+        if total <= self.limit or len(messages) <= 2:
+            return messages, 0
+        keep_system = 1 if messages and messages[0].get("role") == "system" else 0
+        start = keep_system
+        while total > self.limit and start < len(messages) - 1:
+            total -= self.counter.count_message(messages[start])
+            start += 1
+        # 不以 assistant 消息开头，避免回复缺少对应的提问
+        while start < len(messages) - 1 and messages[start].get("role") == "assistant":
+            total -= self.counter.count_message(messages[start])
+            start += 1
+        dropped = start - keep_system
+        return messages[:keep_system] + messages[start:], dropped
+
+
+# 进程内共享的默认实例
+token_counter = TokenCounter()
+
+
+"""
+Run command: python -m src.examples.ai_chat_modular.utils.token_counter
+"""
+if __name__ == "__main__":
+    import time
+
+    samples = [
+        "Hello, world! This is a simple sentence.",
+        "def get_current_working_directory(self) -> str:\n    return os.getcwd()\n",
+        "请帮我读取 README.md 文件的内容",
+        "The year 2024 had 366 days and 8784 hours.",
+    ]
+    for sample in samples:
+        print(f"{token_counter.count(sample):>4}  {sample!r}")
+
+    history = [{"role": "system", "content": "You are a helpful assistant. " * 200}]
+    for i in range(500):
+        history = history + [{"role": "user", "content": f"question {i} " * 50},
+                             {"role": "assistant", "content": f"answer {i} " * 80}]
+        started = time.perf_counter()
+        total = token_counter.count_history(history)
+        elapsed = (time.perf_counter() - started) * 1000
+    print(f"history of {len(history)} messages: {total} tokens, last update {elapsed:.3f} ms")
+    trimmed, dropped = TokenBudget(16385, 1024).trim_history(history)
+    print(f"trimmed to {len(trimmed)} messages ({dropped} dropped)")
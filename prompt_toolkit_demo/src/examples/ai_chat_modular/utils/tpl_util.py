@@ -1,3 +1,21 @@
+"""
+Template Utilities
+==================
+
+``replace_template_vars`` does one ``str.replace`` pass per variable.
+``Template`` tokenises a ``{{name}}`` template once into literal and
+placeholder segments and renders it with a single ``''.join``; renders
+whose inputs did not change are served from a small cache.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+
+
 def replace_template_vars(template, vars_map):
     """
     使用简单字符串替换模板中的变量占位符
@@ -17,6 +35,92 @@ def replace_template_vars(template, vars_map):
     return result
 
 
+class Template:
+    """
+    A ``{{name}}`` template compiled into segments once.
+
+    Even-indexed segments are literal text, odd-indexed segments are
+    placeholder names. Placeholders without a value are kept verbatim, like
+    ``replace_template_vars`` does, and values are never re-scanned for
+    placeholders.
+    """
+
+    def __init__(self, template: str, cache_size: int = 8):
+        """
+        Compile a template.
+
+        Args:
+            template: Template text with ``{{name}}`` placeholders
+            cache_size: Number of recent renders kept (0 disables the cache)
+        """
+        self.source = template
+        # re.split 带捕获组：结果依次为 字面量, 变量名, 字面量, ...
+        self.segments: List[str] = PLACEHOLDER_PATTERN.split(template)
+        self.names: Tuple[str, ...] = tuple(dict.fromkeys(self.segments[1::2]))
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, values: Optional[Dict[str, str]] = None, **kwargs: str) -> str:
+        """
+        Render the template.
+
+        Args:
+            values: Mapping of placeholder name (without braces) to value
+            **kwargs: Additional values, overriding ``values``
+
+        Returns:
+            The rendered text
+        """
+        if kwargs:
+            values = {**(values or {}), **kwargs}
+        values = values or {}
+        key = tuple(values.get(name) for name in self.names)
+
+        if self.cache_size:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return cached
+
+        parts = self.segments.copy()
+        for i in range(1, len(parts), 2):
+            value = values.get(parts[i])
+            parts[i] = "{{" + parts[i] + "}}" if value is None else str(value)
+        result = "".join(parts)
+
+        if self.cache_size:
+            with self._lock:
+                self.misses += 1
+                self._cache[key] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+
+_compiled: Dict[str, Template] = {}
+
+
+def compile_template(template: str) -> Template:
+    """
+    Get the compiled Template for a template string, compiling it once.
+
+    Args:
+        template: Template text with ``{{name}}`` placeholders
+
+    Returns:
+        The shared compiled Template
+    """
+    compiled = _compiled.get(template)
+    if compiled is None:
+        compiled = _compiled.setdefault(template, Template(template))
+    return compiled
+
+
 """
 Run command: python -m src.examples.ai_chat_modular.utils.tpl_util
 """
@@ -73,4 +177,11 @@ if __name__ == "__main__":
     print(f"变量映射: {vars_map4}")
     print(f"结果: {result4}\n")
 
+    # 示例5: 预编译模板
+    print("示例5: 预编译模板")
+    template5 = compile_template("Dear {{name}}, {{product}} is ready. Bye {{name}}!")
+    print(f"片段: {template5.segments}")
+    print(f"结果: {template5.render(name='Carol', product='Too')}")
+    print(f"缓存命中: {template5.render({'name': 'Carol', 'product': 'Too'}) and template5.hits}\n")
+
     print("=== 测试完成 ===")
@@ -16,12 +16,35 @@ from prompt_toolkit.formatted_text import HTML
 from prompt_toolkit.styles import Style
 from prompt_toolkit.history import FileHistory
 from prompt_toolkit.completion import NestedCompleter, PathCompleter
-from prompt_toolkit.widgets import Frame, Box
-from prompt_toolkit.layout.containers import HSplit, Window
-from prompt_toolkit.layout.controls import FormattedTextControl
-from prompt_toolkit.layout import Layout
-from prompt_toolkit.application import Application
-import asyncio
+
+from .stream_renderer import StreamRenderer
+
+
+class PromptHistory(FileHistory):
+    """FileHistory that creates its directory when the first input is stored."""
+
+    def store_string(self, string: str) -> None:
+        # 会话目录在第一次写入时才创建
+        os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+        super().store_string(string)
+
+
+# $ 命令的用法说明，show_instructions 与全屏界面共用
+COMMAND_HELP = [
+    ("$add [path]", "Add content from a file"),
+    ("$help", "Show this help message"),
+    ("$clear", "Clear the current input"),
+    ("$exit", "Exit the chat"),
+    ("$reset", "Reset conversation history"),
+    ("$pwd", "Show current directory"),
+    ("$cd [path]", "Change directory"),
+    ("$approve", "Approve and execute pending tools"),
+    ("$reject", "Reject pending tools"),
+    ("$speculate [on|off]", "Run read-only tools before approval"),
+    ("$resume [session]", "Resume a previous (or the latest) session"),
+    ("$stats", "Show p50/p95 timings of this session"),
+    ("$profile [on|off]", "Write a cProfile/tracemalloc report per turn"),
+]
 
 
 class ViewInterface:
@@ -30,8 +53,13 @@ class ViewInterface:
     Uses prompt_toolkit for enhanced terminal interactions.
     """
 
-    def __init__(self):
-        """Initialize the view interface with styles and key bindings."""
+    def __init__(self, max_fps: float = 30.0):
+        """
+        Initialize the view interface with styles and key bindings.
+
+        Args:
+            max_fps: Maximum frames per second for streamed AI output
+        """
         self.style = Style.from_dict({
             'prompt': '#00ff00 bold',     # Green prompt
             'ai': '#0088ff',              # Blue AI responses
@@ -43,9 +71,13 @@ class ViewInterface:
         })
 
         self.bindings = self._setup_key_bindings()
-        self.history_file = '.ai_chat_history'
+        # 输入历史文件（由 TooTask 指向会话目录中的 prompt_history）
+        self.history_file = None
+        self._history = None
         self.completer = self._create_completer()
         self.pending_tools = []  # 存储待批准的工具列表
+        # 流式输出按帧合并后再写终端
+        self.renderer = StreamRenderer(max_fps=max_fps, style=self.style)
 
     def _setup_key_bindings(self) -> KeyBindings:
         """Set up custom key bindings for the chat interface."""
@@ -87,6 +119,11 @@ class ViewInterface:
             '$pwd': None,
             '$cd': path_completer,
             '$approve': None,  # 添加批准工具的命令
+            '$reject': None,  # 拒绝待批准的工具
+            '$speculate': {'on': None, 'off': None},
+            '$resume': None,  # 恢复之前的会话
+            '$stats': None,  # 显示本次会话的性能统计
+            '$profile': {'on': None, 'off': None},  # 每轮性能剖析
         })
 
         return completer
@@ -99,12 +136,14 @@ class ViewInterface:
             message: The message to display
             msg_type: Type of message (info, error, context)
         """
+        self.renderer.flush()
+        # 使用 HTML.format 转义消息内容，避免 '<' 或 '&' 破坏 HTML 解析
         if msg_type == 'info':
-            print_formatted_text(HTML(f'<ansiwhite>{message}</ansiwhite>'))
+            print_formatted_text(HTML('<ansiwhite>{}</ansiwhite>').format(message))
         elif msg_type == 'error':
-            print_formatted_text(HTML(f'<ansired>{message}</ansired>'))
+            print_formatted_text(HTML('<ansired>{}</ansired>').format(message))
         elif msg_type == 'context':
-            print_formatted_text(HTML(f'<ansicyan>{message}</ansicyan>'))
+            print_formatted_text(HTML('<ansicyan>{}</ansicyan>').format(message))
 
     def display_conversation_context(self, messages: List[Dict[str, str]]):
         """
@@ -161,16 +200,14 @@ class ViewInterface:
 
     def display_ai_header(self):
         """Display the AI response header."""
+        self.renderer.flush()
         print_formatted_text(
             HTML('<ansiblue>AI:</ansiblue> '), end='', flush=True)
 
     def display_attempt_completion(self, chunk: str):
-        if chunk == '' or chunk == '\n':
-            print_formatted_text(chunk, end='', flush=True)
-            return
         """Display an attempt completion chunk."""
-        print_formatted_text(
-            HTML(f'<ansigreen>{chunk}</ansigreen>'), end='', flush=True)
+        # 直接构造 FormattedText 片段，不经过 HTML 解析，'<' 和 '&' 原样显示
+        self.renderer.feed(chunk, 'fg:ansigreen')
 
     def display_ai_message_chunk(self, chunk: str):
         """
@@ -179,11 +216,20 @@ class ViewInterface:
         Args:
             chunk: A part of the AI response to display
         """
-        print(chunk, end='', flush=True)
+        self.renderer.feed(chunk)
 
     def display_newline(self):
         """Display a newline character."""
-        print()
+        self.renderer.feed('\n')
+
+    def finish_ai_message(self) -> Dict[str, float]:
+        """
+        Write the rest of the streamed AI message.
+
+        Returns:
+            Render statistics of the message (chunks, chars, frames, cpu_ms)
+        """
+        return self.renderer.finish()
 
     def display_user_message(self, message: str):
         """
@@ -192,6 +238,7 @@ class ViewInterface:
         Args:
             message: The user message to display
         """
+        self.renderer.flush()
         print_formatted_text(HTML(f'<ansigreen>You:</ansigreen> {message}'))
 
     def display_ai_message(self, message: str):
@@ -201,6 +248,7 @@ class ViewInterface:
         Args:
             message: The AI message to display
         """
+        self.renderer.flush()
         print_formatted_text(HTML(f'<ansiblue>AI:</ansiblue> {message}'))
 
     def get_user_input(self, default_input: str = "") -> str:
@@ -213,6 +261,7 @@ class ViewInterface:
         Returns:
             User input as a string
         """
+        self.renderer.flush()
         user_input = prompt(
             HTML('<ansigreen>You:</ansigreen> '),
             default=default_input,
@@ -220,11 +269,18 @@ class ViewInterface:
             key_bindings=self.bindings,
             style=self.style,
             completer=self.completer,
-            history=FileHistory(self.history_file) if os.path.exists(
-                self.history_file) else None
+            history=self._get_history()
         )
         return user_input.strip()
 
+    def _get_history(self):
+        """Get the prompt history, reloading the file only when its path changes."""
+        if not self.history_file:
+            return None
+        if self._history is None or self._history.filename != self.history_file:
+            self._history = PromptHistory(self.history_file)
+        return self._history
+
     def process_command(self, user_input: str) -> Dict[str, Any]:
         """
         Process special $ commands that affect the view layer.
@@ -297,6 +353,43 @@ class ViewInterface:
                 self.display_system_message(
                     "No pending tools to approve", 'info')
                 result['handled'] = True
+        elif command == '$reject':
+            # 拒绝执行工具
+            if self.pending_tools:
+                self.display_system_message(
+                    f"Rejected execution of {len(self.pending_tools)} tool(s)", 'info')
+                result['rejected_tools'] = self.pending_tools.copy()
+                self.pending_tools.clear()
+            else:
+                self.display_system_message(
+                    "No pending tools to reject", 'info')
+            result['handled'] = True
+        elif command == '$speculate':
+            # 开启/关闭只读工具的投机执行
+            if args.strip().lower() in ('on', 'off'):
+                result['speculate'] = args.strip().lower() == 'on'
+                self.display_system_message(
+                    f"Speculative tool execution {args.strip().lower()}", 'info')
+            else:
+                self.display_system_message(
+                    "Usage: $speculate on|off", 'error')
+            result['handled'] = True
+        elif command == '$resume':
+            # 恢复会话：不带参数时恢复最近一次会话
+            result['resume'] = args.strip() or None
+            result['handled'] = True
+        elif command == '$stats':
+            # 性能统计由 TooTask 显示
+            result['stats'] = True
+            result['handled'] = True
+        elif command == '$profile':
+            # 开启/关闭每轮的 cProfile + tracemalloc 剖析
+            if args.strip().lower() in ('on', 'off'):
+                result['profile'] = args.strip().lower() == 'on'
+            else:
+                self.display_system_message(
+                    "Usage: $profile on|off", 'error')
+            result['handled'] = True
 
         return result
 
@@ -310,14 +403,8 @@ class ViewInterface:
             "Press [Alt+Enter] or [Esc] followed by [Enter] for multi-line messages.")
         print()
         print("Special commands:")
-        print("  $add [path] - Add content from a file")
-        print("  $help       - Show this help message")
-        print("  $clear      - Clear the current input")
-        print("  $exit       - Exit the chat")
-        print("  $reset      - Reset conversation history")
-        print("  $pwd        - Show current directory")
-        print("  $cd [path]  - Change directory")
-        print("  $approve    - Approve and execute pending tools")
+        for usage, description in COMMAND_HELP:
+            print(f"  {usage.ljust(11)} - {description}")
         print()
         print("Special key bindings:")
         print("  Ctrl+C - Clear current input or exit if empty")
@@ -331,6 +418,7 @@ class ViewInterface:
 
     def show_interrupt_message(self):
         """Display an interrupt message."""
+        self.renderer.flush()
         print("\n" + HTML('<ansired>Chat interrupted. Goodbye!</ansired>'))
 
     def wait_for_enter(self):